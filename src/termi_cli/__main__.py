@@ -1,15 +1,17 @@
 import os
 import sys
 import io
-import contextlib
+import time
 import argparse
 import json
 import logging
 
+# Mốc sớm nhất của tiến trình: --trace tính cả thời gian import các module
+_PROCESS_STARTED = time.perf_counter()
+
 from rich.markup import escape
 from rich.console import Console
 from rich.markdown import Markdown
-from PIL import Image
 from dotenv import load_dotenv
 
 # Chuẩn hoá biến môi trường LANGUAGE càng sớm càng tốt để tránh lỗi
@@ -20,51 +22,36 @@ if lang_env:
         os.environ["LANGUAGE"] = primary
 
 # --- Boilerplate để tắt log không cần thiết ---
-@contextlib.contextmanager
-def silence_stderr():
-    """Tạm thởi chuyển hướng stderr sang devnull."""
-    original_stderr_fd = os.dup(2)
-    devnull_fd = os.open(os.devnull, os.O_WRONLY)
-    os.dup2(devnull_fd, 2)
-    os.close(devnull_fd)
-    try:
-        yield
-    finally:
-        os.dup2(original_stderr_fd, 2)
-        os.close(original_stderr_fd)
-
+# SDK Gemini (google.generativeai) được import lười trong termi_cli.api, kèm silence_stderr
+# và hạ mức log google/grpc/absl ngay khi được nạp lần đầu.
 os.environ.setdefault('GRPC_VERBOSITY', 'ERROR')
 os.environ.setdefault('GLOG_minloglevel', '3')
 os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
 os.environ.setdefault('ABSL_CPP_MIN_LOG_LEVEL', '3')
-
-with silence_stderr():
-    import google.generativeai as genai
-try:
-    import logging
-    logging.getLogger('google').setLevel(logging.ERROR)
-    logging.getLogger('grpc').setLevel(logging.ERROR)
-    logging.getLogger('absl').setLevel(logging.ERROR)
-    import absl.logging as _absl_logging
-    _absl_logging.set_verbosity(_absl_logging.ERROR)
-except (ImportError, AttributeError):
-    pass
 # --- Kết thúc Boilerplate ---
 
-from termi_cli import api, utils, cli, memory, i18n
+from termi_cli import api, utils, cli, memory, i18n, circuit_breaker, daemon, hedging, metrics, model_router, response_cache, semantic_cache, tokens, tracing
 from termi_cli.config import load_config, APP_DIR
+from termi_cli.prompts import build_session_instruction, build_volatile_context
 from termi_cli.handlers import (
     agent_handler,
+    batch_handler,
     chat_handler,
     config_handler,
     core_handler,
     history_handler,
+    loadtest_handler,
     utility_handler,
 )
 
+_IMPORTS_DONE = time.perf_counter()
+
 
 def _setup_logging():
-    """Cấu hình logging cho toàn bộ ứng dụng (console + file log)."""
+    """Cấu hình logging cho toàn bộ ứng dụng (console + file log).
+
+    Gọi lại nhiều lần trong cùng tiến trình (daemon) không tạo thêm handler trùng lặp.
+    """
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
@@ -76,13 +63,18 @@ def _setup_logging():
     try:
         os.makedirs(log_dir, exist_ok=True)
         root_logger = logging.getLogger()
+        log_path = os.path.abspath(os.path.join(log_dir, "termi.log"))
 
         # Thêm file handler ở mức DEBUG để lưu toàn bộ log vào file
-        file_handler = logging.FileHandler(os.path.join(log_dir, "termi.log"), encoding="utf-8")
-        file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s - %(message)s")
-        file_handler.setFormatter(file_formatter)
-        root_logger.addHandler(file_handler)
+        if not any(
+            isinstance(h, logging.FileHandler) and h.baseFilename == log_path
+            for h in root_logger.handlers
+        ):
+            file_handler = logging.FileHandler(log_path, encoding="utf-8")
+            file_handler.setLevel(logging.DEBUG)
+            file_formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+            file_handler.setFormatter(file_formatter)
+            root_logger.addHandler(file_handler)
 
         # Hạ level cho các StreamHandler (console) xuống WARNING để ẩn bớt log INFO
         for handler in root_logger.handlers:
@@ -114,26 +106,23 @@ def _run_single_turn(console: Console, config: dict, language: str, parser, args
 
     # Xây dựng prompt
     prompt_parts = []
-    prompt_text = ""
     user_intent = args.prompt or ""
-    
-    if piped_input:
-        prompt_text = f"Dựa vào nội dung được cung cấp sau đây:\n{piped_input}\n\n{user_intent}"
-    else:
-        prompt_text = user_intent
+    relevant_memory = None
+    context = None
 
     if user_intent:
         relevant_memory = memory.search_memory(user_intent)
         if relevant_memory:
             console.print(i18n.tr(language, "memory_found_relevant"))
-            prompt_text = f"{relevant_memory}\n---\n\n{prompt_text}"
 
     if args.read_dir:
         console.print(i18n.tr(language, "reading_directory_context"))
-        context = utils.get_directory_context()
-        prompt_text = f"Dựa vào ngữ cảnh các file dưới đây:\n{context}\n\n{prompt_text}"
+        with tracing.span("directory_context", tracing.TURN):
+            context = utils.get_directory_context()
     
     if args.image:
+        from PIL import Image  # Pillow chỉ cần khi có ảnh đầu vào
+
         for image_path in args.image:
             try:
                 img = Image.open(image_path)
@@ -143,44 +132,101 @@ def _run_single_turn(console: Console, config: dict, language: str, parser, args
             except Exception as e:
                 console.print(i18n.tr(language, "error_opening_image", path=image_path, error=e)); return
         console.print(i18n.tr(language, "images_loaded_count", count=len(args.image)))
-    
-    if prompt_text:
-        prompt_parts.append(prompt_text)
 
     # Xây dựng system instruction cho prompt đơn
     system_instruction_str = core_handler.build_system_instruction(config, args)
     model_name = args.model or config.get("default_model")
 
+    # Ước lượng token và cắt bớt phần ưu tiên thấp trước khi gửi bất kỳ byte nào đi
+    with tracing.span("prompt_budget", tracing.TURN, model=model_name):
+        plan = _plan_prompt_budget(
+            console, language, model_name, system_instruction_str, cli_help_text,
+            history, relevant_memory, context, piped_input, user_intent, list(prompt_parts),
+        )
+    if plan is None:
+        return
+    history = plan.contents.get("history")
+    relevant_memory = plan.contents.get("memory")
+    context = plan.contents.get("directory_context")
+    piped_text = plan.contents.get("piped_input")
+
+    if piped_text:
+        prompt_text = f"Dựa vào nội dung được cung cấp sau đây:\n{piped_text}\n\n{user_intent}"
+    else:
+        prompt_text = user_intent
+
+    if relevant_memory:
+        prompt_text = f"{relevant_memory}\n---\n\n{prompt_text}"
+
+    if context:
+        prompt_text = f"Dựa vào ngữ cảnh các file dưới đây:\n{context}\n\n{prompt_text}"
+
+    if prompt_text:
+        prompt_parts.append(prompt_text)
+
+    # Semantic cache chỉ áp dụng khi prompt chỉ gồm câu hỏi của người dùng (không pipe/ảnh/thư mục)
+    semantic = None
+    if user_intent and not piped_input and not args.image and not args.read_dir:
+        semantic = semantic_cache.get_cache()
+    if semantic is not None:
+        hit = semantic.lookup(user_intent, model_name, system_instruction_str)
+        if hit:
+            cached_answer, similarity = hit
+            console.print(f"\n[dim]🤖 Model: {model_name.replace('models/', '')}[/dim]")
+            console.print(i18n.tr(language, "semantic_cache_hit", similarity=similarity))
+            core_handler.render_text_stream(console, iter([cached_answer]), args.format)
+            _deliver_single_turn_answer(console, language, args, cached_answer)
+            return
+
     # Nếu là HTTP provider (DeepSeek/Groq) thì không dùng tool-calls Gemini, gọi trực tiếp generate_text
-    if isinstance(model_name, str) and (
-        model_name.startswith("deepseek-") or model_name.startswith("groq-")
-    ):
+    if isinstance(model_name, str) and api._provider_of(model_name) != "gemini":
         if not prompt_text:
             return
 
         console.print(f"\n[dim]🤖 Model: {model_name}[/dim]")
         console.print("\n💡 [bold green]Phản hồi:[/bold green]")
 
+        # Model thật sự trả lời (hedging / fallback có thể thay model được yêu cầu)
+        answered_model = model_name
         try:
-            response_text = api.generate_text(
-                model_name,
-                prompt_text,
-                system_instruction=system_instruction_str,
-            )
-        except (api.DeepseekInsufficientBalance, api.GroqInsufficientBalance) as e:
-            provider = "DeepSeek" if isinstance(e, api.DeepseekInsufficientBalance) else "Groq"
-            console.print(
-                f"[bold red]{provider} báo lỗi Insufficient Balance. Không thể dùng {provider} cho lượt hỏi này.[/bold red]"
-            )
-            fallback_model = config.get("default_model")
+            # Stream SSE: hiển thị từng đoạn ngay khi tới thay vì đợi toàn bộ câu trả lời
+            hedge_policy = hedging.policy_for(model_name)
+            if hedge_policy:
+                # Model chính chậm có token đầu tiên thì gửi thêm tới model dự phòng, bên nào nhanh hơn thắng
+                secondary_model, hedge_delay = hedge_policy
+                winner_model, text_stream = hedging.first_response(
+                    model_name,
+                    secondary_model,
+                    lambda m: api.stream_text(m, prompt_text, system_instruction=system_instruction_str),
+                    hedge_delay,
+                )
+                answered_model = winner_model
+                if winner_model != model_name:
+                    console.print(i18n.tr(language, "hedging_secondary_won", model=winner_model))
+            else:
+                text_stream = api.stream_text(model_name, prompt_text, system_instruction=system_instruction_str)
+            response_text = core_handler.render_text_stream(console, text_stream, args.format)
+        except (api.ProviderInsufficientBalance, circuit_breaker.CircuitOpenError) as e:
+            if isinstance(e, circuit_breaker.CircuitOpenError):
+                console.print(i18n.tr(language, "circuit_open_fallback", provider=e.name, retry_in=e.retry_in))
+            else:
+                provider = e.label
+                console.print(
+                    f"[bold red]{provider} báo lỗi Insufficient Balance. Không thể dùng {provider} cho lượt hỏi này.[/bold red]"
+                )
+            # Model kế tiếp còn khoẻ trong model_fallback_order (mặc định: default_model)
+            router = model_router.get_router()
+            router.record_failure(model_name, api.fallback_reason(e))
+            fallback_model = router.next_model(model_name) or config.get("default_model")
             console.print(
-                f"[yellow]Đang chuyển tạm sang model Gemini '[cyan]{fallback_model}[/cyan]' cho lượt hỏi này.[/yellow]"
+                f"[yellow]Đang chuyển tạm sang model '[cyan]{fallback_model}[/cyan]' cho lượt hỏi này.[/yellow]"
             )
 
-            response_text = api.generate_text(
-                fallback_model,
-                prompt_text,
-                system_instruction=system_instruction_str,
+            answered_model = fallback_model
+            response_text = core_handler.render_text_stream(
+                console,
+                api.stream_text(fallback_model, prompt_text, system_instruction=system_instruction_str),
+                args.format,
             )
         except Exception as e:
             console.print(i18n.tr(language, "chat_generic_error", error=e))
@@ -190,44 +236,89 @@ def _run_single_turn(console: Console, config: dict, language: str, parser, args
         if not final_response_text:
             return
 
-        if args.format == "rich":
-            console.print(Markdown(final_response_text))
-        else:
-            console.print(final_response_text)
-
         if user_intent and final_response_text:
             # Không có tool-calls trong nhánh HTTP provider
             if memory.add_memory(user_intent, [], final_response_text):
                 console.print("[dim]💾 Đã lưu 1 lượt tương tác vào trí nhớ dài hạn.[/dim]")
 
-        if args.output:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                f.write(final_response_text)
-            console.print(i18n.tr(language, "file_saved_to", path=args.output))
+        if semantic is not None:
+            semantic.store(user_intent, answered_model, system_instruction_str, final_response_text)
 
-        utils.execute_suggested_commands(final_response_text, console)
+        _deliver_single_turn_answer(console, language, args, final_response_text)
         return
 
     # Nhánh mặc định: dùng Gemini với tool-calls như trước
-    chat_session = api.start_chat_session(model_name, system_instruction_str, history, cli_help_text=cli_help_text)
+    with tracing.span("start_chat_session", tracing.STARTUP, model=model_name):
+        chat_session = api.start_chat_session(model_name, system_instruction_str, history, cli_help_text=cli_help_text)
 
     console.print(f"\n[dim]🤖 Model: {model_name.replace('models/', '')}[/dim]")
     console.print("\n💡 [bold green]Phản hồi:[/bold green]")
 
-    final_response_text, _, _, tool_calls_log = core_handler.handle_conversation_turn(
+    final_response_text, usage, _, tool_calls_log = core_handler.handle_conversation_turn(
         chat_session, prompt_parts, console, model_name=model_name, args=args
     )
+    tool_declarations = None if tool_calls_log else api.tool_declarations_text()
+    if tool_declarations is not None:
+        # Một lần gửi duy nhất: hiệu chỉnh theo đúng payload đã gửi (Gemini tính cả khai báo tool)
+        sent = [plan.contents.get("system_instruction"), history, prompt_parts, tool_declarations]
+        tokens.calibrate(model_name, sent, (usage or {}).get("prompt_tokens"))
 
     if user_intent and final_response_text:
         if memory.add_memory(user_intent, tool_calls_log, final_response_text):
             console.print("[dim]💾 Đã lưu 1 lượt tương tác vào trí nhớ dài hạn.[/dim]")
 
+    # Câu trả lời có gọi tool phụ thuộc trạng thái lúc chạy, không đưa vào semantic cache
+    if semantic is not None and final_response_text and not tool_calls_log:
+        # Router / fallback có thể đã chuyển session sang model Gemini khác
+        answered_model = core_handler._session_model_name(chat_session) or model_name
+        if answered_model.removeprefix("models/") == model_name.removeprefix("models/"):
+            answered_model = model_name
+        semantic.store(user_intent, answered_model, system_instruction_str, final_response_text)
+
+    _deliver_single_turn_answer(console, language, args, final_response_text)
+
+
+def _plan_prompt_budget(console: Console, language: str, model_name: str, system_instruction: str,
+                        cli_help_text: str, history, relevant_memory, context, piped_input, user_intent: str,
+                        images: list):
+    """Lập ngân sách token cho prompt đơn; trả về None nếu riêng phần bắt buộc đã vượt limit."""
+    budget_config = tokens.get_budget_config()
+    http_provider = api._provider_of(model_name) != "gemini"
+    if not http_provider:
+        # Chat session Gemini còn kèm hướng dẫn hệ thống mở rộng (CLI help, quy tắc tool)
+        system_instruction = build_session_instruction(cli_help_text, system_instruction) + build_volatile_context()
+    sections = [
+        tokens.Section("system_instruction", system_instruction, priority=100, required=True),
+        tokens.Section("prompt", user_intent, priority=90, required=True),
+        tokens.Section("images", images, priority=80, required=True),
+        tokens.Section("piped_input", piped_input, priority=60),
+        # DeepSeek/Groq trả lời prompt đơn không kèm lịch sử
+        tokens.Section("history", None if http_provider else history, priority=40, trim="items"),
+        tokens.Section("memory", relevant_memory, priority=30, trim="drop"),
+        tokens.Section("directory_context", context, priority=10),
+    ]
+    limit = api.get_model_token_limit(model_name) if budget_config.get("enabled") else 0
+    plan = tokens.plan_budget(model_name, sections, limit, budget_config["reserve_ratio"])
+
+    for name, before, after in plan.trimmed:
+        if after:
+            console.print(i18n.tr(language, "prompt_budget_trimmed", section=name, before=before, after=after))
+        else:
+            console.print(i18n.tr(language, "prompt_budget_dropped", section=name, before=before))
+    if not plan.fits:
+        console.print(i18n.tr(language, "prompt_budget_exceeded", tokens=plan.total_tokens, limit=plan.limit))
+        return None
+    return plan
+
+
+def _deliver_single_turn_answer(console: Console, language: str, args, response_text: str):
+    """Ghi câu trả lời ra file (nếu có --output) và đề xuất chạy các lệnh shell trong đó."""
     if args.output:
         with open(args.output, 'w', encoding='utf-8') as f:
-            f.write(final_response_text)
+            f.write(response_text)
         console.print(i18n.tr(language, "file_saved_to", path=args.output))
 
-    utils.execute_suggested_commands(final_response_text, console)
+    utils.execute_suggested_commands(response_text, console)
 
 
 def _handle_history_flow(console: Console, config: dict, language: str, args, cli_help_text: str, provided_args):
@@ -365,19 +456,53 @@ def _handle_history_flow(console: Console, config: dict, language: str, args, cl
     return history, False
 
 
-def main(provided_args=None):
-    """Hàm chính điều phối toàn bộ ứng dụng."""
+def _start_trace(path: str, process_started: float | None, main_started: float, config_loaded: float):
+    """Bật --trace và ghi lại các giai đoạn khởi động đã chạy trước khi đọc được tham số.
+
+    ``process_started`` là None khi main được gọi lại trong daemon (module đã import sẵn).
+    """
+    tracing.start(path, origin=process_started if process_started is not None else main_started)
+    if process_started is not None:
+        tracing.complete("import_modules", tracing.STARTUP, process_started, _IMPORTS_DONE)
+    tracing.complete("load_config", tracing.STARTUP, main_started, config_loaded)
+    tracing.complete("parse_args", tracing.STARTUP, config_loaded, time.perf_counter())
+
+
+def _serve_request(client_argv):
+    """Chạy một request của daemon rồi ghi metrics ra đĩa (daemon không thoát sau mỗi lệnh)."""
+    try:
+        # Môi trường đã là của client: key nạp lúc daemon khởi động có thể đã cũ
+        load_dotenv()
+        api.reload_provider_keys()
+        main(argv=client_argv)
+    finally:
+        metrics.flush()
+        tracing.stop()
+
+
+def main(provided_args=None, argv=None):
+    """Hàm chính điều phối toàn bộ ứng dụng.
+
+    ``argv`` cho phép daemon truyền tham số dòng lệnh của client thay vì ``sys.argv``.
+    """
+    global _PROCESS_STARTED
+    main_started = time.perf_counter()
+    # Chỉ lần gọi main đầu tiên của tiến trình mới bao gồm thời gian import
+    process_started, _PROCESS_STARTED = _PROCESS_STARTED, None
     load_dotenv()
     _setup_logging()
 
     console = Console()
-    config = load_config()
+    config = load_config(writable=True)
     language = config.get("language", "vi")
+    config_loaded = time.perf_counter()
 
     parser = cli.create_parser()
 
     try:
-        args = provided_args or parser.parse_args()
+        args = provided_args or parser.parse_args(argv)
+        if getattr(args, "trace", None):
+            _start_trace(args.trace, process_started, main_started, config_loaded)
         cli_help_text = parser.format_help()
         args.cli_help_text = cli_help_text
 
@@ -407,6 +532,29 @@ def main(provided_args=None):
         args.model = args.model or config.get("default_model")
         args.format = args.format or config.get("default_format", "rich")
 
+        # Chế độ daemon thường trú / dừng daemon
+        if getattr(args, "serve", False):
+            daemon.serve(console, runner=_serve_request)
+            return
+        if getattr(args, "stop_daemon", False):
+            if daemon.stop():
+                console.print(i18n.tr(language, "daemon_stop_sent"))
+            else:
+                console.print(i18n.tr(language, "daemon_not_running"))
+            return
+
+        # --no-cache chỉ áp dụng cho lần chạy này (daemon gọi lại main cho mỗi request)
+        response_cache.set_bypass(getattr(args, "no_cache", False))
+        if getattr(args, "cache_stats", False):
+            utility_handler.show_cache_stats(console)
+            return
+        if getattr(args, "stats", None):
+            utility_handler.show_stats(console, args.stats)
+            return
+        if getattr(args, "loadtest", None):
+            loadtest_handler.run_loadtest(console, args)
+            return
+
         # Lệnh chẩn đoán cấu hình không cần API key
         if getattr(args, "diagnostics", False):
             config_handler.show_diagnostics(console, config)
@@ -452,7 +600,8 @@ def main(provided_args=None):
             config_handler.remove_profile(console, config, args.rm_profile)
             return
 
-        keys = api.initialize_api_keys()
+        with tracing.span("initialize_api_keys", tracing.STARTUP):
+            keys = api.initialize_api_keys()
 
         if not keys:
             console.print(i18n.tr(language, "error_no_api_key"))
@@ -464,6 +613,10 @@ def main(provided_args=None):
         api.configure_api(keys[0])
 
         # --- Xử lý các lệnh tiện ích (thoát ngay sau khi chạy) ---
+        if getattr(args, "refresh_models", False):
+            api.refresh_models(console)
+            if not args.list_models:
+                return
         if args.list_models:
             api.list_models(console)
             return
@@ -505,6 +658,9 @@ def main(provided_args=None):
         if args.refactor:
             utility_handler.refactor_code_file(console, args)
             return
+        if getattr(args, "batch", None):
+            batch_handler.run_batch(console, args)
+            return
 
         # --- Xử lý Agent Mode ---
         if args.agent:
@@ -528,10 +684,7 @@ def main(provided_args=None):
             model_name = args.model or config.get("default_model")
 
             # Nếu model là HTTP provider (DeepSeek/Groq), dùng luồng chat riêng qua HTTP API.
-            if isinstance(model_name, str) and (
-                model_name.startswith("deepseek-")
-                or model_name.startswith("groq-")
-            ):
+            if isinstance(model_name, str) and api._provider_of(model_name) != "gemini":
                 chat_handler.run_chat_mode_deepseek(console, config, args, system_instruction_str)
             else:
                 chat_session = api.start_chat_session(
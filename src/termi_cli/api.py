@@ -2,158 +2,306 @@
 Module này chịu trách nhiệm quản lý tương tác với API của Google Gemini,
 bao gồm cả cơ chế xử lý lỗi Quota mạnh mẽ, và đăng ký danh sách tools (bao gồm plugin).
 """
+from __future__ import annotations
+
 import os
 import time
-import re
 import importlib.util
 from pathlib import Path
 import logging
 import json
-import urllib.request
+import threading
+import functools
 import urllib.error
+from contextlib import contextmanager
 
-import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted
 from rich.table import Table
 from rich.console import Console
 
-# Import các module con một cách an toàn
-from termi_cli.tools import web_search, database, calendar_tool, email_tool, file_system_tool, shell_tool
-from termi_cli.tools import instruction_tool
-from termi_cli.tools import code_tool
-from termi_cli.prompts import build_enhanced_instruction
+from termi_cli import cassette, circuit_breaker, context_cache, http_pool, key_pool, metrics, model_catalog, model_router, providers, rate_limit, response_cache, retry, tokens, tracing
+from termi_cli.lazy import LazyModule, quiet_google_loggers
+from termi_cli.tools.registry import ToolRegistry, module_attr_loader
+from termi_cli.tools.plugins import PluginTool, discover_plugin_tools, function_docstrings
+from termi_cli.prompts import build_session_instruction, build_volatile_context, instruction_fingerprint
 from termi_cli.config import APP_DIR
 
+# SDK Gemini rất nặng (gRPC, protobuf...), chỉ import ở lần dùng đầu tiên.
+genai = LazyModule("google.generativeai", quiet=True, on_load=quiet_google_loggers)
+
 _current_api_key_index = 0
 _api_keys = []
 _console = Console()
-_last_free_tier_call_ts: float | None = None
 logger = logging.getLogger(__name__)
 
-# --- DeepSeek integration (HTTP API, OpenAI-compatible) ---
-
-_deepseek_api_keys: list[str] = []
-_current_deepseek_key_index: int = 0
-_last_deepseek_call_ts: float | None = None
+# --- Provider OpenAI-compatible (DeepSeek, Groq, server tự cấu hình; xem ``providers``) ---
 
+ProviderInsufficientBalance = providers.ProviderInsufficientBalance
+DeepseekInsufficientBalance = providers.DeepseekInsufficientBalance
+GroqInsufficientBalance = providers.GroqInsufficientBalance
 
-class DeepseekInsufficientBalance(Exception):
-    """Báo hiệu DeepSeek trả về lỗi thiếu credit (HTTP 402 / Insufficient Balance)."""
-    pass
+_deepseek_api_keys: list[str] = []
+_groq_api_keys: list[str] = []
 
 
-# --- Groq Cloud integration (HTTP OpenAI-compatible) ---
+def provider_base_url(provider: str) -> str:
+    """Base URL của provider; đổi được bằng ``TERMI_<PROVIDER>_BASE_URL``
+    (vd. trỏ vào ``python -m termi_cli.mock_server`` khi chạy thử / đo tải)."""
+    return providers.get(provider).base_url
 
-_groq_api_keys: list[str] = []
-_current_groq_key_index: int = 0
-_last_groq_call_ts: float | None = None
 
+# Chờ tối đa bấy nhiêu giây khi mọi key đều đang cooldown, quá thì báo lỗi ngay
+_MAX_COOLDOWN_WAIT_SECONDS = 90.0
 
-class GroqInsufficientBalance(Exception):
-    """Báo hiệu Groq Cloud trả về lỗi thiếu credit (HTTP 402 / Insufficient)."""
-    pass
+# Provider đã từ chối body nén (gzip) trong tiến trình này -> chỉ gửi body không nén
+_compression_rejected: set[str] = set()
+# Status mà server trả về khi không hiểu ``Content-Encoding`` của request
+_COMPRESSION_REJECTED_STATUSES = frozenset({400, 415, 422})
 
 
-def initialize_deepseek_api_keys() -> list[str]:
-    """Khởi tạo danh sách DeepSeek API keys từ biến môi trường.
+def key_env_name(prefix: str, number: int) -> str:
+    """Tên biến môi trường của key thứ ``number`` (từ 1): PREFIX, PREFIX_2ND, PREFIX_3RD, PREFIX_4TH..."""
+    if number == 1:
+        return prefix
+    return (
+        f"{prefix}_{number}ND" if number == 2
+        else f"{prefix}_{number}RD" if number == 3
+        else f"{prefix}_{number}TH"
+    )
 
-    Quy ước:
-    - DEEPSEEK_API_KEY
-    - DEEPSEEK_API_KEY_2ND, DEEPSEEK_API_KEY_3RD, ...
-    """
-    global _deepseek_api_keys, _current_deepseek_key_index
-    _deepseek_api_keys = []
-    _current_deepseek_key_index = 0
 
-    primary = os.getenv("DEEPSEEK_API_KEY")
+def _load_env_keys(prefix: str) -> list[str]:
+    """Đọc PREFIX, PREFIX_2ND, PREFIX_3RD, PREFIX_4TH... từ biến môi trường."""
+    keys: list[str] = []
+    primary = os.getenv(prefix)
     if primary:
-        _deepseek_api_keys.append(primary)
+        keys.append(primary)
 
     i = 2
     while True:
-        key_name = (
-            f"DEEPSEEK_API_KEY_{i}ND" if i == 2
-            else f"DEEPSEEK_API_KEY_{i}RD" if i == 3
-            else f"DEEPSEEK_API_KEY_{i}TH"
-        )
-        backup = os.getenv(key_name)
+        backup = os.getenv(key_env_name(prefix, i))
         if not backup:
             break
-        _deepseek_api_keys.append(backup)
+        keys.append(backup)
         i += 1
 
-    return _deepseek_api_keys
+    if not keys and cassette.is_replaying():
+        # Phát lại cassette không cần key thật
+        keys.append(cassette.REPLAY_API_KEY)
+    return keys
 
 
-def switch_to_next_deepseek_key() -> str:
-    """Chuyển sang DeepSeek API key tiếp theo và quay vòng giống logic Gemini."""
-    global _deepseek_api_keys, _current_deepseek_key_index
-    if not _deepseek_api_keys:
-        initialize_deepseek_api_keys()
-        if not _deepseek_api_keys:
-            raise RuntimeError("No DeepSeek API key configured (DEEPSEEK_API_KEY...).")
+def initialize_provider_keys(provider: str) -> list[str]:
+    """Nạp key của một provider trong registry vào key pool của nó.
 
-    _current_deepseek_key_index = (_current_deepseek_key_index + 1) % len(_deepseek_api_keys)
-    return f"DeepSeek key #{_current_deepseek_key_index + 1}"
+    Provider không khai báo ``api_key_env`` (server cục bộ) dùng một "key" rỗng duy nhất:
+    request gửi đi không kèm ``Authorization``.
+    """
+    spec = providers.get(provider)
+    keys = _load_env_keys(spec.api_key_env) if spec.api_key_env else [""]
+    key_pool.get_pool(provider).set_keys(keys)
+    return keys
 
 
-def _resilient_deepseek_api_call(model_name: str, messages: list[dict]) -> dict:
-    """Gọi DeepSeek Chat Completions với cơ chế retry + xoay API key khi hết quota.
+def initialize_deepseek_api_keys() -> list[str]:
+    """Khởi tạo danh sách DeepSeek API keys từ biến môi trường.
 
-    - Sử dụng HTTP API OpenAI-compatible: https://api.deepseek.com/chat/completions
-    - Khi gặp lỗi 429 hoặc thông báo chứa "rate limit"/"quota":
-        * Nếu có nhiều key: xoay sang key kế tiếp, thử lại.
-        * Nếu quay lại key ban đầu: coi như hết toàn bộ key, raise exception.
-    - Có throttle đơn giản dựa trên _last_deepseek_call_ts (tương tự Gemini).
+    Quy ước:
+    - DEEPSEEK_API_KEY
+    - DEEPSEEK_API_KEY_2ND, DEEPSEEK_API_KEY_3RD, ...
     """
-    global _deepseek_api_keys, _current_deepseek_key_index, _last_deepseek_call_ts
+    global _deepseek_api_keys
+    _deepseek_api_keys = initialize_provider_keys("deepseek")
+    return _deepseek_api_keys
 
-    if not _deepseek_api_keys:
-        initialize_deepseek_api_keys()
-        if not _deepseek_api_keys:
-            raise RuntimeError("No DeepSeek API key configured (DEEPSEEK_API_KEY...).")
 
-    initial_index = _current_deepseek_key_index
-    url = "https://api.deepseek.com/chat/completions"
+def initialize_groq_api_keys() -> list[str]:
+    """Khởi tạo danh sách Groq API keys từ biến môi trường.
+
+    Quy ước:
+    - GROQ_API_KEY
+    - GROQ_API_KEY_2ND, GROQ_API_KEY_3RD, ...
+    """
+    global _groq_api_keys
+    _groq_api_keys = initialize_provider_keys("groq")
+    return _groq_api_keys
+
+
+def reload_provider_keys() -> None:
+    """Đọc lại key của các provider OpenAI-compatible đã dùng từ môi trường hiện tại.
+
+    Daemon gọi trước mỗi request: môi trường (và key mới / key đã xoay vòng) của từng client
+    có thể khác lúc daemon khởi động. Key Gemini được ``main`` nạp lại ở mỗi lần chạy.
+    """
+    global _deepseek_api_keys, _groq_api_keys
+    _deepseek_api_keys, _groq_api_keys = [], []
+    registry = providers.registry()
+    for provider in key_pool.active_providers():
+        if provider == "deepseek":
+            initialize_deepseek_api_keys()
+        elif provider == "groq":
+            initialize_groq_api_keys()
+        elif provider in registry:
+            initialize_provider_keys(provider)
+
+
+# Rich chỉ cho một live display mỗi console: khi nhiều thread cùng chờ (batch, load test)
+# chỉ thread đầu tiên hiện spinner, các thread khác chờ im lặng
+_status_lock = threading.Lock()
+
+
+@contextmanager
+def _waiting_status(message: str):
+    if not _status_lock.acquire(blocking=False):
+        yield
+        return
+    try:
+        with _console.status(message, spinner="clock"):
+            yield
+    finally:
+        _status_lock.release()
+
+
+def _wait_for_available_key(pool: key_pool.KeyPool, label: str, state: retry.RetryState | None = None) -> bool:
+    """Chờ tới khi pool có key khả dụng; False nếu phải chờ quá lâu (hoặc quá deadline) hoặc mọi key đã hết quota ngày."""
+    wait_time = pool.wait_time()
+    max_wait = _MAX_COOLDOWN_WAIT_SECONDS if state is None else min(_MAX_COOLDOWN_WAIT_SECONDS, state.remaining())
+    if wait_time > max_wait:
+        return False
+    if wait_time > 0 and "PYTEST_CURRENT_TEST" not in os.environ:
+        with tracing.span("key_cooldown_wait", tracing.THROTTLE, provider=label, seconds=round(wait_time, 3)), _waiting_status(
+            f"[yellow]⏳ Mọi {label} API key đang cooldown. Chờ {wait_time:.1f}s...[/yellow]"
+        ):
+            time.sleep(wait_time)
+    return True
+
+
+def _backoff(delay: float, label: str, reason: str, retry_number: int) -> None:
+    """Chờ ``delay`` giây trước lần thử lại thứ ``retry_number`` (bỏ qua khi chạy pytest)."""
+    logger.info("%s: retry #%d sau %.2fs (%s)", label, retry_number, delay, reason)
+    tracing.instant("retry", tracing.PROVIDER, provider=label, reason=reason, attempt=retry_number, seconds=round(delay, 3))
+    if delay <= 0 or "PYTEST_CURRENT_TEST" in os.environ:
+        return
+    with tracing.span("retry_backoff", tracing.THROTTLE, provider=label, seconds=round(delay, 3)), _waiting_status(
+        f"[yellow]⏳ {label} lỗi tạm thời ({reason}), thử lại sau {delay:.1f}s...[/yellow]"
+    ):
+        time.sleep(delay)
+
+
+def _openai_compatible_call(
+    provider: str,
+    label: str,
+    url: str,
+    model_name: str,
+    messages: list[dict],
+    stream: bool,
+    is_insufficient,
+    insufficient_exc,
+    compress: bool = False,
+):
+    """Gọi Chat Completions của một provider OpenAI-compatible qua key pool.
+
+    - Mỗi lần thử mượn một key từ ``key_pool`` (key rảnh / LRU, bỏ qua key đang cooldown).
+    - Lỗi 429 / "rate limit" / "quota": đặt cooldown cho key theo thời gian server yêu cầu
+      (``Retry-After`` / ``x-ratelimit-reset-*``, hoặc đánh dấu hết quota ngày) rồi thử ngay
+      với key khác; chỉ có một key thì chờ key đó hết cooldown.
+    - Lỗi tạm thời (408/5xx, lỗi kết nối, timeout): thử lại theo ``retry.RetryPolicy``
+      (backoff có jitter, trong deadline của lần gọi).
+    - Khi mọi key đều không dùng được: raise ``key_pool.KeysExhausted``.
+    - ``stream=True``: trả về generator các đoạn text (delta) đọc từ SSE thay vì dict JSON.
+    - Key rỗng (provider không cần key): gửi request không kèm ``Authorization``.
+    - Payload được serialize (và nén gzip nếu ``compress``) một lần rồi gửi lại nguyên bytes
+      ở mọi lần thử; server từ chối body nén thì gửi lại bản không nén và không nén nữa.
+    - Số byte gửi / nhận của từng request được ghi vào metrics và log (``--verbose``).
+    """
+    pool = key_pool.get_pool(provider)
+    if not len(pool):
+        raise RuntimeError(f"No {label} API key configured ({provider.upper()}_API_KEY...).")
+
+    # Endpoint đang sập: fail-fast thay vì đợi timeout kết nối cho từng request
+    breaker = circuit_breaker.get_breaker(provider)
+    if breaker.is_open():
+        raise circuit_breaker.CircuitOpenError(label, breaker.retry_in())
+
+    max_attempts = max(3, 2 * len(pool))
+    attempts = 0
+    uploads = 0
+    state = retry.get_policy().start()
+    delay, reason = None, ""
+    stale_retried = False
+    reserved_tokens = rate_limit.estimate_tokens(messages)
+    request_body = http_pool.JsonBody(
+        {"model": model_name, "messages": messages, "stream": stream},
+        compress=compress and provider not in _compression_rejected,
+    )
 
     while True:
-        api_key = _deepseek_api_keys[_current_deepseek_key_index]
-
-        # Throttle đơn giản giữa các request DeepSeek
-        now = time.time()
-        min_interval = 2.0
-        is_pytest = "PYTEST_CURRENT_TEST" in os.environ
-        if _last_deepseek_call_ts is not None and not is_pytest:
-            elapsed = now - _last_deepseek_call_ts
-            if elapsed < min_interval:
-                time.sleep(min_interval - elapsed)
-
-        payload = {
-            "model": model_name,
-            "messages": messages,
-            "stream": False,
-        }
-        data = json.dumps(payload).encode("utf-8")
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        }
+        if delay is not None:
+            # Chờ backoff khi không giữ key nào, để các request khác vẫn dùng được pool
+            _backoff(delay, label, reason, state.retries)
+            delay = None
+
+        api_key = pool.acquire()
+        if api_key is None:
+            if not _wait_for_available_key(pool, label, state):
+                _console.print(
+                    f"[bold red]❌ Đã thử tất cả {label} API key nhưng đều gặp lỗi quota/rate-limit.[/bold red]"
+                )
+                raise key_pool.KeysExhausted(provider, label)
+            continue
 
-        req = urllib.request.Request(url, data=data, headers=headers, method="POST")
+        key_number = pool.index_of(api_key) + 1
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
 
+        permit = None
         try:
-            _last_deepseek_call_ts = time.time()
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                body = resp.read().decode("utf-8", errors="ignore")
-                return json.loads(body)
+            permit = breaker.allow()
+            if permit is None:
+                raise circuit_breaker.CircuitOpenError(label, breaker.retry_in())
+            _throttle(provider, api_key, model_name, reserved_tokens, label)
+            # Dùng connection pool keep-alive chung để tránh bắt tay TCP/TLS cho mỗi request
+            started = time.perf_counter()
+            with tracing.span(f"{provider} {model_name}", tracing.PROVIDER, key=key_number, attempt=attempts + 1,
+                              stream=stream, bytes=len(request_body)):
+                uploads += 1
+                metrics.observe(metrics.REQUEST_BYTES, len(request_body), model=model_name, key=rate_limit.key_fingerprint(api_key))
+                resp = http_pool.post_json(url, request_body, headers=headers)
+                breaker.record_success(permit)
+                if stream:
+                    # Status đã được kiểm tra (lỗi 4xx/5xx ném ra ở trên), phần thân đọc dần qua SSE
+                    on_close = functools.partial(_log_transfer, label, model_name, api_key, request_body, uploads=uploads)
+                    return _timed_stream(_iter_sse_deltas(resp, on_close), started, model_name, api_key)
+                with resp:
+                    raw = resp.read()
+                body = raw.decode("utf-8", errors="ignore")
+            _log_transfer(label, model_name, api_key, request_body, len(raw), uploads=uploads)
+            _observe_call(metrics.PROVIDER_LATENCY, started, model_name, api_key)
+            result = json.loads(body)
+            usage = result.get("usage") or {}
+            _record_usage(provider, api_key, model_name, usage.get("total_tokens"), reserved_tokens)
+            # Hiệu chỉnh bộ ước lượng token theo số token prompt thật
+            tokens.calibrate(provider, messages, usage.get("prompt_tokens"))
+            return result
 
         except urllib.error.HTTPError as e:
+            # 5xx: endpoint có vấn đề; 4xx: endpoint vẫn sống (lỗi nằm ở request/key)
+            if e.code >= 500:
+                breaker.record_failure(permit)
+            else:
+                breaker.record_success(permit)
             body = e.read().decode("utf-8", errors="ignore")
             lower = body.lower()
 
+            if request_body.encoding and e.code in _COMPRESSION_REJECTED_STATUSES:
+                # Endpoint không nhận body nén: gửi lại bản không nén (không tính là retry)
+                _compression_rejected.add(provider)
+                logger.warning("%s từ chối request nén %s (HTTP %d), chuyển sang gửi body không nén.",
+                               label, request_body.encoding, e.code)
+                request_body = request_body.uncompressed()
+                continue
+
             # Trường hợp hết tiền / thiếu credit: raise exception riêng để layer trên có thể fallback provider.
-            if e.code == 402 or "insufficient balance" in lower:
-                raise DeepseekInsufficientBalance(body) from e
+            if is_insufficient(e.code, lower):
+                raise insufficient_exc(body) from e
 
             is_quota_or_rate = (
                 e.code == 429
@@ -161,159 +309,165 @@ def _resilient_deepseek_api_call(model_name: str, messages: list[dict]) -> dict:
                 or "quota" in lower
             )
 
-            if is_quota_or_rate and len(_deepseek_api_keys) > 1:
-                _console.print(
-                    f"[yellow]⚠️ DeepSeek quota/rate-limit error with key #{_current_deepseek_key_index + 1}. "
-                    "Đang chuyển sang key tiếp theo...[/yellow]"
-                )
-                msg = switch_to_next_deepseek_key()
-                if _current_deepseek_key_index == initial_index:
+            if is_quota_or_rate:
+                attempts += 1
+                outcome = pool.report_rate_limit(api_key, body, retry_after=retry.retry_after(e.headers))
+                tracing.instant("key_rate_limited", tracing.PROVIDER, provider=provider, key=key_number, outcome=outcome)
+                if attempts >= max_attempts or len(pool) == 1 and outcome == "exhausted":
                     _console.print(
-                        "[bold red]❌ Đã thử tất cả DeepSeek API key nhưng đều gặp lỗi quota/rate-limit.[/bold red]"
+                        f"[bold red]❌ Đã thử tất cả {label} API key nhưng đều gặp lỗi quota/rate-limit.[/bold red]"
                     )
-                    raise RuntimeError("All DeepSeek API keys exhausted") from e
-
-                _console.print(f"[green]✅ Đã chuyển sang {msg}. Thử lại...[/green]")
+                    raise key_pool.KeysExhausted(provider, label) from e
+                if len(pool) > 1:
+                    _console.print(
+                        f"[yellow]⚠️ {label} quota/rate-limit error with key #{key_number}. "
+                        "Đang chuyển sang key tiếp theo...[/yellow]"
+                    )
+                state.count("rate_limit")
                 continue
 
+            if e.code in retry.TRANSIENT_HTTP_STATUSES:
+                reason = f"HTTP {e.code}"
+                delay = state.next_delay(reason, retry.retry_after(e.headers))
+                if delay is not None:
+                    continue
+
             # Các lỗi HTTP khác: log ra console và re-raise để caller xử lý
             _console.print(
-                f"[bold red]Lỗi HTTP khi gọi DeepSeek (status={e.code}): {body}[/bold red]"
+                f"[bold red]Lỗi HTTP khi gọi {label} (status={e.code}): {body}[/bold red]"
             )
             raise
 
         except urllib.error.URLError as e:  # bao gồm lỗi kết nối, timeout ở tầng socket
-            _console.print(f"[bold red]Không thể kết nối tới DeepSeek API: {e}[/bold red]")
+            stale = isinstance(e, http_pool.StaleConnectionError)
+            if not stale:
+                breaker.record_failure(permit)
+            reason = type(getattr(e, "reason", e)).__name__
+            if stale and not stale_retried:
+                # Server đóng kết nối keep-alive cũ, endpoint vẫn ổn: gửi lại ngay qua kết nối mới
+                stale_retried = True
+                state.count(reason)
+                continue
+            delay = state.next_delay(reason)
+            if delay is not None:
+                continue
+            _console.print(f"[bold red]Không thể kết nối tới {label} API: {e}[/bold red]")
             raise
 
+        finally:
+            pool.release(api_key)
+            # Chỉ trả lượt thăm dò mà chính lần thử này giữ (và chưa được ghi nhận kết quả)
+            if permit is not None and permit.probe:
+                breaker.release_probe(permit)
 
-def initialize_groq_api_keys() -> list[str]:
-    """Khởi tạo danh sách Groq API keys từ biến môi trường.
 
-    Quy ước:
-    - GROQ_API_KEY
-    - GROQ_API_KEY_2ND, GROQ_API_KEY_3RD, ...
-    """
-    global _groq_api_keys, _current_groq_key_index
-    _groq_api_keys = []
-    _current_groq_key_index = 0
+def _resilient_provider_call(provider: str, model_name: str, messages: list[dict], stream: bool = False):
+    """Gọi Chat Completions (``<base_url>/chat/completions``) của một provider trong registry qua key pool."""
+    spec = providers.get(provider)
+    if not len(key_pool.get_pool(provider)) and not initialize_provider_keys(provider):
+        raise RuntimeError(f"No {spec.label} API key configured ({spec.api_key_env}...).")
 
-    primary = os.getenv("GROQ_API_KEY")
-    if primary:
-        _groq_api_keys.append(primary)
+    return _openai_compatible_call(
+        spec.name,
+        spec.label,
+        f"{spec.base_url}/chat/completions",
+        model_name,
+        messages,
+        stream,
+        providers.is_insufficient,
+        spec.insufficient,
+        compress=spec.compress_requests,
+    )
 
-    i = 2
-    while True:
-        key_name = (
-            f"GROQ_API_KEY_{i}ND" if i == 2
-            else f"GROQ_API_KEY_{i}RD" if i == 3
-            else f"GROQ_API_KEY_{i}TH"
-        )
-        backup = os.getenv(key_name)
-        if not backup:
-            break
-        _groq_api_keys.append(backup)
-        i += 1
 
-    return _groq_api_keys
+def _resilient_deepseek_api_call(model_name: str, messages: list[dict], stream: bool = False):
+    """Gọi DeepSeek Chat Completions (``<base>/chat/completions``, mặc định api.deepseek.com) qua key pool."""
+    if not _deepseek_api_keys:
+        initialize_deepseek_api_keys()
+        if not _deepseek_api_keys:
+            raise RuntimeError("No DeepSeek API key configured (DEEPSEEK_API_KEY...).")
+    return _resilient_provider_call("deepseek", model_name, messages, stream)
 
 
-def switch_to_next_groq_key() -> str:
-    """Chuyển sang Groq API key tiếp theo."""
-    global _groq_api_keys, _current_groq_key_index
+def _resilient_groq_api_call(model_name: str, messages: list[dict], stream: bool = False):
+    """Gọi Groq Chat Completions (``<base>/chat/completions``, mặc định api.groq.com/openai/v1) qua key pool."""
     if not _groq_api_keys:
         initialize_groq_api_keys()
         if not _groq_api_keys:
             raise RuntimeError("No Groq API key configured (GROQ_API_KEY...).")
+    return _resilient_provider_call("groq", model_name, messages, stream)
 
-    _current_groq_key_index = (_current_groq_key_index + 1) % len(_groq_api_keys)
-    return f"Groq key #{_current_groq_key_index + 1}"
 
+def _chat_completions(spec: providers.ProviderSpec, model_name: str, messages: list[dict], stream: bool = False):
+    """Định tuyến một lần gọi tới provider của ``spec`` (tên model đã qua bảng alias)."""
+    # DeepSeek / Groq giữ entry point riêng (khởi tạo key theo biến môi trường của chúng)
+    call = {"deepseek": _resilient_deepseek_api_call, "groq": _resilient_groq_api_call}.get(spec.name)
+    model_id = spec.model_id(model_name)
+    if call is None:
+        return _resilient_provider_call(spec.name, model_id, messages, stream)
+    return call(model_id, messages, stream=True) if stream else call(model_id, messages)
 
-def _resilient_groq_api_call(model_name: str, messages: list[dict]) -> dict:
-    """Gọi Groq Chat Completions với cơ chế retry + xoay API key khi hết quota.
 
-    - Sử dụng HTTP API OpenAI-compatible: https://api.groq.com/openai/v1/chat/completions
-    - Khi gặp lỗi 429 hoặc thông báo chứa "rate limit"/"quota":
-        * Nếu có nhiều key: xoay sang key kế tiếp, thử lại.
-        * Nếu quay lại key ban đầu: coi như hết toàn bộ key, raise exception.
-    - Có throttle đơn giản dựa trên _last_groq_call_ts (tương tự DeepSeek).
+def _timed_stream(deltas, started: float, model_name: str, api_key: str | None):
+    """Bọc generator delta: ghi time-to-first-token khi có delta đầu và tổng độ trễ khi đọc hết."""
+    first = True
+    try:
+        for delta in deltas:
+            if first:
+                first = False
+                _observe_call(metrics.TIME_TO_FIRST_TOKEN, started, model_name, api_key)
+            yield delta
+        _observe_call(metrics.PROVIDER_LATENCY, started, model_name, api_key)
+    finally:
+        deltas.close()
+        tracing.complete(f"stream {model_name}", tracing.PROVIDER, started, time.perf_counter())
+
+
+def _log_transfer(label: str, model_name: str, api_key: str | None, request_body: http_pool.JsonBody,
+                  received: int, uploads: int = 1) -> None:
+    """Ghi số byte nhận về vào metrics và log dung lượng của một lần gọi (hiện với ``--verbose``)."""
+    metrics.observe(metrics.RESPONSE_BYTES, received, model=model_name, key=rate_limit.key_fingerprint(api_key))
+    compressed = f" ({request_body.encoding}, {len(request_body.raw)} byte trước khi nén)" if request_body.encoding else ""
+    logger.info("%s %s: gửi %d byte%s x %d lần, nhận %d byte", label, model_name, len(request_body), compressed, uploads, received)
+
+
+def _iter_sse_deltas(resp, on_close=None):
+    """Đọc stream SSE OpenAI-compatible và yield từng đoạn ``choices[0].delta.content``.
+
+    Response luôn được đóng khi generator kết thúc (kể cả khi caller dừng giữa chừng);
+    nếu đã đọc hết tới ``[DONE]`` thì kết nối được trả lại pool để tái sử dụng. Stream kết
+    thúc mà không có ``[DONE]`` (kết nối bị cắt giữa chừng) ném ``URLError`` thay vì trả về
+    câu trả lời bị cụt như thể đã xong. ``on_close(received_bytes)`` được gọi khi đóng stream.
     """
-    global _groq_api_keys, _current_groq_key_index, _last_groq_call_ts
-
-    if not _groq_api_keys:
-        initialize_groq_api_keys()
-        if not _groq_api_keys:
-            raise RuntimeError("No Groq API key configured (GROQ_API_KEY...).")
-
-    initial_index = _current_groq_key_index
-    url = "https://api.groq.com/openai/v1/chat/completions"
-
-    while True:
-        api_key = _groq_api_keys[_current_groq_key_index]
-
-        now = time.time()
-        min_interval = 1.0
-        is_pytest = "PYTEST_CURRENT_TEST" in os.environ
-        if _last_groq_call_ts is not None and not is_pytest:
-            elapsed = now - _last_groq_call_ts
-            if elapsed < min_interval:
-                time.sleep(min_interval - elapsed)
-
-        payload = {
-            "model": model_name,
-            "messages": messages,
-            "stream": False,
-        }
-        data = json.dumps(payload).encode("utf-8")
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        }
-
-        req = urllib.request.Request(url, data=data, headers=headers, method="POST")
-
-        try:
-            _last_groq_call_ts = time.time()
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                body = resp.read().decode("utf-8", errors="ignore")
-                return json.loads(body)
-
-        except urllib.error.HTTPError as e:
-            body = e.read().decode("utf-8", errors="ignore")
-            lower = body.lower()
-
-            if e.code == 402 or ("insufficient" in lower and ("credit" in lower or "balance" in lower or "quota" in lower)):
-                raise GroqInsufficientBalance(body) from e
-
-            is_quota_or_rate = (
-                e.code == 429
-                or "rate limit" in lower
-                or "quota" in lower
-            )
-
-            if is_quota_or_rate and len(_groq_api_keys) > 1:
-                _console.print(
-                    f"[yellow]⚠️ Groq quota/rate-limit error with key #{_current_groq_key_index + 1}. Đang chuyển sang key tiếp theo...[/yellow]"
-                )
-                msg = switch_to_next_groq_key()
-                if _current_groq_key_index == initial_index:
-                    _console.print(
-                        "[bold red]❌ Đã thử tất cả Groq API key nhưng đều gặp lỗi quota/rate-limit.[/bold red]"
-                    )
-                    raise RuntimeError("All Groq API keys exhausted") from e
-
-                _console.print(f"[green]✅ Đã chuyển sang {msg}. Thử lại...[/green]")
+    received = 0
+    try:
+        lines = resp.iter_lines()
+        for line in lines:
+            received += len(line) + 1
+            if not line or line.startswith(b":") or not line.startswith(b"data:"):
                 continue
-
-            _console.print(
-                f"[bold red]Lỗi HTTP khi gọi Groq (status={e.code}): {body}[/bold red]"
-            )
-            raise
-
-        except urllib.error.URLError as e:
-            _console.print(f"[bold red]Không thể kết nối tới Groq API: {e}[/bold red]")
-            raise
+            data = line[len(b"data:"):].strip()
+            if data == b"[DONE]":
+                # Đọc nốt phần kết thúc của body để kết nối có thể tái sử dụng
+                for rest in lines:
+                    received += len(rest) + 1
+                return
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                logger.warning("Bỏ qua SSE event không phải JSON: %r", data[:200])
+                continue
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+        raise urllib.error.URLError("stream ended before [DONE]")
+    finally:
+        resp.close()
+        if on_close is not None:
+            on_close(received)
 
 
 def _normalize_groq_model(model_name: str) -> str:
@@ -322,22 +476,10 @@ def _normalize_groq_model(model_name: str) -> str:
     - Đầu vào thường có dạng "groq-<alias-hoặc-model-thật>".
     - Nếu là alias ngắn (ví dụ: "groq-chat"), map sang model Groq khuyến nghị.
     - Nếu đã là tên model Groq đầy đủ (ví dụ: "groq-llama-3.1-70b-versatile"), giữ nguyên.
-    """
-
-    raw = model_name
-    if model_name.startswith("groq-"):
-        raw = model_name[len("groq-"):] or model_name
 
-    alias_map = {
-        # Alias thân thiện cho chat tổng quát (dùng model Groq khuyến nghị mới)
-        "chat": "llama-3.3-70b-versatile",
-        # Một số alias rút gọn thường gặp
-        "llama-3.1-70b": "llama-3.3-70b-versatile",
-        "llama3-70b": "llama-3.3-70b-versatile",
-        "llama3-8b": "llama3-8b-8192",
-    }
-
-    return alias_map.get(raw, raw)
+    Bảng alias nằm trong ``providers`` (mở rộng được qua ``config["providers"]["groq"]["models"]``).
+    """
+    return providers.get("groq").model_id(model_name)
 
 
 def generate_text(model_name: str, prompt: str, system_instruction: str | None = None) -> str:
@@ -350,128 +492,286 @@ def generate_text(model_name: str, prompt: str, system_instruction: str | None =
       retry + xoay API key riêng (DEEPSEEK_API_KEY, DEEPSEEK_API_KEY_2ND, ...).
     - Nhánh ``groq-*``: gọi Groq Chat Completions (OpenAI-compatible) với bộ
       Groq API key riêng (GROQ_API_KEY, GROQ_API_KEY_2ND, ...).
+    - Tiền tố của provider khai báo trong ``config["providers"]`` (vd. ``local-*``):
+      gọi server OpenAI-compatible đó (xem ``providers``).
     - Các model còn lại: dùng Gemini như trước đây.
+
+    Nếu bật ``response_cache`` (opt-in), kết quả được tra/lưu theo hash của toàn bộ input.
+    Model hết quota / lỗi tạm thời được thay bằng model kế tiếp trong ``model_fallback_order``
+    (xem ``model_router``).
+    """
+    return generate_completion(model_name, prompt, system_instruction)["text"]
+
+
+def generate_completion(model_name: str, prompt: str, system_instruction: str | None = None) -> dict:
+    """Giống ``generate_text`` nhưng trả về thêm model thực sự trả lời và token usage.
+
+    Kết quả: ``{"text", "model", "usage", "cached", "retries"}``; ``usage`` là dict
+    ``prompt_tokens/completion_tokens/total_tokens`` hoặc None khi lấy từ cache, ``retries``
+    là số lần phải thử lại (lỗi tạm thời, đổi key sau 429) trước khi có câu trả lời.
     """
-    if model_name.startswith("deepseek-"):
+    cache = response_cache.get_cache()
+    key = None
+    if cache is not None:
+        key = response_cache.make_key(_provider_of(model_name), model_name, system_instruction, prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            return {"text": cached, "model": model_name, "usage": None, "cached": True, "retries": 0}
+
+    with retry.track() as retry_stats:
+        used_model, (text, usage) = model_router.get_router().call(
+            model_name,
+            lambda candidate: _generate_completion_uncached(candidate, prompt, system_instruction),
+            fallback_reason,
+        )
+    if used_model != model_name:
+        _console.print(f"[yellow]↪ {model_name} không khả dụng, đã dùng '{used_model}' thay thế.[/yellow]")
+    # Câu trả lời của model dự phòng không được lưu dưới khoá của model đã yêu cầu
+    if cache is not None and text and used_model == model_name:
+        cache.put(key, model_name, text)
+    return {"text": text, "model": used_model, "usage": usage, "cached": False, "retries": retry_stats.retries}
+
+
+def fallback_reason(exc: Exception) -> str | None:
+    """Phân loại lỗi cho ``model_router``: có nên chuyển sang model khác hay không."""
+    from google.api_core import exceptions as google_exceptions
+
+    if isinstance(exc, (google_exceptions.ResourceExhausted, key_pool.KeysExhausted, ProviderInsufficientBalance)):
+        return model_router.EXHAUSTED
+    if isinstance(exc, circuit_breaker.CircuitOpenError):
+        return model_router.UNAVAILABLE
+    if isinstance(exc, urllib.error.HTTPError):
+        return model_router.ERROR if exc.code >= 500 else None
+    if isinstance(exc, (google_exceptions.ServerError, google_exceptions.DeadlineExceeded,
+                        urllib.error.URLError, TimeoutError, ConnectionError)):
+        return model_router.ERROR
+    return None
+
+
+def _provider_of(model_name: str) -> str:
+    return providers.provider_of(model_name)
+
+
+def _openai_usage(response: dict) -> dict | None:
+    usage = response.get("usage") if isinstance(response, dict) else None
+    if not usage:
+        return None
+    return {key: int(usage.get(key) or 0) for key in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+
+def _generate_completion_uncached(model_name: str, prompt: str, system_instruction: str | None = None) -> tuple[str, dict | None]:
+    """Gọi model một lần, trả về ``(text, usage)``."""
+    spec = providers.resolve(model_name)
+    if spec is not None:
         messages: list[dict] = []
         if system_instruction:
             messages.append({"role": "system", "content": system_instruction})
         messages.append({"role": "user", "content": prompt})
 
-        response = _resilient_deepseek_api_call(model_name, messages)
+        response = _chat_completions(spec, model_name, messages)
         try:
             # OpenAI-compatible schema: choices[0].message.content
-            return response["choices"][0]["message"]["content"]
+            return response["choices"][0]["message"]["content"], _openai_usage(response)
         except Exception:
             # Nếu format không như mong đợi, trả body thô để debug
-            return json.dumps(response, ensure_ascii=False)
+            return json.dumps(response, ensure_ascii=False), _openai_usage(response)
+
+    # Nhánh mặc định: dùng Gemini thông qua google.generativeai
+    model_kwargs = {}
+    if system_instruction is not None:
+        model_kwargs["system_instruction"] = system_instruction
+
+    model = genai.GenerativeModel(model_name, **model_kwargs)
+    response = resilient_generate_content(model, prompt)
+    return get_response_text(response), get_token_usage(response)
+
+
+def stream_text(model_name: str, prompt: str, system_instruction: str | None = None):
+    """Giống ``generate_text`` nhưng trả về iterator các đoạn text ngay khi model sinh ra.
 
-    if model_name.startswith("groq-"):
-        groq_model = _normalize_groq_model(model_name)
+    Request được gửi ngay khi gọi hàm (không đợi lần lặp đầu), nên các lỗi như
+    ``ProviderInsufficientBalance`` (DeepSeek, Groq...) vẫn ném ra tại chỗ gọi.
+    """
+    spec = providers.resolve(model_name)
+    if spec is not None:
         messages: list[dict] = []
         if system_instruction:
             messages.append({"role": "system", "content": system_instruction})
         messages.append({"role": "user", "content": prompt})
 
-        response = _resilient_groq_api_call(groq_model, messages)
-        try:
-            return response["choices"][0]["message"]["content"]
-        except Exception:
-            return json.dumps(response, ensure_ascii=False)
+        return _chat_completions(spec, model_name, messages, stream=True)
 
-    # Nhánh mặc định: dùng Gemini thông qua google.generativeai
     model_kwargs = {}
     if system_instruction is not None:
         model_kwargs["system_instruction"] = system_instruction
 
     model = genai.GenerativeModel(model_name, **model_kwargs)
-    response = resilient_generate_content(model, prompt)
-    return get_response_text(response)
+    response = _resilient_api_call(model.generate_content, prompt, stream=True)
+    return (text for text in (get_response_text(chunk) for chunk in response) if text)
 
 
-def _load_plugin_tools() -> dict[str, callable]:  # type: ignore[name-defined]
+def _load_plugin_tools() -> dict[str, PluginTool]:
     """Tải thêm tools từ thư mục plugin `APP_DIR/plugins`.
 
     Mỗi file `.py` (không bắt đầu bằng `_`) có thể định nghĩa biến
     `PLUGIN_TOOLS` là một dict: tên_tool (str) -> callable.
-    Các key trùng với core tools sẽ bị bỏ qua để tránh override ngầm.
+    Tên và docstring được đọc từ manifest cache (`APP_DIR/cache/plugin_manifest.json`),
+    code plugin chỉ được import khi tool thực sự được gọi.
     """
+    return discover_plugin_tools(
+        Path(APP_DIR) / "plugins",
+        Path(APP_DIR) / "cache" / "plugin_manifest.json",
+    )
 
-    plugin_tools: dict[str, callable] = {}
-    plugins_dir = Path(APP_DIR) / "plugins"
-    if not plugins_dir.exists() or not plugins_dir.is_dir():
-        return plugin_tools
-
-    for path in plugins_dir.glob("*.py"):
-        if path.name.startswith("_"):
-            continue
-
-        module_name = f"termi_cli_plugins.{path.stem}"
-        try:
-            spec = importlib.util.spec_from_file_location(module_name, path)
-            if spec is None or spec.loader is None:
-                logger.warning("Không thể tạo spec cho plugin '%s'", path)
-                continue
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)  # type: ignore[assignment]
-
-            tools_dict = getattr(module, "PLUGIN_TOOLS", None)
-            if not isinstance(tools_dict, dict):
-                logger.warning("Plugin '%s' không có dict PLUGIN_TOOLS hợp lệ", path)
-                continue
-            for name, func in tools_dict.items():
-                if not callable(func):
-                    logger.warning("Tool '%s' trong plugin '%s' không callable, bỏ qua", name, path)
-                    continue
-                # Không override core tools
-                if name in plugin_tools:
-                    logger.warning("Trùng tên tool plugin '%s' trong '%s', bỏ qua", name, path)
-                    continue
-                plugin_tools[name] = func
-                logger.info("Đã đăng ký plugin tool '%s' từ '%s'", name, path)
-        except Exception:
-            # Plugin lỗi sẽ bị bỏ qua, không làm hỏng toàn bộ CLI
-            logger.exception("Lỗi khi load plugin '%s'", path)
-            continue
 
-    return plugin_tools
-
-
-# Ánh xạ tên tool tới hàm thực thi
-AVAILABLE_TOOLS = {
-    web_search.search_web.__name__: web_search.search_web,
-    database.get_db_schema.__name__: database.get_db_schema,
-    database.run_sql_query.__name__: database.run_sql_query,
-    calendar_tool.list_events.__name__: calendar_tool.list_events,
-    email_tool.search_emails.__name__: email_tool.search_emails,
-    instruction_tool.save_instruction.__name__: instruction_tool.save_instruction,
-    code_tool.refactor_code.__name__: code_tool.refactor_code,
-    code_tool.document_code.__name__: code_tool.document_code,
-    file_system_tool.list_files.__name__: file_system_tool.list_files,
-    file_system_tool.read_file.__name__: file_system_tool.read_file,
-    file_system_tool.write_file.__name__: file_system_tool.write_file,
-    file_system_tool.create_directory.__name__: file_system_tool.create_directory,
-    shell_tool.execute_command.__name__: shell_tool.execute_command,
+# Ánh xạ tên tool tới module chứa hàm thực thi (module chỉ được import khi tool được dùng)
+_CORE_TOOL_MODULES = {
+    "search_web": "termi_cli.tools.web_search",
+    "get_db_schema": "termi_cli.tools.database",
+    "run_sql_query": "termi_cli.tools.database",
+    "list_events": "termi_cli.tools.calendar_tool",
+    "search_emails": "termi_cli.tools.email_tool",
+    "save_instruction": "termi_cli.tools.instruction_tool",
+    "refactor_code": "termi_cli.tools.code_tool",
+    "document_code": "termi_cli.tools.code_tool",
+    "list_files": "termi_cli.tools.file_system_tool",
+    "read_file": "termi_cli.tools.file_system_tool",
+    "write_file": "termi_cli.tools.file_system_tool",
+    "create_directory": "termi_cli.tools.file_system_tool",
+    "execute_command": "termi_cli.tools.shell_tool",
 }
 
+AVAILABLE_TOOLS = ToolRegistry()
+for _name, _module_name in _CORE_TOOL_MODULES.items():
+    AVAILABLE_TOOLS.register(_name, module_attr_loader(_module_name, _name))
+
 # Hợp nhất plugin tools (nếu có), ưu tiên giữ nguyên core tools khi trùng tên
 _PLUGIN_TOOLS = _load_plugin_tools()
-for _name, _func in _PLUGIN_TOOLS.items():
-    if _name not in AVAILABLE_TOOLS:
-        AVAILABLE_TOOLS[_name] = _func
+for _name, _tool in _PLUGIN_TOOLS.items():
+    if _name in AVAILABLE_TOOLS:
+        logger.warning("Plugin tool '%s' trùng tên với core tool, bỏ qua", _name)
+        continue
+    AVAILABLE_TOOLS.register(_name, _tool.load)
+
+
+def describe_tool(name: str) -> str:
+    """Dòng đầu docstring của một tool, không import module tool/plugin nếu chưa cần."""
+    doc = None
+    plugin = _PLUGIN_TOOLS.get(name)
+    if isinstance(plugin, PluginTool):
+        doc = plugin.doc
+    elif (
+        name in _CORE_TOOL_MODULES
+        and isinstance(AVAILABLE_TOOLS, ToolRegistry)
+        and not AVAILABLE_TOOLS.is_loaded(name)
+    ):
+        doc = _core_tool_docstring(name)
+    else:
+        doc = getattr(AVAILABLE_TOOLS[name], "__doc__", None)
+
+    if not doc or not doc.strip():
+        return ""
+    return doc.strip().splitlines()[0]
+
+
+def _core_tool_docstring(name: str) -> str | None:
+    spec = importlib.util.find_spec(_CORE_TOOL_MODULES[name])
+    if spec is None or not spec.origin:
+        return None
+    with open(spec.origin, "r", encoding="utf-8") as f:
+        return function_docstrings(f.read()).get(name)
 
 
 def configure_api(api_key: str):
     """Cấu hình API key ban đầu."""
     genai.configure(api_key=api_key)
+    cassette.install_gemini()
 
 
-def get_available_models() -> list[str]:
-    """Lấy danh sách các model name hỗ trợ generateContent."""
-    models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+_model_catalog: model_catalog.ModelCatalog | None = None
+# Token limit của các model không có trong catalog (chỉ hỏi API một lần mỗi tiến trình)
+_token_limit_cache: dict[str, int] = {}
+
+
+def _fetch_gemini_models() -> list[dict]:
+    def _int_or_none(value):
+        return value if isinstance(value, int) else None
+
+    return [
+        {
+            "name": m.name,
+            "description": str(getattr(m, "description", "") or ""),
+            "input_token_limit": _int_or_none(getattr(m, "input_token_limit", None)),
+            "output_token_limit": _int_or_none(getattr(m, "output_token_limit", None)),
+            "generation_methods": list(m.supported_generation_methods),
+        }
+        for m in genai.list_models()
+    ]
+
+
+def _fetch_openai_compatible_models(url: str, api_key: str, prefix: str) -> list[dict]:
+    """GET /models của provider OpenAI-compatible; tên model được gắn tiền tố của provider (``groq-``...)."""
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    with http_pool.request("GET", url, headers=headers) as resp:
+        data = json.loads(resp.read().decode("utf-8", errors="ignore"))
+    models = []
+    for item in data.get("data", []):
+        model_id = item.get("id")
+        if not model_id:
+            continue
+        models.append({
+            "name": model_id if model_id.startswith(prefix) else f"{prefix}{model_id}",
+            "description": item.get("owned_by", ""),
+            "input_token_limit": item.get("context_window"),
+            "output_token_limit": item.get("max_completion_tokens"),
+            "generation_methods": ["generateContent"],
+        })
     return models
 
 
+def _catalog_fetchers() -> dict:
+    fetchers = {"gemini": _fetch_gemini_models}
+    initializers = {"deepseek": initialize_deepseek_api_keys, "groq": initialize_groq_api_keys}
+    for name, spec in providers.registry().items():
+        keys = initializers.get(name, lambda name=name: initialize_provider_keys(name))()
+        if keys:
+            fetchers[name] = lambda spec=spec, key=keys[0]: _fetch_openai_compatible_models(
+                f"{spec.base_url}/models", key, spec.prefix
+            )
+    return fetchers
+
+
+def get_model_catalog() -> model_catalog.ModelCatalog:
+    """Catalog model dùng chung toàn tiến trình (cache trong APP_DIR/cache/model_catalog.json)."""
+    global _model_catalog
+    if _model_catalog is None:
+        _model_catalog = model_catalog.ModelCatalog(
+            model_catalog.get_catalog_path(),
+            fetchers=_catalog_fetchers(),
+            ttl_seconds=model_catalog.get_ttl_seconds(),
+            failure_backoff_seconds=model_catalog.get_failure_backoff_seconds(),
+        )
+    return _model_catalog
+
+
+def refresh_models(console: Console) -> dict[str, int]:
+    """Làm mới catalog model của mọi provider đã cấu hình key (``--refresh-models``)."""
+    with console.status("[cyan]Đang làm mới danh sách model...[/cyan]", spinner="dots"):
+        counts = get_model_catalog().refresh()
+    for provider, count in counts.items():
+        console.print(f"[green]✅ {provider}: {count} model[/green]")
+    return counts
+
+
+def get_available_models() -> list[str]:
+    """Lấy danh sách các model name Gemini hỗ trợ generateContent (từ catalog)."""
+    return [
+        m["name"]
+        for m in get_model_catalog().models("gemini")
+        if "generateContent" in m.get("generation_methods", [])
+    ]
+
+
 def list_models(console: Console):
     """Liệt kê các model có sẵn."""
     table = Table(title="✨ Danh sách Models Khả Dụng ✨")
@@ -479,10 +779,16 @@ def list_models(console: Console):
     table.add_column("Model Name", style="cyan", no_wrap=True)
     table.add_column("Description", style="magenta")
     console.print("Đang lấy danh sách models...")
-    for m in genai.list_models():
-        if 'generateContent' in m.supported_generation_methods:
-            provider_label = "🟢 Gemini"
-            table.add_row(provider_label, m.name, m.description)
+    catalog = get_model_catalog()
+    provider_labels = {"gemini": "🟢 Gemini", "deepseek": "🔵 DeepSeek", "groq": "🟠 Groq"}
+    for name, spec in providers.registry().items():
+        provider_labels.setdefault(name, f"⚪ {spec.label}")
+    for provider, provider_label in provider_labels.items():
+        if provider not in catalog.fetchers:
+            continue
+        for m in catalog.models(provider):
+            if "generateContent" in m.get("generation_methods", []):
+                table.add_row(provider_label, m["name"], m.get("description") or "")
     console.print(table)
 
 
@@ -493,34 +799,71 @@ def list_tools(console: Console):
     table.add_column("Mô tả", style="green")
 
     for name in sorted(AVAILABLE_TOOLS.keys()):
-        func = AVAILABLE_TOOLS[name]
         source = "plugin" if name in _PLUGIN_TOOLS else "core"
-        doc = ""
-        if getattr(func, "__doc__", None):
-            doc = func.__doc__.strip().splitlines()[0]
-        table.add_row(name, source, doc)
+        table.add_row(name, source, describe_tool(name))
 
     console.print(table)
 
 
 def start_chat_session(model_name: str, system_instruction: str = None, history: list = None, cli_help_text: str = ""):
-    """Khởi tạo chat session."""
-    enhanced_instruction = build_enhanced_instruction(cli_help_text)
-    if system_instruction:
-        enhanced_instruction = f"**PRIMARY DIRECTIVE (User-defined rules):**\n{system_instruction}\n\n---\n\n{enhanced_instruction}"
+    """Khởi tạo chat session.
 
+    System instruction gồm phần cố định (dựng một lần cho mỗi ``cli_help_text``) và phần
+    ngữ cảnh thời gian nhỏ ở cuối. Nếu SDK hỗ trợ context caching, phần cố định được cache
+    phía server và session chỉ tham chiếu tới handle của cache.
+    """
+    stable_instruction = build_session_instruction(cli_help_text, system_instruction)
     tools_config = list(AVAILABLE_TOOLS.values())
 
-    model = genai.GenerativeModel(
-        model_name,
-        system_instruction=enhanced_instruction,
-        tools=tools_config
-    )
+    model = _model_from_context_cache(model_name, stable_instruction, tools_config)
+    if model is None:
+        model = genai.GenerativeModel(
+            model_name,
+            system_instruction=stable_instruction + build_volatile_context(),
+            tools=tools_config
+        )
 
     chat = model.start_chat(history=history or [])
     return chat
 
 
+@functools.lru_cache(maxsize=1)
+def tool_declarations_text() -> str | None:
+    """Khai báo tool (JSON) mà chat session Gemini gửi kèm mỗi request; None nếu không dựng được.
+
+    Gemini tính cả phần này vào ``prompt_token_count``, nên cần nó khi hiệu chỉnh bộ ước lượng token.
+    """
+    try:
+        from google.generativeai.types import content_types
+
+        library = content_types.to_function_library(list(AVAILABLE_TOOLS.values()))
+        return "".join(type(tool).to_json(tool, indent=None) for tool in library.to_proto())
+    except Exception:
+        logger.debug("Không dựng được khai báo tool để ước lượng token", exc_info=True)
+        return None
+
+
+def _model_from_context_cache(model_name: str, stable_instruction: str, tools_config: list):
+    """GenerativeModel dùng context cache cho phần instruction cố định; None nếu không dùng được."""
+    cache = context_cache.get_cache()
+    # Cache chỉ thấy được trong project của key đã tạo nó; nhiều key thường là nhiều project
+    if cache is None or len(_api_keys) > 1:
+        return None
+    if tokens.estimate(model_name, stable_instruction) < int(context_cache.get_context_cache_config()["min_tokens"]):
+        return None
+    # Ngữ cảnh thời gian nằm trong nội dung cache nên chỉ giữ tới ngày (cache đổi mỗi ngày)
+    instruction = stable_instruction + build_volatile_context(with_time=False)
+    key = f"{model_name}:{instruction_fingerprint(instruction)}:{rate_limit.key_fingerprint(_current_gemini_key())}"
+    cached = cache.get_or_create(key, model_name, instruction, tools_config)
+    if cached is None:
+        return None
+    try:
+        return genai.GenerativeModel.from_cached_content(cached)
+    except Exception:
+        logger.warning("Không tạo được model từ context cache, dùng system instruction thường", exc_info=True)
+        return None
+
+
 def get_token_usage(response):
     """Trích xuất thông tin token usage từ response."""
     try:
@@ -575,141 +918,245 @@ def get_response_text(response) -> str:
 
 
 def get_model_token_limit(model_name: str) -> int:
-    """Lấy token limit của model."""
+    """Lấy token limit của model (từ catalog, không gọi mạng ở mỗi lượt chat)."""
+    catalog = get_model_catalog()
+    provider = _provider_of(model_name)
+    cached = catalog.find(model_name)
+    if cached is None and provider != "gemini":
+        # Alias (groq-chat...) được lưu trong catalog dưới tên model thật
+        cached = catalog.find(providers.get(provider).catalog_name(model_name))
+    if cached is None and provider == "gemini":
+        # Lần đầu chưa có catalog: lấy một lần và lưu lại, các tiến trình sau chỉ đọc từ đĩa
+        catalog.models("gemini")
+        cached = catalog.find(model_name)
+    if cached and cached.get("input_token_limit"):
+        return cached["input_token_limit"]
+    if provider != "gemini":
+        return tokens.DEFAULT_INPUT_LIMITS.get(provider, 0)
+    if model_name in _token_limit_cache:
+        return _token_limit_cache[model_name]
+    if catalog.failed_recently("gemini"):
+        # API vừa lỗi: không thử get_model ở mỗi lượt, dùng limit mặc định (0 = không giới hạn) tới khi hết chờ
+        return 0
+
+    limit = 0
     try:
         model_info = genai.get_model(model_name)
         if hasattr(model_info, 'input_token_limit'):
-            return model_info.input_token_limit
-        if 'flash' in model_name.lower():
-            return 1000000
+            limit = model_info.input_token_limit
+        elif 'flash' in model_name.lower():
+            limit = 1000000
         elif 'pro' in model_name.lower():
-            return 2000000
+            limit = 2000000
     except Exception:
         pass
-    return 0
+    _token_limit_cache[model_name] = limit
+    return limit
 
 def initialize_api_keys():
     """Khởi tạo danh sách API keys từ .env và reset trạng thái."""
     global _api_keys, _current_api_key_index
-    _api_keys = []
+    _api_keys = _load_env_keys("GOOGLE_API_KEY")
     _current_api_key_index = 0
-    
-    primary = os.getenv("GOOGLE_API_KEY")
-    if primary:
-        _api_keys.append(primary)
-    
-    i = 2
-    while True:
-        key_name = f"GOOGLE_API_KEY_{i}ND" if i == 2 else f"GOOGLE_API_KEY_{i}RD" if i == 3 else f"GOOGLE_API_KEY_{i}TH"
-        backup_key = os.getenv(key_name)
-        if backup_key:
-            _api_keys.append(backup_key)
-            i += 1
-        else:
-            break
-    
+    key_pool.get_pool("gemini").set_keys(_api_keys)
     return _api_keys
 
 def switch_to_next_api_key():
-    """Hàm nội bộ để chuyển sang API key tiếp theo và quay vòng."""
+    """Đặt cooldown cho key hiện tại và chuyển cấu hình mặc định sang key khả dụng tiếp theo trong pool."""
     global _current_api_key_index, _api_keys
-    _current_api_key_index = (_current_api_key_index + 1) % len(_api_keys)
-    new_key = _api_keys[_current_api_key_index]
+    pool = key_pool.get_pool("gemini")
+    if len(pool) != len(_api_keys):
+        pool.set_keys(_api_keys)
+
+    current_key = _api_keys[_current_api_key_index]
+    pool.mark_cooldown(current_key)
+    new_key = pool.acquire(exclude=(current_key,))
+    if new_key is None:
+        # Mọi key khác đều đang bị chặn: quay vòng như cũ để caller vẫn có key để thử
+        _current_api_key_index = (_current_api_key_index + 1) % len(_api_keys)
+        new_key = _api_keys[_current_api_key_index]
+    else:
+        pool.release(new_key)
+        _current_api_key_index = pool.index_of(new_key)
     genai.configure(api_key=new_key)
     return f"Key #{_current_api_key_index + 1}"
 
-class RPDQuotaExhausted(Exception):
-    """Exception tùy chỉnh để báo hiệu cần tái tạo session."""
-    pass
+_gemini_clients: dict[str, object] = {}
+_gemini_clients_lock = threading.Lock()
+
+
+def _gemini_client_for(api_key: str):
+    """Client generative riêng cho từng key, để nhiều request song song dùng các key khác nhau."""
+    client = _gemini_clients.get(api_key)
+    if client is None:
+        with _gemini_clients_lock:
+            client = _gemini_clients.get(api_key)
+            if client is None:
+                from google.generativeai import client as genai_client
+
+                def _create():
+                    manager = genai_client._ClientManager()
+                    manager.configure(api_key=api_key)
+                    return manager.get_default_client("generative")
+
+                client = cassette.wrap_gemini_client(_create)
+                _gemini_clients[api_key] = client
+    return client
+
+
+def _bind_gemini_key(api_function, api_key: str) -> None:
+    """Gắn client của ``api_key`` vào GenerativeModel sở hữu ``api_function`` (kể cả qua ChatSession)."""
+    owner = getattr(api_function, "__self__", None)
+    model = getattr(owner, "model", owner)
+    if isinstance(model, genai.GenerativeModel):
+        model._client = _gemini_client_for(api_key)
+
+def _gemini_model_name(api_function) -> str:
+    """Lấy tên model từ bound method của GenerativeModel hoặc ChatSession."""
+    owner = getattr(api_function, "__self__", None)
+    model = getattr(owner, "model", owner)
+    name = getattr(model, "model_name", None)
+    return name if isinstance(name, str) else "gemini"
+
+
+def _throttle(provider: str, api_key: str | None, model_name: str, tokens: int, label: str) -> None:
+    """Chờ tới lượt theo rate limiter (bỏ qua khi chạy pytest để test không chậm)."""
+    wait_time = rate_limit.get_limiter().reserve(provider, api_key, model_name, tokens)
+    if wait_time <= 0 or "PYTEST_CURRENT_TEST" in os.environ:
+        return
+    metrics.observe(metrics.THROTTLE_WAIT, wait_time * 1000, model=model_name, key=rate_limit.key_fingerprint(api_key))
+    with tracing.span("rate_limit_wait", tracing.THROTTLE, model=model_name, seconds=round(wait_time, 3)), _waiting_status(
+        f"[yellow]⏳ Rate limit: chờ {wait_time:.1f}s trước khi gọi {label}...[/yellow]"
+    ):
+        time.sleep(wait_time)
+
+
+def _record_usage(provider: str, api_key: str | None, model_name: str, total_tokens, reserved_tokens: int) -> None:
+    if isinstance(total_tokens, int) and total_tokens > 0:
+        rate_limit.get_limiter().record_usage(provider, api_key, model_name, total_tokens, reserved_tokens)
+        metrics.observe(metrics.TOKENS_PER_CALL, total_tokens, model=model_name, key=rate_limit.key_fingerprint(api_key))
+
+
+def _observe_call(metric: str, started: float, model_name: str, api_key: str | None) -> None:
+    """Ghi độ trễ (ms) tính từ ``started`` (``time.perf_counter``) của một lần gọi provider."""
+    metrics.observe(metric, (time.perf_counter() - started) * 1000, model=model_name, key=rate_limit.key_fingerprint(api_key))
+
 
 def _resilient_api_call(api_function, *args, **kwargs):
 
     """
     Hàm bọc "bất tử" cho mọi lệnh gọi API, tự động xử lý lỗi Quota.
+
+    Mỗi lần thử mượn một key từ pool Gemini (key rảnh / lâu chưa dùng nhất) và gắn client
+    của key đó vào model, nên nhiều request song song có thể dùng đồng thời các key khác nhau.
+    Key gặp lỗi RPM được cooldown đúng thời gian server yêu cầu, key hết quota ngày bị bỏ qua
+    tới khi quota reset; request được thử lại ngay với key khác. Lỗi tạm thời phía server
+    (503/500/504) được thử lại theo ``retry.RetryPolicy``.
     """
-    initial_key_index = _current_api_key_index
-    max_rpm_retries = 3
-    
+    from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, InternalServerError, DeadlineExceeded
+
+    pool = key_pool.get_pool("gemini")
+    if pool.keys != list(_api_keys):
+        pool.set_keys(_api_keys)
+
+    max_attempts = max(3, 2 * len(pool))
+    attempts = 0
+    model_name = _gemini_model_name(api_function)
+    last_error = None
+    state = retry.get_policy().start()
+    delay, reason = None, ""
+
     while True:
-        rpm_retry_count = 0
+        if delay is not None:
+            _backoff(delay, "Gemini", reason, state.retries)
+            delay = None
+
+        api_key = pool.acquire() if len(pool) else None
+        if len(pool) and api_key is None:
+            if not _wait_for_available_key(pool, "Gemini", state):
+                _console.print("[bold red]❌ Đã thử tất cả các API key nhưng đều gặp lỗi Quota (RPM/Requests Per Day). Hãy thử lại sau khi quota được reset.[/bold red]")
+                raise last_error or ResourceExhausted("All Gemini API keys exhausted")
+            continue
+
         try:
-            while rpm_retry_count < max_rpm_retries:
-                try:
-                    # Throttle client-side: luôn cách nhau tối thiểu ~10 giây giữa các request
-                    global _last_free_tier_call_ts
-                    now = time.time()
-                    min_interval = 10.0
-
-                    # Khi chạy test (pytest), bỏ qua sleep để test không chậm
-                    is_pytest = "PYTEST_CURRENT_TEST" in os.environ
-
-                    if _last_free_tier_call_ts is not None and not is_pytest:
-                        elapsed = now - _last_free_tier_call_ts
-                        if elapsed < min_interval:
-                            wait_time = min_interval - elapsed
-                            with _console.status(
-                                f"[yellow]⏳ Throttle: chờ {wait_time:.1f}s trước khi gọi Gemini...[/yellow]",
-                                spinner="clock",
-                            ):
-                                time.sleep(wait_time)
-
-                    _last_free_tier_call_ts = time.time()
-
-                    return api_function(*args, **kwargs)
-
-                except ResourceExhausted as e:
-                    error_message = str(e)
-
-                    # Nếu thông báo cho biết đã hết quota free tier/ngày, không nên retry tiếp
-                    if "free_tier_requests" in error_message or "daily" in error_message:
-                        raise e
-
-                    match = re.search(r"Please retry in (\d+\.\d+)s", error_message)
-                    if match:
-                        rpm_retry_count += 1
-                        wait_time = float(match.group(1)) + 1
-                        with _console.status(
-                            f"[yellow]⏳ Lỗi tốc độ (RPM). Chờ {wait_time:.1f}s (thử lại {rpm_retry_count}/{max_rpm_retries})...[/yellow]",
-                            spinner="clock",
-                        ):
-                            time.sleep(wait_time)
-                    else:
-                        raise e
-            
-            raise ResourceExhausted("Hết số lần thử lại cho lỗi RPM. Đang chuyển key.")
+            if api_key is not None:
+                _set_current_gemini_key(pool, api_key)
+                if len(pool) > 1:
+                    _bind_gemini_key(api_function, api_key)
+
+            # Rate limit client-side theo token bucket của (key, model) hiện tại
+            reserved_tokens = rate_limit.estimate_tokens(args)
+            _throttle("gemini", api_key, model_name, reserved_tokens, "Gemini")
+
+            started = time.perf_counter()
+            with tracing.span(f"gemini {model_name}", tracing.PROVIDER, key=pool.index_of(api_key) + 1, attempt=attempts + 1,
+                              stream=bool(kwargs.get("stream"))):
+                result = api_function(*args, **kwargs)
+            # Với stream=True, SDK trả về sau khi nhận chunk đầu tiên: đó là time-to-first-token
+            _observe_call(
+                metrics.TIME_TO_FIRST_TOKEN if kwargs.get("stream") else metrics.PROVIDER_LATENCY,
+                started, model_name, api_key,
+            )
+            if not kwargs.get("stream"):
+                usage = get_token_usage(result) or {}
+                _record_usage("gemini", api_key, model_name, usage.get("total_tokens"), reserved_tokens)
+            return result
 
         except ResourceExhausted as e:
-            error_message = str(e)
-            # Nếu đã hết quota free tier trong ngày / tổng, không xoay key nữa.
-            if "free_tier_requests" in error_message or "daily" in error_message:
-                _console.print("[bold red]❌ Đã hết quota free tier (Requests Per Day / free_tier_requests). Hãy thử lại sau khi quota được reset.[/bold red]")
-                raise e
-
-            _console.print(f"[yellow]⚠️ Gặp lỗi Quota với Key #{_current_api_key_index + 1}. Đang chuyển sang key tiếp theo...[/yellow]")
-            msg = switch_to_next_api_key()
-
-            if _current_api_key_index == initial_key_index:
+            if api_key is None:
+                raise
+            last_error = e
+            attempts += 1
+            outcome = pool.report_rate_limit(api_key, str(e))
+            tracing.instant("key_rate_limited", tracing.PROVIDER, provider="gemini", key=pool.index_of(api_key) + 1, outcome=outcome)
+            if attempts >= max_attempts:
                 _console.print("[bold red]❌ Đã thử tất cả các API key nhưng đều gặp lỗi Quota.[/bold red]")
-                raise e
-            
-            _console.print(f"[green]✅ Đã chuyển sang {msg}. Thử lại...[/green]")
-            raise RPDQuotaExhausted("API key changed.")
+                raise
+            if outcome == "exhausted":
+                _console.print(f"[yellow]⚠️ Key #{pool.index_of(api_key) + 1} đã hết quota trong ngày, bỏ qua tới khi quota reset.[/yellow]")
+            elif len(pool) > 1:
+                _console.print(f"[yellow]⚠️ Gặp lỗi Quota với Key #{pool.index_of(api_key) + 1}. Đang chuyển sang key tiếp theo...[/yellow]")
+            state.count("rate_limit")
+
+        except (ServiceUnavailable, InternalServerError, DeadlineExceeded) as e:
+            reason = type(e).__name__
+            delay = state.next_delay(reason)
+            if delay is None:
+                _console.print(f"[bold red]Lỗi không mong muốn khi gọi API: {e}[/bold red]")
+                raise
 
         except Exception as e:
             _console.print(f"[bold red]Lỗi không mong muốn khi gọi API: {e}[/bold red]")
             raise e
 
+        finally:
+            if api_key is not None:
+                pool.release(api_key)
+
+
+def _set_current_gemini_key(pool: key_pool.KeyPool, api_key: str) -> None:
+    """Ghi nhớ key vừa dùng (cho switch_to_next_api_key và diagnostics)."""
+    global _current_api_key_index
+    index = pool.index_of(api_key)
+    if index >= 0:
+        _current_api_key_index = index
+
+def _current_gemini_key() -> str | None:
+    return _api_keys[_current_api_key_index] if 0 <= _current_api_key_index < len(_api_keys) else None
+
 def resilient_generate_content(model: genai.GenerativeModel, prompt: str):
     """Hàm gọi generate_content với cơ chế retry, dùng cho Agent và các tool."""
     return _resilient_api_call(model.generate_content, prompt)
 
 def resilient_send_message(chat_session: genai.ChatSession, prompt):
     """Hàm gọi send_message với cơ chế retry, dùng cho Agent."""
-    try:
-        return _resilient_api_call(chat_session.send_message, prompt)
-    except RPDQuotaExhausted:
-        raise
+    return _resilient_api_call(chat_session.send_message, prompt)
 
 def send_message(chat_session: genai.ChatSession, prompt_parts: list):
     """Hàm send_message gốc cho chế độ chat thông thường (có streaming)."""
-    return chat_session.send_message(prompt_parts, stream=True)
\ No newline at end of file
+    started = time.perf_counter()
+    with tracing.span("gemini send_message", tracing.PROVIDER, stream=True):
+        response = chat_session.send_message(prompt_parts, stream=True)
+    # SDK trả về sau khi nhận chunk đầu tiên
+    _observe_call(metrics.TIME_TO_FIRST_TOKEN, started, _gemini_model_name(chat_session.send_message), _current_gemini_key())
+    return response
\ No newline at end of file
@@ -0,0 +1,432 @@
+"""
+Ghi lại và phát lại (record/replay) mọi lần gọi provider để chạy termi không cần mạng.
+
+Bật bằng biến môi trường::
+
+    TERMI_CASSETTE=record   # gọi API thật và ghi từng cặp request/response
+    TERMI_CASSETTE=replay   # không gọi mạng, trả lại response đã ghi
+    TERMI_CASSETTE_FILE=session.cassette.jsonl   # mặc định APP_DIR/cassettes/default.jsonl
+    TERMI_CASSETTE_TIMING=fast|original|<hệ số>  # phát lại tức thì (mặc định), đúng nhịp cũ, hoặc nhân thời gian
+
+Hai điểm chặn bao phủ mọi lưu lượng tới model:
+
+- HTTP OpenAI-compatible (DeepSeek, Groq): ``http_pool.post_json``. Ghi status, header
+  ``Retry-After``, body hoặc từng dòng SSE kèm thời điểm tới.
+- Gemini: client ``GenerativeService`` của SDK (``generate_content`` /
+  ``stream_generate_content``), tức là bên dưới ``GenerativeModel`` và ``ChatSession``:
+  lịch sử chat, function-call parts và ``usage_metadata`` được tái tạo y như thật.
+
+Lỗi (HTTP 4xx/5xx, lỗi kết nối, ``ResourceExhausted``...) cũng được ghi và ném lại khi phát lại.
+Mỗi dòng của cassette là một lần gọi (JSON gọn); API key không bao giờ được ghi. Khi phát
+lại, lần gọi được khớp theo hash của request; nếu request đã đổi (vd. ngày giờ trong system
+instruction) thì dùng lần gọi cùng loại kế tiếp theo thứ tự ghi.
+"""
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import urllib.error
+from email.message import Message
+from pathlib import Path
+
+from termi_cli.config import APP_DIR
+
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Key giả dùng khi phát lại mà không có API key thật trong môi trường
+REPLAY_API_KEY = "termi-cassette-replay"
+
+# Header của response cần giữ lại (logic xử lý rate limit đọc chúng)
+_KEPT_HEADERS = (
+    "Retry-After",
+    "Content-Type",
+    "x-ratelimit-remaining-requests",
+    "x-ratelimit-remaining-tokens",
+    "x-ratelimit-reset-requests",
+    "x-ratelimit-reset-tokens",
+)
+
+
+class CassetteMiss(RuntimeError):
+    """Đang phát lại nhưng cassette không còn lần gọi nào phù hợp."""
+
+
+def get_default_path() -> Path:
+    return APP_DIR / "cassettes" / "default.jsonl"
+
+
+def _parse_timing(value: str | None) -> float:
+    """Hệ số nhân thời gian khi phát lại: 0 = tức thì, 1 = đúng nhịp lúc ghi."""
+    if not value or value == "fast":
+        return 0.0
+    if value == "original":
+        return 1.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        logger.warning("TERMI_CASSETTE_TIMING không hợp lệ: %r, phát lại tức thì", value)
+        return 0.0
+
+
+def request_key(*parts) -> str:
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:24]
+
+
+def _proto_to_dict(message) -> dict:
+    return type(message).to_dict(message)
+
+
+class Cassette:
+    """Một file cassette ở chế độ ``record`` hoặc ``replay``."""
+
+    def __init__(self, mode: str, path: Path | str, timing: float = 0.0, clock=time.perf_counter, sleep=time.sleep):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode!r}")
+        self.mode = mode
+        self.path = Path(path)
+        self.timing = timing
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._opened = False
+        self._entries = None
+        self._used: set[int] = set()
+
+    # --- Ghi ---
+
+    def _write(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if not self._opened:
+                # Mỗi tiến trình ghi một cassette mới
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                mode = "w"
+                self._opened = True
+            else:
+                mode = "a"
+            with open(self.path, mode, encoding="utf-8") as f:
+                f.write(line)
+
+    # --- Phát lại ---
+
+    def _load(self) -> list[dict]:
+        if self._entries is None:
+            entries = []
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entries.append(json.loads(line))
+            except FileNotFoundError:
+                raise CassetteMiss(f"Cassette file not found: {self.path}") from None
+            self._entries = entries
+        return self._entries
+
+    def _take(self, kind: str, key: str) -> dict:
+        """Lần gọi chưa dùng khớp ``key``; nếu không có thì lần gọi cùng ``kind`` kế tiếp."""
+        with self._lock:
+            entries = self._load()
+            fallback = None
+            for index, entry in enumerate(entries):
+                if index in self._used or entry.get("kind") != kind:
+                    continue
+                if entry.get("key") == key:
+                    self._used.add(index)
+                    return entry
+                if fallback is None:
+                    fallback = index
+            if fallback is None:
+                raise CassetteMiss(f"No recorded {kind} call left in {self.path}")
+            logger.info("Cassette: request %s không khớp bản ghi nào, dùng bản ghi #%d", kind, fallback + 1)
+            self._used.add(fallback)
+            return entries[fallback]
+
+    def _pace(self, started: float, offset: float) -> None:
+        if self.timing > 0:
+            delay = offset * self.timing - (self._clock() - started)
+            if delay > 0:
+                self._sleep(delay)
+
+    # --- HTTP OpenAI-compatible ---
+
+    def http_post(self, url: str, payload: dict, send):
+        """Thay cho ``send()`` (POST thật): ghi lại hoặc phát lại response."""
+        key = request_key(url, payload)
+        stream = bool(payload.get("stream"))
+        kind = "http.stream" if stream else "http"
+        if self.mode == REPLAY:
+            return _replay_http(self, self._take(kind, key), url)
+
+        entry = {"kind": kind, "key": key, "url": url, "model": payload.get("model"), "stream": stream}
+        started = self._clock()
+        try:
+            resp = send()
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            entry.update(status=e.code, headers=_kept_headers(e.headers), chunks=[[self._clock() - started, body.decode("utf-8", "replace")]])
+            self._write(entry)
+            raise urllib.error.HTTPError(e.url, e.code, e.reason, e.headers, io.BytesIO(body)) from None
+        except urllib.error.URLError as e:
+            entry["error"] = {"type": "URLError", "message": str(e.reason)}
+            self._write(entry)
+            raise
+        entry.update(status=getattr(resp, "status", 200), headers=_kept_headers(getattr(resp, "headers", None)))
+        if stream:
+            return _RecordingStream(self, resp, entry, started)
+        with resp:
+            body = resp.read()
+        entry["chunks"] = [[self._clock() - started, body.decode("utf-8", "replace")]]
+        self._write(entry)
+        return ReplayResponse(entry["status"], entry["headers"], [body])
+
+    # --- Gemini ---
+
+    def gemini_call(self, method: str, request, call, stream: bool):
+        """Thay cho ``call()`` (``generate_content`` / ``stream_generate_content`` của client thật)."""
+        key = request_key(method, _proto_to_dict(request))
+        kind = f"gemini.{method}"
+        if self.mode == REPLAY:
+            entry = self._take(kind, key)
+            return _replay_gemini_stream(self, entry) if stream else _replay_gemini(self, entry)
+
+        entry = {"kind": kind, "key": key, "model": getattr(request, "model", None)}
+        started = self._clock()
+        try:
+            result = call()
+        except Exception as e:
+            entry["error"] = _gemini_error(e)
+            self._write(entry)
+            raise
+        if stream:
+            return self._record_gemini_stream(result, entry, started)
+        entry["chunks"] = [[self._clock() - started, _proto_to_dict(result)]]
+        self._write(entry)
+        return result
+
+    def _record_gemini_stream(self, iterator, entry: dict, started: float):
+        chunks = entry["chunks"] = []
+        try:
+            for chunk in iterator:
+                chunks.append([self._clock() - started, _proto_to_dict(chunk)])
+                yield chunk
+        except Exception as e:
+            entry["error"] = _gemini_error(e)
+            raise
+        finally:
+            self._write(entry)
+
+    def gemini_client(self, factory):
+        """Bọc client ``GenerativeService`` do ``factory()`` tạo (không tạo khi phát lại)."""
+        return _CassetteGeminiClient(self, factory)
+
+
+def _kept_headers(headers) -> dict:
+    if headers is None:
+        return {}
+    return {name: headers.get(name) for name in _KEPT_HEADERS if headers.get(name) is not None}
+
+
+def _message_headers(values: dict) -> Message:
+    headers = Message()
+    for name, value in (values or {}).items():
+        headers[name] = value
+    return headers
+
+
+class ReplayResponse:
+    """Response giả có cùng giao diện với ``http_pool.PooledResponse``."""
+
+    def __init__(self, status: int, headers: dict, chunks, pace=None):
+        self.status = status
+        self.reason = "OK"
+        self.headers = _message_headers(headers)
+        self._chunks = chunks
+        self._pace = pace
+
+    def _iter_chunks(self):
+        for index, chunk in enumerate(self._chunks):
+            if self._pace is not None:
+                self._pace(index)
+            yield chunk
+
+    def read(self, amt: int | None = None) -> bytes:
+        return b"".join(self._iter_chunks())
+
+    def iter_lines(self):
+        yield from self._iter_chunks()
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _RecordingStream(ReplayResponse):
+    """Đọc stream SSE thật và ghi lại từng dòng cùng thời điểm tới."""
+
+    def __init__(self, cassette: Cassette, resp, entry: dict, started: float):
+        super().__init__(entry["status"], entry["headers"], [])
+        self._cassette = cassette
+        self._resp = resp
+        self._entry = entry
+        self._started = started
+        self._entry["chunks"] = []
+        self._written = False
+
+    def iter_lines(self):
+        for line in self._resp.iter_lines():
+            self._entry["chunks"].append([self._cassette._clock() - self._started, line.decode("utf-8", "replace")])
+            yield line
+
+    def read(self, amt: int | None = None) -> bytes:
+        return b"\n".join(self.iter_lines())
+
+    def close(self) -> None:
+        self._resp.close()
+        if not self._written:
+            self._written = True
+            self._cassette._write(self._entry)
+
+
+def _replay_http(cassette: Cassette, entry: dict, url: str):
+    started = cassette._clock()
+    error = entry.get("error")
+    chunks = entry.get("chunks") or []
+    if error:
+        raise urllib.error.URLError(error.get("message", "recorded connection error"))
+    if entry.get("status", 200) >= 400:
+        cassette._pace(started, chunks[0][0] if chunks else 0.0)
+        body = "".join(text for _, text in chunks).encode("utf-8")
+        raise urllib.error.HTTPError(url, entry["status"], "Recorded error", _message_headers(entry.get("headers")), io.BytesIO(body))
+    if not entry.get("stream"):
+        cassette._pace(started, chunks[0][0] if chunks else 0.0)
+        body = "".join(text for _, text in chunks).encode("utf-8")
+        return ReplayResponse(entry.get("status", 200), entry.get("headers"), [body])
+    return ReplayResponse(
+        entry.get("status", 200),
+        entry.get("headers"),
+        [text.encode("utf-8") for _, text in chunks],
+        pace=lambda index: cassette._pace(started, chunks[index][0]),
+    )
+
+
+def _gemini_error(exc: Exception) -> dict:
+    return {"type": type(exc).__name__, "message": getattr(exc, "message", None) or str(exc)}
+
+
+def _raise_gemini_error(error: dict):
+    from google.api_core import exceptions as core_exceptions
+
+    cls = getattr(core_exceptions, error.get("type", ""), None)
+    if isinstance(cls, type) and issubclass(cls, core_exceptions.GoogleAPICallError):
+        raise cls(error.get("message", ""))
+    raise RuntimeError(f"{error.get('type')}: {error.get('message')}")
+
+
+def _gemini_response(data: dict):
+    import google.ai.generativelanguage as glm
+
+    return glm.GenerateContentResponse(data)
+
+
+def _replay_gemini(cassette: Cassette, entry: dict):
+    started = cassette._clock()
+    chunks = entry.get("chunks") or []
+    if chunks:
+        cassette._pace(started, chunks[-1][0])
+    if entry.get("error"):
+        _raise_gemini_error(entry["error"])
+    return _gemini_response(chunks[-1][1] if chunks else {})
+
+
+def _replay_gemini_stream(cassette: Cassette, entry: dict):
+    started = cassette._clock()
+    for offset, data in entry.get("chunks") or []:
+        cassette._pace(started, offset)
+        yield _gemini_response(data)
+    if entry.get("error"):
+        _raise_gemini_error(entry["error"])
+
+
+class _CassetteGeminiClient:
+    """Thay ``GenerativeServiceClient``: chặn các lần sinh nội dung, các lời gọi khác đi thẳng."""
+
+    def __init__(self, cassette: Cassette, factory):
+        self._cassette = cassette
+        self._factory = factory
+        self._inner = None
+
+    def _client(self):
+        if self._inner is None:
+            self._inner = self._factory()
+        return self._inner
+
+    def generate_content(self, request, **kwargs):
+        return self._cassette.gemini_call(
+            "generate_content", request, lambda: self._client().generate_content(request, **kwargs), stream=False
+        )
+
+    def stream_generate_content(self, request, **kwargs):
+        return self._cassette.gemini_call(
+            "stream_generate_content", request, lambda: self._client().stream_generate_content(request, **kwargs), stream=True
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._client(), name)
+
+
+_cassette: Cassette | None = None
+_cassette_lock = threading.Lock()
+_gemini_installed = False
+
+
+def get_cassette() -> Cassette | None:
+    """Cassette của tiến trình theo ``TERMI_CASSETTE``; None khi không bật."""
+    global _cassette
+    if _cassette is None:
+        mode = os.environ.get("TERMI_CASSETTE", "").strip().lower()
+        if mode not in (RECORD, REPLAY):
+            return None
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(
+                    mode,
+                    os.environ.get("TERMI_CASSETTE_FILE") or get_default_path(),
+                    timing=_parse_timing(os.environ.get("TERMI_CASSETTE_TIMING")),
+                )
+                logger.info("Cassette %s: %s", mode, _cassette.path)
+    return _cassette
+
+
+def is_replaying() -> bool:
+    cassette = get_cassette()
+    return cassette is not None and cassette.mode == REPLAY
+
+
+def wrap_gemini_client(factory):
+    """Client Gemini đi qua cassette nếu đang bật, ngược lại ``factory()``."""
+    cassette = get_cassette()
+    return cassette.gemini_client(factory) if cassette is not None else factory()
+
+
+def install_gemini() -> None:
+    """Cho client mặc định của SDK Gemini đi qua cassette (gọi một lần sau ``genai.configure``)."""
+    global _gemini_installed
+    if _gemini_installed or get_cassette() is None:
+        return
+    from google.generativeai import client as genai_client
+
+    original = genai_client.get_default_generative_client
+    genai_client.get_default_generative_client = lambda: wrap_gemini_client(original)
+    _gemini_installed = True
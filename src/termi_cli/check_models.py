@@ -1,7 +1,8 @@
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from termi_cli import api
+
 # Tải API key
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
@@ -11,22 +12,26 @@ if not api_key:
 else:
     try:
         # Cấu hình
-        genai.configure(api_key=api_key)
+        api.initialize_api_keys()
+        api.configure_api(api_key)
 
         print("Đang lấy danh sách các model khả dụng cho key của bạn...")
         print("-" * 50)
 
-        # Lặp qua tất cả model và chỉ in ra những model hỗ trợ 'generateContent'
-        found_model = False
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                print(f"-> {m.name}")
-                found_model = True
+        # Gọi API thật (kiểm tra key) và đồng thời cập nhật catalog model trong APP_DIR
+        catalog = api.get_model_catalog()
+        if not catalog.refresh(["gemini"]):
+            raise RuntimeError("không lấy được danh sách model (xem logs/termi.log)")
+
+        # Chỉ in ra những model hỗ trợ 'generateContent'
+        models = api.get_available_models()
+        for name in models:
+            print(f"-> {name}")
 
-        if not found_model:
+        if not models:
             print("Không tìm thấy model nào hỗ trợ generateContent cho API key này.")
 
         print("-" * 50)
 
     except Exception as e:
-        print(f"Đã xảy ra lỗi khi kết nối tới API: {e}")
\ No newline at end of file
+        print(f"Đã xảy ra lỗi khi kết nối tới API: {e}")
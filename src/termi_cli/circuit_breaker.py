@@ -0,0 +1,215 @@
+"""
+Circuit breaker cho từng endpoint provider HTTP (DeepSeek, Groq).
+
+Khi endpoint sập, mỗi request phải đợi hết connect/read timeout mới báo lỗi, và chat
+session hay script batch cứ thế treo lặp đi lặp lại. Breaker theo dõi các lỗi kết nối /
+HTTP 5xx liên tiếp:
+
+- ``closed``: request đi bình thường; ``failure_threshold`` lỗi liên tiếp thì chuyển sang ``open``.
+- ``open``: request bị từ chối ngay (``CircuitOpenError``) trong ``reset_seconds``; router
+  có thể chuyển sang model dự phòng trong ``model_fallback_order``.
+- ``half_open``: hết thời gian chờ, cho đúng một request thăm dò đi qua. Thành công thì
+  ``closed``, lỗi thì ``open`` lại.
+
+``allow()`` trả về một ``Permit``; chỉ request giữ permit thăm dò (``permit.probe``) mới
+giải phóng được lượt thăm dò, nên request thường hay request bị từ chối không thể vô tình
+mở đường cho thêm một lượt thăm dò khác khi lượt hiện tại còn đang chạy.
+
+Trạng thái được ghi vào quota store (SQLite dùng chung) để các tiến trình khác cũng fail-fast
+và ``termi --diagnostics`` hiển thị được. Cấu hình trong ``config.json``::
+
+    "circuit_breaker": {"failure_threshold": 5, "reset_seconds": 30}
+"""
+import time
+import logging
+import threading
+from collections import deque
+
+from termi_cli import quota_store
+from termi_cli.config import load_config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_BREAKER_CONFIG = {
+    "failure_threshold": 5,
+    "reset_seconds": 30,
+}
+
+# Đọc lại trạng thái do tiến trình khác ghi tối đa mỗi giây một lần
+_STORE_SYNC_INTERVAL = 1.0
+
+
+class CircuitOpenError(Exception):
+    """Breaker đang mở: request bị từ chối ngay mà không gọi mạng."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit is open, retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class Permit:
+    """Quyền gọi mạng do ``CircuitBreaker.allow`` cấp; ``probe`` True nếu là lượt thăm dò ở ``half_open``."""
+
+    __slots__ = ("probe",)
+
+    def __init__(self, probe: bool = False):
+        self.probe = probe
+
+
+# Permit của request thường khi breaker đóng (không giữ lượt thăm dò nào)
+_PASS = Permit()
+
+
+def get_breaker_config() -> dict:
+    return {**DEFAULT_BREAKER_CONFIG, **(load_config().get("circuit_breaker") or {})}
+
+
+class CircuitBreaker:
+    """Breaker ba trạng thái cho một endpoint, an toàn khi dùng từ nhiều thread."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 clock=time.time, store=None):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_seconds = float(reset_seconds)
+        self._clock = clock
+        self._store = store
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self._probe: Permit | None = None
+        self._synced_at = float("-inf")
+        # Các lần chuyển trạng thái gần đây: (thời điểm, trạng thái cũ, trạng thái mới)
+        self.transitions: deque = deque(maxlen=20)
+
+    def _sync_from_store(self, now: float) -> None:
+        if self._store is None or now - self._synced_at < _STORE_SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        row = self._store.load_breakers().get(self.name)
+        # Chỉ nhận trạng thái "mở" mới hơn do tiến trình khác phát hiện
+        if row and row["state"] == OPEN and row["opened_until"] > self.opened_until and self.state == CLOSED:
+            self.failures = int(row["failures"])
+            self.opened_until = float(row["opened_until"])
+            self._transition(OPEN, now, persist=False)
+
+    def _transition(self, state: str, now: float, persist: bool = True) -> None:
+        if state == self.state:
+            return
+        logger.warning("Circuit breaker %s: %s -> %s", self.name, self.state, state)
+        self.transitions.append((now, self.state, state))
+        self.state = state
+        if persist and self._store is not None:
+            self._store.save_breaker(self.name, state, self.failures, self.opened_until, now)
+
+    def allow(self) -> Permit | None:
+        """``Permit`` nếu request được phép gọi mạng, None nếu bị từ chối.
+
+        Ở ``half_open`` chỉ một request nhận permit thăm dò; caller phải trả nó lại qua
+        ``record_success`` / ``record_failure`` / ``release_probe``.
+        """
+        with self._lock:
+            now = self._clock()
+            self._sync_from_store(now)
+            if self.state == CLOSED:
+                return _PASS
+            if self.state == OPEN and now >= self.opened_until:
+                self._transition(HALF_OPEN, now)
+            if self.state == HALF_OPEN and self._probe is None:
+                self._probe = Permit(probe=True)
+                return self._probe
+            return None
+
+    def _release(self, permit: Permit | None) -> None:
+        # Chỉ chủ của lượt thăm dò hiện tại mới giải phóng được nó
+        if permit is not None and permit is self._probe:
+            self._probe = None
+
+    def is_open(self) -> bool:
+        """True khi breaker đang mở và chưa tới lúc thăm dò (không thay đổi trạng thái)."""
+        with self._lock:
+            now = self._clock()
+            self._sync_from_store(now)
+            return self.state == OPEN and now < self.opened_until
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self.opened_until - self._clock())
+
+    def record_success(self, permit: Permit | None = None) -> None:
+        with self._lock:
+            self._release(permit)
+            self.failures = 0
+            self._transition(CLOSED, self._clock())
+
+    def record_failure(self, permit: Permit | None = None) -> None:
+        with self._lock:
+            now = self._clock()
+            self._release(permit)
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_until = now + self.reset_seconds
+                if self.state == OPEN:
+                    # Lỗi của request đã đi qua trước khi breaker mở: chỉ kéo dài thời gian chờ
+                    if self._store is not None:
+                        self._store.save_breaker(self.name, OPEN, self.failures, self.opened_until, now)
+                else:
+                    self._transition(OPEN, now)
+
+    def release_probe(self, permit: Permit | None) -> None:
+        """Request thăm dò kết thúc mà không cho biết endpoint sống hay chết (vd. lỗi 4xx)."""
+        with self._lock:
+            self._release(permit)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": max(0.0, self.opened_until - self._clock()) if self.state != CLOSED else 0.0,
+            }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Breaker dùng chung toàn tiến trình cho endpoint ``name`` (vd. ``"deepseek"``)."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                cfg = get_breaker_config()
+                breaker = _breakers[name] = CircuitBreaker(
+                    name,
+                    failure_threshold=cfg["failure_threshold"],
+                    reset_seconds=cfg["reset_seconds"],
+                    store=quota_store.get_store(),
+                )
+    return breaker
+
+
+def status() -> list[dict]:
+    """Trạng thái mọi breaker đã biết (trong tiến trình này và do tiến trình khác ghi lại)."""
+    rows = {breaker.name: breaker.status() for breaker in list(_breakers.values())}
+    store = quota_store.get_store()
+    if store is not None:
+        now = time.time()
+        for name, row in store.load_breakers().items():
+            if name not in rows:
+                rows[name] = {
+                    "name": name,
+                    "state": row["state"] if row["state"] == CLOSED or row["opened_until"] > now else HALF_OPEN,
+                    "failures": row["failures"],
+                    "retry_in": max(0.0, row["opened_until"] - now) if row["state"] != CLOSED else 0.0,
+                }
+    return [rows[name] for name in sorted(rows)]
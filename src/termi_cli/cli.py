@@ -33,6 +33,19 @@ def create_parser():
         ),
     )
 
+    mode_group.add_argument(
+        "--serve",
+        action="store_true",
+        help=(
+            "Chạy daemon thường trú giữ sẵn SDK, config, API keys, plugin và trí nhớ.\n"
+            "Các lệnh termi sau đó tự chuyển tiếp qua Unix socket nên khởi động gần như tức thì."
+        ),
+    )
+    mode_group.add_argument(
+        "--stop-daemon",
+        action="store_true",
+        help="Dừng daemon đang chạy (nếu có).",
+    )
     mode_group.add_argument(
         "--agent-dry-run",
         action="store_true",
@@ -55,6 +68,11 @@ def create_parser():
     model_group = parser.add_argument_group("Cấu hình Model & AI")
 
     model_group.add_argument("--list-models", action="store_true", help="Liệt kê các model khả dụng.")
+    model_group.add_argument(
+        "--refresh-models",
+        action="store_true",
+        help="Làm mới catalog model (Gemini, DeepSeek, Groq) được cache trong APP_DIR.",
+    )
     model_group.add_argument("--set-model", action="store_true", help="Chạy giao diện để chọn model mặc định.")
     
     model_group.add_argument("-m", "--model", type=str, help="Chọn model cho phiên này (ghi đè tạm thời).")
@@ -108,6 +126,42 @@ def create_parser():
         metavar="NAME",
         help="Xóa một profile cấu hình nhanh theo tên.",
     )
+    model_group.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bỏ qua response cache (nếu đã bật) và luôn gọi model cho lần chạy này.",
+    )
+    model_group.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Hiển thị thống kê response cache (số entry, dung lượng, hit/miss).",
+    )
+    model_group.add_argument(
+        "--stats",
+        nargs="?",
+        const="24h",
+        metavar="WINDOW",
+        help=(
+            "Hiển thị p50/p95/p99 độ trễ, time-to-first-token, thời gian tool, thời gian chờ\n"
+            "rate limit và token mỗi lượt gọi theo model/key/tool (mặc định 24h; vd. 30m, 7d)."
+        ),
+    )
+
+    # --- Kiểm thử tải ---
+    load_group = parser.add_argument_group("Kiểm thử tải (mock server)")
+    load_group.add_argument(
+        "--loadtest",
+        choices=["deepseek", "groq"],
+        metavar="PROVIDER",
+        help=(
+            "Đo tải tầng provider (deepseek/groq) bằng mock server cục bộ và key giả:\n"
+            "in thông lượng, p50/p95/p99 độ trễ, số retry và phân bố request trên từng key."
+        ),
+    )
+    load_group.add_argument("--loadtest-sessions", type=int, metavar="N", help="Số session chạy song song (mặc định: 8).")
+    load_group.add_argument("--loadtest-turns", type=int, metavar="N", help="Số lượt hội thoại mỗi session (mặc định: 5).")
+    load_group.add_argument("--loadtest-keys", type=int, metavar="N", help="Số API key giả trong pool (mặc định: 3).")
+    load_group.add_argument("--loadtest-stream", action="store_true", help="Dùng stream SSE và đo thêm time-to-first-token.")
     
     # --- Quản lý Persona ---
     persona_group = parser.add_argument_group("Quản lý Persona")
@@ -190,6 +244,30 @@ def create_parser():
     io_group.add_argument("-rd", "--read-dir", action="store_true", help="Đọc ngữ cảnh của toàn bộ thư mục hiện tại.")
     io_group.add_argument("-f", "--format", type=str, help="Định dạng output (mặc định: rich).")
     io_group.add_argument("-o", "--output", type=str, metavar="FILE_PATH", help="Lưu kết quả đầu ra vào một file thay vì in ra console.")
+    io_group.add_argument(
+        "--batch",
+        type=str,
+        metavar="JSONL_FILE",
+        help=(
+            "Chạy hàng loạt prompt từ file JSONL (mỗi dòng: prompt, id, model, system_instruction).\n"
+            "Kết quả ghi vào --output (mặc định <file>.out.jsonl); chạy lại sẽ tiếp tục từ chỗ dừng."
+        ),
+    )
+    io_group.add_argument(
+        "--batch-concurrency",
+        type=int,
+        metavar="N",
+        help="Số request chạy song song trong --batch (mặc định: gấp đôi số API key, tối đa 16).",
+    )
+    io_group.add_argument(
+        "--trace",
+        type=str,
+        metavar="FILE",
+        help=(
+            "Ghi trace của lần chạy (khởi động, gọi provider, chờ rate limit, tool, trí nhớ, render)\n"
+            "ra FILE theo định dạng Chrome trace-event; mở bằng chrome://tracing hoặc ui.perfetto.dev."
+        ),
+    )
 
     parser.add_argument(
         "prompt",
@@ -1,6 +1,10 @@
 import os
+import copy
 import json
+import tempfile
+import threading
 from pathlib import Path
+from types import MappingProxyType
 
 APP_DIR = Path(os.getenv("TERMI_CLI_HOME") or (Path.home() / ".termi-cli"))
 _LEGACY_CONFIG_PATH = Path("config.json")
@@ -16,20 +20,42 @@ MODEL_RPM_LIMITS = {
     "models/gemini-flash-latest": 15,
 }
 
-def load_config() -> dict:
-    """Tải cấu hình từ file config.json."""
-    config_data = {}
-    config_exists = CONFIG_PATH.exists()
-
-    if config_exists:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            try:
-                config_data = json.load(f)
-            except json.JSONDecodeError:
-                # Nếu file hỏng, giữ nguyên để người dùng tự xử lý,
-                # và chỉ dùng defaults trong runtime mà không ghi đè.
-                pass
-                
+# Cache toàn tiến trình cho load_config: chỉ đọc/parse lại config.json khi
+# (đường dẫn, mtime_ns, size) thay đổi. load_config nằm trên nhiều hot path
+# (mỗi tool call của agent, mỗi helper history, code_tool...).
+_cache_lock = threading.Lock()
+_cache_key = None
+_cache_data = None
+_cache_view = None
+
+
+def _freeze(value):
+    """Tạo view chỉ-đọc đệ quy (dict -> MappingProxyType, list -> tuple)."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    """Ngược lại của _freeze: chuyển view chỉ-đọc về dict/list thường."""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def _stat_key(path: Path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+def _merge_defaults(config_data: dict) -> dict:
     # --- Cấu hình mặc định ---
     defaults = {
         "default_model": "models/gemini-flash-latest",
@@ -51,7 +77,7 @@ def load_config() -> dict:
         "database": {},
         "profiles": {},
     }
-    
+
     final_config = {**defaults, **config_data}
 
     # Đảm bảo language luôn ở dạng hợp lệ
@@ -59,18 +85,90 @@ def load_config() -> dict:
     if lang_val not in ("vi", "en"):
         final_config["language"] = "vi"
 
-    # Nếu chưa có file config, tự tạo một file mới với giá trị mặc định.
-    if not config_exists:
+    return final_config
+
+
+def atomic_write_json(path: Path | str, data, **dump_kwargs) -> None:
+    """Ghi ``data`` ra file JSON theo kiểu atomic (file tạm cùng thư mục + ``os.replace``).
+
+    Người đọc không bao giờ thấy file ghi dở; lỗi ghi được ném lại sau khi dọn file tạm.
+    ``dump_kwargs`` truyền thẳng cho ``json.dump`` (``indent``, ``ensure_ascii``...).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.stem}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
         try:
-            save_config(final_config)
-        except Exception:
-            # Không để lỗi ghi file làm hỏng quá trình khởi động CLI.
+            os.unlink(tmp_path)
+        except OSError:
             pass
+        raise
+
+
+def _write_config_file(config: dict) -> None:
+    """Ghi config.json theo kiểu atomic."""
+    atomic_write_json(CONFIG_PATH, config, indent=2, ensure_ascii=False)
+
+
+def _store_cache(key, data: dict) -> None:
+    global _cache_key, _cache_data, _cache_view
+    _cache_key = key
+    _cache_data = data
+    _cache_view = _freeze(data)
+
+
+def invalidate_config_cache() -> None:
+    """Bỏ cache, buộc lần load_config kế tiếp đọc lại từ đĩa."""
+    global _cache_key, _cache_data, _cache_view
+    with _cache_lock:
+        _cache_key = _cache_data = _cache_view = None
+
+
+def load_config(writable: bool = False):
+    """Tải cấu hình từ file config.json.
+
+    Kết quả được cache và chỉ đọc lại khi mtime/size của file thay đổi. Mặc định trả về
+    một view chỉ-đọc dùng chung (dict -> ``MappingProxyType``, list -> ``tuple``);
+    caller cần sửa rồi ``save_config`` thì dùng ``writable=True`` để nhận bản sao riêng.
+    """
+    with _cache_lock:
+        key = _stat_key(CONFIG_PATH)
+        if key is None or key != _cache_key:
+            config_data = {}
+            if key is not None:
+                with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+                    try:
+                        config_data = json.load(f)
+                    except json.JSONDecodeError:
+                        # Nếu file hỏng, giữ nguyên để người dùng tự xử lý,
+                        # và chỉ dùng defaults trong runtime mà không ghi đè.
+                        pass
+
+            final_config = _merge_defaults(config_data)
+
+            # Nếu chưa có file config, tự tạo một file mới với giá trị mặc định.
+            if key is None:
+                try:
+                    _write_config_file(final_config)
+                    key = _stat_key(CONFIG_PATH)
+                except Exception:
+                    # Không để lỗi ghi file làm hỏng quá trình khởi động CLI.
+                    pass
+
+            _store_cache(key, final_config)
+
+        if writable:
+            return copy.deepcopy(_cache_data)
+        return _cache_view
 
-    return final_config
 
 def save_config(config: dict):
-    """Lưu cấu hình vào file config.json."""
-    CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=2, ensure_ascii=False)
\ No newline at end of file
+    """Lưu cấu hình vào file config.json (ghi atomic) và cập nhật cache."""
+    config = _thaw(config)
+    with _cache_lock:
+        _write_config_file(config)
+        _store_cache(_stat_key(CONFIG_PATH), _merge_defaults(copy.deepcopy(config)))
@@ -0,0 +1,172 @@
+"""
+Context caching phía server của Gemini cho phần cố định của system instruction.
+
+Phần instruction cố định (quy tắc, khai báo tools, ``--help`` của CLI, chỉ dẫn persona)
+được upload một lần thành ``CachedContent`` và các chat session sau chỉ tham chiếu tới
+handle của nó, thay vì gửi lại (và trả tiền lại) vài nghìn token mỗi lần gọi.
+
+Handle được ghi sổ trong ``APP_DIR/cache/context_cache.json`` theo khoá
+``model + hash nội dung + fingerprint của API key`` cùng thời điểm hết hạn, nên các tiến
+trình sau dùng lại được cho tới khi hết TTL. Lần tạo cache bị server từ chối (prompt dưới
+mức token tối thiểu, model không hỗ trợ...) cũng được ghi lại để không thử lại cho tới hết
+TTL.
+
+Chỉ bật khi SDK có ``google.generativeai.caching`` (các bản ``google-generativeai`` cũ
+không có, khi đó session dùng system instruction thường). Cấu hình trong ``config.json``::
+
+    "context_cache": {
+        "enabled": true,
+        "ttl_seconds": 3600,
+        "min_tokens": 1024
+    }
+"""
+import os
+import json
+import time
+import logging
+import datetime
+import importlib
+import importlib.util
+import threading
+from pathlib import Path
+
+from termi_cli.config import APP_DIR, atomic_write_json, load_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_CACHE_CONFIG = {
+    "enabled": True,
+    "ttl_seconds": 3600,
+    "min_tokens": 1024,
+}
+
+# Không dùng handle sắp hết hạn: request đang chạy có thể gặp cache vừa bị xoá
+_EXPIRY_MARGIN_SECONDS = 60
+
+
+def get_context_cache_config() -> dict:
+    return {**DEFAULT_CONTEXT_CACHE_CONFIG, **(load_config().get("context_cache") or {})}
+
+
+def get_index_path() -> Path:
+    return APP_DIR / "cache" / "context_cache.json"
+
+
+def load_caching_module():
+    """``google.generativeai.caching`` nếu SDK hỗ trợ, ngược lại None."""
+    try:
+        if importlib.util.find_spec("google.generativeai.caching") is None:
+            return None
+        return importlib.import_module("google.generativeai.caching")
+    except (ImportError, ValueError):
+        return None
+
+
+class ContextCache:
+    """Sổ ghi các handle ``CachedContent`` đã tạo và thời điểm hết hạn của chúng."""
+
+    def __init__(self, caching, path: Path | str | None = None, ttl_seconds: float = 3600, clock=time.time):
+        self.caching = caching
+        self.path = Path(path) if path else None
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            data = {}
+            if self.path is not None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    data = {}
+            self._entries = data if isinstance(data, dict) else {}
+        return self._entries
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            atomic_write_json(self.path, self._entries, indent=2)
+        except OSError as e:
+            logger.warning("Không ghi được sổ context cache %s: %s", self.path, e)
+
+    def _prune(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if entry.get("expires_at", 0) <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, key: str):
+        """Entry còn hạn của ``key`` (``{"name": handle | None, ...}``) hoặc None."""
+        with self._lock:
+            entry = self._load().get(key)
+        if entry and entry.get("expires_at", 0) - _EXPIRY_MARGIN_SECONDS > self._clock():
+            return entry
+        return None
+
+    def _remember(self, key: str, name: str | None, model_name: str) -> None:
+        now = self._clock()
+        with self._lock:
+            self._load()
+            self._prune(now)
+            self._entries[key] = {"name": name, "model": model_name, "expires_at": now + self.ttl_seconds}
+            self._save()
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._save()
+
+    def get_or_create(self, key: str, model_name: str, system_instruction: str, tools=None):
+        """Trả về ``CachedContent`` cho ``key``; None nếu server không cho cache nội dung này."""
+        entry = self.lookup(key)
+        if entry is not None:
+            if entry.get("name") is None:
+                return None
+            try:
+                return self.caching.CachedContent.get(entry["name"])
+            except Exception as e:
+                # Cache đã bị xoá phía server (hoặc thuộc project khác): tạo lại
+                logger.info("Context cache %s không còn dùng được: %s", entry["name"], e)
+                self.forget(key)
+
+        try:
+            cached = self.caching.CachedContent.create(
+                model=model_name,
+                system_instruction=system_instruction,
+                tools=tools,
+                ttl=datetime.timedelta(seconds=self.ttl_seconds),
+            )
+        except Exception as e:
+            logger.info("Không tạo được context cache cho %s: %s", model_name, e)
+            self._remember(key, None, model_name)
+            return None
+        self._remember(key, cached.name, model_name)
+        logger.debug("Đã tạo context cache %s cho %s", cached.name, model_name)
+        return cached
+
+
+_cache: ContextCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ContextCache | None:
+    """Context cache dùng chung toàn tiến trình; None nếu bị tắt hoặc SDK không hỗ trợ."""
+    global _cache
+    cfg = get_context_cache_config()
+    if not cfg.get("enabled"):
+        return None
+    if _cache is None:
+        caching = load_caching_module()
+        if caching is None:
+            return None
+        with _cache_lock:
+            if _cache is None:
+                _cache = ContextCache(
+                    caching,
+                    None if "PYTEST_CURRENT_TEST" in os.environ else get_index_path(),
+                    ttl_seconds=cfg["ttl_seconds"],
+                )
+    return _cache
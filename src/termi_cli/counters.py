@@ -0,0 +1,40 @@
+"""
+Bộ đếm tích luỹ nhỏ lưu trong file JSON (thống kê cache, hedging...).
+
+Ghi atomic (``config.atomic_write_json``) nên không bao giờ để lại file hỏng; hai tiến trình
+cùng ghi một lúc có thể mất vài lượt đếm, chấp nhận được với số liệu thống kê.
+"""
+import json
+import logging
+import threading
+from pathlib import Path
+
+from termi_cli.config import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+def read_counters(path: Path | str) -> dict:
+    """Đọc bộ đếm (``{}`` nếu file chưa có hoặc hỏng)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def bump_counters(path: Path | str, **increments: int) -> dict:
+    """Cộng ``increments`` vào các bộ đếm trong ``path``; trả về giá trị mới."""
+    path = Path(path)
+    with _lock:
+        counters = read_counters(path)
+        for name, value in increments.items():
+            counters[name] = counters.get(name, 0) + value
+        try:
+            atomic_write_json(path, counters)
+        except OSError as e:
+            logger.warning("Không ghi được bộ đếm %s: %s", path, e)
+    return counters
@@ -0,0 +1,426 @@
+"""
+Chế độ daemon thường trú (``termi --serve``) và thin client.
+
+Daemon giữ "ấm" toàn bộ phần khởi động tốn kém (interpreter, SDK, ``load_dotenv``,
+``load_config``, API keys, plugin tools, ChromaDB) và lắng nghe trên một Unix socket
+trong ``APP_DIR``. Entry point ``termi`` chỉ import module nhẹ này: nếu có daemon đang
+chạy thì chuyển tiếp argv, cwd, môi trường, stdin và luồng output qua socket; nếu không
+thì fallback chạy in-process như trước.
+
+Giao thức: mỗi frame là một dòng JSON.
+
+- Ngay khi nhận kết nối, daemon gửi ``{"type": "ready", "app_dir", "config_path"}``, hoặc
+  ``{"type": "busy"}`` nếu đang chạy lệnh của client khác. Client không nhận được ``ready``
+  trong ``_HANDSHAKE_TIMEOUT`` thì tự chạy in-process, nên một phiên ``termi --chat`` dài không
+  chặn các lệnh khác.
+- ``APP_DIR`` và đường dẫn config được cố định lúc daemon khởi động: nếu client (theo
+  ``TERMI_CLI_HOME`` / ``config.json`` trong cwd của nó) dùng chỗ khác thì cũng chạy in-process.
+  API key thì được đọc lại từ môi trường của client ở mỗi request.
+- client -> daemon: ``{"type": "run", "argv", "cwd", "env", "stdin", "stdin_isatty", "stdout_isatty"}``,
+  sau đó là các frame ``{"type": "line", "data": str | None}`` để trả lời yêu cầu nhập liệu,
+  hoặc ``{"type": "shutdown"}`` để dừng daemon.
+- daemon -> client: ``{"type": "out" | "err", "data": str}``, ``{"type": "input"}`` khi chương
+  trình cần đọc một dòng từ bàn phím, và cuối cùng ``{"type": "exit", "code": int}``.
+
+Daemon chỉ chạy một request tại một thời điểm (cwd, ``sys.stdout``, ``os.environ`` là trạng
+thái toàn tiến trình); kết nối tới trong lúc đó được trả lời ``busy`` ngay.
+"""
+import os
+import io
+import sys
+import json
+import shutil
+import socket
+import logging
+import threading
+import socketserver
+from pathlib import Path
+
+from termi_cli.config import APP_DIR
+
+logger = logging.getLogger(__name__)
+
+# Timeout ngắn khi client thử kết nối: nếu daemon không phản hồi thì chạy in-process.
+_CONNECT_TIMEOUT = 0.5
+
+# Thời gian client chờ frame ready/busy đầu tiên trước khi bỏ qua daemon
+_HANDSHAKE_TIMEOUT = 2.0
+
+
+def get_socket_path() -> Path:
+    """Đường dẫn Unix socket của daemon (override được qua TERMI_DAEMON_SOCKET)."""
+    return Path(os.getenv("TERMI_DAEMON_SOCKET") or (APP_DIR / "termi.sock"))
+
+
+def is_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def _send_frame(sock_file, frame: dict) -> None:
+    sock_file.write((json.dumps(frame, ensure_ascii=False) + "\n").encode("utf-8"))
+    sock_file.flush()
+
+
+def _instance_info() -> dict:
+    """Trạng thái cố định lúc import mà daemon và client phải giống nhau."""
+    from termi_cli import config
+
+    return {"app_dir": str(APP_DIR), "config_path": str(config.CONFIG_PATH)}
+
+
+def _read_frame(sock_file) -> dict | None:
+    line = sock_file.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+# --- Phía daemon ---
+
+
+class _RemoteWriter(io.TextIOBase):
+    """File-like ghi output thành các frame gửi về client."""
+
+    def __init__(self, sock_file, stream: str, isatty: bool):
+        self._sock_file = sock_file
+        self._stream = stream
+        self._isatty = isatty
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return self._isatty
+
+    def write(self, data: str) -> int:
+        if data:
+            _send_frame(self._sock_file, {"type": self._stream, "data": data})
+        return len(data)
+
+    def flush(self) -> None:
+        self._sock_file.flush()
+
+
+class _RemoteReader(io.TextIOBase):
+    """File-like stdin: nội dung pipe của client, hoặc đọc từng dòng từ bàn phím client."""
+
+    def __init__(self, rfile, wfile, piped: str | None, isatty: bool):
+        self._rfile = rfile
+        self._wfile = wfile
+        self._piped = io.StringIO(piped) if piped is not None else None
+        self._isatty = isatty
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    def readable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return self._isatty
+
+    def read(self, size: int = -1) -> str:
+        if self._piped is not None:
+            return self._piped.read(size)
+        chunks = []
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            chunks.append(line)
+        return "".join(chunks)
+
+    def readline(self, size: int = -1) -> str:
+        if self._piped is not None:
+            return self._piped.readline(size)
+        _send_frame(self._wfile, {"type": "input"})
+        frame = _read_frame(self._rfile)
+        if not frame or frame.get("data") is None:
+            return ""
+        return frame["data"]
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        busy = not self.server.busy.acquire(blocking=False)
+        try:
+            self._handle(busy)
+        finally:
+            if not busy:
+                self.server.busy.release()
+
+    def _handle(self, busy: bool):
+        try:
+            _send_frame(self.wfile, {"type": "busy"} if busy else {"type": "ready", **_instance_info()})
+            frame = _read_frame(self.rfile)
+        except (ValueError, OSError):
+            return
+        if not frame:
+            return
+
+        if frame.get("type") == "shutdown":
+            _send_frame(self.wfile, {"type": "exit", "code": 0})
+            # shutdown() chờ serve_forever dừng nên phải gọi từ một thread khác
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+
+        if busy or frame.get("type") != "run":
+            _send_frame(self.wfile, {"type": "exit", "code": 2})
+            return
+
+        code = self.server.run_request(frame, self.rfile, self.wfile)
+        try:
+            _send_frame(self.wfile, {"type": "exit", "code": code})
+        except OSError:
+            pass
+
+
+class TermiDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server chạy các lệnh termi trong một tiến trình đã "ấm".
+
+    Mỗi kết nối có thread riêng để luôn trả lời được handshake, nhưng ``busy`` đảm bảo chỉ
+    một lệnh chạy tại một thời điểm.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, runner):
+        self.runner = runner
+        self.busy = threading.Lock()
+        super().__init__(socket_path, _RequestHandler)
+
+    def run_request(self, frame: dict, rfile, wfile) -> int:
+        """Chạy một lệnh termi với stdin/stdout/stderr/cwd/env của client."""
+        saved_streams = (sys.stdin, sys.stdout, sys.stderr)
+        saved_cwd = os.getcwd()
+        saved_env = dict(os.environ)
+        stdout_isatty = bool(frame.get("stdout_isatty"))
+
+        try:
+            os.environ.clear()
+            os.environ.update(frame.get("env") or saved_env)
+            os.chdir(frame.get("cwd") or saved_cwd)
+            sys.stdin = _RemoteReader(rfile, wfile, frame.get("stdin"), bool(frame.get("stdin_isatty")))
+            sys.stdout = _RemoteWriter(wfile, "out", stdout_isatty)
+            sys.stderr = _RemoteWriter(wfile, "err", stdout_isatty)
+            code = self.runner(list(frame.get("argv") or []))
+            return code if isinstance(code, int) else 0
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client đã ngắt (Ctrl-C): bỏ request này, tiếp tục phục vụ.
+            logger.info("Client ngắt kết nối giữa chừng.")
+            return 130
+        except Exception:
+            logger.exception("Lỗi khi xử lý request trong daemon")
+            return 1
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = saved_streams
+            try:
+                os.chdir(saved_cwd)
+            except OSError:
+                pass
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+
+def _is_daemon_alive(path: Path) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(_CONNECT_TIMEOUT)
+    try:
+        sock.connect(str(path))
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def warm_up() -> None:
+    """Nạp trước những phần tốn kém để các request sau không phải trả lại chi phí khởi động."""
+    from termi_cli import api, memory
+
+    keys = api.initialize_api_keys()
+    if keys:
+        api.configure_api(keys[0])
+    # Chạm vào SDK để LazyModule import thật sự, và resolve toàn bộ tools (kể cả plugin)
+    api.genai.GenerativeModel
+    list(api.AVAILABLE_TOOLS.values())
+    memory._ensure_collection()
+
+
+def serve(console, runner, warm_up=warm_up) -> None:
+    """Chạy daemon ở foreground cho tới khi nhận lệnh dừng hoặc Ctrl-C."""
+    from termi_cli import i18n
+    from termi_cli.config import load_config
+
+    language = load_config().get("language", "vi")
+    if not is_supported():
+        console.print(i18n.tr(language, "daemon_not_supported"))
+        return
+
+    path = get_socket_path()
+    if path.exists():
+        if _is_daemon_alive(path):
+            console.print(i18n.tr(language, "daemon_already_running", path=path))
+            return
+        # Socket cũ từ một daemon đã chết
+        path.unlink()
+
+    if warm_up is not None:
+        with console.status(i18n.tr(language, "daemon_warming_up"), spinner="dots"):
+            warm_up()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # bind() tạo socket theo umask: đặt 0o177 để socket là 0600 ngay từ đầu, không có khe hở
+    old_umask = os.umask(0o177)
+    try:
+        server = TermiDaemonServer(str(path), runner)
+    finally:
+        os.umask(old_umask)
+    console.print(i18n.tr(language, "daemon_listening", path=path))
+    try:
+        server.serve_forever(poll_interval=0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        console.print(i18n.tr(language, "daemon_stopped"))
+
+
+# --- Phía client ---
+
+
+def _connect(allow_busy: bool = False) -> tuple[socket.socket, object, dict] | None:
+    if not is_supported() or os.getenv("TERMI_NO_DAEMON", "").lower() in ("1", "true", "yes"):
+        return None
+    path = get_socket_path()
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(_CONNECT_TIMEOUT)
+    try:
+        sock.connect(str(path))
+        # Daemon đang bận (hoặc treo) thì không chờ: caller chạy in-process
+        sock.settimeout(_HANDSHAKE_TIMEOUT)
+        sock_file = sock.makefile("rwb")
+        hello = _read_frame(sock_file)
+    except (OSError, ValueError):
+        sock.close()
+        return None
+    if not hello or hello.get("type") not in (("ready", "busy") if allow_busy else ("ready",)):
+        sock_file.close()
+        sock.close()
+        return None
+    sock.settimeout(None)
+    return sock, sock_file, hello
+
+
+def forward(argv: list[str]) -> int | None:
+    """Chuyển tiếp một lệnh sang daemon. Trả về exit code, hoặc None nếu không có daemon rảnh."""
+    connection = _connect()
+    if connection is None:
+        return None
+    sock, sock_file, hello = connection
+    if any(hello.get(name) != value for name, value in _instance_info().items()):
+        # Daemon dùng APP_DIR / config khác của client: không thể phục vụ đúng
+        sock_file.close()
+        sock.close()
+        return None
+
+    stdin_isatty = sys.stdin.isatty() if sys.stdin else True
+    piped = None
+    if not stdin_isatty:
+        try:
+            piped = sys.stdin.read()
+        except UnicodeDecodeError:
+            piped = sys.stdin.buffer.read().decode("utf-8", errors="ignore")
+
+    env = dict(os.environ)
+    stdout_isatty = sys.stdout.isatty()
+    if stdout_isatty:
+        # Daemon không có terminal riêng: gửi kích thước terminal để rich tự xuống dòng đúng
+        size = shutil.get_terminal_size()
+        env.setdefault("COLUMNS", str(size.columns))
+        env.setdefault("LINES", str(size.lines))
+
+    frame = {
+        "type": "run",
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": env,
+        "stdin": piped,
+        "stdin_isatty": stdin_isatty,
+        "stdout_isatty": stdout_isatty,
+    }
+
+    try:
+        _send_frame(sock_file, frame)
+        while True:
+            reply = _read_frame(sock_file)
+            if reply is None:
+                # Daemon chết giữa chừng
+                return 1
+            kind = reply.get("type")
+            if kind == "out":
+                sys.stdout.write(reply["data"])
+                sys.stdout.flush()
+            elif kind == "err":
+                sys.stderr.write(reply["data"])
+                sys.stderr.flush()
+            elif kind == "input":
+                try:
+                    line = sys.stdin.readline()
+                except (EOFError, KeyboardInterrupt):
+                    line = ""
+                _send_frame(sock_file, {"type": "line", "data": line or None})
+            elif kind == "exit":
+                return int(reply.get("code") or 0)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        try:
+            sock_file.close()
+        finally:
+            sock.close()
+
+
+def stop() -> bool:
+    """Gửi lệnh dừng tới daemon đang chạy. Trả về False nếu không có daemon."""
+    # Lệnh dừng vẫn được nhận khi daemon đang chạy lệnh khác
+    connection = _connect(allow_busy=True)
+    if connection is None:
+        return False
+    sock, sock_file, _ = connection
+    try:
+        _send_frame(sock_file, {"type": "shutdown"})
+        _read_frame(sock_file)
+        return True
+    finally:
+        sock_file.close()
+        sock.close()
+
+
+def client_main() -> None:
+    """Entry point ``termi``: ưu tiên daemon đang chạy, fallback chạy in-process."""
+    argv = sys.argv[1:]
+    # --loadtest và TERMI_CASSETTE luôn chạy in-process: key giả, mock server và bản vá
+    # cassette (cài một lần cho cả tiến trình) không được lọt vào daemon
+    in_process = "--loadtest" in argv or os.getenv("TERMI_CASSETTE")
+    if "--serve" not in argv and "--stop-daemon" not in argv and not in_process:
+        code = forward(argv)
+        if code is not None:
+            sys.exit(code)
+
+    from termi_cli.__main__ import main
+
+    main()
@@ -16,10 +16,8 @@ from rich.json import JSON
 from rich.text import Text
 from rich.tree import Tree
 from rich.table import Table
-from google.api_core.exceptions import ResourceExhausted
 
-from termi_cli import api, i18n
-from termi_cli.api import RPDQuotaExhausted # Import exception tùy chỉnh
+from termi_cli import api, i18n, metrics, tracing
 from termi_cli.prompts import build_agent_instruction, build_master_agent_prompt, build_executor_instruction
 from termi_cli.config import load_config
 from .core_handler import confirm_and_write_file
@@ -112,7 +110,7 @@ def _extract_first_json_match(text: str):
 def _get_safe_agent_model(console: Console, config: dict) -> str:
     """Đảm bảo Agent luôn dùng model Gemini an toàn.
 
-    Nếu config.agent_model là DeepSeek/Groq (HTTP provider), in cảnh báo và
+    Nếu config.agent_model là DeepSeek/Groq/provider OpenAI-compatible khác (HTTP), in cảnh báo và
     fallback sang một model Gemini (ưu tiên default_model nếu có dạng Gemini).
     """
     language = config.get("language", "vi")
@@ -120,10 +118,7 @@ def _get_safe_agent_model(console: Console, config: dict) -> str:
 
     provider = "gemini"
     if isinstance(agent_model, str):
-        if agent_model.startswith("deepseek-"):
-            provider = "deepseek"
-        elif agent_model.startswith("groq-"):
-            provider = "groq"
+        provider = api._provider_of(agent_model)
 
     if provider == "gemini":
         return agent_model
@@ -179,37 +174,30 @@ def run_master_agent(console: Console, args: argparse.Namespace):
 
     initial_response = None
     
-    while True:
-        try:
-            agent_model_name = _get_safe_agent_model(console, config)
-            model = api.genai.GenerativeModel(agent_model_name)
-            
-            master_prompt = build_master_agent_prompt(args.prompt)
-            
-            response = api.resilient_generate_content(model, master_prompt)
+    try:
+        agent_model_name = _get_safe_agent_model(console, config)
+        model = api.genai.GenerativeModel(agent_model_name)
+        
+        master_prompt = build_master_agent_prompt(args.prompt)
+        
+        response = api.resilient_generate_content(model, master_prompt)
 
-            raw_text = api.get_response_text(response)
-            json_match = _extract_first_json_match(raw_text)
-            if not json_match:
-                raise ValueError("Agent không trả về JSON hợp lệ ban đầu.")
+        raw_text = api.get_response_text(response)
+        json_match = _extract_first_json_match(raw_text)
+        if not json_match:
+            raise ValueError("Agent không trả về JSON hợp lệ ban đầu.")
 
-            initial_response = json.loads(json_match.group(1))
-            break 
+        initial_response = json.loads(json_match.group(1))
 
-        except RPDQuotaExhausted:
-            # API call đã tự xử lý việc chuyển key và in thông báo.
-            # Chỉ cần lặp lại vòng lặp để thử lại với key mới.
-            continue
-        
-        except Exception as e:
-            console.print(
-                i18n.tr(
-                    language,
-                    "agent_unexpected_analysis_error",
-                    error=e,
-                )
+    except Exception as e:
+        console.print(
+            i18n.tr(
+                language,
+                "agent_unexpected_analysis_error",
+                error=e,
             )
-            return
+        )
+        return
 
     if not initial_response:
         console.print(i18n.tr(language, "agent_no_response_after_retries"))
@@ -248,7 +236,8 @@ def _execute_tool(console: Console, tool_name: str, tool_args: dict, dry_run: bo
     if tool_name == 'write_file':
 
         # Gọi tool write_file để trả về yêu cầu xác nhận, sau đó dùng helper chung để hỏi và ghi file.
-        result = tool_function(**tool_args)
+        with tracing.span(f"tool {tool_name}", tracing.TOOL), metrics.timer(metrics.TOOL_DURATION, tool=tool_name):
+            result = tool_function(**tool_args)
         if isinstance(result, str) and result.startswith("USER_CONFIRMATION_REQUIRED:WRITE_FILE:"):
             file_path_to_write = result.split(":", 2)[2]
             content_to_write = tool_args.get("content", "")
@@ -257,7 +246,7 @@ def _execute_tool(console: Console, tool_name: str, tool_args: dict, dry_run: bo
     else:
         with console.status(
             i18n.tr(language, "agent_tool_status_running", tool_name=tool_name)
-        ):
+        ), tracing.span(f"tool {tool_name}", tracing.TOOL), metrics.timer(metrics.TOOL_DURATION, tool=tool_name):
             return tool_function(**tool_args)
 
 
@@ -301,79 +290,74 @@ def execute_project_plan(console: Console, args: argparse.Namespace, project_pla
 
         dynamic_prompt = f"<scratchpad>\n{scratchpad}\n</scratchpad>\nBased on the plan and my scratchpad, what is the single next action I should take?"
         
-        while True:
-            try:
-                response = api.resilient_send_message(chat_session, dynamic_prompt)
+        try:
+            response = api.resilient_send_message(chat_session, dynamic_prompt)
 
-                raw_text = api.get_response_text(response)
-                json_match = _extract_first_json_match(raw_text)
-                if not json_match:
-                    raise ValueError("No valid JSON found.")
+            raw_text = api.get_response_text(response)
+            json_match = _extract_first_json_match(raw_text)
+            if not json_match:
+                raise ValueError("No valid JSON found.")
 
-                plan = json.loads(json_match.group(1))
-                thought = plan.get("thought", "")
-                action = plan.get("action", {})
-                
-                console.print(
-                    Panel(
-                        Markdown(thought),
-                        title=i18n.tr(language, "agent_executor_thought_title"),
-                        border_style="magenta",
-                    )
+            plan = json.loads(json_match.group(1))
+            thought = plan.get("thought", "")
+            action = plan.get("action", {})
+            
+            console.print(
+                Panel(
+                    Markdown(thought),
+                    title=i18n.tr(language, "agent_executor_thought_title"),
+                    border_style="magenta",
                 )
+            )
 
-                tool_name = action.get("tool_name", "")
-                tool_args = action.get("tool_args", {})
-
-                if tool_name == "finish":
-                    final_answer = tool_args.get(
-                        "answer",
-                        i18n.tr(language, "agent_project_finished_default"),
-                    )
-                    console.print(
-                        Panel(
-                            Markdown(final_answer),
-                            title=i18n.tr(language, "agent_project_finished_title"),
-                            border_style="green",
-                        )
-                    )
-
-                    flag = "có" if language == "vi" and dry_run else "không" if language == "vi" else ("yes" if dry_run else "no")
-                    console.print(
-                        i18n.tr(
-                            language,
-                            "agent_session_summary",
-                            steps=step + 1,
-                            flag=flag,
-                        )
-                    )
-                    return
+            tool_name = action.get("tool_name", "")
+            tool_args = action.get("tool_args", {})
 
-                observation = _execute_tool(console, tool_name, tool_args, dry_run=dry_run)
+            if tool_name == "finish":
+                final_answer = tool_args.get(
+                    "answer",
+                    i18n.tr(language, "agent_project_finished_default"),
+                )
                 console.print(
                     Panel(
-                        Markdown(str(observation)),
-                        title=i18n.tr(language, "agent_executor_result_title"),
-                        border_style="blue",
-                        expand=False,
+                        Markdown(final_answer),
+                        title=i18n.tr(language, "agent_project_finished_title"),
+                        border_style="green",
                     )
                 )
 
-                scratchpad += f"\n\n**Step {step + 1}:**\n- **Thought:** {thought}\n- **Action:** Called `{tool_name}` with args `{tool_args}`.\n- **Observation:** {observation}"
-                break
-
-            except RPDQuotaExhausted:
-                console.print(i18n.tr(language, "agent_recreate_session_quota"))
-                chat_session = api.start_chat_session(model_name=agent_model_name, system_instruction=executor_instruction)
-            except Exception as e:
+                flag = "có" if language == "vi" and dry_run else "không" if language == "vi" else ("yes" if dry_run else "no")
                 console.print(
                     i18n.tr(
                         language,
-                        "agent_executor_unrecoverable_error",
-                        error=e,
+                        "agent_session_summary",
+                        steps=step + 1,
+                        flag=flag,
                     )
                 )
                 return
+
+            observation = _execute_tool(console, tool_name, tool_args, dry_run=dry_run)
+            console.print(
+                Panel(
+                    Markdown(str(observation)),
+                    title=i18n.tr(language, "agent_executor_result_title"),
+                    border_style="blue",
+                    expand=False,
+                )
+            )
+
+            scratchpad += f"\n\n**Step {step + 1}:**\n- **Thought:** {thought}\n- **Action:** Called `{tool_name}` with args `{tool_args}`.\n- **Observation:** {observation}"
+
+        except Exception as e:
+            console.print(
+                i18n.tr(
+                    language,
+                    "agent_executor_unrecoverable_error",
+                    error=e,
+                )
+            )
+            return
     else:
         console.print(i18n.tr(language, "agent_max_steps_reached", max_steps=max_steps))
 
@@ -415,30 +399,25 @@ def execute_simple_task(console: Console, args: argparse.Namespace, first_step:
             action = current_step_json.get("action", {})
         # Các bước tiếp theo sẽ được lấy từ API call
         else:
-            while True:
-                try:
-                    response = api.resilient_send_message(chat_session, next_prompt)
-                    raw_text = api.get_response_text(response)
-                    json_match = _extract_first_json_match(raw_text)
-                    if not json_match:
-                        raise ValueError("No valid JSON found.")
-
-                    current_step_json = json.loads(json_match.group(1))
-                    thought = current_step_json.get("thought", "")
-                    action = current_step_json.get("action", {})
-                    break
-                except RPDQuotaExhausted:
-                    console.print(i18n.tr(language, "agent_recreate_session_quota"))
-                    chat_session = api.start_chat_session(model_name=agent_model_name, system_instruction=agent_instruction)
-                except Exception as e:
-                    console.print(
-                        i18n.tr(
-                            language,
-                            "agent_executor_unrecoverable_error",
-                            error=e,
-                        )
+            try:
+                response = api.resilient_send_message(chat_session, next_prompt)
+                raw_text = api.get_response_text(response)
+                json_match = _extract_first_json_match(raw_text)
+                if not json_match:
+                    raise ValueError("No valid JSON found.")
+
+                current_step_json = json.loads(json_match.group(1))
+                thought = current_step_json.get("thought", "")
+                action = current_step_json.get("action", {})
+            except Exception as e:
+                console.print(
+                    i18n.tr(
+                        language,
+                        "agent_executor_unrecoverable_error",
+                        error=e,
                     )
-                    return
+                )
+                return
 
         try:
             console.print(
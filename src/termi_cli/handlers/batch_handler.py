@@ -0,0 +1,204 @@
+"""
+Module xử lý chế độ batch: ``termi --batch prompts.jsonl``.
+
+Mỗi dòng của file input là một record JSON::
+
+    {"id": "ticket-42", "prompt": "Tóm tắt ticket...", "model": "groq-chat", "system_instruction": "..."}
+
+Chỉ ``prompt`` là bắt buộc; ``id`` mặc định là số dòng, ``model`` / ``system_instruction``
+mặc định lấy theo tham số dòng lệnh và config. Các record chạy song song (có giới hạn) qua
+``api.generate_completion``, nên được hưởng key pool, rate limiter, router model và response
+cache như mọi lệnh khác. Kết quả được ghi nối tiếp (JSONL, theo thứ tự hoàn thành) kèm độ trễ,
+token usage và số lần retry. Chạy lại cùng lệnh sẽ bỏ qua các record đã thành công trong file output.
+"""
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from rich.console import Console
+
+from termi_cli import api, i18n, key_pool
+from termi_cli.config import load_config
+from .core_handler import build_system_instruction
+
+logger = logging.getLogger(__name__)
+
+# Giới hạn trên của số request song song mặc định
+MAX_DEFAULT_CONCURRENCY = 16
+
+
+def default_output_path(input_path: str) -> Path:
+    path = Path(input_path)
+    return path.with_name(f"{path.stem}.out.jsonl")
+
+
+def read_records(input_path: str) -> tuple[list[dict], list[dict]]:
+    """Đọc file JSONL; trả về ``(records, lỗi)`` — dòng hỏng được báo lỗi thay vì dừng cả batch."""
+    records, errors = [], []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                errors.append({"id": line_no, "error": f"invalid JSON: {e}"})
+                continue
+            if not isinstance(record, dict) or not isinstance(record.get("prompt"), str) or not record["prompt"].strip():
+                errors.append({"id": line_no, "error": "missing 'prompt'"})
+                continue
+            record.setdefault("id", line_no)
+            records.append(record)
+    return records, errors
+
+
+def completed_ids(output_path: Path) -> set:
+    """Các id đã chạy thành công trong file output cũ (dòng bị ghi dở khi crash được bỏ qua)."""
+    done = set()
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(result, dict) and "error" not in result:
+                    done.add(_id_key(result.get("id")))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _id_key(record_id) -> str:
+    # "7" trong output và 7 trong input là cùng một record
+    return str(record_id)
+
+
+def default_concurrency(models) -> int:
+    """Mặc định chạy song song gấp đôi số key của các provider được dùng (tối thiểu 2)."""
+    providers = {api._provider_of(model) for model in models}
+    if "deepseek" in providers:
+        api.initialize_deepseek_api_keys()
+    if "groq" in providers:
+        api.initialize_groq_api_keys()
+    for provider in providers - {"gemini", "deepseek", "groq"}:
+        api.initialize_provider_keys(provider)
+    total_keys = sum(len(key_pool.get_pool(provider)) for provider in providers)
+    if "gemini" in providers:
+        total_keys = max(total_keys, len(api._api_keys))
+    return max(2, min(MAX_DEFAULT_CONCURRENCY, 2 * total_keys))
+
+
+def run_record(record: dict, model_name: str, system_instruction: str | None) -> dict:
+    """Chạy một record; lỗi được ghi vào kết quả thay vì ném ra."""
+    model = record.get("model") or model_name
+    started = time.monotonic()
+    result = {"id": record["id"], "model": model}
+    try:
+        completion = api.generate_completion(
+            model,
+            record["prompt"],
+            record.get("system_instruction", system_instruction),
+        )
+    except Exception as e:
+        logger.warning("Batch record %s lỗi: %s", record["id"], e)
+        result["error"] = str(e) or type(e).__name__
+    else:
+        result.update({
+            "model": completion["model"],
+            "text": completion["text"],
+            "usage": completion["usage"],
+            "cached": completion["cached"],
+            "retries": completion.get("retries", 0),
+        })
+    result["latency_ms"] = int((time.monotonic() - started) * 1000)
+    return result
+
+
+def _ensure_trailing_newline(path: Path) -> None:
+    """File output bị cắt giữa dòng khi crash: thêm xuống dòng để dòng mới không dính vào."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, 2)
+            if f.tell() == 0:
+                return
+            f.seek(-1, 2)
+            last = f.read(1)
+    except FileNotFoundError:
+        return
+    if last != b"\n":
+        with open(path, "ab") as f:
+            f.write(b"\n")
+
+
+def run_batch(console: Console, args: argparse.Namespace):
+    """Chạy ``--batch``: đọc input, bỏ qua record đã xong, ghi kết quả theo thứ tự hoàn thành."""
+    config = load_config()
+    language = config.get("language", "vi")
+    input_path = args.batch
+    output_path = Path(args.output) if args.output else default_output_path(input_path)
+
+    try:
+        records, errors = read_records(input_path)
+    except OSError as e:
+        console.print(i18n.tr(language, "batch_input_error", path=input_path, error=e))
+        return
+
+    model_name = args.model or config.get("default_model")
+    system_instruction = build_system_instruction(config, args) or None
+    done = completed_ids(output_path)
+    pending = [record for record in records if _id_key(record["id"]) not in done]
+    concurrency = getattr(args, "batch_concurrency", None) or (config.get("batch") or {}).get("concurrency")
+    concurrency = int(concurrency or default_concurrency({r.get("model") or model_name for r in pending} or {model_name}))
+
+    console.print(i18n.tr(
+        language, "batch_started",
+        total=len(records), skipped=len(records) - len(pending), concurrency=concurrency, output=output_path,
+    ))
+
+    succeeded = failed = 0
+    started = time.monotonic()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    _ensure_trailing_newline(output_path)
+    with open(output_path, "a", encoding="utf-8") as out, \
+            console.status(i18n.tr(language, "batch_progress", done=0, total=len(pending))) as status:
+
+        def _write(result: dict) -> None:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            # Ghi ngay từng dòng để chạy lại sau crash không mất kết quả đã có
+            out.flush()
+
+        for error in errors:
+            _write(error)
+            failed += 1
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="termi-batch") as executor:
+            remaining = iter(pending)
+            in_flight = set()
+            while True:
+                # Chỉ giữ tối đa ``concurrency`` record đang chạy, không nạp cả file vào executor
+                while len(in_flight) < concurrency:
+                    record = next(remaining, None)
+                    if record is None:
+                        break
+                    in_flight.add(executor.submit(run_record, record, model_name, system_instruction))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    _write(result)
+                    if "error" in result:
+                        failed += 1
+                    else:
+                        succeeded += 1
+                status.update(i18n.tr(language, "batch_progress", done=succeeded + failed - len(errors), total=len(pending)))
+
+    console.print(i18n.tr(
+        language, "batch_finished",
+        succeeded=succeeded, failed=failed, elapsed=time.monotonic() - started, output=output_path,
+    ))
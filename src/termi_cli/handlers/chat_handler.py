@@ -14,7 +14,7 @@ from rich.console import Console
 
 from termi_cli import utils, api, i18n
 
-from .core_handler import handle_conversation_turn, get_response_text_from_history
+from .core_handler import handle_conversation_turn, get_response_text_from_history, render_text_stream
 from .history_handler import serialize_history, HISTORY_DIR
 
 def run_chat_mode(chat_session, console: Console, config: dict, args: argparse.Namespace):
@@ -170,13 +170,13 @@ def run_chat_mode_deepseek(console: Console, config: dict, args: argparse.Namesp
             )
 
             try:
-                response_text = api.generate_text(
-                    model_name,
-                    composite_prompt,
-                    system_instruction=system_instruction,
+                response_text = render_text_stream(
+                    console,
+                    api.stream_text(model_name, composite_prompt, system_instruction=system_instruction),
+                    args.format,
                 )
-            except (api.DeepseekInsufficientBalance, api.GroqInsufficientBalance) as e:
-                provider = "DeepSeek" if isinstance(e, api.DeepseekInsufficientBalance) else "Groq"
+            except api.ProviderInsufficientBalance as e:
+                provider = e.label
                 console.print(
                     f"[bold red]{provider} báo lỗi Insufficient Balance. Không thể tiếp tục dùng {provider} cho phiên chat này.[/bold red]"
                 )
@@ -207,7 +207,6 @@ def run_chat_mode_deepseek(console: Console, config: dict, args: argparse.Namesp
                 continue
 
             dialogue.append(("assistant", response_text))
-            console.print(response_text)
 
             # Vẫn cho phép AI đề xuất lệnh shell nếu có
             utils.execute_suggested_commands(response_text, console)
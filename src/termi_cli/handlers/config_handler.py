@@ -6,7 +6,7 @@ bao gồm quản lý persona, custom instructions và lựa chọn model.
 from rich.console import Console
 from rich.table import Table
 
-from termi_cli import api, i18n
+from termi_cli import api, circuit_breaker, hedging, i18n, providers
 from termi_cli.config import save_config
 
 
@@ -64,12 +64,11 @@ def model_selection_wizard(console: Console, config: dict):
         if not isinstance(model_name, str):
             console.print(i18n.tr(language, "config_model_provider_hint_gemini"))
             return
-        if model_name.startswith("deepseek-"):
-            console.print(i18n.tr(language, "config_model_provider_hint_deepseek"))
-        elif model_name.startswith("groq-"):
-            console.print(i18n.tr(language, "config_model_provider_hint_groq"))
+        provider = api._provider_of(model_name)
+        if provider in ("gemini", "deepseek", "groq"):
+            console.print(i18n.tr(language, f"config_model_provider_hint_{provider}"))
         else:
-            console.print(i18n.tr(language, "config_model_provider_hint_gemini"))
+            console.print(i18n.tr(language, "config_model_provider_hint_custom", provider=providers.get(provider).label))
 
     # Bước 1: chọn default_model
     default_index = _select_index("config_select_model_prompt")
@@ -329,11 +328,8 @@ def show_diagnostics(console: Console, config: dict):
     def _provider_name(model_name: str) -> str:
         if not isinstance(model_name, str):
             return "Gemini"
-        if model_name.startswith("deepseek-"):
-            return "DeepSeek"
-        if model_name.startswith("groq-"):
-            return "Groq"
-        return "Gemini"
+        spec = providers.resolve(model_name)
+        return spec.label if spec is not None else "Gemini"
 
     def _provider_label(model_name: str) -> str:
         name = _provider_name(model_name)
@@ -410,8 +406,33 @@ def show_diagnostics(console: Console, config: dict):
         # Không để lỗi diagnostics API key làm vỡ lệnh
         pass
 
+    # Thống kê hedging (chỉ hiện khi đã từng chạy)
+    hedge_stats = hedging.read_stats()
+    if hedge_stats.get("requests"):
+        console.print(
+            i18n.tr(
+                language,
+                "diagnostics_hedging_stats",
+                requests=hedge_stats.get("requests", 0),
+                hedged=hedge_stats.get("hedged", 0),
+                rate=hedge_stats.get("hedged", 0) / hedge_stats["requests"],
+                primary_wins=hedge_stats.get("primary_wins", 0),
+                secondary_wins=hedge_stats.get("secondary_wins", 0),
+            )
+        )
+
+    # Trạng thái circuit breaker của các endpoint HTTP (chỉ hiện khi đã từng ghi nhận)
+    for breaker in circuit_breaker.status():
+        console.print(
+            i18n.tr(
+                language,
+                f"diagnostics_breaker_{breaker['state']}",
+                name=breaker["name"],
+                failures=breaker["failures"],
+                retry_in=breaker["retry_in"],
+            )
+        )
+
     # Giải thích rõ hành vi fallback của Agent khi dùng DeepSeek/Groq
-    if isinstance(agent_model, str) and (
-        agent_model.startswith("deepseek-") or agent_model.startswith("groq-")
-    ):
+    if isinstance(agent_model, str) and api._provider_of(agent_model) != "gemini":
         console.print(i18n.tr(language, "diagnostics_agent_fallback_note"))
\ No newline at end of file
@@ -8,16 +8,17 @@ bao gồm gọi tool, xử lý lỗi quota, và retry cho chế độ chat thôn
 import os
 import json
 import re
+import time
 import argparse
 from collections import namedtuple
 import logging
 
 from rich.console import Console
+from rich.live import Live
 from rich.markdown import Markdown
 from rich.panel import Panel
-from google.api_core.exceptions import ResourceExhausted, PermissionDenied, InvalidArgument
 
-from termi_cli import api, i18n
+from termi_cli import api, i18n, metrics, model_router, tracing
 from termi_cli.config import load_config
 
 
@@ -86,6 +87,29 @@ def accumulate_response_stream(response_stream):
     return full_text, function_calls
 
 
+def render_text_stream(console: Console, text_stream, output_format: str = "rich") -> str:
+    """Hiển thị dần các đoạn text từ một stream (DeepSeek/Groq SSE) và trả về toàn bộ text.
+
+    Với format ``rich``, Markdown được render lại liên tục trong một vùng ``Live``;
+    các format khác in thẳng từng đoạn ra console.
+    """
+    parts: list[str] = []
+    # Span gồm cả thời gian chờ các đoạn tiếp theo từ mạng (span provider "stream" nằm song song)
+    with tracing.span("render_stream", tracing.RENDER, format=output_format):
+        if output_format == "rich":
+            with Live(Markdown(""), console=console, refresh_per_second=12, vertical_overflow="visible") as live:
+                for delta in text_stream:
+                    parts.append(delta)
+                    live.update(Markdown("".join(parts)))
+        else:
+            for delta in text_stream:
+                parts.append(delta)
+                console.print(delta, end="", markup=False, highlight=False)
+            if parts:
+                console.print()
+    return "".join(parts)
+
+
 def build_system_instruction(config, args):
     """Xây dựng system instruction dựa trên config và tham số dòng lệnh."""
     saved_instructions = config.get("saved_instructions", [])
@@ -115,7 +139,8 @@ def confirm_and_write_file(console: Console, file_path_to_write: str, content_to
     console.print(
         i18n.tr(language, "write_file_confirmation", path=file_path_to_write)
     )
-    choice = console.input("Bạn có đồng ý không? [y/n]: ", markup=False).lower()
+    with tracing.span("confirm_write_file", tracing.USER, path=file_path_to_write):
+        choice = console.input("Bạn có đồng ý không? [y/n]: ", markup=False).lower()
 
     if choice == "y":
         try:
@@ -132,9 +157,16 @@ def confirm_and_write_file(console: Console, file_path_to_write: str, content_to
         return i18n.tr(language, "write_file_denied")
 
 
-def _send_and_accumulate(chat_session, message, total_tokens):
-    """Gửi message tới chat_session, đọc stream và cộng dồn token usage."""
+def _send_and_accumulate(chat_session, message, total_tokens, timings=None):
+    """Gửi message tới chat_session, đọc stream và cộng dồn token usage.
+
+    ``timings["ttft"]``: số giây tới chunk đầu tiên (SDK trả về stream sau chunk đầu), không
+    phụ thuộc độ dài câu trả lời nên dùng được để so độ nhanh giữa các model.
+    """
+    started = time.monotonic()
     response_stream = api.send_message(chat_session, message)
+    if timings is not None:
+        timings["ttft"] = time.monotonic() - started
     text_chunk, function_calls = accumulate_response_stream(response_stream)
 
     try:
@@ -166,7 +198,8 @@ def _execute_single_tool_call(func_call, status, console: Console, tool_calls_lo
     if tool_name in api.AVAILABLE_TOOLS:
         try:
             tool_function = api.AVAILABLE_TOOLS[tool_name]
-            result = tool_function(**tool_args)
+            with tracing.span(f"tool {tool_name}", tracing.TOOL), metrics.timer(metrics.TOOL_DURATION, tool=tool_name):
+                result = tool_function(**tool_args)
         except Exception as e:
             logger.exception("Error executing tool '%s'", tool_name)
             result = f"Error executing tool '{tool_name}': {str(e)}"
@@ -199,10 +232,52 @@ def _execute_single_tool_call(func_call, status, console: Console, tool_calls_lo
     }
 
 
+def _is_gemini_model(model_name: str) -> bool:
+    # Chat session dùng tool-calling của Gemini nên chỉ fallback sang model Gemini
+    return api._provider_of(model_name) == "gemini"
+
+
+def _session_model_name(chat_session):
+    return getattr(getattr(chat_session, "model", None), "model_name", None)
+
+
+def _switch_session_model(chat_session, model_name: str, args):
+    """Chuyển chat session sang ``model_name``, giữ nguyên lịch sử.
+
+    Nếu được, model mới được gắn thẳng vào session hiện tại để caller (vòng chat) tiếp tục
+    dùng đúng session đó ở các lượt sau; ngược lại trả về session mới.
+    """
+    replacement = api.start_chat_session(model_name, *get_session_recreation_args(chat_session, args))
+    try:
+        chat_session.model = replacement.model
+    except AttributeError:
+        return replacement
+    return chat_session
+
+
 def handle_conversation_turn(chat_session, prompt_parts, console: Console, model_name: str = None, args: argparse.Namespace = None):
     """
     Xử lý một lượt hội thoại với logic retry mạnh mẽ cho chế độ chat.
+
+    Khi mọi key đều hết quota (hoặc model lỗi tạm thời), lượt chat được chuyển sang model
+    kế tiếp trong ``model_fallback_order``; model đang degraded bị bỏ qua ngay từ đầu (model
+    chậm chỉ bị bỏ qua khi bật ``router.reroute_slow``).
     """
+    from google.api_core.exceptions import ResourceExhausted
+
+    language = load_config().get("language", "vi")
+    router = model_router.get_router()
+    tried_models = []
+    if model_name:
+        preferred = router.choose(model_name, accept=_is_gemini_model)
+        current = _session_model_name(chat_session)
+        if preferred != model_name:
+            tried_models.append(model_name)
+        if preferred != (current or model_name):
+            console.print(i18n.tr(language, "router_skip_degraded", model=model_name, fallback=preferred))
+            chat_session = _switch_session_model(chat_session, preferred, args)
+        model_name = preferred
+
     max_attempts = len(api._api_keys)
     attempt_count = 0
 
@@ -213,11 +288,15 @@ def handle_conversation_turn(chat_session, prompt_parts, console: Console, model
             total_tokens = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
             tool_calls_log = []
             
-            with console.status("[bold green]AI đang suy nghĩ...[/bold green]", spinner="dots") as status:
+            with tracing.span("chat_turn", tracing.TURN, model=model_name, attempt=attempt_count + 1), \
+                    console.status("[bold green]AI đang suy nghĩ...[/bold green]", spinner="dots") as status:
                 # Gọi hàm send_message gốc (có stream)
+                timings = {}
                 text_chunk, function_calls = _send_and_accumulate(
-                    chat_session, prompt_parts, total_tokens
+                    chat_session, prompt_parts, total_tokens, timings=timings
                 )
+                if model_name and "ttft" in timings:
+                    router.record_success(model_name, timings["ttft"])
 
                 if text_chunk:
                     final_text_response += text_chunk
@@ -246,17 +325,31 @@ def handle_conversation_turn(chat_session, prompt_parts, console: Console, model
             output_format = args.format if args else 'rich'
             display_text = final_text_response.strip()
 
-            if output_format == 'rich':
-                console.print(Markdown(display_text))
-            else:
-                console.print(display_text)
+            with tracing.span("render_markdown", tracing.RENDER, format=output_format):
+                if output_format == 'rich':
+                    console.print(Markdown(display_text))
+                else:
+                    console.print(display_text)
 
             token_limit = api.get_model_token_limit(model_name)
+            if total_tokens['total_tokens']:
+                metrics.observe(
+                    metrics.TOKENS_PER_CALL,
+                    total_tokens['total_tokens'],
+                    model=model_name or _session_model_name(chat_session),
+                )
             
             return final_text_response.strip(), total_tokens, token_limit, tool_calls_log
         
         except ResourceExhausted as e:
             attempt_count += 1
+            if attempt_count >= max_attempts and model_name:
+                fallback = _fall_back_to_next_model(router, model_name, tried_models, model_router.EXHAUSTED, console, language)
+                if fallback:
+                    chat_session = _switch_session_model(chat_session, fallback, args)
+                    model_name, attempt_count = fallback, 0
+                    continue
+                break
             console.print(
                 f"\n[yellow]⚠️ Gặp lỗi Quota. Đang thử chuyển sang key tiếp theo... ({attempt_count}/{max_attempts})[/yellow]"
             )
@@ -270,10 +363,27 @@ def handle_conversation_turn(chat_session, prompt_parts, console: Console, model
                 *get_session_recreation_args(chat_session, args),
             )
             continue
-        except Exception:
+        except Exception as e:
+            reason = api.fallback_reason(e)
+            if reason is not None and model_name:
+                fallback = _fall_back_to_next_model(router, model_name, tried_models, reason, console, language)
+                if fallback:
+                    chat_session = _switch_session_model(chat_session, fallback, args)
+                    model_name, attempt_count = fallback, 0
+                    continue
             logger.exception(
                 "Đã xảy ra lỗi không mong muốn trong handle_conversation_turn."
             )
             raise
 
-    return "", {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}, 0, []
\ No newline at end of file
+    return "", {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}, 0, []
+
+def _fall_back_to_next_model(router, model_name: str, tried_models: list, reason: str, console: Console, language: str):
+    """Ghi lỗi cho ``model_name`` và chọn model kế tiếp trong ``model_fallback_order`` (None nếu hết)."""
+    router.record_failure(model_name, reason)
+    tried_models.append(model_name)
+    fallback = router.next_model(model_name, tried=tried_models, accept=_is_gemini_model)
+    if fallback:
+        tracing.instant("model_fallback", tracing.TURN, model=model_name, fallback=fallback, reason=reason)
+        console.print(i18n.tr(language, "router_model_fallback", model=model_name, fallback=fallback))
+    return fallback
@@ -0,0 +1,249 @@
+"""
+Module xử lý ``termi --loadtest groq``: đo tải tầng provider bằng mock server đi kèm.
+
+Lệnh dựng ``mock_server.MockServer`` cục bộ (cấu hình theo mục ``mock_server`` trong
+``config.json``), trỏ ``TERMI_<PROVIDER>_BASE_URL`` vào đó cùng các API key giả, rồi chạy
+N session song song, mỗi session gồm nhiều lượt hội thoại (lịch sử dài dần) gọi thẳng
+``api._resilient_<provider>_api_call``. Nhờ vậy key pool, rate limiter, circuit breaker và
+đường đọc SSE được đo đúng như khi chạy thật. Báo cáo gồm thông lượng, p50/p95/p99 độ trễ
+(và time-to-first-token khi ``--loadtest-stream``), số lần retry, lỗi theo loại và phân bố
+request / 429 / cooldown trên từng key.
+
+Trạng thái key/breaker không được ghi vào quota store dùng chung và metrics của lần đo không
+lẫn vào ``--stats``.
+"""
+import os
+import time
+import logging
+import argparse
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from rich.console import Console
+from rich.table import Table
+
+from termi_cli import api, i18n, key_pool, metrics, mock_server, providers
+from termi_cli.config import load_config
+from termi_cli.rate_limit import key_fingerprint
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("deepseek", "groq")
+
+DEFAULT_MODELS = {
+    "deepseek": "deepseek-chat",
+    "groq": "llama-3.1-8b-instant",
+}
+
+_KEY_PREFIXES = {
+    "deepseek": "DEEPSEEK_API_KEY",
+    "groq": "GROQ_API_KEY",
+}
+
+
+def _initialize_keys(provider: str) -> None:
+    if provider == "deepseek":
+        api.initialize_deepseek_api_keys()
+    else:
+        api.initialize_groq_api_keys()
+
+
+@contextmanager
+def pointed_at(provider: str, base_url: str, keys: list[str]):
+    """Tạm trỏ provider vào ``base_url`` với các key giả; khôi phục môi trường và key pool sau đó."""
+    prefix = _KEY_PREFIXES[provider]
+    overrides = {f"TERMI_{provider.upper()}_BASE_URL": base_url}
+    # Xoá các key thật dư ra để pool chỉ gồm key giả
+    count = max(len(keys), len(api._load_env_keys(prefix)))
+    names = [api.key_env_name(prefix, number) for number in range(1, count + 1)]
+    overrides.update({name: keys[i] if i < len(keys) else None for i, name in enumerate(names)})
+    saved = {name: os.environ.get(name) for name in overrides}
+    try:
+        for name, value in overrides.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        _initialize_keys(provider)
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        _initialize_keys(provider)
+
+
+def _run_session(call, model_name: str, turns: int, stream: bool, session_id: int) -> list[dict]:
+    """Một session hội thoại: mỗi lượt gửi lại toàn bộ lịch sử như chat thật."""
+    messages = [{"role": "system", "content": f"You are load-test session #{session_id}. Reply briefly."}]
+    results = []
+    for turn in range(1, turns + 1):
+        messages.append({"role": "user", "content": f"Turn {turn}: summarize the previous answer in one sentence."})
+        started = time.perf_counter()
+        ttft_ms = None
+        try:
+            if stream:
+                parts = []
+                for delta in call(model_name, messages, stream=True):
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    parts.append(delta)
+                reply = "".join(parts)
+            else:
+                reply = call(model_name, messages)["choices"][0]["message"]["content"]
+        except Exception as e:
+            logger.debug("Load test session %d turn %d lỗi: %s", session_id, turn, e)
+            messages.pop()
+            results.append({"ok": False, "error": type(e).__name__, "latency_ms": (time.perf_counter() - started) * 1000})
+            continue
+        messages.append({"role": "assistant", "content": reply})
+        results.append({"ok": True, "latency_ms": (time.perf_counter() - started) * 1000, "ttft_ms": ttft_ms})
+    return results
+
+
+def _percentiles(values: list) -> dict:
+    values = sorted(values)
+    return {
+        "p50": metrics.percentile(values, 50),
+        "p95": metrics.percentile(values, 95),
+        "p99": metrics.percentile(values, 99),
+        "max": float(values[-1]) if values else 0.0,
+    }
+
+
+def run_load_test(provider: str, sessions: int = 8, turns: int = 5, keys: int = 3, stream: bool = False,
+                  server_config: dict | None = None, model_name: str | None = None) -> dict:
+    """Chạy load test với mock server cục bộ và trả về báo cáo (dict)."""
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unsupported provider for load test: {provider!r}")
+    call = api._resilient_deepseek_api_call if provider == "deepseek" else api._resilient_groq_api_call
+    model_name = model_name or DEFAULT_MODELS[provider]
+    fake_keys = [f"mock-{provider}-key-{i}" for i in range(1, max(1, keys) + 1)]
+
+    registry = metrics.MetricsRegistry(None)
+    previous_registry = metrics.set_registry(registry)
+    quiet = api._console.quiet
+    # Cảnh báo đổi key / rate limit của từng request sẽ làm ngập màn hình
+    api._console.quiet = True
+    try:
+        with mock_server.MockServer(server_config, flavor=provider) as server, \
+                pointed_at(provider, server.base_url, fake_keys):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, sessions), thread_name_prefix="termi-loadtest") as executor:
+                futures = [executor.submit(_run_session, call, model_name, turns, stream, i) for i in range(1, sessions + 1)]
+                results = [result for future in futures for result in future.result()]
+            duration = time.perf_counter() - started
+            served = server.stats()
+            pool_status = key_pool.get_pool(provider).status()
+    finally:
+        api._console.quiet = quiet
+        metrics.set_registry(previous_registry)
+
+    errors = Counter(result["error"] for result in results if not result["ok"])
+    succeeded = [result for result in results if result["ok"]]
+    # Lượt bị breaker chặn không gửi request nào; mọi request dư ra là retry / đổi key
+    reached_server = len(results) - errors.get("CircuitOpenError", 0)
+    throttle_waits = sum(row["count"] for row in registry.snapshot() if row["metric"] == metrics.THROTTLE_WAIT)
+
+    key_rows = []
+    for status in pool_status:
+        counts = served["keys"].get(key_fingerprint(fake_keys[status["index"] - 1]), {})
+        key_rows.append({
+            "index": status["index"],
+            "requests": counts.get("received", 0),
+            "rate_limited": counts.get("rate_limited", 0),
+            "cooldown_s": status["cooldown_s"],
+        })
+
+    return {
+        "provider": provider,
+        "model": model_name,
+        "sessions": sessions,
+        "turns": turns,
+        "stream": stream,
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "errors": dict(errors),
+        "duration_s": duration,
+        "throughput_rps": len(succeeded) / duration if duration else 0.0,
+        "tokens_per_s": served["completion_tokens"] / duration if duration else 0.0,
+        "latency_ms": _percentiles([result["latency_ms"] for result in succeeded]),
+        "ttft_ms": _percentiles([result["ttft_ms"] for result in succeeded if result["ttft_ms"] is not None]) if stream else None,
+        "http_requests": served["requests"],
+        "retries": max(0, served["requests"] - reached_server),
+        "rate_limited": served["rate_limited"],
+        "insufficient": served["insufficient"],
+        "dropped": served["dropped"] + served["stream_dropped"],
+        "throttle_waits": throttle_waits,
+        "keys": key_rows,
+    }
+
+
+def _format_percentiles(values: dict | None) -> str:
+    if not values:
+        return "-"
+    return " / ".join(f"{values[q]:.0f}" for q in ("p50", "p95", "p99", "max"))
+
+
+def print_report(console: Console, report: dict, language: str = "vi") -> None:
+    table = Table(title=i18n.tr(
+        language, "loadtest_title",
+        provider=report["provider"], model=report["model"], sessions=report["sessions"], turns=report["turns"],
+    ))
+    table.add_column(i18n.tr(language, "loadtest_col_metric"), style="cyan")
+    table.add_column(i18n.tr(language, "loadtest_col_value"), style="green", justify="right")
+    errors = ", ".join(f"{name}={count}" for name, count in sorted(report["errors"].items())) or "-"
+    rows = [
+        ("loadtest_row_requests", f"{report['succeeded']}/{report['requests']}"),
+        ("loadtest_row_duration", f"{report['duration_s']:.2f}s"),
+        ("loadtest_row_throughput", f"{report['throughput_rps']:.2f} req/s"),
+        ("loadtest_row_tokens", f"{report['tokens_per_s']:.0f} tok/s"),
+        ("loadtest_row_latency", _format_percentiles(report["latency_ms"])),
+        ("loadtest_row_ttft", _format_percentiles(report["ttft_ms"])),
+        ("loadtest_row_http", str(report["http_requests"])),
+        ("loadtest_row_retries", str(report["retries"])),
+        ("loadtest_row_rate_limited", str(report["rate_limited"])),
+        ("loadtest_row_throttled", str(report["throttle_waits"])),
+        ("loadtest_row_dropped", str(report["dropped"])),
+        ("loadtest_row_errors", errors),
+    ]
+    for key, value in rows:
+        table.add_row(i18n.tr(language, key), value)
+    console.print(table)
+
+    keys_table = Table(title=i18n.tr(language, "loadtest_keys_title"))
+    keys_table.add_column("#", justify="right")
+    keys_table.add_column(i18n.tr(language, "loadtest_col_requests"), justify="right")
+    keys_table.add_column("429", justify="right", style="yellow")
+    keys_table.add_column(i18n.tr(language, "loadtest_col_cooldown"), justify="right")
+    for row in report["keys"]:
+        keys_table.add_row(str(row["index"]), str(row["requests"]), str(row["rate_limited"]), f"{row['cooldown_s']:.1f}s")
+    console.print(keys_table)
+
+
+def run_loadtest(console: Console, args: argparse.Namespace):
+    """Chạy ``--loadtest PROVIDER`` và in báo cáo."""
+    config = load_config()
+    language = config.get("language", "vi")
+    # Key giả không được để lại cooldown/breaker trong quota store dùng chung
+    os.environ.setdefault("TERMI_NO_QUOTA_STORE", "1")
+
+    sessions = args.loadtest_sessions or 8
+    turns = args.loadtest_turns or 5
+    keys = args.loadtest_keys or 3
+    stream = bool(getattr(args, "loadtest_stream", False))
+    # Dùng --model nếu nó thuộc đúng provider đang đo, ngược lại model mặc định của provider
+    model_name = args.model if args.model and api._provider_of(args.model) == args.loadtest else None
+    if model_name:
+        model_name = providers.get(args.loadtest).model_id(model_name)
+
+    console.print(i18n.tr(language, "loadtest_started", provider=args.loadtest, sessions=sessions, turns=turns, keys=keys))
+    with console.status(i18n.tr(language, "loadtest_running")):
+        report = run_load_test(
+            args.loadtest, sessions=sessions, turns=turns, keys=keys, stream=stream,
+            server_config=mock_server.get_mock_server_config(), model_name=model_name,
+        )
+    print_report(console, report, language)
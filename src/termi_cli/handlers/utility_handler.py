@@ -7,8 +7,9 @@ import argparse
 import subprocess
 from rich.console import Console
 from rich.markdown import Markdown
+from rich.table import Table
 
-from termi_cli import api, utils, i18n
+from termi_cli import api, utils, i18n, metrics, response_cache, semantic_cache
 from termi_cli.config import load_config
 from termi_cli.tools import code_tool
 
@@ -78,9 +79,9 @@ def generate_git_commit_message(console: Console, args: argparse.Namespace, shor
                 prompt_text,
                 system_instruction=git_commit_system_instruction,
             ).strip()
-        except (api.DeepseekInsufficientBalance, api.GroqInsufficientBalance):
+        except api.ProviderInsufficientBalance as e:
             fallback_model = config.get("default_model")
-            provider_label = "DeepSeek/Groq"
+            provider_label = e.label
             console.print(
                 f"[bold red]{provider_label} báo lỗi Insufficient Balance. Không thể dùng {provider_label} để sinh commit lần này.[/bold red]"
             )
@@ -163,4 +164,71 @@ def _handle_code_utility(console: Console, file_path: str, tool_func, tool_name:
             console.print(i18n.tr(language, "code_error_saving_file", error=e))
     else:
         console.print(i18n.tr(language, "code_result_title", tool_name=tool_name))
-        console.print(Markdown(result))
\ No newline at end of file
+        console.print(Markdown(result))
+
+def show_cache_stats(console: Console):
+    """In thống kê response cache của generate_text."""
+    language = load_config().get("language", "vi")
+    config = response_cache.get_cache_config()
+    stats = response_cache.get_stats()
+
+    table = Table(title=i18n.tr(language, "cache_stats_title"))
+    table.add_column(i18n.tr(language, "cache_stats_metric"), style="cyan")
+    table.add_column(i18n.tr(language, "cache_stats_value"), style="green", justify="right")
+    table.add_row(i18n.tr(language, "cache_stats_enabled"), str(bool(config.get("enabled"))))
+    table.add_row(i18n.tr(language, "cache_stats_entries"), str(stats["entries"]))
+    table.add_row(i18n.tr(language, "cache_stats_size"), f"{stats['bytes'] / 1024:.1f} KB")
+    table.add_row(i18n.tr(language, "cache_stats_hits"), str(stats["hits"]))
+    table.add_row(i18n.tr(language, "cache_stats_misses"), str(stats["misses"]))
+    table.add_row(i18n.tr(language, "cache_stats_hit_rate"), f"{stats['hit_rate']:.1%}")
+    table.add_row(i18n.tr(language, "cache_stats_evictions"), str(stats["evictions"]))
+
+    semantic_stats = semantic_cache.read_stats()
+    semantic_hits = semantic_stats.get("hits", 0)
+    semantic_lookups = semantic_hits + semantic_stats.get("misses", 0)
+    table.add_row(i18n.tr(language, "cache_stats_semantic_hits"), str(semantic_hits))
+    table.add_row(i18n.tr(language, "cache_stats_semantic_misses"), str(semantic_stats.get("misses", 0)))
+    table.add_row(
+        i18n.tr(language, "cache_stats_semantic_hit_rate"),
+        f"{semantic_hits / semantic_lookups:.1%}" if semantic_lookups else "-",
+    )
+    console.print(table)
+
+
+def _format_metric_value(metric: str, value: float) -> str:
+    if metric == metrics.TOKENS_PER_CALL:
+        return f"{value:,.0f}"
+    if metric in (metrics.REQUEST_BYTES, metrics.RESPONSE_BYTES):
+        return f"{value / 1024:,.1f} KB" if value >= 1024 else f"{value:,.0f} B"
+    return f"{value:,.0f} ms" if value >= 10 else f"{value:.1f} ms"
+
+
+def show_stats(console: Console, window: str = "24h"):
+    """In p50/p95/p99 của các metrics đã ghi trong ``window`` gần nhất, theo model/key/tool."""
+    language = load_config().get("language", "vi")
+    try:
+        window_seconds = metrics.parse_window(window)
+    except ValueError:
+        console.print(i18n.tr(language, "stats_invalid_window", window=window))
+        return
+
+    registry = metrics.get_registry()
+    records = registry.load(window_seconds)
+    if not records:
+        console.print(i18n.tr(language, "stats_empty", window=window, path=registry.path))
+        return
+
+    table = Table(title=i18n.tr(language, "stats_title", window=window, count=len(records)))
+    table.add_column(i18n.tr(language, "stats_col_metric"), style="cyan")
+    table.add_column(i18n.tr(language, "stats_col_group"), style="magenta")
+    table.add_column(i18n.tr(language, "stats_col_count"), justify="right")
+    for column in ("p50", "p95", "p99"):
+        table.add_column(column, style="green", justify="right")
+    for row in metrics.summarize(records):
+        table.add_row(
+            row["metric"],
+            f"{row['label']}={row['value']}",
+            str(row["count"]),
+            *(_format_metric_value(row["metric"], row[q]) for q in ("p50", "p95", "p99")),
+        )
+    console.print(table)
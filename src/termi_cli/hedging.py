@@ -0,0 +1,155 @@
+"""
+Hedged request giữa hai provider cho các lượt hỏi single-turn cần độ trễ thấp.
+
+Nếu model chính (ví dụ ``groq-chat``) chưa trả token đầu tiên sau ``delay_ms``, cùng
+prompt được gửi thêm tới model dự phòng (ví dụ ``models/gemini-flash-latest``). Bên nào
+có token đầu tiên trước thì thắng; stream của bên thua được đóng ngay khi nó trả về.
+Nếu model chính lỗi trước khi có token (hết credit, quota...), model dự phòng được gọi
+ngay mà không phải đợi.
+
+Cấu hình trong ``config.json``::
+
+    "hedging": {
+        "enabled": false,
+        "secondary_model": "models/gemini-flash-latest",
+        "delay_ms": 800
+    }
+
+Số request, số lần hedge và thắng/thua được cộng dồn trong
+``APP_DIR/cache/hedging_stats.json`` (xem ``termi --diagnostics``).
+"""
+import queue
+import logging
+import threading
+from pathlib import Path
+
+from termi_cli import counters
+from termi_cli.config import APP_DIR, load_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEDGING_CONFIG = {
+    "enabled": False,
+    "secondary_model": "models/gemini-flash-latest",
+    "delay_ms": 800,
+}
+
+_END = object()
+
+
+def get_hedging_config() -> dict:
+    return {**DEFAULT_HEDGING_CONFIG, **(load_config().get("hedging") or {})}
+
+
+def get_stats_path() -> Path:
+    return APP_DIR / "cache" / "hedging_stats.json"
+
+
+def read_stats(path: Path | str | None = None) -> dict:
+    return counters.read_counters(path or get_stats_path())
+
+
+def policy_for(model_name: str) -> tuple[str, float] | None:
+    """``(secondary_model, delay_seconds)`` nếu cần hedge cho ``model_name``, ngược lại None."""
+    cfg = get_hedging_config()
+    secondary = cfg.get("secondary_model")
+    if not cfg.get("enabled") or not secondary or secondary == model_name:
+        return None
+    return secondary, max(0.0, float(cfg.get("delay_ms", 0))) / 1000.0
+
+
+def _race(model: str, start_stream, results: queue.Queue) -> None:
+    """Mở stream của ``model`` và đợi token đầu tiên, rồi báo kết quả vào ``results``."""
+    try:
+        stream = iter(start_stream(model))
+        first = next(stream, _END)
+    except Exception as e:
+        results.put((model, None, None, e))
+        return
+    results.put((model, stream, first, None))
+
+
+def _close_stream(stream) -> None:
+    close = getattr(stream, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            logger.debug("Không đóng được stream của bên thua", exc_info=True)
+
+
+def _discard_losers(results: queue.Queue, pending: int) -> None:
+    """Đợi các bên thua trả về rồi đóng stream của chúng (giải phóng kết nối)."""
+    for _ in range(pending):
+        _, stream, _, _ = results.get()
+        if stream is not None:
+            _close_stream(stream)
+
+
+def _chain(first, stream):
+    if first is _END:
+        return
+    yield first
+    yield from stream
+
+
+def first_response(primary: str, secondary: str, start_stream, delay_seconds: float,
+                   stats_path: Path | str | None = None):
+    """Chạy ``start_stream(primary)``, hedge sang ``secondary`` nếu chậm hoặc lỗi.
+
+    ``start_stream(model)`` trả về iterator các đoạn text. Hàm chờ tới khi có token đầu
+    tiên và trả về ``(winner_model, iterator)``; nếu cả hai đều lỗi thì ném lại lỗi của
+    model chính.
+    """
+    results: queue.Queue = queue.Queue()
+
+    def _start(model: str) -> None:
+        threading.Thread(target=_race, args=(model, start_stream, results), name=f"hedge-{model}", daemon=True).start()
+
+    _start(primary)
+    try:
+        outcome = results.get(timeout=delay_seconds)
+    except queue.Empty:
+        outcome = None
+
+    if outcome is not None and outcome[3] is None:
+        _record(stats_path, hedged=False, winner_is_primary=True)
+        _, stream, first, _ = outcome
+        return primary, _chain(first, stream)
+
+    # Model chính chậm hoặc đã lỗi: gửi thêm tới model dự phòng
+    logger.info("Hedging: %s chưa có token đầu sau %.0fms, gửi thêm tới %s", primary, delay_seconds * 1000, secondary)
+    errors = {}
+    pending = {secondary}
+    if outcome is None:
+        pending.add(primary)
+    else:
+        errors[primary] = outcome[3]
+    _start(secondary)
+
+    while pending:
+        model, stream, first, error = results.get()
+        pending.discard(model)
+        if error is not None:
+            errors[model] = error
+            continue
+        if pending:
+            threading.Thread(target=_discard_losers, args=(results, len(pending)), daemon=True).start()
+        _record(stats_path, hedged=True, winner_is_primary=model == primary)
+        return model, _chain(first, stream)
+
+    _record(stats_path, hedged=True, winner_is_primary=None)
+    raise errors.get(primary) or errors[secondary]
+
+
+def _record(stats_path, hedged: bool, winner_is_primary: bool | None) -> None:
+    increments = {"requests": 1}
+    if hedged:
+        increments["hedged"] = 1
+        if winner_is_primary is True:
+            increments["primary_wins"] = 1
+        elif winner_is_primary is False:
+            increments["secondary_wins"] = 1
+        else:
+            increments["failures"] = 1
+    counters.bump_counters(stats_path or get_stats_path(), **increments)
@@ -0,0 +1,379 @@
+"""
+Connection pool HTTP keep-alive dùng chung cho các provider OpenAI-compatible (DeepSeek, Groq...).
+
+Mỗi host giữ một ngăn xếp các kết nối ``http.client`` đang rảnh để tái sử dụng, tránh
+phải bắt tay TCP + TLS lại cho từng request. Cấu hình trong ``config.json``::
+
+    "http": {
+        "pool_size": 4,          # số kết nối rảnh tối đa giữ lại cho mỗi host
+        "connect_timeout": 10,   # giây
+        "read_timeout": 60,      # giây
+        "idle_timeout": 30,      # giây; kết nối rảnh lâu hơn thì bỏ, không tái sử dụng
+        "http2": false,          # dùng HTTP/2 qua httpx (nếu đã cài httpx[http2])
+        "compress_min_bytes": 16384  # body nhỏ hơn thì không nén (xem ``JsonBody``)
+    }
+
+Lỗi được ném ra dưới dạng ``urllib.error.HTTPError`` / ``urllib.error.URLError`` để code
+xử lý lỗi sẵn có (đọc ``e.code``, ``e.read()``) giữ nguyên. Kết nối tái sử dụng bị server
+đóng sau khi đã gửi request ném ``StaleConnectionError`` (lớp con của ``URLError``): endpoint
+vẫn ổn nên caller không tính là lỗi của endpoint.
+"""
+import io
+import ssl
+import time
+import select
+import gzip
+import json
+import logging
+import threading
+import http.client
+import urllib.error
+from urllib.parse import urlsplit
+
+from termi_cli import cassette
+from termi_cli.config import load_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HTTP_CONFIG = {
+    "pool_size": 4,
+    "connect_timeout": 10.0,
+    "read_timeout": 60.0,
+    "idle_timeout": 30.0,
+    "http2": False,
+    "compress_min_bytes": 16384,
+}
+
+# Mức nén gzip: body prompt lớn (vài trăm KB) vẫn nén trong vài ms
+_GZIP_LEVEL = 6
+
+# Lỗi cho thấy server đã đóng một kết nối keep-alive cũ. Chỉ gửi lại (một lần, với kết nối
+# mới) khi lỗi xảy ra lúc đang gửi request; request đã gửi xong thì server có thể đã xử lý
+# nên lỗi được chuyển cho retry policy của caller (tính vào ngân sách retry)
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class StaleConnectionError(urllib.error.URLError):
+    """Kết nối keep-alive tái sử dụng bị server đóng trước khi trả response."""
+
+
+def _is_alive(conn) -> bool:
+    """Kết nối rảnh còn dùng được: socket không có gì để đọc (server đã đóng thì đọc được EOF)."""
+    sock = conn.sock
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+def _http_error(url: str, status: int, reason: str, headers, body: bytes) -> urllib.error.HTTPError:
+    return urllib.error.HTTPError(url, status, reason, headers, io.BytesIO(body))
+
+
+class JsonBody:
+    """Payload JSON đã serialize (và nén nếu được) đúng một lần.
+
+    Cùng một ``JsonBody`` được gửi lại nguyên vẹn ở mọi lần retry / đổi key, nên prompt
+    lớn không bị ``json.dumps`` (và nén) lại cho từng lần thử. JSON được ghi gọn, giữ
+    nguyên UTF-8 (không escape ``\\uXXXX``). ``compress=True`` nén gzip
+    (``Content-Encoding: gzip``) khi body từ ``min_bytes`` trở lên và nén thực sự nhỏ hơn.
+    """
+
+    def __init__(self, payload: dict, compress: bool = False, min_bytes: int | None = None):
+        self.payload = payload
+        self.raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.data = self.raw
+        self.encoding = None
+        if min_bytes is None:
+            min_bytes = int(get_http_config()["compress_min_bytes"])
+        if compress and len(self.raw) >= min_bytes:
+            compressed = gzip.compress(self.raw, compresslevel=_GZIP_LEVEL)
+            if len(compressed) < len(self.raw):
+                self.data, self.encoding = compressed, "gzip"
+
+    def __len__(self) -> int:
+        """Số byte thực sự gửi đi (sau khi nén)."""
+        return len(self.data)
+
+    @property
+    def headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.encoding:
+            headers["Content-Encoding"] = self.encoding
+        return headers
+
+    def uncompressed(self) -> "JsonBody":
+        """Bản không nén của cùng payload (dùng lại bytes đã serialize)."""
+        plain = object.__new__(JsonBody)
+        plain.payload, plain.raw, plain.data, plain.encoding = self.payload, self.raw, self.raw, None
+        return plain
+
+
+class PooledResponse:
+    """Response đọc từ một kết nối trong pool; trả kết nối về pool khi đóng."""
+
+    def __init__(self, pool: "HTTPPool", key, conn, response: http.client.HTTPResponse):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def read(self, amt: int | None = None) -> bytes:
+        return self._response.read(amt)
+
+    def iter_lines(self):
+        """Đọc từng dòng (bytes, đã bỏ CRLF) khi dữ liệu tới – dùng cho streaming."""
+        while True:
+            line = self._response.readline()
+            if not line:
+                return
+            yield line.rstrip(b"\r\n")
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        reusable = self._response.isclosed() and not self._response.will_close
+        if not reusable:
+            # Response chưa đọc hết (hoặc server yêu cầu đóng): không thể tái sử dụng
+            self._response.close()
+            conn.close()
+            return
+        self._pool._release(self._key, conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class HTTPPool:
+    """Pool kết nối HTTP/1.1 keep-alive theo (scheme, host, port)."""
+
+    def __init__(self, pool_size: int = 4, connect_timeout: float = 10.0, read_timeout: float = 60.0,
+                 idle_timeout: float = 30.0, clock=time.monotonic):
+        self.pool_size = max(0, int(pool_size))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        # (scheme, host, port) -> [(kết nối, thời điểm trả về pool)]
+        self._idle: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        self._ssl_context = None
+
+    def _new_connection(self, key):
+        scheme, host, port = key
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(
+                host, port, timeout=self.connect_timeout, context=self._ssl_context
+            )
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        # Sau khi kết nối xong, timeout của socket là read timeout
+        conn.sock.settimeout(self.read_timeout)
+        return conn
+
+    def _acquire(self, key):
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    break
+                conn, released_at = idle.pop()
+            if self._clock() - released_at < self.idle_timeout and _is_alive(conn):
+                return conn, True
+            # Rảnh quá lâu hoặc server đã đóng: bỏ đi thay vì gửi request vào một kết nối chết
+            conn.close()
+        return self._new_connection(key), False
+
+    def _release(self, key, conn) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append((conn, self._clock()))
+                return
+        conn.close()
+
+    def request(self, method: str, url: str, body: bytes | None = None, headers: dict | None = None) -> PooledResponse:
+        """Gửi request; trả về ``PooledResponse`` (2xx/3xx) hoặc ném HTTPError/URLError."""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                conn, reused = self._acquire(key)
+            except (OSError, http.client.HTTPException) as e:
+                raise urllib.error.URLError(e) from e
+
+            sent = False
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                sent = True
+                response = conn.getresponse()
+            except _STALE_CONNECTION_ERRORS as e:
+                conn.close()
+                if reused and attempt == 1 and not sent:
+                    logger.debug("Kết nối keep-alive tới %s đã bị đóng, thử lại với kết nối mới", parts.hostname)
+                    continue
+                if reused:
+                    raise StaleConnectionError(e) from e
+                raise urllib.error.URLError(e) from e
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise urllib.error.URLError(e) from e
+
+            pooled = PooledResponse(self, key, conn, response)
+            if response.status >= 400:
+                try:
+                    error_body = pooled.read()
+                finally:
+                    pooled.close()
+                raise _http_error(url, response.status, response.reason, response.headers, error_body)
+            return pooled
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+
+class _HttpxResponse:
+    def __init__(self, response):
+        self._response = response
+        self.status = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+
+    def read(self, amt: int | None = None) -> bytes:
+        return self._response.read()
+
+    def iter_lines(self):
+        for line in self._response.iter_lines():
+            yield line.encode("utf-8") if isinstance(line, str) else line
+
+    def close(self) -> None:
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class HttpxPool:
+    """Backend HTTP/2 tuỳ chọn dựa trên httpx (chỉ dùng khi ``http.http2`` bật và đã cài httpx[http2])."""
+
+    def __init__(self, httpx_module, pool_size: int, connect_timeout: float, read_timeout: float):
+        self._httpx = httpx_module
+        self._client = httpx_module.Client(
+            http2=True,
+            limits=httpx_module.Limits(max_keepalive_connections=pool_size),
+            timeout=httpx_module.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    def request(self, method: str, url: str, body: bytes | None = None, headers: dict | None = None):
+        httpx = self._httpx
+        try:
+            request = self._client.build_request(method, url, content=body, headers=headers)
+            response = self._client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            raise urllib.error.URLError(e) from e
+        if response.status_code >= 400:
+            try:
+                error_body = response.read()
+            finally:
+                response.close()
+            raise _http_error(url, response.status_code, response.reason_phrase, response.headers, error_body)
+        return _HttpxResponse(response)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_http_config() -> dict:
+    return {**DEFAULT_HTTP_CONFIG, **(load_config().get("http") or {})}
+
+
+def _create_pool():
+    cfg = get_http_config()
+    pool_size = int(cfg["pool_size"])
+    connect_timeout = float(cfg["connect_timeout"])
+    read_timeout = float(cfg["read_timeout"])
+    if cfg.get("http2"):
+        try:
+            import httpx
+            import h2  # noqa: F401  (httpx cần package h2 cho HTTP/2)
+
+            return HttpxPool(httpx, pool_size, connect_timeout, read_timeout)
+        except ImportError:
+            logger.warning("Đã bật http.http2 nhưng chưa cài 'httpx[http2]', dùng HTTP/1.1 keep-alive.")
+    return HTTPPool(pool_size, connect_timeout, read_timeout, float(cfg["idle_timeout"]))
+
+
+def get_pool():
+    """Pool dùng chung toàn tiến trình (khởi tạo lười theo config ``http``)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _create_pool()
+    return _pool
+
+
+def reset_pool() -> None:
+    """Đóng mọi kết nối và tạo lại pool ở lần dùng sau (ví dụ khi đổi config)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def request(method: str, url: str, body: bytes | None = None, headers: dict | None = None):
+    """Gửi request qua pool dùng chung."""
+    return get_pool().request(method, url, body=body, headers=headers)
+
+
+def post_json(url: str, payload: "dict | JsonBody", headers: dict | None = None):
+    """POST một payload JSON; trả về response để caller tự đọc (hoặc stream).
+
+    ``payload`` là dict hoặc ``JsonBody`` đã chuẩn bị sẵn (để tái sử dụng giữa các lần thử).
+    """
+    body = payload if isinstance(payload, JsonBody) else JsonBody(payload)
+    all_headers = {**body.headers, **(headers or {})}
+    recorder = cassette.get_cassette()
+    if recorder is not None:
+        # TERMI_CASSETTE: ghi lại hoặc phát lại thay vì (chỉ) gọi mạng
+        return recorder.http_post(url, body.payload, lambda: request("POST", url, body=body.data, headers=all_headers))
+    return request("POST", url, body=body.data, headers=all_headers)
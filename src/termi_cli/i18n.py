@@ -162,7 +162,6 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "agent_project_finished_default": "Dự án đã hoàn thành.",
         "agent_project_finished_title": "[bold green]✅ Dự Án Hoàn Thành[/bold green]",
         "agent_executor_result_title": "[bold blue]👀 Kết quả[/bold blue]",
-        "agent_recreate_session_quota": "[green]... Tái tạo session với key mới...[/green]",
         "agent_executor_unrecoverable_error": "[bold red]Lỗi không thể phục hồi trong vòng lặp Executor: {error}[/bold red]",
         "agent_max_steps_reached": "[bold yellow]⚠️ Agent đã đạt đến giới hạn {max_steps} bước.[/bold yellow]",
         "agent_http_provider_not_supported_for_agent": "[yellow]Agent hiện chỉ hỗ trợ model Gemini. Model '{model}' sẽ không hoạt động đúng, đang tạm thởi dùng '{fallback_model}'.[/yellow]",
@@ -180,6 +179,91 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "agent_mode_label": "[dim]Chế độ: {mode}[/dim]",
         "agent_session_summary": "[bold green]✅ Agent đã hoàn thành sau {steps} bước (dry-run: {flag}).[/bold green]",
         "agent_max_steps_override": "[dim]Giới hạn bước tối đa cho Agent trong phiên này: {max_steps} bước.[/dim]",
+
+        # Daemon (--serve)
+        "daemon_not_supported": "[yellow]Hệ điều hành này không hỗ trợ Unix socket, không thể chạy daemon.[/yellow]",
+        "daemon_already_running": "[yellow]Daemon đã chạy sẵn tại [cyan]{path}[/cyan].[/yellow]",
+        "daemon_warming_up": "[cyan]Đang nạp trước SDK, config, plugin và trí nhớ...[/cyan]",
+        "daemon_listening": "[green]Daemon termi đang lắng nghe tại [cyan]{path}[/cyan]. Nhấn Ctrl+C để dừng.[/green]",
+        "daemon_stopped": "[dim]Daemon đã dừng.[/dim]",
+        "daemon_stop_sent": "[green]Đã gửi lệnh dừng tới daemon.[/green]",
+        "daemon_not_running": "[yellow]Không có daemon nào đang chạy.[/yellow]",
+
+        # Response cache (--cache-stats)
+        "cache_stats_title": "Response cache",
+        "cache_stats_metric": "Chỉ số",
+        "cache_stats_value": "Giá trị",
+        "cache_stats_enabled": "Đang bật",
+        "cache_stats_entries": "Số entry",
+        "cache_stats_size": "Dung lượng",
+        "cache_stats_hits": "Số lần hit",
+        "cache_stats_misses": "Số lần miss",
+        "cache_stats_hit_rate": "Tỉ lệ hit",
+        "cache_stats_evictions": "Số entry bị loại (LRU)",
+
+        # Semantic cache
+        "semantic_cache_hit": "\n💡 [bold green]Phản hồi[/bold green] [dim](từ semantic cache, độ tương đồng {similarity:.2f})[/dim]:",
+        "cache_stats_semantic_hits": "Semantic cache hits",
+        "cache_stats_semantic_misses": "Semantic cache misses",
+        "cache_stats_semantic_hit_rate": "Tỉ lệ hit semantic cache",
+
+        # Hedging
+        "hedging_secondary_won": "[dim]⚡ Model dự phòng [cyan]{model}[/cyan] trả lời nhanh hơn (hedging).[/dim]",
+        "diagnostics_hedging_stats": "[dim]⚡ Hedging: {requests} request, {hedged} lần hedge ({rate:.0%}); model chính thắng {primary_wins}, model dự phòng thắng {secondary_wins}.[/dim]",
+
+        # Router chọn model theo model_fallback_order
+        "router_model_fallback": "[yellow]↪ Model '{model}' không khả dụng, chuyển sang '{fallback}' cho lượt này...[/yellow]",
+        "router_skip_degraded": "[yellow]↪ Model '{model}' đang chậm hoặc lỗi liên tục, tạm dùng '{fallback}'.[/yellow]",
+
+        # Ngân sách token cho prompt
+        "prompt_budget_trimmed": "[yellow]✂️ Đã cắt '{section}' từ ~{before} xuống ~{after} token để vừa input limit của model.[/yellow]",
+        "prompt_budget_dropped": "[yellow]✂️ Đã bỏ '{section}' (~{before} token) để vừa input limit của model.[/yellow]",
+        "prompt_budget_exceeded": "[bold red]❌ Prompt (~{tokens} token) vượt input limit của model ({limit} token) ngay cả sau khi cắt bớt ngữ cảnh. Hãy rút ngắn câu hỏi hoặc nội dung đầu vào.[/bold red]",
+
+        # Chế độ batch (--batch)
+        "batch_input_error": "[bold red]Không đọc được file batch '{path}': {error}[/bold red]",
+        "batch_started": "[cyan]📦 Batch: {total} record, bỏ qua {skipped} record đã xong, chạy song song {concurrency}. Kết quả: {output}[/cyan]",
+        "batch_progress": "[bold green]Đang chạy batch... {done}/{total}[/bold green]",
+        "batch_finished": "[green]✅ Batch xong: {succeeded} thành công, {failed} lỗi trong {elapsed:.1f}s. Kết quả: {output}[/green]",
+
+        # Circuit breaker cho provider HTTP
+        "circuit_open_fallback": "[bold red]{provider} đang tạm ngưng (circuit breaker mở, thử lại sau ~{retry_in:.0f}s).[/bold red]",
+        "diagnostics_breaker_closed": "[green]🔌 Circuit breaker {name}: đóng (hoạt động bình thường)[/green]",
+        "diagnostics_breaker_open": "[bold red]🔌 Circuit breaker {name}: MỞ sau {failures} lỗi liên tiếp, thăm dò lại sau ~{retry_in:.0f}s[/bold red]",
+        "diagnostics_breaker_half_open": "[yellow]🔌 Circuit breaker {name}: nửa mở, request kế tiếp sẽ thăm dò endpoint[/yellow]",
+
+        # Thống kê độ trễ (--stats)
+        "stats_invalid_window": "[red]Khoảng thời gian không hợp lệ: '{window}'. Dùng dạng 30m, 24h, 7d.[/red]",
+        "stats_empty": "[yellow]Chưa có metrics nào trong {window} gần nhất ({path}).[/yellow]",
+        "stats_title": "Độ trễ & thông lượng ({window} gần nhất, {count} mẫu)",
+        "stats_col_metric": "Chỉ số",
+        "stats_col_group": "Nhóm",
+        "stats_col_count": "Số mẫu",
+
+        # Load test (--loadtest)
+        "loadtest_started": "[cyan]Load test {provider}: {sessions} session × {turns} lượt, {keys} key giả (mock server cục bộ).[/cyan]",
+        "loadtest_running": "[cyan]Đang chạy load test...[/cyan]",
+        "loadtest_title": "Load test {provider} ({model}, {sessions} session × {turns} lượt)",
+        "loadtest_col_metric": "Chỉ số",
+        "loadtest_col_value": "Giá trị",
+        "loadtest_row_requests": "Lượt thành công / tổng",
+        "loadtest_row_duration": "Thời gian chạy",
+        "loadtest_row_throughput": "Thông lượng",
+        "loadtest_row_tokens": "Token sinh ra",
+        "loadtest_row_latency": "Độ trễ ms (p50 / p95 / p99 / max)",
+        "loadtest_row_ttft": "Time-to-first-token ms (p50 / p95 / p99 / max)",
+        "loadtest_row_http": "Số request HTTP",
+        "loadtest_row_retries": "Số lần retry",
+        "loadtest_row_rate_limited": "Phản hồi 429",
+        "loadtest_row_throttled": "Lần chờ rate limiter",
+        "loadtest_row_dropped": "Kết nối bị cắt",
+        "loadtest_row_errors": "Lỗi",
+        "loadtest_keys_title": "Phân bố theo key",
+        "loadtest_col_requests": "Request",
+        "loadtest_col_cooldown": "Cooldown còn lại",
+
+        # Provider OpenAI-compatible tự cấu hình
+        "config_model_provider_hint_custom": "[dim]Provider: {provider} (OpenAI-compatible tự cấu hình; HTTP chat/generate_text, không hỗ trợ Agent hoặc tool-calls Gemini).[/dim]",
     },
     "en": {
         # General errors & bootstrap
@@ -342,7 +426,6 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "agent_project_finished_default": "The project has been completed.",
         "agent_project_finished_title": "[bold green]✅ Project Completed[/bold green]",
         "agent_executor_result_title": "[bold blue]👀 Result[/bold blue]",
-        "agent_recreate_session_quota": "[green]... Recreating session with a new key...[/green]",
         "agent_executor_unrecoverable_error": "[bold red]Unrecoverable error in Executor loop: {error}[/bold red]",
         "agent_max_steps_reached": "[bold yellow]⚠️ Agent has reached the step limit of {max_steps}.[/bold yellow]",
         "agent_http_provider_not_supported_for_agent": "[yellow]Agent currently supports only Gemini models. Model '{model}' is not supported; temporarily using '{fallback_model}'.[/yellow]",
@@ -360,6 +443,91 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "agent_mode_label": "[dim]Mode: {mode}[/dim]",
         "agent_session_summary": "[bold green]✅ Agent finished after {steps} step(s) (dry-run: {flag}).[/bold green]",
         "agent_max_steps_override": "[dim]Maximum number of Agent steps for this session: {max_steps}.[/dim]",
+
+        # Daemon (--serve)
+        "daemon_not_supported": "[yellow]This OS does not support Unix sockets; cannot run the daemon.[/yellow]",
+        "daemon_already_running": "[yellow]A daemon is already running at [cyan]{path}[/cyan].[/yellow]",
+        "daemon_warming_up": "[cyan]Preloading SDKs, config, plugins and memory...[/cyan]",
+        "daemon_listening": "[green]termi daemon listening on [cyan]{path}[/cyan]. Press Ctrl+C to stop.[/green]",
+        "daemon_stopped": "[dim]Daemon stopped.[/dim]",
+        "daemon_stop_sent": "[green]Stop command sent to the daemon.[/green]",
+        "daemon_not_running": "[yellow]No daemon is running.[/yellow]",
+
+        # Response cache (--cache-stats)
+        "cache_stats_title": "Response cache",
+        "cache_stats_metric": "Metric",
+        "cache_stats_value": "Value",
+        "cache_stats_enabled": "Enabled",
+        "cache_stats_entries": "Entries",
+        "cache_stats_size": "Size",
+        "cache_stats_hits": "Hits",
+        "cache_stats_misses": "Misses",
+        "cache_stats_hit_rate": "Hit rate",
+        "cache_stats_evictions": "Evicted entries (LRU)",
+
+        # Semantic cache
+        "semantic_cache_hit": "\n💡 [bold green]Response[/bold green] [dim](from semantic cache, similarity {similarity:.2f})[/dim]:",
+        "cache_stats_semantic_hits": "Semantic cache hits",
+        "cache_stats_semantic_misses": "Semantic cache misses",
+        "cache_stats_semantic_hit_rate": "Semantic cache hit rate",
+
+        # Hedging
+        "hedging_secondary_won": "[dim]⚡ Secondary model [cyan]{model}[/cyan] answered first (hedging).[/dim]",
+        "diagnostics_hedging_stats": "[dim]⚡ Hedging: {requests} requests, {hedged} hedged ({rate:.0%}); primary won {primary_wins}, secondary won {secondary_wins}.[/dim]",
+
+        # Model router over model_fallback_order
+        "router_model_fallback": "[yellow]↪ Model '{model}' is unavailable, switching to '{fallback}' for this turn...[/yellow]",
+        "router_skip_degraded": "[yellow]↪ Model '{model}' is slow or failing repeatedly, using '{fallback}' for now.[/yellow]",
+
+        # Prompt token budget
+        "prompt_budget_trimmed": "[yellow]✂️ Trimmed '{section}' from ~{before} to ~{after} tokens to fit the model's input limit.[/yellow]",
+        "prompt_budget_dropped": "[yellow]✂️ Dropped '{section}' (~{before} tokens) to fit the model's input limit.[/yellow]",
+        "prompt_budget_exceeded": "[bold red]❌ The prompt (~{tokens} tokens) exceeds the model's input limit ({limit} tokens) even after trimming context. Please shorten the question or the input.[/bold red]",
+
+        # Batch mode (--batch)
+        "batch_input_error": "[bold red]Cannot read batch file '{path}': {error}[/bold red]",
+        "batch_started": "[cyan]📦 Batch: {total} records, skipping {skipped} already done, concurrency {concurrency}. Output: {output}[/cyan]",
+        "batch_progress": "[bold green]Running batch... {done}/{total}[/bold green]",
+        "batch_finished": "[green]✅ Batch finished: {succeeded} succeeded, {failed} failed in {elapsed:.1f}s. Output: {output}[/green]",
+
+        # Circuit breaker for HTTP providers
+        "circuit_open_fallback": "[bold red]{provider} is temporarily unavailable (circuit breaker open, retrying in ~{retry_in:.0f}s).[/bold red]",
+        "diagnostics_breaker_closed": "[green]🔌 Circuit breaker {name}: closed (healthy)[/green]",
+        "diagnostics_breaker_open": "[bold red]🔌 Circuit breaker {name}: OPEN after {failures} consecutive failures, probing again in ~{retry_in:.0f}s[/bold red]",
+        "diagnostics_breaker_half_open": "[yellow]🔌 Circuit breaker {name}: half-open, the next request will probe the endpoint[/yellow]",
+
+        # Latency statistics (--stats)
+        "stats_invalid_window": "[red]Invalid time window: '{window}'. Use e.g. 30m, 24h, 7d.[/red]",
+        "stats_empty": "[yellow]No metrics recorded in the last {window} ({path}).[/yellow]",
+        "stats_title": "Latency & throughput (last {window}, {count} samples)",
+        "stats_col_metric": "Metric",
+        "stats_col_group": "Group",
+        "stats_col_count": "Count",
+
+        # Load test (--loadtest)
+        "loadtest_started": "[cyan]Load test {provider}: {sessions} sessions × {turns} turns, {keys} fake keys (local mock server).[/cyan]",
+        "loadtest_running": "[cyan]Running load test...[/cyan]",
+        "loadtest_title": "Load test {provider} ({model}, {sessions} sessions × {turns} turns)",
+        "loadtest_col_metric": "Metric",
+        "loadtest_col_value": "Value",
+        "loadtest_row_requests": "Succeeded / total turns",
+        "loadtest_row_duration": "Duration",
+        "loadtest_row_throughput": "Throughput",
+        "loadtest_row_tokens": "Generated tokens",
+        "loadtest_row_latency": "Latency ms (p50 / p95 / p99 / max)",
+        "loadtest_row_ttft": "Time-to-first-token ms (p50 / p95 / p99 / max)",
+        "loadtest_row_http": "HTTP requests",
+        "loadtest_row_retries": "Retries",
+        "loadtest_row_rate_limited": "429 responses",
+        "loadtest_row_throttled": "Rate limiter waits",
+        "loadtest_row_dropped": "Dropped connections",
+        "loadtest_row_errors": "Errors",
+        "loadtest_keys_title": "Per-key distribution",
+        "loadtest_col_requests": "Requests",
+        "loadtest_col_cooldown": "Cooldown left",
+
+        # Custom OpenAI-compatible providers
+        "config_model_provider_hint_custom": "[dim]Provider: {provider} (custom OpenAI-compatible; HTTP chat/generate_text, Agent and Gemini tool-calls are not supported).[/dim]",
     },
 }
 
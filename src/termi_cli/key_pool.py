@@ -0,0 +1,296 @@
+"""
+Bộ lập lịch API key cho từng provider (Gemini, DeepSeek, Groq).
+
+Thay vì chỉ dùng một key và xoay vòng khi gặp lỗi quota, mỗi request "mượn" một key
+từ pool:
+
+- Ưu tiên key đang rảnh (ít request đang chạy nhất), sau đó key lâu chưa dùng nhất (LRU).
+- Key vừa gặp lỗi RPM (``Please retry in Xs``, ``try again in 1m2s``, ``Retry-After``)
+  được đặt cooldown đúng khoảng thời gian server yêu cầu.
+- Key Gemini hết quota ngày (quota_id ``...PerDay...``) bị đánh dấu exhausted tới lần reset
+  kế tiếp (nửa đêm giờ Pacific) và bị bỏ qua.
+
+Nhờ vậy nhiều thread trong cùng tiến trình có thể dùng đồng thời tất cả các key.
+Trạng thái cooldown/exhausted và bộ đếm request được đồng bộ qua ``quota_store`` để các
+tiến trình termi khác trên cùng máy không phải gọi thử lại vào key đã biết là "chết".
+"""
+import re
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from termi_cli import quota_store
+from termi_cli.rate_limit import key_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Cooldown mặc định khi server báo rate limit nhưng không nói rõ phải chờ bao lâu
+DEFAULT_COOLDOWN_SECONDS = 30.0
+
+# Đọc lại trạng thái dùng chung từ quota store tối đa mỗi bấy nhiêu giây
+_STORE_SYNC_INTERVAL = 1.0
+
+_RETRY_PATTERNS = [
+    # Gemini: "Please retry in 12.345s" / Groq: "Please try again in 7.66s" / "try again in 1m2.5s"
+    re.compile(r"(?:retry|try again) in\s+(?:(?P<m>\d+)m)?(?P<s>\d+(?:\.\d+)?)s", re.IGNORECASE),
+    re.compile(r"(?:retry|try again) in\s+(?P<ms>\d+(?:\.\d+)?)ms", re.IGNORECASE),
+    # Gemini (gRPC detail): retry_delay { seconds: 12 }
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(?P<s>\d+)", re.IGNORECASE),
+]
+
+# Quota ngày của Gemini: quota_id dạng "GenerateRequestsPerDayPerProjectPerModel-FreeTier"
+# (gRPC ``quota_id: "..."`` hoặc REST ``"quotaId": "..."``). Chỉ quota này mới chặn key tới
+# nửa đêm; lỗi TPD/RPD của Groq, DeepSeek... đi kèm thời gian chờ cụ thể nên chỉ cooldown.
+_DAILY_QUOTA_ID = re.compile(r"quota_?id\"?\s*:\s*\"?[\w-]*PerDay", re.IGNORECASE)
+
+
+class KeysExhausted(RuntimeError):
+    """Mọi key của provider đều đang cooldown / hết quota nên không gửi được request."""
+
+    def __init__(self, provider: str, label: str | None = None):
+        super().__init__(f"All {label or provider} API keys exhausted")
+        self.provider = provider
+
+
+def parse_retry_delay(message: str) -> float | None:
+    """Đọc thời gian chờ (giây) từ thông báo lỗi rate limit của provider."""
+    if not message:
+        return None
+    for pattern in _RETRY_PATTERNS:
+        match = pattern.search(message)
+        if not match:
+            continue
+        groups = match.groupdict()
+        if groups.get("ms"):
+            return float(groups["ms"]) / 1000.0
+        minutes = float(groups.get("m") or 0)
+        return minutes * 60 + float(groups["s"])
+    return None
+
+
+def is_daily_quota_error(message: str) -> bool:
+    """Lỗi quota ngày của Gemini (không nên thử lại key này cho tới khi quota reset)."""
+    return bool(message) and _DAILY_QUOTA_ID.search(message) is not None
+
+
+def next_daily_reset(now: float | None = None) -> float:
+    """Thời điểm (epoch) quota ngày được reset: nửa đêm giờ Pacific kế tiếp."""
+    now = time.time() if now is None else now
+    try:
+        from zoneinfo import ZoneInfo
+
+        tz = ZoneInfo("America/Los_Angeles")
+    except Exception:
+        # Không có tzdata: xấp xỉ bằng UTC-8
+        tz = timezone(timedelta(hours=-8))
+    local = datetime.fromtimestamp(now, tz)
+    midnight = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.timestamp()
+
+
+class _KeyState:
+    __slots__ = ("key", "fingerprint", "index", "last_used", "in_flight", "cooldown_until", "exhausted_until", "requests")
+
+    def __init__(self, key: str, index: int):
+        self.key = key
+        self.fingerprint = key_fingerprint(key)
+        self.index = index
+        self.last_used = 0.0
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.exhausted_until = 0.0
+        self.requests = 0
+
+    def blocked_until(self) -> float:
+        return max(self.cooldown_until, self.exhausted_until)
+
+
+class KeyPool:
+    """Pool API key của một provider, an toàn khi dùng từ nhiều thread.
+
+    ``store`` (tuỳ chọn) là ``quota_store.QuotaStore`` dùng chung giữa các tiến trình.
+    """
+
+    def __init__(self, provider: str, keys: list[str] | None = None, clock=time.time, store=None):
+        self.provider = provider
+        self._clock = clock
+        self._store = store
+        self._synced_at = None
+        self._lock = threading.Lock()
+        self._states: list[_KeyState] = []
+        self.set_keys(keys or [])
+
+    def set_keys(self, keys: list[str]) -> None:
+        """Thay danh sách key, giữ lại trạng thái cooldown của các key cũ còn dùng."""
+        with self._lock:
+            old = {s.key: s for s in self._states}
+            self._states = []
+            for index, key in enumerate(keys):
+                state = old.get(key) or _KeyState(key, index)
+                state.index = index
+                self._states.append(state)
+
+    @property
+    def keys(self) -> list[str]:
+        return [s.key for s in self._states]
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def index_of(self, key: str) -> int:
+        for state in self._states:
+            if state.key == key:
+                return state.index
+        return -1
+
+    def _state(self, key: str) -> _KeyState | None:
+        for state in self._states:
+            if state.key == key:
+                return state
+        return None
+
+    def _sync_from_store(self, force: bool = False) -> None:
+        """Gộp trạng thái do các tiến trình khác ghi vào quota store (lấy giá trị chặn lâu hơn)."""
+        if self._store is None:
+            return
+        now = self._clock()
+        if not force and self._synced_at is not None and now - self._synced_at < _STORE_SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        shared = self._store.load(self.provider, now)
+        with self._lock:
+            for state in self._states:
+                row = shared.get(state.fingerprint)
+                if row is None:
+                    continue
+                state.cooldown_until = max(state.cooldown_until, row["cooldown_until"])
+                state.exhausted_until = max(state.exhausted_until, row["exhausted_until"])
+                state.requests = row["requests"]
+
+    def acquire(self, exclude=()) -> str | None:
+        """Lấy key khả dụng phù hợp nhất (rảnh nhất, rồi LRU); None nếu mọi key đang bị chặn."""
+        self._sync_from_store()
+        with self._lock:
+            now = self._clock()
+            candidates = [
+                s for s in self._states
+                if s.blocked_until() <= now and s.key not in exclude
+            ]
+            if not candidates:
+                return None
+            state = min(candidates, key=lambda s: (s.in_flight, s.last_used, s.index))
+            state.in_flight += 1
+            state.last_used = now
+            state.requests += 1
+        if self._store is not None:
+            self._store.record_request(self.provider, state.fingerprint, next_daily_reset(now))
+        return state.key
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            state = self._state(key)
+            if state is not None and state.in_flight > 0:
+                state.in_flight -= 1
+
+    @contextmanager
+    def lease(self, exclude=()):
+        """Context manager mượn một key (``None`` nếu không có key khả dụng)."""
+        key = self.acquire(exclude)
+        try:
+            yield key
+        finally:
+            if key is not None:
+                self.release(key)
+
+    def wait_time(self) -> float:
+        """Số giây tới khi có ít nhất một key khả dụng (``inf`` nếu tất cả đã hết quota ngày)."""
+        self._sync_from_store(force=True)
+        with self._lock:
+            if not self._states:
+                return math.inf
+            now = self._clock()
+            waits = []
+            for state in self._states:
+                if state.exhausted_until > now:
+                    continue
+                waits.append(max(0.0, state.cooldown_until - now))
+            return min(waits) if waits else math.inf
+
+    def mark_cooldown(self, key: str, seconds: float | None = None) -> float:
+        """Tạm ngưng dùng key trong ``seconds`` giây (mặc định DEFAULT_COOLDOWN_SECONDS)."""
+        seconds = DEFAULT_COOLDOWN_SECONDS if seconds is None else max(0.0, float(seconds))
+        with self._lock:
+            state = self._state(key)
+            if state is None:
+                return seconds
+            state.cooldown_until = max(state.cooldown_until, self._clock() + seconds)
+            until = state.cooldown_until
+        if self._store is not None:
+            self._store.set_cooldown(self.provider, state.fingerprint, until)
+        logger.info("%s key #%d cooldown %.1fs", self.provider, self.index_of(key) + 1, seconds)
+        return seconds
+
+    def mark_exhausted(self, key: str, until: float | None = None) -> None:
+        """Đánh dấu key hết quota ngày tới ``until`` (mặc định lần reset quota kế tiếp)."""
+        until = next_daily_reset(self._clock()) if until is None else until
+        with self._lock:
+            state = self._state(key)
+            if state is None:
+                return
+            state.exhausted_until = max(state.exhausted_until, until)
+        if self._store is not None:
+            self._store.set_exhausted(self.provider, state.fingerprint, until)
+        logger.info("%s key #%d exhausted until %s", self.provider, self.index_of(key) + 1, until)
+
+    def report_rate_limit(self, key: str, message: str = "", retry_after: float | None = None) -> str:
+        """Ghi nhận lỗi quota/rate limit cho key; trả về ``"exhausted"`` hoặc ``"cooldown"``.
+
+        Thời gian chờ server đưa ra (``retry_after`` hoặc "try again in ...") được dùng làm
+        cooldown; chỉ quota ngày của Gemini mới đánh dấu key hết quota tới lần reset.
+        """
+        if is_daily_quota_error(message):
+            self.mark_exhausted(key)
+            return "exhausted"
+        delay = retry_after if retry_after is not None else parse_retry_delay(message)
+        self.mark_cooldown(key, delay)
+        return "cooldown"
+
+    def status(self) -> list[dict]:
+        """Trạng thái từng key (không lộ giá trị key) cho diagnostics."""
+        self._sync_from_store(force=True)
+        with self._lock:
+            now = self._clock()
+            return [
+                {
+                    "index": s.index + 1,
+                    "in_flight": s.in_flight,
+                    "cooldown_s": max(0.0, s.cooldown_until - now),
+                    "exhausted": s.exhausted_until > now,
+                    "requests_today": s.requests,
+                }
+                for s in self._states
+            ]
+
+
+_pools: dict[str, KeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def active_providers() -> list[str]:
+    """Các provider đã có pool trong tiến trình này."""
+    with _pools_lock:
+        return list(_pools)
+
+
+def get_pool(provider: str) -> KeyPool:
+    """Pool dùng chung toàn tiến trình cho một provider (đồng bộ với quota store nếu bật)."""
+    pool = _pools.get(provider)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(provider)
+            if pool is None:
+                pool = _pools[provider] = KeyPool(provider, store=quota_store.get_store())
+    return pool
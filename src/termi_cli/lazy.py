@@ -0,0 +1,93 @@
+"""
+Tiện ích import lười (lazy import) cho các SDK nặng.
+
+Các lệnh không cần gọi model (``--diagnostics``, ``--list-profiles``, ``--rm-history``,
+``--reset-memory``...) không nên phải trả giá import ``google.generativeai``, ``chromadb``,
+``sqlalchemy``, ``googleapiclient`` hay ``requests``. Module này cung cấp:
+
+- ``silence_stderr``: tạm tắt stderr ở tầng file descriptor (log gRPC/absl khi import genai).
+- ``LazyModule``: proxy module, chỉ import module thật ở lần truy cập thuộc tính đầu tiên.
+"""
+import os
+import types
+import logging
+import importlib
+import threading
+import contextlib
+
+
+@contextlib.contextmanager
+def silence_stderr():
+    """Tạm thởi chuyển hướng stderr sang devnull."""
+    try:
+        original_stderr_fd = os.dup(2)
+    except OSError:
+        # Không có fd 2 (ví dụ chạy dưới một số service manager): bỏ qua.
+        yield
+        return
+    devnull_fd = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull_fd, 2)
+    os.close(devnull_fd)
+    try:
+        yield
+    finally:
+        os.dup2(original_stderr_fd, 2)
+        os.close(original_stderr_fd)
+
+
+class LazyModule(types.ModuleType):
+    """Proxy cho một module, chỉ thực sự import khi có truy cập thuộc tính.
+
+    Thuộc tính được gán trực tiếp lên proxy (ví dụ khi test dùng ``mocker.patch``)
+    sẽ được ưu tiên hơn thuộc tính của module thật.
+    """
+
+    def __init__(self, name: str, quiet: bool = False, on_load=None):
+        super().__init__(name)
+        self.__dict__["_lazy_quiet"] = quiet
+        self.__dict__["_lazy_on_load"] = on_load
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is not None:
+            return module
+
+        with self.__dict__["_lazy_lock"]:
+            module = self.__dict__["_lazy_module"]
+            if module is None:
+                if self.__dict__["_lazy_quiet"]:
+                    with silence_stderr():
+                        module = importlib.import_module(self.__name__)
+                else:
+                    module = importlib.import_module(self.__name__)
+                on_load = self.__dict__["_lazy_on_load"]
+                if on_load is not None:
+                    on_load(module)
+                self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        if attr.startswith("__") and attr.endswith("__"):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<LazyModule '{self.__name__}' ({state})>"
+
+
+def quiet_google_loggers(_module=None):
+    """Giảm độ ồn log của google/grpc/absl sau khi import SDK Gemini."""
+    logging.getLogger('google').setLevel(logging.ERROR)
+    logging.getLogger('grpc').setLevel(logging.ERROR)
+    logging.getLogger('absl').setLevel(logging.ERROR)
+    try:
+        import absl.logging as _absl_logging
+        _absl_logging.set_verbosity(_absl_logging.ERROR)
+    except (ImportError, AttributeError):
+        pass
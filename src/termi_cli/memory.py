@@ -1,10 +1,9 @@
-import chromadb
-from chromadb.config import Settings
 import time
 import os
 import shutil
 import logging
 
+from termi_cli import metrics, tracing
 from termi_cli.config import APP_DIR
 
 DB_PATH = str(APP_DIR / "memory_db")
@@ -17,6 +16,20 @@ collection = None
 MEMORY_DISABLED = False
 
 
+def _create_collection():
+    """Mở (hoặc tạo) collection ChromaDB tại DB_PATH. chromadb chỉ được import ở đây."""
+    global client
+    import chromadb
+    from chromadb.config import Settings
+
+    os.makedirs(DB_PATH, exist_ok=True)
+    client = chromadb.PersistentClient(
+        path=DB_PATH,
+        settings=Settings(anonymized_telemetry=False),
+    )
+    return client.get_or_create_collection(name="long_term_memory")
+
+
 def _ensure_collection():
     """Đảm bảo collection ChromaDB đã được khởi tạo, với xử lý fallback khi DB hỏng.
 
@@ -30,12 +43,7 @@ def _ensure_collection():
         return collection
 
     try:
-        os.makedirs(DB_PATH, exist_ok=True)
-        client = chromadb.PersistentClient(
-            path=DB_PATH,
-            settings=Settings(anonymized_telemetry=False),
-        )
-        collection = client.get_or_create_collection(name="long_term_memory")
+        collection = _create_collection()
         return collection
     except Exception as e:
         logger.warning(
@@ -56,12 +64,7 @@ def _ensure_collection():
                     corrupted_db_path,
                 )
 
-            os.makedirs(DB_PATH, exist_ok=True)
-            client = chromadb.PersistentClient(
-                path=DB_PATH,
-                settings=Settings(anonymized_telemetry=False),
-            )
-            collection = client.get_or_create_collection(name="long_term_memory")
+            collection = _create_collection()
             logger.info("--- MEMORY: Đã tạo lại database trí nhớ thành công. ---")
             return collection
         except Exception as final_e:
@@ -73,6 +76,20 @@ def _ensure_collection():
             return None
 
 
+def get_collection(name: str, metadata: dict | None = None):
+    """Mở một collection phụ trong cùng database (dùng chung embedding function mặc định với trí nhớ).
+
+    Trả về None nếu trí nhớ bị vô hiệu hoá hoặc không mở được collection.
+    """
+    if _ensure_collection() is None:
+        return None
+    try:
+        return client.get_or_create_collection(name=name, metadata=metadata)
+    except Exception as e:
+        logger.error("--- MEMORY ERROR: Không thể mở collection '%s': %s ---", name, e)
+        return None
+
+
 def reset_memory_db() -> bool:
     """Xoá toàn bộ database trí nhớ dài hạn (thư mục memory_db)."""
     global client, collection, MEMORY_DISABLED
@@ -122,10 +139,11 @@ def add_memory(user_intent: str, tool_calls_log: list, final_response: str):
 
         doc_id = str(time.time())
 
-        collection_obj.add(
-            documents=[document],
-            ids=[doc_id]
-        )
+        with tracing.span("memory_add", tracing.MEMORY), metrics.timer(metrics.MEMORY_QUERY, op="add"):
+            collection_obj.add(
+                documents=[document],
+                ids=[doc_id]
+            )
         logger.debug("MEMORY: saved 1 interaction to long-term store.")
         return True
     except Exception as e:
@@ -142,10 +160,11 @@ def search_memory(query: str, n_results: int = 2) -> str:
         return ""
 
     try:
-        results = collection_obj.query(
-            query_texts=[query],
-            n_results=n_results
-        )
+        with tracing.span("memory_search", tracing.MEMORY), metrics.timer(metrics.MEMORY_QUERY, op="search"):
+            results = collection_obj.query(
+                query_texts=[query],
+                n_results=n_results
+            )
 
         documents = results.get('documents', [[]])[0]
         if not documents:
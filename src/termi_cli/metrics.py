@@ -0,0 +1,214 @@
+"""
+Đo độ trễ và thông lượng của từng lần gọi (provider, tool, rate limiter, trí nhớ).
+
+Mỗi phép đo là một observation ``(metric, value, labels)``, ví dụ::
+
+    metrics.observe(metrics.PROVIDER_LATENCY, 812.4, model="groq-chat", key="3f9a0c1b2d4e")
+
+Observation được giữ trong bộ đệm của tiến trình (kèm histogram theo từng bộ label để xem
+nhanh trong daemon) và được ghi nối tiếp dạng JSONL vào ``APP_DIR/metrics/metrics.jsonl``
+khi bộ đệm đầy, sau mỗi request của daemon và lúc tiến trình thoát. ``termi --stats 24h``
+đọc lại file này và in p50/p95/p99 theo model, key (fingerprint, không lộ giá trị) và tool.
+
+Thời gian đo bằng mili giây; ``tokens_per_call`` là số token của một lượt gọi;
+``request_bytes`` / ``response_bytes`` là số byte gửi đi (sau khi nén) / nhận về của một
+request HTTP tới provider OpenAI-compatible.
+"""
+import os
+import re
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from termi_cli.config import APP_DIR
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_LATENCY = "provider_latency_ms"
+TIME_TO_FIRST_TOKEN = "ttft_ms"
+TOOL_DURATION = "tool_duration_ms"
+THROTTLE_WAIT = "throttle_wait_ms"
+MEMORY_QUERY = "memory_query_ms"
+TOKENS_PER_CALL = "tokens_per_call"
+REQUEST_BYTES = "request_bytes"
+RESPONSE_BYTES = "response_bytes"
+
+# Các label dùng để nhóm trong báo cáo, theo thứ tự hiển thị
+REPORT_LABELS = ("model", "key", "tool", "op")
+
+# Ghi ra đĩa khi bộ đệm có bấy nhiêu observation
+_FLUSH_EVERY = 200
+# Số giá trị giữ lại cho mỗi histogram trong bộ nhớ
+_HISTOGRAM_SIZE = 1000
+# File vượt ngưỡng này thì được đổi tên thành ``metrics.jsonl.1`` (chỉ giữ một bản cũ)
+_MAX_FILE_BYTES = 20 * 1024 * 1024
+
+_WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def get_metrics_path() -> Path:
+    return APP_DIR / "metrics" / "metrics.jsonl"
+
+
+def parse_window(window: str) -> float:
+    """Đổi ``"30m"`` / ``"24h"`` / ``"7d"`` (hoặc số giây) thành số giây."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*", str(window).lower())
+    if not match:
+        raise ValueError(f"Invalid time window: {window!r}")
+    return float(match.group(1)) * _WINDOW_UNITS[match.group(2) or "s"]
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Percentile theo nearest-rank trên list đã sắp xếp (``q`` trong khoảng 0..100)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return float(sorted_values[min(len(sorted_values), int(rank)) - 1])
+
+
+class MetricsRegistry:
+    """Bộ đệm observation và histogram trong bộ nhớ; ``path`` None thì không ghi ra đĩa."""
+
+    def __init__(self, path: Path | str | None = None, flush_every: int = _FLUSH_EVERY,
+                 max_file_bytes: int = _MAX_FILE_BYTES, clock=time.time):
+        self.path = Path(path) if path else None
+        self.flush_every = max(1, int(flush_every))
+        self.max_file_bytes = max_file_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buffer: list[dict] = []
+        self._histograms: dict[tuple, deque] = {}
+
+    def observe(self, metric: str, value, **labels) -> None:
+        labels = {name: str(label) for name, label in labels.items() if label is not None}
+        record = {"ts": round(self._clock(), 3), "metric": metric, "value": round(float(value), 3), "labels": labels}
+        with self._lock:
+            self._buffer.append(record)
+            key = (metric, tuple(sorted(labels.items())))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = deque(maxlen=_HISTOGRAM_SIZE)
+            histogram.append(record["value"])
+            should_flush = len(self._buffer) >= self.flush_every
+        if should_flush:
+            self.flush()
+
+    @contextmanager
+    def timer(self, metric: str, **labels):
+        """Đo thời gian (ms) của khối ``with``; vẫn ghi nhận khi khối ném lỗi."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(metric, (time.perf_counter() - started) * 1000, **labels)
+
+    def flush(self) -> None:
+        """Ghi nối tiếp các observation trong bộ đệm ra file JSONL."""
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+            if not pending or self.path is None:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if self.path.exists() and self.path.stat().st_size > self.max_file_bytes:
+                    os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+                lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in pending)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError as e:
+                logger.warning("Không ghi được metrics vào %s: %s", self.path, e)
+
+    def snapshot(self) -> list[dict]:
+        """Tóm tắt các histogram trong bộ nhớ của tiến trình hiện tại."""
+        with self._lock:
+            items = [(key, sorted(values)) for key, values in self._histograms.items()]
+        return [
+            {"metric": metric, "labels": dict(labels), **_summary(values)}
+            for (metric, labels), values in sorted(items)
+        ]
+
+    def load(self, window_seconds: float | None = None) -> list[dict]:
+        """Observation đã ghi ra đĩa (kể cả bản xoay vòng) trong ``window_seconds`` gần nhất."""
+        self.flush()
+        if self.path is None:
+            return []
+        since = self._clock() - window_seconds if window_seconds else None
+        records = []
+        for path in (self.path.with_name(self.path.name + ".1"), self.path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        if isinstance(record, dict) and (since is None or record.get("ts", 0) >= since):
+                            records.append(record)
+            except OSError:
+                continue
+        return records
+
+
+def _summary(sorted_values: list) -> dict:
+    return {
+        "count": len(sorted_values),
+        "p50": percentile(sorted_values, 50),
+        "p95": percentile(sorted_values, 95),
+        "p99": percentile(sorted_values, 99),
+    }
+
+
+def summarize(records: list[dict]) -> list[dict]:
+    """Nhóm observation theo metric và từng label trong ``REPORT_LABELS``, tính p50/p95/p99."""
+    groups: dict[tuple, list] = {}
+    for record in records:
+        labels = record.get("labels") or {}
+        for name in REPORT_LABELS:
+            if name in labels:
+                groups.setdefault((record["metric"], name, labels[name]), []).append(record["value"])
+    rows = []
+    ordered = sorted(groups.items(), key=lambda item: (item[0][0], REPORT_LABELS.index(item[0][1]), item[0][2]))
+    for (metric, label, value), values in ordered:
+        rows.append({"metric": metric, "label": label, "value": value, **_summary(sorted(values))})
+    return rows
+
+
+_registry: MetricsRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """Registry dùng chung toàn tiến trình (không ghi ra đĩa khi chạy pytest)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry(None if "PYTEST_CURRENT_TEST" in os.environ else get_metrics_path())
+                atexit.register(_registry.flush)
+    return _registry
+
+
+def set_registry(registry: MetricsRegistry | None) -> MetricsRegistry | None:
+    """Thay registry dùng chung (vd. registry chỉ trong bộ nhớ khi đo tải); trả về registry cũ."""
+    global _registry
+    with _registry_lock:
+        previous, _registry = _registry, registry
+    return previous
+
+
+def observe(metric: str, value, **labels) -> None:
+    get_registry().observe(metric, value, **labels)
+
+
+def timer(metric: str, **labels):
+    return get_registry().timer(metric, **labels)
+
+
+def flush() -> None:
+    if _registry is not None:
+        _registry.flush()
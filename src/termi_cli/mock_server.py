@@ -0,0 +1,389 @@
+"""
+Server giả lập endpoint Chat Completions OpenAI-compatible của DeepSeek / Groq.
+
+Dùng để chạy thử và đo tải tầng provider (key pool, rate limiter, circuit breaker, stream
+SSE) mà không tốn quota thật. Server trả lời ``POST .../chat/completions`` (JSON thường hoặc
+SSE khi ``"stream": true``) và ``GET .../models``, với các hành vi cấu hình được:
+
+- độ trễ tới byte đầu tiên theo phân phối ``fixed`` / ``uniform`` / ``lognormal``;
+- tốc độ sinh token (``tokens_per_second``) cho cả response thường lẫn stream;
+- lỗi 429 (ngẫu nhiên theo ``rate_limit_rate`` hoặc khi một key vượt ``rpm_per_key``) và
+  402 (``insufficient_balance_rate``) với đúng thân lỗi mà API thật trả về;
+- rớt kết nối trước khi trả lời (``drop_rate``) hoặc giữa stream (``stream_drop_rate``);
+- body request nén gzip (``Content-Encoding: gzip``): giải nén, hoặc trả 415 khi
+  ``accept_gzip_requests`` tắt (như API thật không hỗ trợ request nén).
+
+Chạy riêng (rồi trỏ termi vào bằng ``TERMI_GROQ_BASE_URL`` / ``TERMI_DEEPSEEK_BASE_URL``)::
+
+    python -m termi_cli.mock_server --flavor groq --port 8080
+
+Cấu hình mặc định đọc từ mục ``mock_server`` trong ``config.json``::
+
+    "mock_server": {
+        "latency": {"distribution": "lognormal", "median_ms": 250, "sigma": 0.5},
+        "tokens_per_second": 200,
+        "rate_limit_rate": 0.05,
+        "rpm_per_key": 30
+    }
+"""
+import gzip
+import json
+import math
+import time
+import random
+import socket
+import logging
+import argparse
+import threading
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from termi_cli.config import load_config
+from termi_cli.rate_limit import key_fingerprint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOCK_SERVER_CONFIG = {
+    # fixed: {"value_ms"}; uniform: {"min_ms", "max_ms"}; lognormal: {"median_ms", "sigma"}
+    "latency": {"distribution": "lognormal", "median_ms": 250, "sigma": 0.5},
+    "tokens_per_second": 200,
+    "completion_tokens": 64,
+    "rate_limit_rate": 0.0,
+    # Số request mỗi phút cho mỗi key trước khi trả 429 (0 = không giới hạn)
+    "rpm_per_key": 0,
+    "retry_after_seconds": 2,
+    "insufficient_balance_rate": 0.0,
+    "drop_rate": 0.0,
+    "stream_drop_rate": 0.0,
+    "accept_gzip_requests": True,
+    "seed": None,
+}
+
+# Tiền tố đường dẫn của từng provider, để base URL giống hệt API thật
+FLAVOR_PREFIXES = {
+    "deepseek": "",
+    "groq": "/openai/v1",
+}
+
+FLAVOR_MODELS = {
+    "deepseek": ["deepseek-chat", "deepseek-reasoner"],
+    "groq": ["llama-3.3-70b-versatile", "llama-3.1-8b-instant"],
+}
+
+_WORDS = ("mock", "token", "stream", "termi", "latency", "reply", "provider", "chunk")
+
+
+def get_mock_server_config() -> dict:
+    return {**DEFAULT_MOCK_SERVER_CONFIG, **(load_config().get("mock_server") or {})}
+
+
+def rate_limit_body(flavor: str, model: str, limit: int, retry_after: float) -> dict:
+    """Thân lỗi 429 theo đúng định dạng của provider."""
+    if flavor == "groq":
+        message = (
+            f"Rate limit reached for model `{model}` in organization `org_mock` service tier `on_demand` "
+            f"on requests per minute (RPM): Limit {limit}, Used {limit}, Requested 1. "
+            f"Please try again in {retry_after:g}s. Visit https://console.groq.com/docs/rate-limits for more information."
+        )
+        return {"error": {"message": message, "type": "requests", "code": "rate_limit_exceeded"}}
+    return {"error": {"message": "Rate Limit Reached", "type": "rate_limit_error", "param": None, "code": "rate_limit_exceeded"}}
+
+
+def insufficient_balance_body(flavor: str) -> dict:
+    """Thân lỗi 402 theo đúng định dạng của provider."""
+    if flavor == "groq":
+        message = "Your organization has insufficient credit balance to complete this request. Please add credits to continue."
+        return {"error": {"message": message, "type": "insufficient_quota", "code": "insufficient_quota"}}
+    return {"error": {"message": "Insufficient Balance", "type": "unknown_error", "param": None, "code": "invalid_request_error"}}
+
+
+def sample_latency(latency: dict, rng: random.Random) -> float:
+    """Độ trễ (giây) lấy mẫu theo cấu hình ``latency``."""
+    distribution = latency.get("distribution", "fixed")
+    if distribution == "uniform":
+        return rng.uniform(latency.get("min_ms", 0), latency.get("max_ms", 0)) / 1000
+    if distribution == "lognormal":
+        median = max(float(latency.get("median_ms", 0)), 1e-3)
+        return rng.lognormvariate(math.log(median), float(latency.get("sigma", 0.5))) / 1000
+    return float(latency.get("value_ms", 0)) / 1000
+
+
+class MockServer:
+    """Server giả lập chạy trên một thread nền; dùng được như context manager."""
+
+    def __init__(self, config: dict | None = None, flavor: str = "groq", host: str = "127.0.0.1", port: int = 0):
+        if flavor not in FLAVOR_PREFIXES:
+            raise ValueError(f"Unknown mock flavor: {flavor!r}")
+        self.config = {**DEFAULT_MOCK_SERVER_CONFIG, **(config or {})}
+        self.flavor = flavor
+        self._rng = random.Random(self.config.get("seed"))
+        self._lock = threading.Lock()
+        self._windows: dict[str, deque] = {}
+        self._stats = Counter()
+        self._by_key: dict[str, Counter] = {}
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{FLAVOR_PREFIXES[self.flavor]}"
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Chạy server ở thread hiện tại cho tới khi bị ngắt (Ctrl+C)."""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self) -> dict:
+        """Số request đã nhận theo kết quả, tổng và theo từng key (fingerprint).
+
+        ``request_bytes`` là số byte body nhận được trên đường truyền (trước khi giải nén).
+        """
+        names = ("requests", "ok", "rate_limited", "insufficient", "dropped", "stream_dropped", "completion_tokens",
+                 "request_bytes", "gzip_requests", "unsupported_encoding")
+        with self._lock:
+            return {
+                **{name: self._stats[name] for name in names},
+                "keys": {fp: dict(counts) for fp, counts in self._by_key.items()},
+            }
+
+    def _count(self, fingerprint: str, outcome: str, tokens: int = 0) -> None:
+        with self._lock:
+            self._stats["requests" if outcome == "received" else outcome] += 1
+            self._stats["completion_tokens"] += tokens
+            self._by_key.setdefault(fingerprint, Counter())[outcome] += 1
+
+    def _add(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def _random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _latency(self) -> float:
+        with self._lock:
+            return sample_latency(self.config["latency"], self._rng)
+
+    def _rpm_retry_after(self, fingerprint: str) -> float | None:
+        """Số giây key phải chờ nếu đã dùng hết ``rpm_per_key``; None nếu còn lượt (và ghi nhận lượt này)."""
+        limit = int(self.config.get("rpm_per_key") or 0)
+        if limit <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(fingerprint, deque())
+            while window and window[0] <= now - 60:
+                window.popleft()
+            if len(window) >= limit:
+                return max(0.001, window[0] + 60 - now)
+            window.append(now)
+        return None
+
+    def decide(self, fingerprint: str) -> tuple[str, float | None]:
+        """Chọn kết quả cho một request: ``ok`` / ``drop`` / ``rate_limited`` / ``insufficient``."""
+        cfg = self.config
+        if self._random() < cfg["drop_rate"]:
+            return "drop", None
+        if self._random() < cfg["insufficient_balance_rate"]:
+            return "insufficient", None
+        retry_after = self._rpm_retry_after(fingerprint)
+        if retry_after is not None:
+            return "rate_limited", math.ceil(retry_after)
+        if self._random() < cfg["rate_limit_rate"]:
+            return "rate_limited", float(cfg["retry_after_seconds"])
+        return "ok", None
+
+    def completion_text(self) -> list[str]:
+        count = max(1, int(self.config["completion_tokens"]))
+        with self._lock:
+            return [self._rng.choice(_WORDS) + " " for _ in range(count)]
+
+
+def _make_handler(server: MockServer):
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status: int, body: dict, headers: dict | None = None) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _drop(self) -> None:
+            # Đóng socket không trả lời gì, giống load balancer cắt kết nối
+            self.close_connection = True
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        def do_GET(self):
+            if not self.path.rstrip("/").endswith("/models"):
+                self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                return
+            models = [{"id": model, "object": "model", "owned_by": "mock"} for model in FLAVOR_MODELS[server.flavor]]
+            self._send_json(200, {"object": "list", "data": models})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length) if length else b""
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                return
+            server._add("request_bytes", len(raw))
+            if (self.headers.get("Content-Encoding") or "").lower() == "gzip":
+                if not server.config["accept_gzip_requests"]:
+                    server._add("unsupported_encoding")
+                    self._send_json(415, {"error": {"message": "Unsupported Content-Encoding: gzip", "type": "invalid_request_error"}})
+                    return
+                server._add("gzip_requests")
+                try:
+                    raw = gzip.decompress(raw)
+                except OSError:
+                    self._send_json(400, {"error": {"message": "Invalid gzip body", "type": "invalid_request_error"}})
+                    return
+            try:
+                payload = json.loads(raw or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+                return
+
+            auth = self.headers.get("Authorization", "")
+            fingerprint = key_fingerprint(auth[len("Bearer "):] if auth.startswith("Bearer ") else None)
+            model = payload.get("model") or FLAVOR_MODELS[server.flavor][0]
+            server._count(fingerprint, "received")
+
+            time.sleep(server._latency())
+            outcome, retry_after = server.decide(fingerprint)
+            if outcome == "drop":
+                server._count(fingerprint, "dropped")
+                self._drop()
+                return
+            if outcome == "insufficient":
+                server._count(fingerprint, "insufficient")
+                self._send_json(402, insufficient_balance_body(server.flavor))
+                return
+            if outcome == "rate_limited":
+                server._count(fingerprint, "rate_limited")
+                limit = int(server.config.get("rpm_per_key") or 0) or 30
+                self._send_json(
+                    429,
+                    rate_limit_body(server.flavor, model, limit, retry_after),
+                    {"Retry-After": f"{retry_after:g}"},
+                )
+                return
+
+            words = server.completion_text()
+            prompt_tokens = max(1, len(json.dumps(payload.get("messages") or [])) // 4)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)}
+            if payload.get("stream"):
+                self._stream(fingerprint, model, words, usage)
+                return
+
+            tps = float(server.config["tokens_per_second"] or 0)
+            if tps > 0:
+                time.sleep(len(words) / tps)
+            server._count(fingerprint, "ok", len(words))
+            self._send_json(200, {
+                "id": f"chatcmpl-mock-{int(time.time() * 1000)}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words).strip()}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def _write_chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _stream(self, fingerprint: str, model: str, words: list[str], usage: dict) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            tps = float(server.config["tokens_per_second"] or 0)
+            drop_at = len(words) // 2 if server._random() < server.config["stream_drop_rate"] else None
+            created = int(time.time())
+            for index, word in enumerate(words):
+                if index == drop_at:
+                    server._count(fingerprint, "stream_dropped")
+                    self._drop()
+                    return
+                chunk = {
+                    "id": f"chatcmpl-mock-{created}",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                if tps > 0:
+                    time.sleep(1 / tps)
+            final = {
+                "id": f"chatcmpl-mock-{created}",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            # Groq trả usage trong ``x_groq``, DeepSeek ở cấp ngoài cùng
+            if server.flavor == "groq":
+                final["x_groq"] = {"usage": usage}
+            else:
+                final["usage"] = usage
+            self._write_chunk(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self._write_chunk(b"")
+            server._count(fingerprint, "ok", len(words))
+
+    return _Handler
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server (DeepSeek / Groq).")
+    parser.add_argument("--flavor", choices=sorted(FLAVOR_PREFIXES), default="groq")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--config", metavar="JSON_FILE", help="Ghi đè cấu hình mock_server bằng file JSON.")
+    args = parser.parse_args(argv)
+
+    config = get_mock_server_config()
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    server = MockServer(config, flavor=args.flavor, host=args.host, port=args.port)
+    print(f"Mock {args.flavor} server: {server.base_url}  (export TERMI_{args.flavor.upper()}_BASE_URL={server.base_url})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
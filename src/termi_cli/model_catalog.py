@@ -0,0 +1,155 @@
+"""
+Catalog model lưu trên đĩa cho cả ba provider (Gemini, DeepSeek, Groq).
+
+Trước đây mỗi lượt chat gọi ``genai.get_model`` chỉ để đọc ``input_token_limit``, còn
+``--list-models`` / ``--set-model`` phân trang lại ``genai.list_models()`` từ đầu. Giờ danh
+sách model (kèm token limit) được cache trong ``APP_DIR/cache/model_catalog.json``:
+
+- Chưa có dữ liệu của provider: lấy đồng bộ một lần.
+- Dữ liệu quá TTL (mặc định 24 giờ, ``"model_catalog": {"ttl_hours": 24}`` trong config):
+  trả về dữ liệu cũ ngay và làm mới ở thread nền.
+- Lấy danh sách lỗi (mất mạng, key hỏng...): lần lỗi được ghi lại và trong
+  ``failure_backoff_minutes`` (mặc định 5) không gọi lại, chỉ dùng dữ liệu cũ (hoặc không có
+  gì, caller dùng limit mặc định) thay vì lấy đồng bộ lại ở mỗi lượt chat.
+- ``termi --refresh-models``: làm mới ngay lập tức.
+
+Module không tự gọi API: ``api.py`` truyền vào các hàm ``fetchers[provider]() -> list[dict]``,
+mỗi dict gồm ``name``, ``description``, ``input_token_limit``, ``output_token_limit``,
+``generation_methods``.
+"""
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+
+from termi_cli.config import APP_DIR, atomic_write_json, load_config
+
+logger = logging.getLogger(__name__)
+
+_CATALOG_VERSION = 1
+
+DEFAULT_TTL_HOURS = 24
+DEFAULT_FAILURE_BACKOFF_MINUTES = 5
+
+
+def get_catalog_path() -> Path:
+    return APP_DIR / "cache" / "model_catalog.json"
+
+
+def get_ttl_seconds() -> float:
+    cfg = load_config().get("model_catalog") or {}
+    return float(cfg.get("ttl_hours", DEFAULT_TTL_HOURS)) * 3600
+
+
+def get_failure_backoff_seconds() -> float:
+    cfg = load_config().get("model_catalog") or {}
+    return float(cfg.get("failure_backoff_minutes", DEFAULT_FAILURE_BACKOFF_MINUTES)) * 60
+
+
+class ModelCatalog:
+    """Danh sách model theo provider, cache trên đĩa với TTL và làm mới nền."""
+
+    def __init__(self, path: Path | str, fetchers: dict, ttl_seconds: float, clock=time.time,
+                 failure_backoff_seconds: float = DEFAULT_FAILURE_BACKOFF_MINUTES * 60):
+        self.path = Path(path)
+        self.fetchers = fetchers
+        self.ttl_seconds = float(ttl_seconds)
+        self.failure_backoff_seconds = float(failure_backoff_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = None
+        self._refreshing: set[str] = set()
+
+    def _load(self) -> dict:
+        if self._data is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if not isinstance(data, dict) or data.get("version") != _CATALOG_VERSION:
+                    data = None
+            except (OSError, ValueError):
+                data = None
+            self._data = data or {"version": _CATALOG_VERSION, "providers": {}}
+            # Thời điểm lần lấy danh sách gần nhất bị lỗi, theo provider
+            self._data.setdefault("failures", {})
+        return self._data
+
+    def _save(self) -> None:
+        try:
+            atomic_write_json(self.path, self._data, ensure_ascii=False, indent=2)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Không ghi được model catalog %s: %s", self.path, e)
+
+    def refresh(self, providers=None) -> dict[str, int]:
+        """Lấy lại danh sách model ngay; trả về số model theo provider (lỗi được log và bỏ qua)."""
+        counts = {}
+        for provider in providers or list(self.fetchers):
+            fetcher = self.fetchers.get(provider)
+            if fetcher is None:
+                continue
+            try:
+                models = list(fetcher())
+            except Exception as e:
+                logger.warning("Không lấy được danh sách model %s: %s", provider, e)
+                with self._lock:
+                    self._load()["failures"][provider] = self._clock()
+                    self._save()
+                continue
+            with self._lock:
+                data = self._load()
+                data["providers"][provider] = {"fetched_at": self._clock(), "models": models}
+                data["failures"].pop(provider, None)
+                self._save()
+            counts[provider] = len(models)
+        return counts
+
+    def _refresh_in_background(self, provider: str) -> None:
+        with self._lock:
+            if provider in self._refreshing:
+                return
+            self._refreshing.add(provider)
+
+        def _run():
+            try:
+                self.refresh([provider])
+            finally:
+                with self._lock:
+                    self._refreshing.discard(provider)
+
+        threading.Thread(target=_run, name=f"model-catalog-{provider}", daemon=True).start()
+
+    def failed_recently(self, provider: str) -> bool:
+        """True khi lần lấy danh sách gần nhất của ``provider`` lỗi và chưa hết thời gian chờ."""
+        with self._lock:
+            failed_at = self._load()["failures"].get(provider)
+        return failed_at is not None and self._clock() - float(failed_at) < self.failure_backoff_seconds
+
+    def models(self, provider: str) -> list[dict]:
+        """Model của ``provider`` từ cache (lấy đồng bộ nếu chưa có, làm mới nền nếu quá TTL).
+
+        Trong thời gian chờ sau một lần lấy lỗi thì không gọi lại, chỉ trả về dữ liệu đang có.
+        """
+        with self._lock:
+            entry = self._load()["providers"].get(provider)
+        if self.failed_recently(provider):
+            return list(entry["models"]) if entry else []
+        if entry is None:
+            self.refresh([provider])
+            with self._lock:
+                entry = self._load()["providers"].get(provider)
+            return list(entry["models"]) if entry else []
+        if self._clock() - float(entry.get("fetched_at", 0)) > self.ttl_seconds:
+            self._refresh_in_background(provider)
+        return list(entry["models"])
+
+    def find(self, model_name: str) -> dict | None:
+        """Tìm model đã cache theo tên (chấp nhận cả ``gemini-x`` lẫn ``models/gemini-x``)."""
+        candidates = {model_name, f"models/{model_name}", model_name.removeprefix("models/")}
+        with self._lock:
+            providers = self._load()["providers"]
+            for entry in providers.values():
+                for model in entry.get("models", []):
+                    if model.get("name") in candidates:
+                        return model
+        return None
@@ -0,0 +1,228 @@
+"""
+Router chọn model theo ``model_fallback_order`` dựa trên độ trễ và tỉ lệ lỗi gần đây.
+
+Mỗi model có một hồ sơ trượt (tối đa ``window`` kết quả gần nhất, bỏ các kết quả cũ hơn
+``window_seconds``) gồm độ trễ của các lần gọi thành công và số lần lỗi:
+
+- Model hết quota (mọi key đều bị rate limit / hết credit) hoặc có provider đang bị circuit
+  breaker chặn bị coi là *degraded* trong ``degrade_seconds``.
+- Model có tỉ lệ lỗi từ ``error_rate`` trở lên (sau ít nhất ``min_samples`` lần gọi)
+  cũng bị degraded.
+- Model có trung vị thời gian tới token đầu tiên (TTFT) vượt ``slow_ms`` bị coi là *chậm*:
+  vẫn dùng được nhưng xếp sau các model khoẻ khác. TTFT không phụ thuộc độ dài câu trả lời,
+  nên model trả lời dài (reasoner, pro) không bị coi là chậm chỉ vì viết nhiều.
+
+Khi model được yêu cầu đang degraded, router thử lần lượt các model trong
+``model_fallback_order``; model đang degraded chỉ được thử khi không còn lựa chọn nào khác.
+Model được yêu cầu mà chỉ chậm thì vẫn được giữ, trừ khi bật ``reroute_slow``.
+Cấu hình trong ``config.json``::
+
+    "router": {
+        "enabled": true,
+        "slow_ms": 8000,
+        "reroute_slow": false,
+        "degrade_seconds": 120,
+        "error_rate": 0.5,
+        "window": 20
+    }
+"""
+import time
+import logging
+import statistics
+import threading
+from collections import deque
+
+from termi_cli.config import load_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTER_CONFIG = {
+    "enabled": True,
+    "slow_ms": 8000,
+    "reroute_slow": False,
+    "degrade_seconds": 120,
+    "error_rate": 0.5,
+    "min_samples": 3,
+    "window": 20,
+    "window_seconds": 600,
+}
+
+# Lý do fallback mà ``classify`` trả về
+EXHAUSTED = "exhausted"
+UNAVAILABLE = "unavailable"
+ERROR = "error"
+
+
+def get_router_config() -> dict:
+    return {**DEFAULT_ROUTER_CONFIG, **(load_config().get("router") or {})}
+
+
+class _Profile:
+    """Các kết quả gần đây của một model: ``(timestamp, latency_seconds | None, ok)``."""
+
+    def __init__(self, window: int):
+        self.samples: deque = deque(maxlen=max(1, int(window)))
+        self.degraded_until = 0.0
+
+    def prune(self, now: float, max_age: float) -> None:
+        while self.samples and now - self.samples[0][0] > max_age:
+            self.samples.popleft()
+
+
+class ModelRouter:
+    """Hồ sơ độ trễ/lỗi theo model và thứ tự thử model cho mỗi request."""
+
+    def __init__(self, config: dict | None = None, fallback_order=None, clock=time.monotonic):
+        self._config = config
+        self._fallback_order = fallback_order
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._profiles: dict[str, _Profile] = {}
+
+    def _settings(self) -> dict:
+        return self._config if self._config is not None else get_router_config()
+
+    def _order(self) -> list[str]:
+        if self._fallback_order is not None:
+            return list(self._fallback_order)
+        return list(load_config().get("model_fallback_order") or [])
+
+    def _profile(self, model: str) -> _Profile:
+        profile = self._profiles.get(model)
+        if profile is None:
+            profile = self._profiles[model] = _Profile(self._settings().get("window", 20))
+        return profile
+
+    def record_success(self, model: str, latency: float) -> None:
+        """Ghi một lần gọi thành công; ``latency`` là thời gian (giây) tới token đầu tiên."""
+        with self._lock:
+            self._profile(model).samples.append((self._clock(), float(latency), True))
+
+    def record_failure(self, model: str, reason: str = ERROR) -> None:
+        """Ghi một lần lỗi; hết quota hoặc tỉ lệ lỗi cao thì đánh dấu model degraded."""
+        cfg = self._settings()
+        now = self._clock()
+        with self._lock:
+            profile = self._profile(model)
+            profile.samples.append((now, None, False))
+            profile.prune(now, float(cfg["window_seconds"]))
+            failures = sum(1 for _, _, ok in profile.samples if not ok)
+            too_many_errors = (
+                len(profile.samples) >= int(cfg["min_samples"])
+                and failures / len(profile.samples) >= float(cfg["error_rate"])
+            )
+            if reason in (EXHAUSTED, UNAVAILABLE) or too_many_errors:
+                profile.degraded_until = max(profile.degraded_until, now + float(cfg["degrade_seconds"]))
+                logger.info("Model %s bị đánh dấu degraded (%s)", model, reason)
+
+    def is_degraded(self, model: str) -> bool:
+        with self._lock:
+            profile = self._profiles.get(model)
+            return profile is not None and profile.degraded_until > self._clock()
+
+    def median_latency(self, model: str) -> float | None:
+        """Trung vị TTFT (giây) của các lần gọi thành công còn trong cửa sổ."""
+        cfg = self._settings()
+        with self._lock:
+            profile = self._profiles.get(model)
+            if profile is None:
+                return None
+            profile.prune(self._clock(), float(cfg["window_seconds"]))
+            latencies = [latency for _, latency, ok in profile.samples if ok]
+        return statistics.median(latencies) if latencies else None
+
+    def is_slow(self, model: str) -> bool:
+        latency = self.median_latency(model)
+        return latency is not None and latency * 1000 > float(self._settings()["slow_ms"])
+
+    def candidates(self, model: str, accept=None) -> list[str]:
+        """Thứ tự thử: model khoẻ trước (model yêu cầu đứng đầu), rồi model chậm, cuối cùng model degraded.
+
+        Model yêu cầu chỉ bị xếp vào nhóm chậm khi bật ``reroute_slow``. ``accept(model) -> bool``
+        lọc bớt các model trong ``model_fallback_order`` (ví dụ chỉ giữ model Gemini khi cần
+        tool-calling). Khi router tắt chỉ trả về ``[model]``.
+        """
+        settings = self._settings()
+        if not settings.get("enabled", True):
+            return [model]
+        reroute_slow = settings.get("reroute_slow", False)
+        ordered = [model]
+        for name in self._order():
+            if name and name not in ordered and (accept is None or accept(name)):
+                ordered.append(name)
+        healthy, slow, degraded = [], [], []
+        for name in ordered:
+            if self.is_degraded(name):
+                degraded.append(name)
+            elif self.is_slow(name) and (name != model or reroute_slow):
+                slow.append(name)
+            else:
+                healthy.append(name)
+        return healthy + slow + degraded
+
+    def choose(self, model: str, accept=None) -> str:
+        """Model nên dùng cho request tiếp theo thay cho ``model``."""
+        return self.candidates(model, accept)[0]
+
+    def next_model(self, model: str, tried=(), accept=None) -> str | None:
+        """Model kế tiếp chưa thử (và không degraded) sau khi ``model`` thất bại."""
+        for name in self.candidates(model, accept):
+            if name != model and name not in tried and not self.is_degraded(name):
+                return name
+        return None
+
+    def call(self, model: str, fn, classify, accept=None):
+        """Gọi ``fn(candidate)`` lần lượt theo ``candidates`` và trả về ``(model_used, result)``.
+
+        ``classify(exc)`` trả về ``EXHAUSTED`` / ``UNAVAILABLE`` / ``ERROR`` nếu lỗi đáng để chuyển model,
+        ``None`` nếu phải ném ra ngay (lỗi tham số, lỗi xác thực...). Khi mọi model đều
+        thất bại, lỗi của model đầu tiên được ném lại.
+        """
+        first_error = None
+        for candidate in self.candidates(model, accept):
+            started = self._clock()
+            try:
+                result = fn(candidate)
+            except Exception as e:
+                reason = classify(e)
+                if reason is None:
+                    raise
+                self.record_failure(candidate, reason)
+                logger.warning("Model %s lỗi (%s): %s. Thử model kế tiếp.", candidate, reason, e)
+                first_error = first_error or e
+                continue
+            # Không stream nên chỉ đo được cả lần gọi (cận trên của TTFT)
+            self.record_success(candidate, self._clock() - started)
+            return candidate, result
+        raise first_error
+
+    def status(self) -> list[dict]:
+        """Hồ sơ hiện tại của các model đã dùng (cho diagnostics)."""
+        with self._lock:
+            models = sorted(self._profiles)
+        rows = []
+        for model in models:
+            with self._lock:
+                samples = list(self._profiles[model].samples)
+            rows.append({
+                "model": model,
+                "requests": len(samples),
+                "errors": sum(1 for _, _, ok in samples if not ok),
+                "median_latency": self.median_latency(model),
+                "degraded": self.is_degraded(model),
+            })
+        return rows
+
+
+_router: ModelRouter | None = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """Router dùng chung toàn tiến trình (đọc config mỗi lần, nên đổi config có hiệu lực ngay)."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
@@ -1,18 +1,20 @@
+import hashlib
 from datetime import datetime
+from functools import lru_cache
 
-def build_enhanced_instruction(cli_help_text: str = "") -> str:
-    """
-    Xây dựng chuỗi system instruction nâng cao, với các quy tắc cực kỳ nghiêm ngặt.
+
+@lru_cache(maxsize=8)
+def build_stable_instruction(cli_help_text: str = "") -> str:
     """
-    current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    Phần cố định của system instruction (quy tắc, tools, ``--help`` của CLI).
 
+    Không chứa gì thay đổi theo thời gian, nên cùng một ``cli_help_text`` luôn cho cùng một
+    chuỗi: provider có thể cache prefix này và các lần tạo lại session không phải dựng lại.
+    """
     instruction_template = f"""
 You are a powerful AI assistant integrated into a command-line interface (CLI).
 Your goal is to be as helpful, accurate, and direct as possible.
 
-**CURRENT CONTEXT:**
-- The current date and time is: {current_datetime}.
-
 **YOUR CAPABILITIES:**
 
 **1. Internal Tools (Function Calling):**
@@ -48,6 +50,41 @@ Use this as the **single source of truth** to answer any questions about the app
     return instruction_template
 
 
+def build_volatile_context(now: datetime | None = None, with_time: bool = True) -> str:
+    """Phần thay đổi theo thời gian, luôn đặt ở cuối system instruction."""
+    now = now or datetime.now()
+    current = now.strftime("%Y-%m-%d %H:%M") if with_time else now.strftime("%Y-%m-%d")
+    label = "date and time" if with_time else "date"
+    return f"""
+**CURRENT CONTEXT:**
+- The current {label} is: {current}.
+"""
+
+
+def build_session_instruction(cli_help_text: str = "", system_instruction: str | None = None) -> str:
+    """Phần cố định của system instruction cho chat session, kèm chỉ dẫn riêng của người dùng.
+
+    Chỉ dẫn của người dùng (persona, saved instructions) đứng sau prefix chung để các
+    persona khác nhau vẫn dùng chung được phần prefix đã cache.
+    """
+    stable = build_stable_instruction(cli_help_text)
+    if system_instruction:
+        stable = f"{stable}\n---\n\n**PRIMARY DIRECTIVE (User-defined rules, these take precedence):**\n{system_instruction}\n"
+    return stable
+
+
+def instruction_fingerprint(text: str) -> str:
+    """Hash nội dung của phần instruction cố định (dùng làm khoá cache)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def build_enhanced_instruction(cli_help_text: str = "") -> str:
+    """
+    Xây dựng chuỗi system instruction nâng cao, với các quy tắc cực kỳ nghiêm ngặt.
+    """
+    return build_stable_instruction(cli_help_text) + build_volatile_context()
+
+
 def build_agent_instruction() -> str:
     from termi_cli import api
     tool_list = "\n".join([f"- `{name}`" for name in api.AVAILABLE_TOOLS.keys()])
@@ -165,8 +202,8 @@ def build_executor_instruction() -> str:
     """
     from termi_cli import api
     tool_definitions = ""
-    for func in api.AVAILABLE_TOOLS.values():
-        tool_definitions += f"- `{func.__name__}`: {func.__doc__.strip().splitlines()[0]}\n"
+    for name in api.AVAILABLE_TOOLS.keys():
+        tool_definitions += f"- `{name}`: {api.describe_tool(name)}\n"
 
     instruction = f"""
 You are an expert AI developer, the "Executor". Your goal is to execute a development plan step-by-step using the available tools.
@@ -0,0 +1,204 @@
+"""
+Registry các provider OpenAI-compatible (DeepSeek, Groq và server tự cấu hình).
+
+Model được định tuyến theo tiền tố tên: ``deepseek-*`` -> DeepSeek, ``groq-*`` -> Groq,
+tiền tố khai báo trong mục ``providers`` của ``config.json`` -> provider tương ứng, còn lại
+là Gemini. Mọi provider trong registry dùng chung đường gọi Chat Completions của ``api``
+(key pool, rate limiter, circuit breaker, retry, SSE).
+
+Ví dụ trỏ termi vào server llama.cpp / vLLM cục bộ::
+
+    "providers": {
+        "local": {
+            "prefix": "local-",
+            "base_url": "http://127.0.0.1:8080/v1",
+            "label": "llama.cpp",
+            "models": {"chat": "qwen2.5-7b-instruct"},
+            "rate_limits": {}
+        }
+    }
+
+- ``api_key_env``: tiền tố biến môi trường chứa key (``PREFIX``, ``PREFIX_2ND``...).
+  Bỏ trống thì gọi không kèm ``Authorization`` (server cục bộ thường không cần key).
+- ``models``: alias -> tên model thật (``local-chat`` -> ``qwen2.5-7b-instruct``).
+- ``strip_prefix``: bỏ tiền tố trước khi gửi tên model lên server (mặc định bật).
+- ``compress_requests``: nén gzip body lớn (``Content-Encoding: gzip``) khi server nhận
+  được (vd. đứng sau nginx có giải nén request). Mặc định tắt; server trả 400/415/422 cho
+  body nén thì tự quay về gửi không nén.
+- ``rate_limits``: ``{"rpm", "tpm", "burst"}`` như mục ``rate_limits``; provider tự cấu
+  hình không khai báo thì không bị throttle.
+- ``base_url`` vẫn đổi được bằng ``TERMI_<NAME>_BASE_URL``.
+
+Khai báo trùng tên ``deepseek`` / ``groq`` thì ghi đè từng trường của provider có sẵn
+(alias được gộp thêm vào bảng alias mặc định).
+"""
+import os
+import logging
+from collections.abc import Mapping
+
+from termi_cli.config import load_config
+
+logger = logging.getLogger(__name__)
+
+GEMINI = "gemini"
+
+
+class ProviderInsufficientBalance(Exception):
+    """Provider trả về lỗi thiếu credit (HTTP 402 / "insufficient balance")."""
+
+    label = "Provider"
+
+    def __init__(self, message: str = "", label: str | None = None):
+        super().__init__(message)
+        if label is not None:
+            self.label = label
+
+
+class DeepseekInsufficientBalance(ProviderInsufficientBalance):
+    """Báo hiệu DeepSeek trả về lỗi thiếu credit (HTTP 402 / Insufficient Balance)."""
+
+    label = "DeepSeek"
+
+
+class GroqInsufficientBalance(ProviderInsufficientBalance):
+    """Báo hiệu Groq Cloud trả về lỗi thiếu credit (HTTP 402 / Insufficient)."""
+
+    label = "Groq"
+
+
+def is_insufficient(status: int, lower_body: str) -> bool:
+    """Lỗi thiếu credit theo cách DeepSeek / Groq / OpenAI báo (status 402 hoặc nội dung body)."""
+    return status == 402 or (
+        "insufficient" in lower_body
+        and ("credit" in lower_body or "balance" in lower_body or "quota" in lower_body)
+    )
+
+
+class ProviderSpec:
+    """Mô tả một provider OpenAI-compatible trong registry."""
+
+    def __init__(self, name: str, prefix: str | None = None, base_url: str = "", label: str | None = None,
+                 api_key_env: str | None = None, models: dict | None = None, strip_prefix: bool = True,
+                 compress_requests: bool = False, insufficient_exc: type[ProviderInsufficientBalance] = ProviderInsufficientBalance):
+        self.name = name
+        self.prefix = prefix or f"{name}-"
+        self.label = label or name
+        self.api_key_env = api_key_env or None
+        self.models = dict(models or {})
+        self.strip_prefix = bool(strip_prefix)
+        self.compress_requests = bool(compress_requests)
+        self.insufficient_exc = insufficient_exc
+        self._base_url = base_url
+
+    @property
+    def base_url(self) -> str:
+        override = os.getenv(f"TERMI_{self.name.upper().replace('-', '_')}_BASE_URL")
+        return (override or self._base_url).rstrip("/")
+
+    def matches(self, model_name: str) -> bool:
+        return model_name.startswith(self.prefix)
+
+    def model_id(self, model_name: str) -> str:
+        """Tên model gửi lên server: bỏ tiền tố (nếu cấu hình) rồi tra bảng alias."""
+        raw = model_name
+        if model_name.startswith(self.prefix):
+            raw = model_name[len(self.prefix):] or model_name
+        if raw in self.models:
+            return self.models[raw]
+        return raw if self.strip_prefix else model_name
+
+    def catalog_name(self, model_name: str) -> str:
+        """Tên model trong catalog (luôn mang tiền tố, như ``_fetch_openai_compatible_models``)."""
+        model_id = self.model_id(model_name)
+        return model_id if model_id.startswith(self.prefix) else f"{self.prefix}{model_id}"
+
+    def insufficient(self, message: str) -> ProviderInsufficientBalance:
+        return self.insufficient_exc(message, label=self.label)
+
+
+_BUILTIN = {
+    "deepseek": {
+        "label": "DeepSeek",
+        "base_url": "https://api.deepseek.com",
+        "api_key_env": "DEEPSEEK_API_KEY",
+        # DeepSeek nhận nguyên tên "deepseek-chat" / "deepseek-reasoner"
+        "strip_prefix": False,
+        "insufficient_exc": DeepseekInsufficientBalance,
+    },
+    "groq": {
+        "label": "Groq",
+        "base_url": "https://api.groq.com/openai/v1",
+        "api_key_env": "GROQ_API_KEY",
+        "models": {
+            # Alias thân thiện cho chat tổng quát (dùng model Groq khuyến nghị mới)
+            "chat": "llama-3.3-70b-versatile",
+            # Một số alias rút gọn thường gặp
+            "llama-3.1-70b": "llama-3.3-70b-versatile",
+            "llama3-70b": "llama-3.3-70b-versatile",
+            "llama3-8b": "llama3-8b-8192",
+        },
+        "insufficient_exc": GroqInsufficientBalance,
+    },
+}
+
+# ``rate_limits`` do ``rate_limit.RateLimiter.limits_for`` đọc thẳng từ config
+_SPEC_FIELDS = ("prefix", "base_url", "label", "api_key_env", "models", "strip_prefix", "compress_requests")
+
+# (mục ``providers`` của config đã dựng, registry tương ứng); load_config trả về cùng
+# một object cho tới khi file đổi nên chỉ dựng lại khi config thực sự thay đổi
+_registry_cache: tuple | None = None
+
+
+def _build(name: str, user: dict) -> ProviderSpec | None:
+    fields = dict(_BUILTIN.get(name, {}))
+    for field in _SPEC_FIELDS:
+        if field not in user:
+            continue
+        if field == "models":
+            fields["models"] = {**fields.get("models", {}), **(user["models"] or {})}
+        else:
+            fields[field] = user[field]
+    if not fields.get("base_url"):
+        logger.warning("Provider '%s' trong config.json thiếu base_url, bỏ qua.", name)
+        return None
+    return ProviderSpec(name, **fields)
+
+
+def registry() -> dict[str, ProviderSpec]:
+    """Các provider OpenAI-compatible hiện có (có sẵn + khai báo trong ``config.json``)."""
+    global _registry_cache
+    section = load_config().get("providers")
+    cached = _registry_cache
+    if cached is not None and cached[0] is section:
+        return cached[1]
+
+    configured = section if isinstance(section, Mapping) else {}
+    specs = {}
+    for name in [*_BUILTIN, *(n for n in configured if n not in _BUILTIN)]:
+        if name == GEMINI:
+            continue
+        user = configured.get(name)
+        spec = _build(name, user if isinstance(user, Mapping) else {})
+        if spec is not None:
+            specs[name] = spec
+    _registry_cache = (section, specs)
+    return specs
+
+
+def get(name: str) -> ProviderSpec:
+    """Spec theo tên provider; KeyError nếu không có trong registry."""
+    return registry()[name]
+
+
+def resolve(model_name: str) -> ProviderSpec | None:
+    """Provider phục vụ ``model_name``; None nghĩa là Gemini.
+
+    Tiền tố dài nhất được ưu tiên, nên ``groq-local-`` không bị nhầm sang ``groq-``.
+    """
+    matching = [spec for spec in registry().values() if spec.matches(model_name)]
+    return max(matching, key=lambda spec: len(spec.prefix)) if matching else None
+
+
+def provider_of(model_name: str) -> str:
+    spec = resolve(model_name)
+    return spec.name if spec is not None else GEMINI
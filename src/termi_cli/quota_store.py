@@ -0,0 +1,176 @@
+"""
+Trạng thái quota/cooldown của API key dùng chung giữa các tiến trình termi trên cùng máy.
+
+Lưu trong SQLite (``APP_DIR/quota.db``, chế độ WAL) để nhiều terminal, cron job hay
+daemon cùng biết key nào đang bị rate limit hoặc đã hết quota ngày, thay vì mỗi tiến
+trình phải tự gọi thử vào key "chết" mới phát hiện ra. Mỗi dòng gồm:
+
+- ``cooldown_until``: epoch tới khi key hết bị chặn vì lỗi RPM.
+- ``exhausted_until``: epoch tới khi quota ngày được reset.
+- ``requests`` / ``window_end``: bộ đếm request trong cửa sổ quota ngày hiện tại.
+
+Bảng ``breaker_state`` lưu trạng thái circuit breaker của từng provider (xem
+``circuit_breaker.py``) để mọi tiến trình cùng fail-fast khi endpoint đang sập.
+
+Key chỉ được lưu dưới dạng fingerprint (``rate_limit.key_fingerprint``), không lưu giá trị.
+Mọi lỗi SQLite (file bị khoá quá lâu, thư mục chỉ đọc...) chỉ được log, không làm hỏng request.
+"""
+import os
+import time
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+from termi_cli.config import APP_DIR
+
+logger = logging.getLogger(__name__)
+
+# Chờ tối đa bấy nhiêu giây khi tiến trình khác đang ghi
+_BUSY_TIMEOUT_SECONDS = 2.0
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS key_state (
+        provider TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        cooldown_until REAL NOT NULL DEFAULT 0,
+        exhausted_until REAL NOT NULL DEFAULT 0,
+        requests INTEGER NOT NULL DEFAULT 0,
+        window_end REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (provider, fingerprint)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS breaker_state (
+        name TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        failures INTEGER NOT NULL DEFAULT 0,
+        opened_until REAL NOT NULL DEFAULT 0,
+        updated REAL NOT NULL DEFAULT 0
+    )
+    """,
+)
+
+
+def get_store_path() -> Path:
+    """Đường dẫn DB (ghi đè được bằng biến môi trường ``TERMI_QUOTA_DB``)."""
+    return Path(os.getenv("TERMI_QUOTA_DB") or (APP_DIR / "quota.db"))
+
+
+class QuotaStore:
+    """Kho trạng thái quota theo (provider, fingerprint của key)."""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3.Connection không nên dùng chung giữa các thread -> mỗi thread một kết nối
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, sql: str, params=()) -> list:
+        try:
+            return self._connect().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Không truy cập được quota store %s: %s", self.path, e)
+            return []
+
+    def load(self, provider: str, now: float | None = None) -> dict[str, dict]:
+        """Trạng thái các key của ``provider``: ``{fingerprint: {cooldown_until, exhausted_until, requests}}``."""
+        now = time.time() if now is None else now
+        rows = self._execute(
+            "SELECT fingerprint, cooldown_until, exhausted_until, requests, window_end "
+            "FROM key_state WHERE provider = ?",
+            (provider,),
+        )
+        return {
+            fp: {
+                "cooldown_until": cooldown_until,
+                "exhausted_until": exhausted_until,
+                # Bộ đếm của cửa sổ đã qua không còn ý nghĩa
+                "requests": requests if window_end > now else 0,
+            }
+            for fp, cooldown_until, exhausted_until, requests, window_end in rows
+        }
+
+    def set_cooldown(self, provider: str, fingerprint: str, until: float) -> None:
+        """Ghi cooldown (chỉ kéo dài, không rút ngắn giá trị do tiến trình khác ghi)."""
+        self._execute(
+            "INSERT INTO key_state (provider, fingerprint, cooldown_until) VALUES (?, ?, ?) "
+            "ON CONFLICT (provider, fingerprint) DO UPDATE SET "
+            "cooldown_until = MAX(cooldown_until, excluded.cooldown_until)",
+            (provider, fingerprint, until),
+        )
+
+    def set_exhausted(self, provider: str, fingerprint: str, until: float) -> None:
+        """Đánh dấu key hết quota ngày tới ``until``."""
+        self._execute(
+            "INSERT INTO key_state (provider, fingerprint, exhausted_until) VALUES (?, ?, ?) "
+            "ON CONFLICT (provider, fingerprint) DO UPDATE SET "
+            "exhausted_until = MAX(exhausted_until, excluded.exhausted_until)",
+            (provider, fingerprint, until),
+        )
+
+    def record_request(self, provider: str, fingerprint: str, window_end: float) -> None:
+        """Tăng bộ đếm request của key; ``window_end`` là thời điểm reset quota ngày kế tiếp."""
+        self._execute(
+            "INSERT INTO key_state (provider, fingerprint, requests, window_end) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT (provider, fingerprint) DO UPDATE SET "
+            "requests = CASE WHEN window_end = excluded.window_end THEN requests + 1 ELSE 1 END, "
+            "window_end = excluded.window_end",
+            (provider, fingerprint, window_end),
+        )
+
+    def load_breakers(self) -> dict[str, dict]:
+        """Trạng thái circuit breaker: ``{name: {state, failures, opened_until, updated}}``."""
+        rows = self._execute("SELECT name, state, failures, opened_until, updated FROM breaker_state")
+        return {
+            name: {"state": state, "failures": failures, "opened_until": opened_until, "updated": updated}
+            for name, state, failures, opened_until, updated in rows
+        }
+
+    def save_breaker(self, name: str, state: str, failures: int, opened_until: float, updated: float) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO breaker_state (name, state, failures, opened_until, updated) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (name, state, failures, opened_until, updated),
+        )
+
+    def clear(self, provider: str | None = None) -> None:
+        """Xoá trạng thái (của một provider hoặc tất cả)."""
+        if provider is None:
+            self._execute("DELETE FROM key_state")
+        else:
+            self._execute("DELETE FROM key_state WHERE provider = ?", (provider,))
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_store: QuotaStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> QuotaStore | None:
+    """Store dùng chung toàn tiến trình; ``None`` khi tắt (``TERMI_NO_QUOTA_STORE``) hoặc khi chạy pytest."""
+    global _store
+    if os.getenv("TERMI_NO_QUOTA_STORE") or "PYTEST_CURRENT_TEST" in os.environ:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = QuotaStore(get_store_path())
+    return _store
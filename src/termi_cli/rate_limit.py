@@ -0,0 +1,164 @@
+"""
+Rate limiter token-bucket theo (provider, API key, model).
+
+Thay cho các khoảng nghỉ cố định trước đây (10s cho Gemini, 2s DeepSeek, 1s Groq):
+mỗi tổ hợp (provider, key, model) có một bucket RPM và (tuỳ chọn) một bucket TPM.
+Request chỉ phải chờ khi bucket thực sự cạn, nên key trả phí / model có RPM cao
+không bị chậm vô ích, còn burst nhỏ vẫn được phép.
+
+Giới hạn lấy theo thứ tự ưu tiên:
+
+1. ``config["rate_limits"][<model>]``
+2. ``config["rate_limits"][<provider>]`` (``gemini`` / ``deepseek`` / ``groq`` / tên provider tự cấu hình)
+3. ``config["providers"][<provider>]["rate_limits"]`` (xem ``providers``)
+4. ``config.MODEL_RPM_LIMITS[<model>]``
+5. ``DEFAULT_PROVIDER_LIMITS[<provider>]``; provider tự cấu hình không có mặc định (không throttle)
+
+Mỗi mục có dạng ``{"rpm": 15, "tpm": 1000000, "burst": 3}``; thiếu ``burst`` thì
+mặc định khoảng 1/5 RPM (tối thiểu 1), thiếu ``tpm`` thì không giới hạn token.
+"""
+import time
+import hashlib
+import logging
+import threading
+
+from termi_cli.config import MODEL_RPM_LIMITS, load_config
+
+logger = logging.getLogger(__name__)
+
+# Mặc định khi model không có cấu hình riêng (tương đương các khoảng nghỉ cũ, nhưng cho burst)
+DEFAULT_PROVIDER_LIMITS = {
+    "gemini": {"rpm": 6},
+    "deepseek": {"rpm": 30},
+    "groq": {"rpm": 30},
+}
+
+
+def key_fingerprint(api_key: str | None) -> str:
+    """Định danh ngắn, không lộ giá trị, cho một API key."""
+    if not api_key:
+        return "-"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def estimate_tokens(payload) -> int:
+    """Ước lượng thô số token (~4 ký tự/token) dùng khi giữ chỗ TPM trước request."""
+    return max(1, len(str(payload)) // 4)
+
+
+class TokenBucket:
+    """Bucket với tốc độ nạp ``rate`` token/giây và dung lượng ``capacity``.
+
+    ``reserve`` trừ token ngay (có thể âm) và trả về thời gian cần chờ, nên nhiều
+    thread cùng gọi sẽ được xếp lịch nối tiếp nhau thay vì cùng thức dậy một lúc.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Giữ chỗ ``amount`` token; trả về số giây cần chờ trước khi dùng."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            # Một request lớn hơn cả dung lượng bucket vẫn phải được phép đi (sau khi chờ đầy)
+            amount = min(float(amount), self.capacity)
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Điều chỉnh sau khi biết số token thực tế (dương = trừ thêm, âm = hoàn lại)."""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class _Limits:
+    __slots__ = ("rpm", "tpm")
+
+    def __init__(self, rpm: TokenBucket | None, tpm: TokenBucket | None):
+        self.rpm = rpm
+        self.tpm = tpm
+
+
+class RateLimiter:
+    """Tập các bucket theo (provider, key_fingerprint, model)."""
+
+    def __init__(self, config_loader=load_config, clock=time.monotonic):
+        self._config_loader = config_loader
+        self._clock = clock
+        self._buckets: dict[tuple, _Limits] = {}
+        self._lock = threading.Lock()
+
+    def limits_for(self, provider: str, model: str) -> dict:
+        """Cấu hình giới hạn hiệu lực cho một model."""
+        config = self._config_loader()
+        user_limits = config.get("rate_limits") or {}
+        for key in (model, provider):
+            if key in user_limits:
+                return dict(user_limits[key])
+        provider_config = (config.get("providers") or {}).get(provider) or {}
+        if provider_config.get("rate_limits") is not None:
+            return dict(provider_config["rate_limits"])
+        if model in MODEL_RPM_LIMITS:
+            return {"rpm": MODEL_RPM_LIMITS[model]}
+        return dict(DEFAULT_PROVIDER_LIMITS.get(provider, {}))
+
+    def _get(self, provider: str, api_key: str | None, model: str) -> _Limits:
+        bucket_key = (provider, key_fingerprint(api_key), model)
+        limits = self._buckets.get(bucket_key)
+        if limits is not None:
+            return limits
+        with self._lock:
+            limits = self._buckets.get(bucket_key)
+            if limits is None:
+                cfg = self.limits_for(provider, model)
+                rpm = cfg.get("rpm")
+                tpm = cfg.get("tpm")
+                burst = cfg.get("burst") or max(1, int(rpm or 0) // 5)
+                limits = _Limits(
+                    TokenBucket(rpm / 60.0, burst, self._clock) if rpm else None,
+                    TokenBucket(tpm / 60.0, tpm, self._clock) if tpm else None,
+                )
+                self._buckets[bucket_key] = limits
+        return limits
+
+    def reserve(self, provider: str, api_key: str | None, model: str, tokens: int = 0) -> float:
+        """Giữ chỗ 1 request (+ ``tokens`` token ước lượng); trả về số giây cần chờ."""
+        limits = self._get(provider, api_key, model)
+        wait = 0.0
+        if limits.rpm is not None:
+            wait = limits.rpm.reserve(1)
+        if limits.tpm is not None and tokens:
+            wait = max(wait, limits.tpm.reserve(tokens))
+        return wait
+
+    def record_usage(self, provider: str, api_key: str | None, model: str, actual_tokens: int, reserved_tokens: int = 0) -> None:
+        """Cập nhật TPM theo số token thực tế từ usage metadata của response."""
+        limits = self._get(provider, api_key, model)
+        if limits.tpm is not None and actual_tokens:
+            limits.tpm.adjust(actual_tokens - reserved_tokens)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+_limiter = RateLimiter()
+
+
+def get_limiter() -> RateLimiter:
+    return _limiter
@@ -0,0 +1,247 @@
+"""
+Cache đĩa (content-addressed) cho kết quả ``api.generate_text``.
+
+Khoá là sha256 của (provider, model, system_instruction, prompt, tham số sinh), nên
+chạy lại ``--document`` / ``--refactor`` / sinh commit message trên input không đổi
+không phải gọi mạng nữa. Cache là opt-in, cấu hình trong ``config.json``::
+
+    "response_cache": {
+        "enabled": false,           # bật cache (hoặc đặt biến môi trường TERMI_RESPONSE_CACHE=1)
+        "ttl_seconds": 604800,      # entry cũ hơn bị coi là miss và bị xoá
+        "max_entries": 1000,        # vượt quá thì xoá entry ít dùng gần đây nhất (LRU)
+        "max_bytes": 52428800       # giới hạn tổng dung lượng text lưu trong cache
+    }
+
+Dữ liệu lưu trong SQLite ``APP_DIR/cache/responses.db`` kèm bộ đếm hit/miss dùng chung
+giữa các lần chạy (xem ``termi --cache-stats``). ``--no-cache`` bỏ qua cache cho lần chạy đó.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+from termi_cli.config import APP_DIR, load_config
+
+logger = logging.getLogger(__name__)
+
+_KEY_VERSION = 1
+
+DEFAULT_CACHE_CONFIG = {
+    "enabled": False,
+    "ttl_seconds": 7 * 24 * 3600,
+    "max_entries": 1000,
+    "max_bytes": 50 * 1024 * 1024,
+}
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created REAL NOT NULL,
+        last_access REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)",
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+)
+
+# "--no-cache" của lần chạy hiện tại (đặt lại ở mỗi lần gọi main, kể cả trong daemon)
+_bypass = False
+
+
+def get_cache_path() -> Path:
+    return APP_DIR / "cache" / "responses.db"
+
+
+def get_cache_config() -> dict:
+    cfg = {**DEFAULT_CACHE_CONFIG, **(load_config().get("response_cache") or {})}
+    if os.getenv("TERMI_RESPONSE_CACHE"):
+        cfg["enabled"] = os.getenv("TERMI_RESPONSE_CACHE") not in ("0", "false", "no")
+    return cfg
+
+
+def set_bypass(bypass: bool) -> None:
+    """Bật/tắt ``--no-cache`` cho lần chạy hiện tại."""
+    global _bypass
+    _bypass = bool(bypass)
+
+
+def is_bypassed() -> bool:
+    return _bypass
+
+
+def make_key(provider: str, model: str, system_instruction: str | None, prompt: str, params: dict | None = None) -> str:
+    """Khoá cache: sha256 của biểu diễn JSON chuẩn hoá của toàn bộ input."""
+    payload = json.dumps(
+        {
+            "v": _KEY_VERSION,
+            "provider": provider,
+            "model": model,
+            "system_instruction": system_instruction,
+            "prompt": prompt,
+            "params": params or {},
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Cache LRU + TTL trên SQLite, an toàn khi dùng từ nhiều thread/tiến trình."""
+
+    def __init__(self, path: Path | str, ttl_seconds: float, max_entries: int, max_bytes: int, clock=time.time):
+        self.path = Path(path)
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self._clock = clock
+        self._local = threading.local()
+        # Bộ đếm trong tiến trình hiện tại (bộ đếm tích luỹ nằm trong bảng counters)
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=2.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> str | None:
+        """Trả về text đã cache (và cập nhật LRU) hoặc None nếu miss/hết hạn."""
+        now = self._clock()
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                self._bump(conn, "misses")
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self._bump(conn, "hits")
+            return row[0]
+        except sqlite3.Error as e:
+            logger.warning("Không đọc được response cache %s: %s", self.path, e)
+            return None
+
+    def put(self, key: str, model: str, value: str) -> None:
+        """Lưu text và dọn bớt entry theo TTL / LRU nếu vượt giới hạn."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = self._clock()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, model, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, value, size, now, now),
+            )
+            self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning("Không ghi được response cache %s: %s", self.path, e)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Xoá dần từ entry ít dùng gần đây nhất tới khi về dưới giới hạn
+        removed = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            removed.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", removed)
+        if removed:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES ('evictions', ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                (len(removed),),
+            )
+
+    def stats(self) -> dict:
+        """Số entry, dung lượng và bộ đếm hit/miss tích luỹ."""
+        try:
+            conn = self._connect()
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        except sqlite3.Error as e:
+            logger.warning("Không đọc được response cache %s: %s", self.path, e)
+            count, total, counters = 0, 0, {}
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM counters")
+        except sqlite3.Error as e:
+            logger.warning("Không xoá được response cache %s: %s", self.path, e)
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def _open_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cfg = get_cache_config()
+                _cache = ResponseCache(
+                    get_cache_path(),
+                    ttl_seconds=cfg["ttl_seconds"],
+                    max_entries=cfg["max_entries"],
+                    max_bytes=cfg["max_bytes"],
+                )
+    return _cache
+
+
+def get_cache() -> ResponseCache | None:
+    """Cache dùng chung toàn tiến trình; None khi cache đang tắt hoặc bị ``--no-cache`` bỏ qua."""
+    if _bypass or not get_cache_config().get("enabled"):
+        return None
+    return _open_cache()
+
+
+def get_stats() -> dict:
+    """Thống kê cache (kể cả khi cache đang tắt, để xem số liệu cũ)."""
+    return _open_cache().stats()
@@ -0,0 +1,189 @@
+"""
+Chính sách retry chung cho mọi provider (Gemini, DeepSeek, Groq).
+
+- Lỗi tạm thời (HTTP 408/5xx, lỗi kết nối / timeout, ``ServiceUnavailable`` của Gemini)
+  được thử lại với exponential backoff có giới hạn và *full jitter*: lần thứ ``n`` chờ
+  ngẫu nhiên trong ``[0, min(max_delay, base_delay * 2**(n-1))]`` để các client không
+  cùng dội lại một lúc.
+- Server đã nói rõ phải chờ bao lâu (``Retry-After``, ``x-ratelimit-reset-*``) thì chờ
+  đúng khoảng đó thay vì đoán.
+- Mỗi lần gọi có một deadline tổng: hết thời gian thì báo lỗi ngay, không retry tiếp.
+
+Lỗi 429 vẫn do key pool xử lý (cooldown key rồi đổi key), nhưng cũng tính vào số lần retry
+và deadline của lần gọi. Caller muốn biết một lần gọi đã phải retry bao nhiêu lần thì bọc
+nó trong ``with retry.track() as stats:`` rồi đọc ``stats.retries``.
+
+Cấu hình trong ``config.json``::
+
+    "retry": {"max_retries": 4, "base_delay": 0.5, "max_delay": 20, "deadline_seconds": 120}
+"""
+import re
+import time
+import random
+import logging
+import email.utils
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from termi_cli.config import load_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRY_CONFIG = {
+    "max_retries": 4,
+    "base_delay": 0.5,
+    "max_delay": 20.0,
+    "deadline_seconds": 120.0,
+}
+
+# Status HTTP đáng thử lại (429 đi theo nhánh rate limit / key pool riêng)
+TRANSIENT_HTTP_STATUSES = frozenset({408, 500, 502, 503, 504})
+
+# "2m59.56s", "7.66s", "120ms", "1h2m"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def get_retry_config() -> dict:
+    return {**DEFAULT_RETRY_CONFIG, **(load_config().get("retry") or {})}
+
+
+def parse_duration(value) -> float | None:
+    """Đổi ``"7.66s"`` / ``"2m59.56s"`` / ``"120ms"`` / ``"3"`` thành số giây."""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    try:
+        return max(0.0, float(text))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(text)
+    if not parts or "".join(number + unit for number, unit in parts) != text:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _header(headers, name: str):
+    if headers is None:
+        return None
+    value = headers.get(name)
+    if value is None and hasattr(headers, "items"):
+        # dict thường (cassette, test) không phân biệt hoa thường như HTTPMessage
+        lower = name.lower()
+        value = next((v for k, v in headers.items() if str(k).lower() == lower), None)
+    return value
+
+
+def retry_after(headers, now: float | None = None) -> float | None:
+    """Số giây server yêu cầu chờ, đọc từ ``Retry-After`` hoặc ``x-ratelimit-reset-*``.
+
+    ``Retry-After`` (số giây hoặc HTTP-date) được ưu tiên. Không có thì dùng
+    ``x-ratelimit-reset-requests`` / ``-tokens`` của giới hạn đã cạn (``remaining`` = 0);
+    không biết giới hạn nào cạn thì lấy mốc reset sớm nhất.
+    """
+    value = _header(headers, "Retry-After")
+    if value is not None:
+        seconds = parse_duration(value)
+        if seconds is not None:
+            return seconds
+        try:
+            moment = email.utils.parsedate_to_datetime(str(value))
+        except (TypeError, ValueError):
+            moment = None
+        if moment is not None:
+            return max(0.0, moment.timestamp() - (time.time() if now is None else now))
+
+    resets, exhausted = [], []
+    for kind in ("requests", "tokens"):
+        reset = parse_duration(_header(headers, f"x-ratelimit-reset-{kind}"))
+        if reset is None:
+            continue
+        resets.append(reset)
+        if str(_header(headers, f"x-ratelimit-remaining-{kind}")).strip() == "0":
+            exhausted.append(reset)
+    if exhausted:
+        return max(exhausted)
+    return min(resets) if resets else None
+
+
+class RetryPolicy:
+    """Tham số backoff; ``rng`` trả về số trong [0, 1) (thay được khi test)."""
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 20.0,
+                 deadline_seconds: float = 120.0, rng=random.random, clock=time.monotonic):
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.deadline_seconds = float(deadline_seconds)
+        self._rng = rng
+        self._clock = clock
+
+    def backoff(self, retry_number: int) -> float:
+        """Full jitter: ngẫu nhiên trong ``[0, min(max_delay, base_delay * 2**(n-1))]``."""
+        cap = min(self.max_delay, self.base_delay * (2 ** max(0, retry_number - 1)))
+        return self._rng() * cap
+
+    def start(self) -> "RetryState":
+        return RetryState(self, self._clock)
+
+
+class RetryState:
+    """Số lần đã retry và deadline của một lần gọi."""
+
+    def __init__(self, policy: RetryPolicy, clock=time.monotonic):
+        self.policy = policy
+        self.retries = 0
+        self._clock = clock
+        self.deadline = clock() + policy.deadline_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - self._clock())
+
+    def next_delay(self, reason: str, server_delay: float | None = None) -> float | None:
+        """Thời gian chờ trước lần thử kế tiếp; None nếu đã hết lượt retry hoặc quá deadline."""
+        if self.retries >= self.policy.max_retries:
+            return None
+        delay = server_delay if server_delay is not None else self.policy.backoff(self.retries + 1)
+        if delay > self.remaining():
+            return None
+        self.count(reason)
+        return delay
+
+    def count(self, reason: str) -> None:
+        """Ghi nhận một lần thử lại (kể cả lần đổi key sau 429 do key pool quyết định)."""
+        self.retries += 1
+        stats = _tracked.get()
+        if stats is not None:
+            stats.retries += 1
+            stats.reasons[reason] += 1
+
+
+class RetryStats:
+    def __init__(self):
+        self.retries = 0
+        self.reasons: Counter = Counter()
+
+
+_tracked: ContextVar[RetryStats | None] = ContextVar("termi_retry_stats", default=None)
+
+
+@contextmanager
+def track():
+    """Đếm mọi lần retry xảy ra trong khối ``with`` (theo context hiện tại, an toàn giữa các thread)."""
+    stats = RetryStats()
+    token = _tracked.set(stats)
+    try:
+        yield stats
+    finally:
+        _tracked.reset(token)
+
+
+def get_policy() -> RetryPolicy:
+    cfg = get_retry_config()
+    return RetryPolicy(
+        max_retries=cfg["max_retries"],
+        base_delay=cfg["base_delay"],
+        max_delay=cfg["max_delay"],
+        deadline_seconds=cfg["deadline_seconds"],
+    )
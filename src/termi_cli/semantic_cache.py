@@ -0,0 +1,152 @@
+"""
+Cache câu trả lời theo ngữ nghĩa cho chế độ single-turn.
+
+Các câu hỏi diễn đạt khác nhau nhưng cùng ý ("how do I rebase onto main" /
+"git rebase onto main how") được nhúng bằng cùng embedding function mà trí nhớ dài hạn
+(``memory.py``, ChromaDB) đang dùng. Nếu đã có câu trả lời cho cùng model + system
+instruction với độ tương đồng cosine vượt ngưỡng, câu trả lời đó được trả về ngay.
+
+Cache là opt-in, cấu hình trong ``config.json``::
+
+    "semantic_cache": {
+        "enabled": false,
+        "threshold": 0.92,          # độ tương đồng cosine tối thiểu để coi là trùng
+        "ttl_seconds": 604800,      # câu trả lời cũ hơn bị bỏ qua và xoá
+        "max_entries": 500          # vượt quá thì xoá các câu trả lời cũ nhất
+    }
+
+``--no-cache`` cũng bỏ qua cache này; ``--cache-stats`` hiển thị số lần hit/miss.
+"""
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from termi_cli import counters, memory, response_cache
+from termi_cli.config import APP_DIR, load_config
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "semantic_answer_cache"
+
+DEFAULT_SEMANTIC_CACHE_CONFIG = {
+    "enabled": False,
+    "threshold": 0.92,
+    "ttl_seconds": 7 * 24 * 3600,
+    "max_entries": 500,
+}
+
+
+def get_semantic_cache_config() -> dict:
+    return {**DEFAULT_SEMANTIC_CACHE_CONFIG, **(load_config().get("semantic_cache") or {})}
+
+
+def get_stats_path() -> Path:
+    return APP_DIR / "cache" / "semantic_cache_stats.json"
+
+
+def _instruction_hash(system_instruction: str | None) -> str:
+    return hashlib.sha256((system_instruction or "").encode("utf-8")).hexdigest()[:16]
+
+
+class SemanticCache:
+    """Câu trả lời đã lưu trong một collection ChromaDB (khoảng cách cosine)."""
+
+    def __init__(self, collection, threshold: float, ttl_seconds: float, max_entries: int,
+                 stats_path: Path | str | None = None, clock=time.time):
+        self.collection = collection
+        self.threshold = float(threshold)
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = int(max_entries)
+        self.stats_path = Path(stats_path) if stats_path else None
+        self._clock = clock
+
+    def lookup(self, intent: str, model: str, system_instruction: str | None) -> tuple[str, float] | None:
+        """Trả về ``(answer, similarity)`` nếu có câu trả lời đủ giống, ngược lại None."""
+        hit = None
+        try:
+            if self.collection.count():
+                results = self.collection.query(
+                    query_texts=[intent],
+                    n_results=1,
+                    where={"$and": [{"model": model}, {"instruction": _instruction_hash(system_instruction)}]},
+                )
+                ids = results.get("ids", [[]])[0]
+                if ids:
+                    metadata = results["metadatas"][0][0]
+                    similarity = 1.0 - float(results["distances"][0][0])
+                    if self._clock() - float(metadata.get("created", 0)) > self.ttl_seconds:
+                        self.collection.delete(ids=ids)
+                    elif similarity >= self.threshold:
+                        hit = (metadata["answer"], similarity)
+        except Exception as e:
+            logger.warning("Không tra cứu được semantic cache: %s", e)
+        self._bump("hits" if hit else "misses")
+        return hit
+
+    def store(self, intent: str, model: str, system_instruction: str | None, answer: str) -> None:
+        """Lưu câu trả lời, rồi dọn entry hết hạn / vượt ``max_entries``."""
+        instruction = _instruction_hash(system_instruction)
+        entry_id = hashlib.sha256(f"{model}\0{instruction}\0{intent}".encode("utf-8")).hexdigest()
+        try:
+            self.collection.upsert(
+                ids=[entry_id],
+                documents=[intent],
+                metadatas=[{"model": model, "instruction": instruction, "answer": answer, "created": self._clock()}],
+            )
+            self._evict()
+        except Exception as e:
+            logger.warning("Không ghi được semantic cache: %s", e)
+
+    def _evict(self) -> None:
+        count = self.collection.count()
+        if count <= self.max_entries:
+            return
+        entries = self.collection.get(include=["metadatas"])
+        now = self._clock()
+        # Cũ nhất trước; entry hết hạn luôn bị xoá
+        ordered = sorted(zip(entries["ids"], entries["metadatas"]), key=lambda item: float(item[1].get("created", 0)))
+        removed = []
+        for entry_id, metadata in ordered:
+            expired = now - float(metadata.get("created", 0)) > self.ttl_seconds
+            if not expired and count - len(removed) <= self.max_entries:
+                break
+            removed.append(entry_id)
+        if removed:
+            self.collection.delete(ids=removed)
+
+    def _bump(self, name: str) -> None:
+        if self.stats_path is not None:
+            counters.bump_counters(self.stats_path, **{name: 1})
+
+
+def read_stats(path: Path | str | None = None) -> dict:
+    """Bộ đếm hit/miss tích luỹ của semantic cache."""
+    return counters.read_counters(path or get_stats_path())
+
+
+_cache: SemanticCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SemanticCache | None:
+    """Semantic cache dùng chung; None khi tắt, bị ``--no-cache`` bỏ qua hoặc trí nhớ không khả dụng."""
+    global _cache
+    cfg = get_semantic_cache_config()
+    if not cfg.get("enabled") or response_cache.is_bypassed():
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                collection = memory.get_collection(COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+                if collection is None:
+                    return None
+                _cache = SemanticCache(
+                    collection,
+                    threshold=cfg["threshold"],
+                    ttl_seconds=cfg["ttl_seconds"],
+                    max_entries=cfg["max_entries"],
+                    stats_path=get_stats_path(),
+                )
+    return _cache
@@ -0,0 +1,279 @@
+"""
+Ước lượng token phía client và lập ngân sách prompt theo input limit của model.
+
+Ước lượng dựa trên số byte UTF-8 chia cho số byte/token đặc trưng của từng họ model
+(Gemini, DeepSeek, Groq), nhân với hệ số hiệu chỉnh học từ ``usage_metadata`` / ``usage``
+thật mà API trả về. Hệ số được lưu trong ``APP_DIR/cache/token_calibration.json`` nên các
+lần chạy sau dùng lại được. Kết quả đếm thô được cache theo (họ model, text).
+
+``plan_budget`` chia input limit của model cho các phần của prompt (system instruction,
+trí nhớ, ngữ cảnh thư mục, lịch sử, câu hỏi...). Nếu vượt, phần có độ ưu tiên thấp nhất bị
+cắt bớt hoặc bỏ trước, và mọi thay đổi được báo lại cho người dùng trước khi gửi request.
+Cấu hình trong ``config.json``::
+
+    "prompt_budget": {
+        "enabled": true,
+        "reserve_ratio": 0.1        # để dành một phần limit cho sai số ước lượng và khai báo tool
+    }
+"""
+import os
+import json
+import logging
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from termi_cli import providers
+from termi_cli.config import APP_DIR, atomic_write_json, load_config
+
+logger = logging.getLogger(__name__)
+
+# Số byte UTF-8 trung bình cho một token (điểm xuất phát trước khi hiệu chỉnh)
+BYTES_PER_TOKEN = {
+    "gemini": 4.0,
+    "deepseek": 3.6,
+    "groq": 3.8,
+}
+
+# Input limit dùng khi catalog không có thông tin (DeepSeek không trả context_window)
+DEFAULT_INPUT_LIMITS = {
+    "deepseek": 64000,
+}
+
+# Gemini tính mỗi ảnh là một số token cố định
+IMAGE_TOKENS = 258
+
+DEFAULT_BUDGET_CONFIG = {
+    "enabled": True,
+    "reserve_ratio": 0.1,
+}
+
+# Hệ số hiệu chỉnh luôn nằm trong khoảng này, tránh một mẫu lỗi làm lệch hẳn ước lượng
+_MIN_FACTOR = 0.5
+_MAX_FACTOR = 2.5
+# Trọng số của mẫu mới (trung bình trượt theo hàm mũ)
+_CALIBRATION_ALPHA = 0.2
+# Prompt quá ngắn bị chi phối bởi token overhead cố định, không dùng để hiệu chỉnh
+_MIN_CALIBRATION_TOKENS = 200
+
+# Cắt một phần xuống dưới mức này thì bỏ hẳn (vài dòng ngữ cảnh rời rạc không còn giá trị)
+_MIN_KEPT_TOKENS = 256
+
+TRUNCATION_MARKER = "\n--- TRUNCATED TO FIT TOKEN BUDGET ---\n"
+
+
+def get_budget_config() -> dict:
+    return {**DEFAULT_BUDGET_CONFIG, **(load_config().get("prompt_budget") or {})}
+
+
+def get_calibration_path() -> Path:
+    return APP_DIR / "cache" / "token_calibration.json"
+
+
+def family_of(model_name: str) -> str:
+    """Họ model (``gemini`` / ``deepseek`` / ``groq`` / provider tự cấu hình); chấp nhận cả tên provider."""
+    if model_name in BYTES_PER_TOKEN or model_name in providers.registry():
+        return model_name
+    return providers.provider_of(model_name)
+
+
+@lru_cache(maxsize=512)
+def _raw_count(family: str, text: str) -> float:
+    # str tự cache hash, nên đếm lại cùng một chuỗi (vd. ngữ cảnh thư mục) gần như miễn phí
+    return len(text.encode("utf-8")) / BYTES_PER_TOKEN.get(family, 4.0)
+
+
+def _raw_estimate(family: str, payload) -> float:
+    """Đếm thô cho text, list các phần (text/ảnh), dict message/history."""
+    if payload is None:
+        return 0.0
+    if isinstance(payload, str):
+        return _raw_count(family, payload)
+    if isinstance(payload, dict):
+        return sum(_raw_estimate(family, value) for value in payload.values())
+    if isinstance(payload, (list, tuple)):
+        return sum(_raw_estimate(family, item) for item in payload)
+    if isinstance(payload, (int, float, bool)):
+        return _raw_count(family, str(payload))
+    # Phần không phải text (PIL.Image...) được coi là ảnh
+    return float(IMAGE_TOKENS)
+
+
+class TokenEstimator:
+    """Ước lượng token theo họ model, kèm hệ số hiệu chỉnh lưu trên đĩa."""
+
+    def __init__(self, path: Path | str | None = None):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._calibration = None
+
+    def _load(self) -> dict:
+        if self._calibration is None:
+            data = {}
+            if self.path is not None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    data = {}
+            self._calibration = data if isinstance(data, dict) else {}
+        return self._calibration
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            atomic_write_json(self.path, self._calibration, indent=2)
+        except OSError as e:
+            logger.warning("Không ghi được hệ số hiệu chỉnh token %s: %s", self.path, e)
+
+    def factor(self, model_name: str) -> float:
+        with self._lock:
+            entry = self._load().get(family_of(model_name)) or {}
+        return float(entry.get("factor", 1.0))
+
+    def estimate(self, model_name: str, payload) -> int:
+        """Số token ước lượng của ``payload`` cho ``model_name`` (đã hiệu chỉnh)."""
+        raw = _raw_estimate(family_of(model_name), payload)
+        return int(round(raw * self.factor(model_name))) if raw else 0
+
+    def calibrate(self, model_name: str, payload, actual_tokens) -> None:
+        """Cập nhật hệ số hiệu chỉnh từ số token thật API báo về cho ``payload``."""
+        if not isinstance(actual_tokens, int) or actual_tokens < _MIN_CALIBRATION_TOKENS:
+            return
+        family = family_of(model_name)
+        raw = _raw_estimate(family, payload)
+        if raw <= 0:
+            return
+        observed = min(_MAX_FACTOR, max(_MIN_FACTOR, actual_tokens / raw))
+        with self._lock:
+            entry = self._load().setdefault(family, {"factor": 1.0, "samples": 0})
+            if entry.get("samples"):
+                entry["factor"] = entry["factor"] * (1 - _CALIBRATION_ALPHA) + observed * _CALIBRATION_ALPHA
+            else:
+                entry["factor"] = observed
+            entry["samples"] = int(entry.get("samples", 0)) + 1
+            self._save()
+
+
+class Section:
+    """Một phần của prompt.
+
+    ``priority`` càng thấp càng bị cắt trước. ``trim`` quyết định cách cắt:
+    ``"tail"`` giữ phần đầu text, ``"items"`` bỏ các phần tử cũ nhất của list (lịch sử),
+    ``"drop"`` bỏ cả phần. Phần ``required`` không bao giờ bị cắt.
+    """
+
+    def __init__(self, name: str, content, priority: int, trim: str = "tail", required: bool = False):
+        self.name = name
+        self.content = content
+        self.priority = priority
+        self.trim = trim
+        self.required = required
+
+
+class BudgetPlan:
+    """Kết quả lập ngân sách: nội dung giữ lại theo tên phần và các phần đã bị cắt/bỏ."""
+
+    def __init__(self, limit: int, budget: int):
+        self.limit = limit
+        self.budget = budget
+        self.contents: dict = {}
+        self.tokens: dict[str, int] = {}
+        # (tên phần, token ban đầu, token còn lại); còn lại = 0 nghĩa là bị bỏ hẳn
+        self.trimmed: list[tuple[str, int, int]] = []
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+    @property
+    def fits(self) -> bool:
+        """False khi riêng các phần bắt buộc đã vượt input limit của model."""
+        return not self.limit or self.total_tokens <= self.limit
+
+
+def _truncate_text(text: str, keep_ratio: float) -> str:
+    keep = int(len(text) * keep_ratio) - len(TRUNCATION_MARKER)
+    return text[:keep] + TRUNCATION_MARKER if keep > 0 else ""
+
+
+def _fit_section(estimator: TokenEstimator, model_name: str, section: Section, target: int):
+    """Cắt ``section`` về khoảng ``target`` token; trả về nội dung mới (None nếu bỏ hẳn)."""
+    content = section.content
+    if section.trim == "items" and isinstance(content, list):
+        kept = list(content)
+        while kept and estimator.estimate(model_name, kept) > target:
+            kept.pop(0)
+        return kept or None
+    if section.trim == "tail" and isinstance(content, str) and target >= _MIN_KEPT_TOKENS:
+        current = estimator.estimate(model_name, content)
+        truncated = _truncate_text(content, target / current)
+        # Ước lượng tỉ lệ theo ký tự chỉ gần đúng: cắt thêm nếu vẫn vượt
+        while truncated and estimator.estimate(model_name, truncated) > target:
+            truncated = _truncate_text(truncated[: -len(TRUNCATION_MARKER)], 0.9)
+        return truncated or None
+    return None
+
+
+def plan_budget(model_name: str, sections: list[Section], limit: int, reserve_ratio: float | None = None,
+                estimator: TokenEstimator | None = None) -> BudgetPlan:
+    """Chia ``limit`` token cho ``sections``, cắt phần ưu tiên thấp trước khi vượt ngân sách.
+
+    ``limit`` <= 0 (không biết limit của model) thì giữ nguyên mọi phần.
+    """
+    estimator = estimator or get_estimator()
+    if reserve_ratio is None:
+        reserve_ratio = float(get_budget_config()["reserve_ratio"])
+    budget = int(limit * (1 - reserve_ratio)) if limit and limit > 0 else 0
+    plan = BudgetPlan(limit if limit and limit > 0 else 0, budget)
+
+    for section in sections:
+        if section.content:
+            plan.contents[section.name] = section.content
+            plan.tokens[section.name] = estimator.estimate(model_name, section.content)
+    if not budget:
+        return plan
+
+    trimmable = sorted(
+        (s for s in sections if not s.required and s.name in plan.contents),
+        key=lambda s: s.priority,
+    )
+    for section in trimmable:
+        over = plan.total_tokens - budget
+        if over <= 0:
+            break
+        before = plan.tokens[section.name]
+        content = None if section.trim == "drop" else _fit_section(estimator, model_name, section, before - over)
+        if content:
+            plan.contents[section.name] = content
+            plan.tokens[section.name] = estimator.estimate(model_name, content)
+        else:
+            del plan.contents[section.name]
+            plan.tokens[section.name] = 0
+        plan.trimmed.append((section.name, before, plan.tokens[section.name]))
+        if not plan.tokens[section.name]:
+            del plan.tokens[section.name]
+    return plan
+
+
+_estimator: TokenEstimator | None = None
+_estimator_lock = threading.Lock()
+
+
+def get_estimator() -> TokenEstimator:
+    """Estimator dùng chung toàn tiến trình (hệ số hiệu chỉnh lưu trong ``APP_DIR/cache``)."""
+    global _estimator
+    if _estimator is None:
+        with _estimator_lock:
+            if _estimator is None:
+                _estimator = TokenEstimator(None if "PYTEST_CURRENT_TEST" in os.environ else get_calibration_path())
+    return _estimator
+
+
+def estimate(model_name: str, payload) -> int:
+    return get_estimator().estimate(model_name, payload)
+
+
+def calibrate(model_name: str, payload, actual_tokens) -> None:
+    get_estimator().calibrate(model_name, payload, actual_tokens)
@@ -46,11 +46,11 @@ def refactor_code(file_path: str) -> str:
 
     try:
         return api.generate_text(model_name, prompt)
-    except (api.DeepseekInsufficientBalance, api.GroqInsufficientBalance):
+    except api.ProviderInsufficientBalance:
         fallback_model = config.get("default_model")
         if fallback_model and fallback_model != model_name:
             logger.warning(
-                "DeepSeek/Groq Insufficient Balance cho model '%s', fallback sang '%s' cho refactor_code.",
+                "Provider báo Insufficient Balance cho model '%s', fallback sang '%s' cho refactor_code.",
                 model_name,
                 fallback_model,
             )
@@ -85,11 +85,11 @@ def document_code(file_path: str) -> str:
 
     try:
         return api.generate_text(model_name, prompt)
-    except (api.DeepseekInsufficientBalance, api.GroqInsufficientBalance):
+    except api.ProviderInsufficientBalance:
         fallback_model = config.get("default_model")
         if fallback_model and fallback_model != model_name:
             logger.warning(
-                "DeepSeek/Groq Insufficient Balance cho model '%s', fallback sang '%s' cho document_code.",
+                "Provider báo Insufficient Balance cho model '%s', fallback sang '%s' cho document_code.",
                 model_name,
                 fallback_model,
             )
@@ -7,7 +7,7 @@ def save_instruction(instruction: str) -> str:
     """
     print(f"--- TOOL: Đang lưu chỉ dẫn tùy chỉnh: '{instruction}' ---")
     try:
-        config = load_config()
+        config = load_config(writable=True)
         if "saved_instructions" not in config:
             config["saved_instructions"] = []
         
@@ -0,0 +1,220 @@
+"""
+Khám phá plugin tools qua manifest cache, không import code plugin khi khởi động.
+
+Mỗi file ``APP_DIR/plugins/*.py`` được phân tích tĩnh (AST) để lấy tên các tool trong
+``PLUGIN_TOOLS`` và docstring của chúng. Kết quả lưu trong một manifest JSON, khoá theo
+đường dẫn + mtime/size + sha256, nên các lần chạy sau chỉ cần ``stat`` từng file.
+Module plugin chỉ thực sự được import khi một tool của nó được gọi (hoặc được resolve
+từ ``AVAILABLE_TOOLS``).
+
+Nếu ``PLUGIN_TOOLS`` không phải dict literal (ví dụ được dựng động), manifest fallback
+sang import module một lần để đọc tên/docstring, rồi cache lại như bình thường.
+"""
+import ast
+import sys
+import json
+import hashlib
+import logging
+import threading
+import importlib.util
+from pathlib import Path
+
+from termi_cli.config import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST_VERSION = 1
+
+
+class PluginTool:
+    """Tool plugin nạp lười: biết tên/docstring từ manifest, import module khi được gọi."""
+
+    def __init__(self, name: str, doc: str | None, path: str, module_name: str):
+        self.name = name
+        self.doc = doc
+        self.path = path
+        self.module_name = module_name
+        self.__name__ = name
+        self.__doc__ = doc
+        self._func = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Import module plugin (một lần) và trả về callable thật của tool."""
+        if self._func is not None:
+            return self._func
+        with self._lock:
+            if self._func is None:
+                module = _import_plugin_module(Path(self.path), self.module_name)
+                tools_dict = getattr(module, "PLUGIN_TOOLS", None)
+                func = tools_dict.get(self.name) if isinstance(tools_dict, dict) else None
+                if not callable(func):
+                    raise TypeError(f"Tool '{self.name}' trong plugin '{self.path}' không callable")
+                self._func = func
+        return self._func
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"PluginTool({self.name!r}, path={self.path!r})"
+
+
+def _import_plugin_module(path: Path, module_name: str):
+    module = sys.modules.get(module_name)
+    if module is not None and getattr(module, "__file__", None) == str(path):
+        return module
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Không thể tạo spec cho plugin '{path}'")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore[assignment]
+    sys.modules[module_name] = module
+    return module
+
+
+def _function_docs(tree: ast.Module) -> dict[str, str | None]:
+    return {
+        node.name: ast.get_docstring(node)
+        for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    }
+
+
+def function_docstrings(source: str) -> dict[str, str | None]:
+    """Docstring của các hàm top-level trong một đoạn source (không thực thi code)."""
+    return _function_docs(ast.parse(source))
+
+
+# Giá trị literal trong PLUGIN_TOOLS: chắc chắn không callable
+_LITERAL_NODES = (ast.Constant, ast.JoinedStr, ast.List, ast.Tuple, ast.Set, ast.Dict,
+                  ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def _extract_static(source: str):
+    """Đọc ``PLUGIN_TOOLS`` bằng AST.
+
+    Trả về list ``[(tên_tool, docstring)]``; ``[]`` nếu không có ``PLUGIN_TOOLS`` hợp lệ;
+    hoặc ``None`` nếu không xác định được tĩnh (cần import module).
+    """
+    tree = ast.parse(source)
+    docs = _function_docs(tree)
+
+    value = None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(t, ast.Name) and t.id == "PLUGIN_TOOLS" for t in node.targets
+        ):
+            value = node.value
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.target.id == "PLUGIN_TOOLS":
+            value = node.value
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name) and node.target.id == "PLUGIN_TOOLS":
+            # PLUGIN_TOOLS |= {...}: không đọc tĩnh được
+            return None
+
+    if value is None or isinstance(value, (ast.Constant, ast.List, ast.Tuple, ast.Set, ast.JoinedStr)):
+        return []
+    if not isinstance(value, ast.Dict) or any(
+        not (isinstance(k, ast.Constant) and isinstance(k.value, str)) for k in value.keys
+    ):
+        return None
+
+    # Chỉ hàm/class top-level và lambda chắc chắn callable khi đọc tĩnh
+    classes = {node.name for node in tree.body if isinstance(node, ast.ClassDef)}
+    tools = []
+    for key, func_node in zip(value.keys, value.values):
+        if isinstance(func_node, _LITERAL_NODES):
+            logger.warning("Tool '%s' trong plugin không callable, bỏ qua", key.value)
+            continue
+        if isinstance(func_node, ast.Lambda):
+            tools.append((key.value, None))
+        elif isinstance(func_node, ast.Name) and (func_node.id in docs or func_node.id in classes):
+            tools.append((key.value, docs.get(func_node.id)))
+        else:
+            # Tên gán / import, thuộc tính module, lời gọi hàm...: import để kiểm tra callable()
+            return None
+    return tools
+
+
+def _extract_by_import(path: Path, module_name: str):
+    module = _import_plugin_module(path, module_name)
+    tools_dict = getattr(module, "PLUGIN_TOOLS", None)
+    if not isinstance(tools_dict, dict):
+        return []
+    tools = []
+    for name, func in tools_dict.items():
+        if not callable(func):
+            logger.warning("Tool '%s' trong plugin '%s' không callable, bỏ qua", name, path)
+            continue
+        tools.append((name, getattr(func, "__doc__", None)))
+    return tools
+
+
+def _load_manifest(cache_path: Path) -> dict:
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != _MANIFEST_VERSION:
+        return {}
+    return data.get("plugins", {})
+
+
+def _save_manifest(cache_path: Path, plugins: dict) -> None:
+    try:
+        atomic_write_json(cache_path, {"version": _MANIFEST_VERSION, "plugins": plugins}, ensure_ascii=False, indent=2)
+    except OSError:
+        logger.warning("Không thể ghi plugin manifest '%s'", cache_path, exc_info=True)
+
+
+def discover_plugin_tools(plugins_dir: Path, cache_path: Path) -> dict[str, PluginTool]:
+    """Trả về mapping tên tool -> PluginTool cho mọi plugin trong ``plugins_dir``.
+
+    File không đổi (mtime/size) dùng lại manifest; file đổi mtime nhưng cùng sha256 chỉ
+    cập nhật lại mtime. Plugin lỗi bị bỏ qua, không làm hỏng CLI.
+    """
+    plugin_tools: dict[str, PluginTool] = {}
+    if not plugins_dir.exists() or not plugins_dir.is_dir():
+        return plugin_tools
+
+    old_manifest = _load_manifest(cache_path)
+    new_manifest: dict = {}
+
+    for path in sorted(plugins_dir.glob("*.py")):
+        if path.name.startswith("_"):
+            continue
+
+        module_name = f"termi_cli_plugins.{path.stem}"
+        key = str(path.resolve())
+        try:
+            st = path.stat()
+            entry = old_manifest.get(key)
+            if not (entry and entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size):
+                raw = path.read_bytes()
+                digest = hashlib.sha256(raw).hexdigest()
+                if not (entry and entry.get("sha256") == digest):
+                    tools = _extract_static(raw.decode("utf-8"))
+                    if tools is None:
+                        tools = _extract_by_import(path, module_name)
+                    entry = {"sha256": digest, "tools": [{"name": n, "doc": d} for n, d in tools]}
+                    if not tools:
+                        logger.warning("Plugin '%s' không có dict PLUGIN_TOOLS hợp lệ", path)
+                entry = {**entry, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+        except Exception:
+            # Plugin lỗi sẽ bị bỏ qua, không làm hỏng toàn bộ CLI
+            logger.exception("Lỗi khi đọc plugin '%s'", path)
+            continue
+
+        new_manifest[key] = entry
+        for tool in entry["tools"]:
+            name = tool["name"]
+            if name in plugin_tools:
+                logger.warning("Trùng tên tool plugin '%s' trong '%s', bỏ qua", name, path)
+                continue
+            plugin_tools[name] = PluginTool(name, tool.get("doc"), str(path), module_name)
+
+    if new_manifest != old_manifest:
+        _save_manifest(cache_path, new_manifest)
+
+    return plugin_tools
@@ -0,0 +1,74 @@
+"""
+Registry tools với cơ chế nạp lười.
+
+Tên tool được đăng ký sẵn (rẻ), còn module chứa hàm thực thi chỉ được import
+khi tool đó thực sự được lấy ra (``registry[name]``). Nhờ vậy việc kiểm tra
+``name in AVAILABLE_TOOLS`` hay liệt kê ``AVAILABLE_TOOLS.keys()`` không kéo theo
+``sqlalchemy``, ``googleapiclient``, ``requests``...
+"""
+import importlib
+import threading
+from collections.abc import MutableMapping
+
+
+def module_attr_loader(module_name: str, attr: str):
+    """Tạo loader import ``module_name`` và trả về thuộc tính ``attr``."""
+
+    def _load():
+        module = importlib.import_module(module_name)
+        return getattr(module, attr)
+
+    return _load
+
+
+class ToolRegistry(MutableMapping):
+    """Mapping tên tool -> callable, resolve lười theo từng tool."""
+
+    def __init__(self):
+        self._loaders: dict[str, callable] = {}  # type: ignore[valid-type]
+        self._resolved: dict[str, callable] = {}  # type: ignore[valid-type]
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader) -> None:
+        """Đăng ký một tool bằng loader (hàm không tham số trả về callable)."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._resolved.pop(name, None)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._resolved
+
+    def __getitem__(self, name: str):
+        func = self._resolved.get(name)
+        if func is not None:
+            return func
+        loader = self._loaders[name]  # KeyError nếu không tồn tại, giống dict
+        with self._lock:
+            func = self._resolved.get(name)
+            if func is None:
+                func = loader()
+                self._resolved[name] = func
+        return func
+
+    def __setitem__(self, name: str, func) -> None:
+        with self._lock:
+            self._loaders[name] = lambda: func
+            self._resolved[name] = func
+
+    def __delitem__(self, name: str) -> None:
+        with self._lock:
+            del self._loaders[name]
+            self._resolved.pop(name, None)
+
+    def __contains__(self, name) -> bool:
+        # Mapping mặc định gọi __getitem__ (sẽ import module) – tránh điều đó.
+        return name in self._loaders
+
+    def __iter__(self):
+        return iter(list(self._loaders))
+
+    def __len__(self) -> int:
+        return len(self._loaders)
+
+    def __repr__(self) -> str:
+        return f"ToolRegistry({sorted(self._loaders)})"
@@ -0,0 +1,150 @@
+"""
+Ghi trace của một phiên chạy theo định dạng Chrome trace-event (``termi --trace out.json``).
+
+File kết quả mở được bằng ``chrome://tracing`` hoặc https://ui.perfetto.dev. Mỗi span là một
+event ``"ph": "X"`` (thời điểm bắt đầu + độ dài, tính bằng micro giây) trên đúng thread đã
+chạy nó, nên các span lồng nhau (lượt chat -> gọi provider -> chờ rate limit) hiện thành
+từng tầng và đường găng của phiên chạy lộ ra ngay. Các sự kiện tức thời (đổi key, retry,
+chuyển model) là event ``"ph": "i"``.
+
+Khi không bật ``--trace``, ``span`` trả về một context manager rỗng dùng chung nên gần như
+không tốn chi phí.
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Nhóm span (trường ``cat``) để lọc trong trace viewer
+STARTUP = "startup"
+PROVIDER = "provider"
+THROTTLE = "throttle"
+TOOL = "tool"
+MEMORY = "memory"
+RENDER = "render"
+USER = "user"
+TURN = "turn"
+
+_NOOP = nullcontext()
+
+
+class Tracer:
+    """Thu các trace event trong bộ nhớ và ghi ra file JSON khi kết thúc."""
+
+    def __init__(self, path: Path | str, clock=time.perf_counter, origin: float | None = None):
+        self.path = Path(path)
+        self._clock = clock
+        self._origin = clock() if origin is None else origin
+        self._lock = threading.Lock()
+        self._events: list[dict] = []
+        self._threads: dict[int, str] = {}
+        self._pid = os.getpid()
+
+    def _ts(self, value: float) -> float:
+        return round((value - self._origin) * 1_000_000, 3)
+
+    def _event(self, event: dict) -> None:
+        thread = threading.current_thread()
+        event.update(pid=self._pid, tid=thread.ident)
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    def complete(self, name: str, cat: str, start: float, end: float, **args) -> None:
+        """Thêm một span đã kết thúc (``start``/``end`` theo ``clock``)."""
+        event = {"name": name, "cat": cat, "ph": "X", "ts": self._ts(start), "dur": round((end - start) * 1_000_000, 3)}
+        if args:
+            event["args"] = args
+        self._event(event)
+
+    def instant(self, name: str, cat: str, **args) -> None:
+        event = {"name": name, "cat": cat, "ph": "i", "s": "t", "ts": self._ts(self._clock())}
+        if args:
+            event["args"] = args
+        self._event(event)
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        started = self._clock()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.complete(name, cat, started, self._clock(), **args)
+
+    def events(self) -> list[dict]:
+        with self._lock:
+            metadata = [
+                {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self._threads.items()
+            ]
+            return metadata + sorted(self._events, key=lambda event: event["ts"])
+
+    def write(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+        except OSError as e:
+            logger.error("Không ghi được trace vào %s: %s", self.path, e)
+
+
+_tracer: Tracer | None = None
+_tracer_lock = threading.Lock()
+_atexit_registered = False
+
+
+def start(path: Path | str, origin: float | None = None) -> Tracer:
+    """Bật tracing cho tiến trình; trace được ghi khi gọi ``stop`` hoặc khi tiến trình thoát.
+
+    ``origin`` (theo ``time.perf_counter``) cho phép tính cả các giai đoạn khởi động đã
+    chạy trước khi đọc được ``--trace``.
+    """
+    global _tracer, _atexit_registered
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.write()
+        _tracer = Tracer(path, origin=origin)
+        if not _atexit_registered:
+            atexit.register(stop)
+            _atexit_registered = True
+    return _tracer
+
+
+def stop() -> None:
+    """Ghi trace ra file và tắt tracing (gọi nhiều lần không sao)."""
+    global _tracer
+    with _tracer_lock:
+        tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.write()
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, cat: str, **args):
+    """Context manager đo một span; không làm gì khi tracing tắt."""
+    tracer = _tracer
+    return tracer.span(name, cat, **args) if tracer is not None else _NOOP
+
+
+def complete(name: str, cat: str, start: float, end: float, **args) -> None:
+    tracer = _tracer
+    if tracer is not None:
+        tracer.complete(name, cat, start, end, **args)
+
+
+def instant(name: str, cat: str, **args) -> None:
+    tracer = _tracer
+    if tracer is not None:
+        tracer.instant(name, cat, **args)
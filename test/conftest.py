@@ -0,0 +1,26 @@
+import pytest
+
+
+class FakeClock:
+    """Đồng hồ giả cho các thành phần nhận ``clock=``: test tự tăng ``now``."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def make_cache(fake_clock):
+    """Dựng cache chạy theo ``fake_clock``: ``make_cache(cls, *args, **params)`` (TTL mặc định 100s)."""
+
+    def factory(cls, *args, **params):
+        return cls(*args, clock=fake_clock, **{"ttl_seconds": 100, **params})
+
+    return factory
@@ -6,7 +6,7 @@ from rich.console import Console
 
 from termi_cli.handlers import agent_handler
 from termi_cli import i18n
-from termi_cli.api import RPDQuotaExhausted
+from termi_cli.key_pool import KeysExhausted
 
 
 def _make_args(**kwargs):
@@ -210,8 +210,8 @@ def test_run_master_agent_handles_invalid_initial_json_and_prints_error(mocker):
     assert any("Agent không trả về JSON hợp lệ ban đầu." in text for text in printed)
 
 
-def test_run_master_agent_retries_on_quota_and_then_executes_plan(mocker):
-    """run_master_agent: gặp quota (RPDQuotaExhausted) thì retry và sau đó thực thi project_plan."""
+def test_run_master_agent_reports_exhausted_keys_without_retrying(mocker):
+    """run_master_agent: mọi key đã hết quota (việc đổi key nằm trong api) thì báo lỗi, không gọi lại."""
     console = mocker.MagicMock(spec=Console)
     args = _make_args(prompt="Demo goal")
 
@@ -236,25 +236,23 @@ def test_run_master_agent_retries_on_quota_and_then_executes_plan(mocker):
 
     mock_generate = mocker.patch(
         "termi_cli.handlers.agent_handler.api.resilient_generate_content",
-        side_effect=[RPDQuotaExhausted("quota"), success_resp],
+        side_effect=[KeysExhausted("gemini", "Gemini"), success_resp],
     )
 
     mock_exec_project = mocker.patch("termi_cli.handlers.agent_handler.execute_project_plan")
 
     agent_handler.run_master_agent(console, args)
 
-    # Gọi API ít nhất 2 lần (1 lần lỗi quota, 1 lần thành công)
-    assert mock_generate.call_count == 2
+    # api đã thử hết key trước khi ném lỗi nên handler không gọi lại
+    assert mock_generate.call_count == 1
+    mock_exec_project.assert_not_called()
 
-    # Cuối cùng phải gọi execute_project_plan với plan đúng
-    mock_exec_project.assert_called_once()
-    _, exec_args, exec_kwargs = mock_exec_project.mock_calls[0]
-    # exec_args = (console, args, plan_dict)
-    assert exec_args[2] == plan
+    printed = [str(call.args[0]) for call in console.print.call_args_list if call.args]
+    assert any("All Gemini API keys exhausted" in text for text in printed)
 
 
-def test_execute_project_plan_handles_quota_and_recreates_session(mocker):
-    """execute_project_plan: khi gặp RPDQuotaExhausted trong bước executor, phải recreate session."""
+def test_execute_project_plan_stops_on_exhausted_keys(mocker):
+    """execute_project_plan: key đã hết quota ở bước executor thì dừng, không tạo lại session."""
     console = mocker.MagicMock(spec=Console)
     args = _make_args(agent_dry_run=False)
 
@@ -270,13 +268,12 @@ def test_execute_project_plan_handles_quota_and_recreates_session(mocker):
         "files": [],
     }
 
-    # start_chat_session được gọi ban đầu và sau khi quota để recreate session
     mock_start = mocker.patch(
         "termi_cli.handlers.agent_handler.api.start_chat_session",
         side_effect=[object(), object()],
     )
 
-    # Lần đầu tiên gửi message bị quota, lần hai trả về step finish hợp lệ
+    # Lần gửi đầu tiên đã hết key; step finish phía sau không bao giờ được đọc
     step_finish = {
         "thought": "done",
         "action": {"tool_name": "finish", "tool_args": {"answer": "ok"}},
@@ -284,7 +281,7 @@ def test_execute_project_plan_handles_quota_and_recreates_session(mocker):
     success_payload = json.dumps(step_finish)
     success_resp = type("Resp", (), {"text": f"```json\n{success_payload}\n```"})
 
-    calls = [RPDQuotaExhausted("quota"), success_resp]
+    calls = [KeysExhausted("gemini", "Gemini"), success_resp]
 
     def fake_send(_session, _prompt):
         value = calls.pop(0)
@@ -299,13 +296,11 @@ def test_execute_project_plan_handles_quota_and_recreates_session(mocker):
 
     agent_handler.execute_project_plan(console, args, project_plan)
 
-    # Đã recreate session sau khi quota
-    assert mock_start.call_count == 2
-
-    # In ra thông báo recreate session
-    recreate_msg = i18n.tr("vi", "agent_recreate_session_quota")
+    # Session chỉ được tạo một lần, lỗi được báo như lỗi không thể phục hồi
+    assert mock_start.call_count == 1
+    error_msg = i18n.tr("vi", "agent_executor_unrecoverable_error", error="All Gemini API keys exhausted")
     printed = [call.args[0] for call in console.print.call_args_list if call.args]
-    assert recreate_msg in printed
+    assert error_msg in printed
 
 
 def test_execute_project_plan_handles_invalid_step_json_and_prints_error(mocker):
@@ -347,8 +342,8 @@ def test_execute_project_plan_handles_invalid_step_json_and_prints_error(mocker)
     assert any("No valid JSON found." in text for text in printed)
 
 
-def test_execute_simple_task_handles_quota_and_recreates_session(mocker):
-    """execute_simple_task: khi quota ở bước tiếp theo, phải recreate session."""
+def test_execute_simple_task_stops_on_exhausted_keys(mocker):
+    """execute_simple_task: key đã hết quota ở bước tiếp theo thì dừng, không tạo lại session."""
     console = mocker.MagicMock(spec=Console)
     args = _make_args(agent_dry_run=False)
 
@@ -373,7 +368,7 @@ def test_execute_simple_task_handles_quota_and_recreates_session(mocker):
         return_value="OBS",
     )
 
-    # Bước thứ hai: đầu tiên quota, sau đó trả về step finish hợp lệ
+    # Bước thứ hai: hết key ngay lần gửi đầu tiên
     step_finish = {
         "thought": "Second",
         "action": {"tool_name": "finish", "tool_args": {"answer": "ok"}},
@@ -381,7 +376,7 @@ def test_execute_simple_task_handles_quota_and_recreates_session(mocker):
     success_payload = json.dumps(step_finish)
     success_resp = type("Resp", (), {"text": f"```json\n{success_payload}\n```"})
 
-    calls = [RPDQuotaExhausted("quota"), success_resp]
+    calls = [KeysExhausted("gemini", "Gemini"), success_resp]
 
     def fake_send(_session, _prompt):
         value = calls.pop(0)
@@ -399,12 +394,11 @@ def test_execute_simple_task_handles_quota_and_recreates_session(mocker):
     # Tool được gọi ít nhất một lần cho bước đầu tiên
     mock_exec_tool.assert_called()
 
-    # Đã recreate session sau khi quota
-    assert mock_start.call_count == 2
-
-    recreate_msg = i18n.tr("vi", "agent_recreate_session_quota")
+    # Session chỉ được tạo một lần, lỗi được báo như lỗi không thể phục hồi
+    assert mock_start.call_count == 1
+    error_msg = i18n.tr("vi", "agent_executor_unrecoverable_error", error="All Gemini API keys exhausted")
     printed = [call.args[0] for call in console.print.call_args_list if call.args]
-    assert recreate_msg in printed
+    assert error_msg in printed
 
 
 def test_execute_simple_task_handles_invalid_step_json_and_prints_error(mocker):
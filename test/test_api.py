@@ -1,7 +1,9 @@
 import os
 from unittest.mock import MagicMock
+
+import pytest
 from rich.console import Console
-from termi_cli import api
+from termi_cli import api, key_pool
 
 def test_initialize_api_keys(mocker):
     """
@@ -19,10 +21,22 @@ def test_initialize_api_keys(mocker):
     assert keys == ["key1", "key2", "key3"]
     assert len(keys) == 3
 
-def test_get_available_models(mocker):
+def test_initialize_api_keys_reads_nth_suffixes(mocker):
+    """Key Gemini thứ 4 trở đi dùng hậu tố _<n>TH giống các provider khác."""
+    mocker.patch.dict(os.environ, {api.key_env_name("GOOGLE_API_KEY", n): f"key{n}" for n in range(1, 6)}, clear=True)
+
+    assert api.initialize_api_keys() == ["key1", "key2", "key3", "key4", "key5"]
+    assert key_pool.get_pool("gemini").keys == ["key1", "key2", "key3", "key4", "key5"]
+
+def test_get_available_models(mocker, tmp_path, monkeypatch):
     """
     Kiểm tra hàm lấy model mà không cần gọi API thật.
     """
+    # Catalog model ghi vào thư mục tạm thay vì APP_DIR thật
+    monkeypatch.setattr(api, "_model_catalog", None, raising=True)
+    monkeypatch.setattr(api.model_catalog, "get_catalog_path", lambda: tmp_path / "model_catalog.json")
+    monkeypatch.setattr(api, "_catalog_fetchers", lambda: {"gemini": api._fetch_gemini_models})
+
     # 1. Tạo các đối tượng model giả, có cấu trúc giống hệt model thật
     mock_model_1 = MagicMock()
     mock_model_1.name = "models/gemini-pro"
@@ -91,6 +105,84 @@ def test_load_plugin_tools_ignores_invalid_tools_dict(tmp_path, monkeypatch):
 
     assert tools == {}
 
+def test_load_plugin_tools_does_not_import_plugin_until_called(tmp_path, monkeypatch):
+    """Plugin chỉ được import khi tool được gọi; tên/docstring lấy từ manifest."""
+    plugins_dir = tmp_path / "plugins"
+    plugins_dir.mkdir()
+    marker = tmp_path / "imported.txt"
+    (plugins_dir / "lazy_plugin.py").write_text(
+        "import pathlib\n"
+        f"pathlib.Path({str(marker)!r}).write_text('x')\n\n"
+        "def lazy_tool(x: int = 1):\n"
+        "    \"\"\"Lazy tool docstring.\"\"\"\n"
+        "    return x * 2\n\n"
+        "PLUGIN_TOOLS = {'lazy_tool': lazy_tool}\n",
+        encoding="utf-8",
+    )
+
+    monkeypatch.setattr(api, "APP_DIR", tmp_path)
+    tools = api._load_plugin_tools()
+
+    assert tools["lazy_tool"].doc == "Lazy tool docstring."
+    assert not marker.exists()
+    assert (tmp_path / "cache" / "plugin_manifest.json").exists()
+
+    assert tools["lazy_tool"](x=3) == 6
+    assert marker.exists()
+
+def test_load_plugin_tools_reuses_manifest_for_unchanged_files(tmp_path, monkeypatch, mocker):
+    """Lần chạy thứ hai không phân tích lại plugin chưa đổi."""
+    from termi_cli.tools import plugins
+
+    plugins_dir = tmp_path / "plugins"
+    plugins_dir.mkdir()
+    (plugins_dir / "p.py").write_text(
+        "def t():\n    return 1\n\nPLUGIN_TOOLS = {'t': t}\n", encoding="utf-8"
+    )
+    monkeypatch.setattr(api, "APP_DIR", tmp_path)
+    extract = mocker.spy(plugins, "_extract_static")
+
+    api._load_plugin_tools()
+    tools = api._load_plugin_tools()
+
+    assert extract.call_count == 1
+    assert list(tools) == ["t"]
+
+def test_load_plugin_tools_falls_back_to_import_for_dynamic_dict(tmp_path, monkeypatch):
+    """PLUGIN_TOOLS dựng động không đọc tĩnh được thì import module để lấy danh sách tool."""
+    plugins_dir = tmp_path / "plugins"
+    plugins_dir.mkdir()
+    (plugins_dir / "dyn.py").write_text(
+        "def a():\n    \"\"\"Tool A.\"\"\"\n    return 'a'\n\n"
+        "PLUGIN_TOOLS = dict(a=a)\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(api, "APP_DIR", tmp_path)
+
+    tools = api._load_plugin_tools()
+
+    assert tools["a"].doc == "Tool A."
+    assert tools["a"]() == "a"
+
+def test_load_plugin_tools_skips_non_callable_entries(tmp_path, monkeypatch):
+    """Giá trị không callable trong PLUGIN_TOOLS (literal, hằng số, thuộc tính module) bị bỏ qua."""
+    plugins_dir = tmp_path / "plugins"
+    plugins_dir.mkdir()
+    (plugins_dir / "mixed.py").write_text(
+        "import os\n\n"
+        "LIMIT = 10\n\n"
+        "def ok():\n    \"\"\"Tool OK.\"\"\"\n    return 'ok'\n\n"
+        "PLUGIN_TOOLS = {'ok': ok, 'lam': lambda: 'lam', 'num': 3, 'limit': LIMIT, 'sep': os.sep, 'join': os.path.join}\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(api, "APP_DIR", tmp_path)
+
+    tools = api._load_plugin_tools()
+
+    assert sorted(tools) == ["join", "lam", "ok"]
+    assert tools["ok"].doc == "Tool OK."
+    assert tools["lam"]() == "lam"
+
 def test_list_tools_prints_core_and_plugin_tools(monkeypatch):
     """list_tools phải in được cả core tool và plugin tool mà không crash."""
     def core_tool():
@@ -150,6 +242,25 @@ def test_initialize_groq_api_keys(mocker):
     assert keys == ["g1", "g2", "g3"]
     assert len(keys) == 3
 
+def test_reload_provider_keys_picks_up_rotated_keys(mocker):
+    """Daemon đọc lại key từ môi trường của từng client thay vì giữ key lúc khởi động."""
+    mocker.patch.dict(os.environ, {"GROQ_API_KEY": "old"}, clear=True)
+    mocker.patch.object(api, "_groq_api_keys", [])
+    mocker.patch.dict(key_pool._pools, {}, clear=True)
+    api.initialize_groq_api_keys()
+
+    mocker.patch.dict(os.environ, {"GROQ_API_KEY": "new", "GROQ_API_KEY_2ND": "new2"}, clear=True)
+    api.reload_provider_keys()
+
+    assert api._groq_api_keys == ["new", "new2"]
+    assert key_pool.get_pool("groq").keys == ["new", "new2"]
+
+
+def test_key_env_name_follows_ordinal_suffixes():
+    """Tên biến môi trường của key: PREFIX, PREFIX_2ND, PREFIX_3RD rồi PREFIX_<n>TH."""
+    names = [api.key_env_name("GROQ_API_KEY", n) for n in range(1, 6)]
+    assert names == ["GROQ_API_KEY", "GROQ_API_KEY_2ND", "GROQ_API_KEY_3RD", "GROQ_API_KEY_4TH", "GROQ_API_KEY_5TH"]
+
 def test_generate_text_routes_to_groq(monkeypatch):
     """generate_text phải route đúng sang _resilient_groq_api_call khi dùng groq-* model."""
 
@@ -171,4 +282,247 @@ def test_generate_text_routes_to_groq(monkeypatch):
     assert captured["model_name"] == "llama-3.3-70b-versatile"
 
     assert captured["messages"][0] == {"role": "system", "content": "sys-instr"}
-    assert captured["messages"][1] == {"role": "user", "content": "hello"}
\ No newline at end of file
+    assert captured["messages"][1] == {"role": "user", "content": "hello"}
+
+
+class _FakeStreamResponse:
+    def __init__(self, lines):
+        self._lines = lines
+        self.closed = False
+
+    def iter_lines(self):
+        yield from self._lines
+
+    def close(self):
+        self.closed = True
+
+
+def test_iter_sse_deltas_yields_content_until_done():
+    """_iter_sse_deltas bỏ qua comment/keep-alive, yield delta.content và dừng ở [DONE]."""
+    resp = _FakeStreamResponse([
+        b": keep-alive",
+        b"",
+        b'data: {"choices":[{"delta":{"role":"assistant"}}]}',
+        b'data: {"choices":[{"delta":{"content":"Xin "}}]}',
+        b'data: {"choices":[{"delta":{"content":"ch\xc3\xa0o"}}]}',
+        b"data: [DONE]",
+    ])
+
+    assert list(api._iter_sse_deltas(resp)) == ["Xin ", "chào"]
+    assert resp.closed
+
+def test_stream_text_raises_insufficient_balance_before_iteration(monkeypatch):
+    """Lỗi thiếu credit phải ném ra ngay khi gọi stream_text để caller fallback sang Gemini."""
+    def fake_deepseek_call(model_name, messages, stream=False):
+        assert stream is True
+        raise api.DeepseekInsufficientBalance("Insufficient Balance")
+
+    monkeypatch.setattr(api, "_resilient_deepseek_api_call", fake_deepseek_call, raising=True)
+
+    with pytest.raises(api.DeepseekInsufficientBalance):
+        api.stream_text("deepseek-chat", "hello")
+
+def test_stream_text_routes_groq_with_normalized_model(monkeypatch):
+    """stream_text dùng model Groq đã normalize và trả về iterator delta."""
+    captured = {}
+
+    def fake_groq_call(model_name, messages, stream=False):
+        captured["model_name"] = model_name
+        captured["stream"] = stream
+        return iter(["a", "b"])
+
+    monkeypatch.setattr(api, "_resilient_groq_api_call", fake_groq_call, raising=True)
+
+    assert "".join(api.stream_text("groq-chat", "hi")) == "ab"
+    assert captured == {"model_name": "llama-3.3-70b-versatile", "stream": True}
+
+def test_deepseek_rate_limit_fails_over_to_next_key(monkeypatch):
+    """Lỗi 429 với một key: key đó bị cooldown và request được thử ngay với key khác."""
+    import io
+    import json
+    import urllib.error
+
+    from termi_cli import key_pool
+
+    monkeypatch.setattr(api, "_deepseek_api_keys", ["k1", "k2"], raising=True)
+    pool = key_pool.KeyPool("deepseek", ["k1", "k2"])
+    monkeypatch.setattr(key_pool, "_pools", {"deepseek": pool}, raising=True)
+
+    used_keys = []
+
+    class _Resp:
+        def __init__(self, body):
+            self._body = body
+
+        def read(self):
+            return self._body
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+    def fake_post_json(url, payload, headers=None):
+        used_keys.append(headers["Authorization"])
+        if headers["Authorization"] == "Bearer k1":
+            raise urllib.error.HTTPError(url, 429, "Too Many Requests", {"Retry-After": "20"}, io.BytesIO(b"rate limit"))
+        return _Resp(json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode())
+
+    monkeypatch.setattr(api.http_pool, "post_json", fake_post_json, raising=True)
+
+    result = api._resilient_deepseek_api_call("deepseek-chat", [{"role": "user", "content": "hi"}])
+
+    assert result["choices"][0]["message"]["content"] == "ok"
+    assert used_keys == ["Bearer k1", "Bearer k2"]
+    assert pool.status()[0]["cooldown_s"] > 0
+    assert all(s["in_flight"] == 0 for s in pool.status())
+
+@pytest.mark.parametrize("rate_headers", [
+    {"Retry-After": "0.05"},
+    {"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "50ms", "x-ratelimit-reset-requests": "2s"},
+])
+def test_daily_token_limit_honours_rate_limit_headers(monkeypatch, rate_headers):
+    """429 TPD của Groq (body "try again in 14m28s") kèm header: cooldown theo header, key không bị coi là hết quota ngày."""
+    import io
+    import json
+    import urllib.error
+
+    from termi_cli import key_pool
+
+    monkeypatch.setattr(api, "_groq_api_keys", ["g1"], raising=True)
+    pool = key_pool.KeyPool("groq", ["g1"])
+    monkeypatch.setattr(key_pool, "_pools", {"groq": pool}, raising=True)
+    body = (b'{"error":{"message":"Rate limit reached for model `llama-3.3-70b-versatile` on tokens per day (TPD): '
+            b'Limit 100000, Used 99512, Requested 1033. Please try again in 14m28.032s.","code":"rate_limit_exceeded"}}')
+    calls = []
+
+    class _Resp(io.BytesIO):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+    def fake_post_json(url, payload, headers=None):
+        calls.append(url)
+        if len(calls) == 1:
+            raise urllib.error.HTTPError(url, 429, "Too Many Requests", rate_headers, io.BytesIO(body))
+        return _Resp(json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode())
+
+    monkeypatch.setattr(api.http_pool, "post_json", fake_post_json, raising=True)
+
+    result = api._resilient_groq_api_call("llama-3.3-70b-versatile", [{"role": "user", "content": "hi"}])
+
+    assert result["choices"][0]["message"]["content"] == "ok"
+    assert len(calls) == 2
+    # Chờ theo header (50ms) chứ không theo body (14 phút, quá ngưỡng chờ -> KeysExhausted)
+    assert pool.status()[0]["exhausted"] is False
+
+def test_get_model_token_limit_reads_catalog_without_network(tmp_path, monkeypatch, mocker):
+    """Token limit lấy từ catalog model, không gọi genai.get_model ở mỗi lượt chat."""
+    catalog = api.model_catalog.ModelCatalog(
+        tmp_path / "model_catalog.json",
+        {"gemini": lambda: [{"name": "models/gemini-pro-latest", "input_token_limit": 2097152,
+                             "generation_methods": ["generateContent"]}]},
+        ttl_seconds=3600,
+    )
+    monkeypatch.setattr(api, "_model_catalog", catalog, raising=True)
+    get_model = mocker.patch("google.generativeai.get_model")
+
+    assert api.get_model_token_limit("models/gemini-pro-latest") == 2097152
+    assert api.get_model_token_limit("models/gemini-pro-latest") == 2097152
+    get_model.assert_not_called()
+
+
+def test_get_model_token_limit_does_not_refetch_after_catalog_failure(tmp_path, monkeypatch, mocker):
+    """list_models lỗi: các lượt chat sau (kể cả tiến trình mới) dùng limit mặc định, không gọi mạng lại."""
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise RuntimeError("network down")
+
+    def new_catalog():
+        return api.model_catalog.ModelCatalog(tmp_path / "model_catalog.json", {"gemini": broken}, ttl_seconds=3600)
+
+    get_model = mocker.patch("google.generativeai.get_model", side_effect=RuntimeError("network down"))
+    monkeypatch.setattr(api, "_token_limit_cache", {}, raising=True)
+    monkeypatch.setattr(api, "_model_catalog", new_catalog(), raising=True)
+    assert api.get_model_token_limit("models/gemini-pro-latest") == 0
+
+    monkeypatch.setattr(api, "_token_limit_cache", {}, raising=True)
+    monkeypatch.setattr(api, "_model_catalog", new_catalog(), raising=True)
+    assert api.get_model_token_limit("models/gemini-pro-latest") == 0
+
+    assert len(calls) == 1
+    assert get_model.call_count == 0
+
+
+def test_deepseek_circuit_breaker_fails_fast_after_connection_errors(monkeypatch):
+    """Sau N lỗi kết nối liên tiếp, request kế tiếp bị từ chối ngay mà không gọi mạng."""
+    import urllib.error
+
+    from termi_cli import circuit_breaker, key_pool
+
+    monkeypatch.setattr(api, "_deepseek_api_keys", ["k1"], raising=True)
+    monkeypatch.setattr(key_pool, "_pools", {"deepseek": key_pool.KeyPool("deepseek", ["k1"])}, raising=True)
+    breaker = circuit_breaker.CircuitBreaker("deepseek", failure_threshold=2, reset_seconds=30)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {"deepseek": breaker}, raising=True)
+
+    calls = []
+
+    def fake_post_json(url, payload, headers=None):
+        calls.append(url)
+        raise urllib.error.URLError("connection refused")
+
+    monkeypatch.setattr(api.http_pool, "post_json", fake_post_json, raising=True)
+    messages = [{"role": "user", "content": "hi"}]
+
+    # Lỗi kết nối được retry, tới lỗi thứ hai thì breaker mở và lần thử kế tiếp bị chặn
+    with pytest.raises(circuit_breaker.CircuitOpenError):
+        api._resilient_deepseek_api_call("deepseek-chat", messages)
+    with pytest.raises(circuit_breaker.CircuitOpenError):
+        api._resilient_deepseek_api_call("deepseek-chat", messages)
+
+    assert len(calls) == 2
+    assert api.fallback_reason(circuit_breaker.CircuitOpenError("DeepSeek", 30)) == "unavailable"
+
+
+def test_stale_keep_alive_connection_is_resent_without_breaker_failure(monkeypatch):
+    """Kết nối keep-alive cũ bị server đóng: gửi lại ngay, không tính là lỗi của endpoint."""
+    import io
+    import json
+    import http.client
+
+    from termi_cli import circuit_breaker, key_pool
+
+    monkeypatch.setattr(api, "_deepseek_api_keys", ["k1"], raising=True)
+    monkeypatch.setattr(key_pool, "_pools", {"deepseek": key_pool.KeyPool("deepseek", ["k1"])}, raising=True)
+    breaker = circuit_breaker.CircuitBreaker("deepseek", failure_threshold=1, reset_seconds=30)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {"deepseek": breaker}, raising=True)
+    backoffs = []
+    monkeypatch.setattr(api, "_backoff", lambda *args: backoffs.append(args), raising=True)
+    calls = []
+
+    class _Resp(io.BytesIO):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+    def fake_post_json(url, payload, headers=None):
+        calls.append(url)
+        if len(calls) == 1:
+            raise api.http_pool.StaleConnectionError(http.client.RemoteDisconnected("closed without response"))
+        return _Resp(json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode())
+
+    monkeypatch.setattr(api.http_pool, "post_json", fake_post_json, raising=True)
+
+    result = api._resilient_deepseek_api_call("deepseek-chat", [{"role": "user", "content": "hi"}])
+
+    assert result["choices"][0]["message"]["content"] == "ok"
+    assert len(calls) == 2
+    assert backoffs == []
+    assert breaker.status()["failures"] == 0 and breaker.status()["state"] == circuit_breaker.CLOSED
@@ -0,0 +1,80 @@
+import json
+import argparse
+
+from termi_cli.handlers import batch_handler
+
+
+def _args(input_path, output_path):
+    return argparse.Namespace(
+        batch=str(input_path),
+        output=str(output_path),
+        batch_concurrency=3,
+        model="groq-chat",
+        system_instruction=None,
+        persona=None,
+    )
+
+
+def _read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def test_run_batch_writes_results_with_latency_and_usage(tmp_path, mocker):
+    """Mỗi record cho ra một dòng kết quả (kèm usage, latency); dòng hỏng được báo lỗi."""
+    input_path = tmp_path / "prompts.jsonl"
+    input_path.write_text(
+        '{"id": "a", "prompt": "one"}\n'
+        '{"prompt": "two", "model": "deepseek-chat", "system_instruction": "be short"}\n'
+        "not json\n",
+        encoding="utf-8",
+    )
+    output_path = tmp_path / "out.jsonl"
+    mocker.patch("termi_cli.handlers.batch_handler.load_config", return_value={"language": "vi"})
+    completion = mocker.patch(
+        "termi_cli.handlers.batch_handler.api.generate_completion",
+        side_effect=lambda model, prompt, si: {
+            "text": f"{prompt}!", "model": model, "cached": False,
+            "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+        },
+    )
+
+    batch_handler.run_batch(mocker.MagicMock(), _args(input_path, output_path))
+
+    results = {str(r["id"]): r for r in _read_jsonl(output_path)}
+    assert results["a"]["text"] == "one!"
+    assert results["a"]["model"] == "groq-chat"
+    assert results["2"]["model"] == "deepseek-chat"
+    assert results["2"]["usage"]["total_tokens"] == 5
+    assert isinstance(results["2"]["latency_ms"], int)
+    assert "invalid JSON" in results["3"]["error"]
+    completion.assert_any_call("deepseek-chat", "two", "be short")
+
+
+def test_run_batch_resumes_after_partial_output(tmp_path, mocker):
+    """Chạy lại bỏ qua record đã thành công, chạy lại record lỗi và dòng bị ghi dở."""
+    input_path = tmp_path / "prompts.jsonl"
+    input_path.write_text(
+        "".join(json.dumps({"id": i, "prompt": f"p{i}"}) + "\n" for i in range(1, 5)),
+        encoding="utf-8",
+    )
+    output_path = tmp_path / "out.jsonl"
+    # Record 1 xong, record 2 lỗi, record 3 bị cắt giữa chừng khi crash
+    output_path.write_text(
+        '{"id": 1, "text": "done"}\n{"id": 2, "error": "boom"}\n{"id": 3, "te',
+        encoding="utf-8",
+    )
+    mocker.patch("termi_cli.handlers.batch_handler.load_config", return_value={"language": "vi"})
+    prompts = []
+
+    def fake_completion(model, prompt, si):
+        prompts.append(prompt)
+        return {"text": prompt.upper(), "model": model, "usage": None, "cached": False}
+
+    mocker.patch("termi_cli.handlers.batch_handler.api.generate_completion", side_effect=fake_completion)
+
+    batch_handler.run_batch(mocker.MagicMock(), _args(input_path, output_path))
+
+    assert sorted(prompts) == ["p2", "p3", "p4"]
+    lines = output_path.read_text(encoding="utf-8").splitlines()
+    assert lines[2] == '{"id": 3, "te'
+    assert batch_handler.completed_ids(output_path) == {"1", "2", "3", "4"}
@@ -0,0 +1,126 @@
+import io
+import json
+import urllib.error
+
+import pytest
+
+from termi_cli import api, cassette, http_pool
+
+
+class _FakeResponse:
+    def __init__(self, body: bytes = b"", lines=(), status: int = 200):
+        self.status = status
+        self.headers = {"Content-Type": "application/json"}
+        self._body = body
+        self._lines = list(lines)
+
+    def read(self, amt=None):
+        return self._body
+
+    def iter_lines(self):
+        yield from self._lines
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(round(seconds, 3))
+        self.now += seconds
+
+
+def test_http_calls_are_recorded_and_replayed_without_network(tmp_path, monkeypatch):
+    """DeepSeek/Groq: response thường, stream SSE và lỗi 429 được ghi rồi phát lại y nguyên."""
+    path = tmp_path / "session.jsonl"
+    sse = [b'data: {"choices":[{"delta":{"content":"Xin "}}]}', 'data: {"choices":[{"delta":{"content":"chào"}}]}'.encode(), b"data: [DONE]"]
+    replies = [
+        _FakeResponse(json.dumps({"choices": [{"message": {"content": "4"}}], "usage": {"total_tokens": 9}}).encode()),
+        _FakeResponse(lines=sse),
+        urllib.error.HTTPError("u", 429, "Too Many Requests", {"Retry-After": "7"}, io.BytesIO(b'{"error":"rate limit"}')),
+    ]
+
+    def fake_request(method, url, body=None, headers=None):
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(http_pool, "request", fake_request)
+    url = "https://api.deepseek.com/chat/completions"
+
+    def run_session():
+        with http_pool.post_json(url, {"model": "deepseek-chat", "messages": [{"role": "user", "content": "2+2"}], "stream": False}) as resp:
+            answer = json.loads(resp.read())["choices"][0]["message"]["content"]
+        resp = http_pool.post_json(url, {"model": "deepseek-chat", "messages": [], "stream": True})
+        streamed = "".join(api._iter_sse_deltas(resp))
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            http_pool.post_json(url, {"model": "deepseek-chat", "messages": [], "stream": False, "n": 2})
+        return answer, streamed, excinfo.value.code, excinfo.value.headers.get("Retry-After"), excinfo.value.read()
+
+    monkeypatch.setattr(cassette, "_cassette", cassette.Cassette(cassette.RECORD, path))
+    recorded = run_session()
+    assert recorded == ("4", "Xin chào", 429, "7", b'{"error":"rate limit"}')
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+    assert "Authorization" not in path.read_text(encoding="utf-8")
+
+    # Phát lại: không còn request thật nào được gửi
+    monkeypatch.setattr(http_pool, "request", lambda *a, **k: pytest.fail("network used during replay"))
+    monkeypatch.setattr(cassette, "_cassette", cassette.Cassette(cassette.REPLAY, path))
+    assert run_session() == recorded
+    with pytest.raises(cassette.CassetteMiss):
+        http_pool.post_json(url, {"model": "deepseek-chat", "messages": []})
+
+
+def test_gemini_stream_with_function_call_and_usage_replays_with_original_timing(tmp_path):
+    """Gemini: chunk có function-call và usage_metadata, cùng lỗi quota, được phát lại theo đúng nhịp."""
+    import google.ai.generativelanguage as glm
+    from google.api_core.exceptions import ResourceExhausted
+
+    path = tmp_path / "gemini.jsonl"
+    request = glm.GenerateContentRequest(model="models/gemini-flash-latest", contents=[{"role": "user", "parts": [{"text": "ls"}]}])
+    chunks = [
+        glm.GenerateContentResponse({"candidates": [{"content": {"role": "model", "parts": [{"text": "Đang xem"}]}}]}),
+        glm.GenerateContentResponse({
+            "candidates": [{"content": {"role": "model", "parts": [{"function_call": {"name": "list_files", "args": {"directory": "."}}}]}}],
+            "usage_metadata": {"prompt_token_count": 12, "candidates_token_count": 5, "total_token_count": 17},
+        }),
+    ]
+    clock = _Clock()
+
+    class _RealClient:
+        def stream_generate_content(self, request):
+            for chunk in chunks:
+                clock.now += 0.5
+                yield chunk
+
+        def generate_content(self, request):
+            raise ResourceExhausted("Quota exceeded for requests per minute")
+
+    recorder = cassette.Cassette(cassette.RECORD, path, clock=clock)
+    client = recorder.gemini_client(_RealClient)
+    assert list(client.stream_generate_content(request)) == chunks
+    with pytest.raises(ResourceExhausted):
+        client.generate_content(request)
+
+    player = cassette.Cassette(cassette.REPLAY, path, timing=1.0, clock=clock, sleep=clock.sleep)
+    client = player.gemini_client(lambda: pytest.fail("real client created during replay"))
+    replayed = list(client.stream_generate_content(request))
+    assert replayed == chunks
+    assert replayed[1].usage_metadata.total_token_count == 17
+    assert clock.slept == [0.5, 0.5]
+    with pytest.raises(ResourceExhausted, match="requests per minute"):
+        client.generate_content(request)
@@ -0,0 +1,88 @@
+import threading
+
+from termi_cli import circuit_breaker, quota_store
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_threshold_and_probes_once_when_half_open():
+    """N lỗi liên tiếp thì mở; hết cool-down chỉ cho một request thăm dò đi qua."""
+    clock = _Clock()
+    breaker = circuit_breaker.CircuitBreaker("groq", failure_threshold=3, reset_seconds=30, clock=clock)
+
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.is_open() and not breaker.allow()
+
+    clock.now += 31
+    probe = breaker.allow()
+    assert probe and probe.probe
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    # Request thứ hai trong lúc thăm dò bị từ chối
+    assert not breaker.allow()
+
+    # Thăm dò lỗi -> mở lại; thăm dò thành công -> đóng
+    breaker.record_failure(probe)
+    assert breaker.state == circuit_breaker.OPEN
+    clock.now += 31
+    probe = breaker.allow()
+    assert probe
+    breaker.record_success(probe)
+    assert breaker.state == circuit_breaker.CLOSED
+    assert [t[2] for t in breaker.transitions] == ["open", "half_open", "open", "half_open", "closed"]
+
+
+def test_open_state_is_shared_through_quota_store(tmp_path):
+    """Breaker mở ở tiến trình này thì tiến trình khác (cùng store) cũng fail-fast."""
+    clock = _Clock()
+    store = quota_store.QuotaStore(tmp_path / "quota.db")
+    first = circuit_breaker.CircuitBreaker("deepseek", failure_threshold=1, reset_seconds=60, clock=clock, store=store)
+    second = circuit_breaker.CircuitBreaker("deepseek", failure_threshold=1, reset_seconds=60, clock=clock, store=store)
+
+    first.record_failure()
+
+    assert second.is_open()
+    assert second.retry_in() == 60
+    assert store.load_breakers()["deepseek"]["state"] == circuit_breaker.OPEN
+
+
+def test_half_open_probe_is_owned_by_the_caller_that_took_it():
+    """Hai thread cùng gọi ở half_open: chỉ một thăm dò, thread bị từ chối không giải phóng được lượt đó."""
+    clock = _Clock()
+    breaker = circuit_breaker.CircuitBreaker("groq", failure_threshold=1, reset_seconds=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 31
+
+    barrier = threading.Barrier(2)
+    permits = []
+
+    def caller():
+        barrier.wait()
+        permits.append(breaker.allow())
+
+    threads = [threading.Thread(target=caller) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    granted = [permit for permit in permits if permit is not None]
+    assert len(granted) == 1 and granted[0].probe
+
+    # Kết thúc của request khác (không giữ thăm dò) không mở thêm lượt thăm dò
+    breaker.release_probe(None)
+    breaker.release_probe(circuit_breaker.Permit(probe=True))
+    assert breaker.allow() is None
+
+    breaker.release_probe(granted[0])
+    assert breaker.allow().probe
@@ -1,4 +1,5 @@
 import json
+import pytest
 from pathlib import Path
 from termi_cli import config
 
@@ -44,4 +45,75 @@ def test_load_default_config_if_not_exists(tmp_path):
     
     # Kiểm tra một vài giá trị mặc định quan trọng
     assert "default_model" in loaded_config
-    assert loaded_config["personas"] == {}
\ No newline at end of file
+    assert loaded_config["personas"] == {}
+
+def test_load_config_is_cached_until_file_changes(tmp_path, mocker):
+    """
+    load_config chỉ parse lại config.json khi mtime/size của file thay đổi.
+    """
+    config.CONFIG_PATH = tmp_path / "cached_config.json"
+    config.CONFIG_PATH.write_text(json.dumps({"default_model": "model-a"}), encoding="utf-8")
+    config.invalidate_config_cache()
+    json_load = mocker.spy(config.json, "load")
+
+    assert config.load_config()["default_model"] == "model-a"
+    assert config.load_config()["default_model"] == "model-a"
+    assert json_load.call_count == 1
+
+    # File bị sửa bên ngoài (kích thước khác) -> đọc lại
+    config.CONFIG_PATH.write_text(json.dumps({"default_model": "model-bb"}), encoding="utf-8")
+    assert config.load_config()["default_model"] == "model-bb"
+    assert json_load.call_count == 2
+
+
+def test_load_config_returns_read_only_view_and_writable_copy(tmp_path):
+    """
+    View mặc định là chỉ-đọc; writable=True trả về bản sao độc lập có thể sửa.
+    """
+    config.CONFIG_PATH = tmp_path / "view_config.json"
+    config.invalidate_config_cache()
+
+    view = config.load_config()
+    with pytest.raises(TypeError):
+        view["language"] = "en"
+    with pytest.raises(TypeError):
+        view["personas"]["x"] = "y"
+
+    writable = config.load_config(writable=True)
+    writable["personas"]["x"] = "y"
+    writable["model_fallback_order"].append("models/other")
+    assert "x" not in config.load_config()["personas"]
+    assert "models/other" not in config.load_config()["model_fallback_order"]
+
+
+def test_save_config_writes_atomically_and_updates_cache(tmp_path, mocker):
+    """
+    save_config ghi qua file tạm + os.replace và cập nhật cache, không cần đọc lại đĩa.
+    """
+    config.CONFIG_PATH = tmp_path / "saved_config.json"
+    config.invalidate_config_cache()
+    replace = mocker.spy(config.os, "replace")
+
+    data = config.load_config(writable=True)
+    data["personas"] = {"tester": "You test things."}
+    config.save_config(data)
+
+    assert replace.call_args[0][1] == config.CONFIG_PATH
+    assert [p.name for p in tmp_path.iterdir()] == ["saved_config.json"]
+
+    json_load = mocker.spy(config.json, "load")
+    assert config.load_config()["personas"]["tester"] == "You test things."
+    assert json_load.call_count == 0
+
+
+def test_atomic_write_json_keeps_old_file_and_cleans_temp_on_failure(tmp_path):
+    """atomic_write_json: ghi lỗi giữa chừng thì file cũ còn nguyên và không để lại file tạm."""
+    path = tmp_path / "nested" / "state.json"
+    config.atomic_write_json(path, {"a": 1})
+    assert json.loads(path.read_text(encoding="utf-8")) == {"a": 1}
+
+    with pytest.raises(TypeError):
+        config.atomic_write_json(path, {"a": object()})
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"a": 1}
+    assert [p.name for p in path.parent.iterdir()] == ["state.json"]
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from termi_cli import context_cache, prompts
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FakeCaching:
+    """Giả lập ``google.generativeai.caching`` đủ cho ContextCache."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.created = []
+        self.fetched = []
+        outer = self
+
+        class CachedContent:
+            def __init__(self, name):
+                self.name = name
+
+            @staticmethod
+            def create(model, system_instruction, tools, ttl):
+                if outer.fail:
+                    raise ValueError("Cached content is too small")
+                outer.created.append((model, system_instruction, ttl.total_seconds()))
+                return CachedContent(f"cachedContents/{len(outer.created)}")
+
+            @staticmethod
+            def get(name):
+                outer.fetched.append(name)
+                return CachedContent(name)
+
+        self.CachedContent = CachedContent
+
+
+def test_stable_instruction_is_deterministic_and_volatile_part_is_a_suffix():
+    """Phần cố định không đổi theo thời gian; ngày giờ chỉ nằm ở phần đuôi."""
+    stable = prompts.build_session_instruction("usage: termi", "Trả lời bằng tiếng Việt")
+    assert stable == prompts.build_session_instruction("usage: termi", "Trả lời bằng tiếng Việt")
+    assert stable.startswith(prompts.build_stable_instruction("usage: termi"))
+    assert "CURRENT CONTEXT" not in stable
+    assert prompts.instruction_fingerprint(stable) == prompts.instruction_fingerprint(stable)
+
+    volatile = prompts.build_volatile_context(datetime(2024, 5, 1, 9, 30, 59))
+    assert "2024-05-01 09:30." in volatile
+    assert "2024-05-01." in prompts.build_volatile_context(datetime(2024, 5, 1, 9, 30), with_time=False)
+
+
+def test_context_cache_reuses_handles_until_expiry(tmp_path):
+    """Handle được tạo một lần, dùng lại qua các tiến trình, và tạo lại khi hết hạn."""
+    clock = _Clock()
+    caching = _FakeCaching()
+    path = tmp_path / "context_cache.json"
+    cache = context_cache.ContextCache(caching, path, ttl_seconds=600, clock=clock)
+
+    first = cache.get_or_create("m:abc:key", "models/gemini-2.5-flash", "stable", tools=[])
+    assert first.name == "cachedContents/1"
+    assert caching.created == [("models/gemini-2.5-flash", "stable", 600.0)]
+
+    # Tiến trình khác đọc sổ trên đĩa và chỉ lấy lại handle
+    other = context_cache.ContextCache(caching, path, ttl_seconds=600, clock=clock)
+    assert other.get_or_create("m:abc:key", "models/gemini-2.5-flash", "stable").name == "cachedContents/1"
+    assert caching.fetched == ["cachedContents/1"]
+
+    clock.now += 600
+    assert cache.get_or_create("m:abc:key", "models/gemini-2.5-flash", "stable").name == "cachedContents/2"
+
+    # Server từ chối cache: ghi nhớ để không thử lại cho tới hết TTL
+    refusing = _FakeCaching(fail=True)
+    small = context_cache.ContextCache(refusing, None, ttl_seconds=600, clock=clock)
+    assert small.get_or_create("m:small:key", "models/gemini-2.5-flash", "x") is None
+    refusing.fail = False
+    assert small.get_or_create("m:small:key", "models/gemini-2.5-flash", "x") is None
+    assert refusing.created == []
@@ -55,7 +55,7 @@ def test_handle_conversation_turn_executes_tools_when_function_calls_present(moc
         ("Final answer", []),
     ]
 
-    def fake_send_and_accumulate(session, message, total_tokens):
+    def fake_send_and_accumulate(session, message, total_tokens, timings=None):
         return calls.pop(0)
 
     mocker.patch(
@@ -124,7 +124,7 @@ def test_handle_conversation_turn_retries_on_quota_and_recreates_session(mocker,
         ("Hello after quota", []),
     ]
 
-    def fake_send_and_accumulate(session, message, total_tokens):
+    def fake_send_and_accumulate(session, message, total_tokens, timings=None):
         value = calls.pop(0)
         if isinstance(value, Exception):
             raise value
@@ -186,7 +186,7 @@ def test_handle_conversation_turn_raises_permission_denied_without_retry(mocker,
     chat_session = object()
     prompt_parts = ["hello"]
 
-    def fake_send_and_accumulate(session, message, total_tokens):
+    def fake_send_and_accumulate(session, message, total_tokens, timings=None):
         raise PermissionDenied("denied")
 
     mocker.patch(
@@ -222,7 +222,7 @@ def test_handle_conversation_turn_raises_invalid_argument_without_retry(mocker,
     chat_session = object()
     prompt_parts = ["hello"]
 
-    def fake_send_and_accumulate(session, message, total_tokens):
+    def fake_send_and_accumulate(session, message, total_tokens, timings=None):
         raise InvalidArgument("bad-args")
 
     mocker.patch(
@@ -351,3 +351,83 @@ def test_accumulate_response_stream_collects_native_function_calls():
 
     assert full_text == ""
     assert function_calls == [native_fc]
+
+
+def test_render_text_stream_prints_deltas_and_returns_full_text():
+    """render_text_stream in dần từng đoạn (format thường) và trả về toàn bộ text."""
+    from rich.console import Console
+
+    console = Console(record=True, width=80)
+
+    text = core_handler.render_text_stream(console, iter(["Hello", ", ", "world"]), "plain")
+
+    assert text == "Hello, world"
+    assert "Hello, world" in console.export_text()
+
+
+def test_render_text_stream_rich_renders_markdown():
+    """Với format rich, kết quả cuối cùng được render dạng Markdown."""
+    from rich.console import Console
+
+    console = Console(record=True, width=80)
+
+    text = core_handler.render_text_stream(console, iter(["# Tiêu đề\n", "nội dung"]), "rich")
+
+    assert text == "# Tiêu đề\nnội dung"
+    output = console.export_text()
+    assert "Tiêu đề" in output and "nội dung" in output
+    assert "#" not in output
+
+
+def test_send_and_accumulate_reports_time_to_first_chunk(mocker):
+    """TTFT đo tới lúc send_message trả stream, không tính thời gian đọc hết câu trả lời."""
+    response = mocker.MagicMock()
+    mocker.patch("termi_cli.handlers.core_handler.api.send_message", return_value=response)
+    mocker.patch("termi_cli.handlers.core_handler.api.get_token_usage", return_value=None)
+    clock = mocker.patch("termi_cli.handlers.core_handler.time.monotonic", side_effect=[10.0, 10.5, 99.0])
+
+    def slow_accumulate(stream):
+        clock()  # đọc hết câu trả lời dài mất nhiều thời gian
+        return "answer", []
+
+    mocker.patch("termi_cli.handlers.core_handler.accumulate_response_stream", side_effect=slow_accumulate)
+    timings = {}
+
+    assert core_handler._send_and_accumulate(object(), ["hi"], {}, timings=timings) == ("answer", [])
+    assert timings == {"ttft": 0.5}
+
+
+def test_handle_conversation_turn_falls_back_to_next_model_when_keys_exhausted(mocker, monkeypatch):
+    """Hết quota trên mọi key thì lượt chat chuyển sang model kế tiếp trong model_fallback_order."""
+    console = mocker.MagicMock()
+    chat_session = SimpleNamespace(model=SimpleNamespace(model_name="models/flash"), history=[])
+
+    router = core_handler.model_router.ModelRouter(
+        config=dict(core_handler.model_router.DEFAULT_ROUTER_CONFIG),
+        fallback_order=["models/flash", "groq-chat", "models/pro"],
+    )
+    monkeypatch.setattr(core_handler.model_router, "get_router", lambda: router)
+    monkeypatch.setattr(core_handler.api, "_api_keys", ["k1"], raising=False)
+
+    def fake_send_and_accumulate(session, message, total_tokens, timings=None):
+        if session.model.model_name == "models/flash":
+            raise ResourceExhausted("quota")
+        return ("Hello from pro", [])
+
+    mocker.patch("termi_cli.handlers.core_handler._send_and_accumulate", side_effect=fake_send_and_accumulate)
+    mocker.patch(
+        "termi_cli.handlers.core_handler.api.start_chat_session",
+        side_effect=lambda name, *a: SimpleNamespace(model=SimpleNamespace(model_name=name)),
+    )
+    mocker.patch("termi_cli.handlers.core_handler.get_session_recreation_args", return_value=("sys", [], ""))
+    mocker.patch("termi_cli.handlers.core_handler.api.get_model_token_limit", return_value=42)
+
+    result_text, _, token_limit, _ = core_handler.handle_conversation_turn(
+        chat_session, ["hello"], console, model_name="models/flash", args=None,
+    )
+
+    assert result_text == "Hello from pro"
+    assert token_limit == 42
+    # Session của caller được gắn model mới (groq-chat bị bỏ qua vì không hỗ trợ tool-calling Gemini)
+    assert chat_session.model.model_name == "models/pro"
+    assert router.is_degraded("models/flash")
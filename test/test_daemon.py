@@ -0,0 +1,177 @@
+import io
+import os
+import sys
+import time
+import subprocess
+
+import pytest
+
+from termi_cli import daemon
+
+pytestmark = pytest.mark.skipif(not daemon.is_supported(), reason="Cần Unix socket")
+
+# Daemon thử nghiệm: runner giả lập in ra trạng thái request thay vì chạy termi thật
+_DAEMON_SCRIPT = """
+import os, sys
+from rich.console import Console
+from termi_cli import daemon
+
+def runner(argv):
+    print("cwd=" + os.getcwd())
+    print("argv=" + ",".join(argv))
+    print("env=" + os.environ.get("TERMI_TEST_VAR", ""))
+    print("tty=" + str(sys.stdin.isatty()))
+    if argv and argv[0] == "ask":
+        print("hello " + input("name? "))
+    else:
+        print("stdin=" + sys.stdin.read().strip())
+    return 3
+
+daemon.serve(Console(), runner, warm_up=None)
+"""
+
+
+class _TtyInput(io.StringIO):
+    def isatty(self):
+        return True
+
+
+@pytest.fixture
+def running_daemon(tmp_path, monkeypatch):
+    sock_path = tmp_path / "termi.sock"
+    env = dict(os.environ)
+    env["TERMI_CLI_HOME"] = str(tmp_path / "home")
+    env["TERMI_DAEMON_SOCKET"] = str(sock_path)
+    proc = subprocess.Popen(
+        [sys.executable, "-c", _DAEMON_SCRIPT],
+        env=env,
+        cwd=tmp_path,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    monkeypatch.setenv("TERMI_DAEMON_SOCKET", str(sock_path))
+    monkeypatch.delenv("TERMI_NO_DAEMON", raising=False)
+    # Client giả lập cùng APP_DIR / config với daemon thử nghiệm
+    home = tmp_path / "home"
+    monkeypatch.setattr(daemon, "_instance_info", lambda: {"app_dir": str(home), "config_path": str(home / "config.json")})
+
+    deadline = time.time() + 30
+    while not sock_path.exists() and time.time() < deadline:
+        time.sleep(0.05)
+    assert sock_path.exists(), "daemon không khởi động được"
+
+    yield proc
+
+    daemon.stop()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def test_socket_is_private_to_owner(running_daemon):
+    """Socket daemon chỉ chủ sở hữu đọc/ghi được."""
+    mode = daemon.get_socket_path().stat().st_mode & 0o777
+    assert mode == 0o600
+
+
+def test_forward_returns_none_without_daemon(tmp_path, monkeypatch):
+    """Không có daemon thì client phải fallback (forward trả về None)."""
+    monkeypatch.setenv("TERMI_DAEMON_SOCKET", str(tmp_path / "missing.sock"))
+    assert daemon.forward(["--diagnostics"]) is None
+
+
+def test_forward_relays_argv_cwd_env_and_piped_stdin(running_daemon, tmp_path, monkeypatch, capsys):
+    """Daemon nhận argv, cwd, biến môi trường, stdin pipe của client và trả về exit code."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TERMI_TEST_VAR", "xin-chao")
+    monkeypatch.setattr(sys, "stdin", io.StringIO("noi dung pipe\n"))
+
+    code = daemon.forward(["--chat", "hỏi gì đó"])
+
+    out = capsys.readouterr().out
+    assert code == 3
+    assert f"cwd={tmp_path}" in out
+    assert "argv=--chat,hỏi gì đó" in out
+    assert "env=xin-chao" in out
+    assert "tty=False" in out
+    assert "stdin=noi dung pipe" in out
+
+
+def test_forward_relays_interactive_input(running_daemon, monkeypatch, capsys):
+    """input() trong daemon phải đọc từng dòng từ bàn phím của client."""
+    monkeypatch.setattr(sys, "stdin", _TtyInput("Termi\n"))
+
+    code = daemon.forward(["ask"])
+
+    out = capsys.readouterr().out
+    assert code == 3
+    assert "tty=True" in out
+    assert "name? " in out
+    assert "hello Termi" in out
+
+
+def test_forward_falls_back_while_daemon_is_busy(running_daemon, monkeypatch):
+    """Một lệnh đang chờ nhập liệu trong daemon không được chặn các lệnh termi khác."""
+    import json
+    import socket
+
+    busy = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    busy.connect(os.environ["TERMI_DAEMON_SOCKET"])
+    busy_file = busy.makefile("rwb")
+    try:
+        assert json.loads(busy_file.readline())["type"] == "ready"
+        busy_file.write(json.dumps({"type": "run", "argv": ["ask"], "stdin_isatty": True}).encode() + b"\n")
+        busy_file.flush()
+        # Chờ tới khi lệnh "ask" đang đợi client nhập tên
+        while json.loads(busy_file.readline())["type"] != "input":
+            pass
+
+        monkeypatch.setattr(sys, "stdin", io.StringIO(""))
+        started = time.monotonic()
+        assert daemon.forward(["--chat", "hi"]) is None
+        assert time.monotonic() - started < daemon._HANDSHAKE_TIMEOUT
+
+        busy_file.write(json.dumps({"type": "line", "data": "Termi\n"}).encode() + b"\n")
+        busy_file.flush()
+        frames = [json.loads(line) for line in busy_file]
+        assert frames[-1] == {"type": "exit", "code": 3}
+    finally:
+        busy_file.close()
+        busy.close()
+
+
+def test_forward_falls_back_when_daemon_uses_other_app_dir(running_daemon, tmp_path, monkeypatch):
+    """Daemon khởi động với TERMI_CLI_HOME khác thì client phải tự chạy lệnh."""
+    other = tmp_path / "other-home"
+    monkeypatch.setattr(daemon, "_instance_info", lambda: {"app_dir": str(other), "config_path": str(other / "config.json")})
+    monkeypatch.setattr(sys, "stdin", io.StringIO(""))
+
+    assert daemon.forward(["--chat", "hi"]) is None
+
+
+def test_stop_shuts_daemon_down(running_daemon):
+    """--stop-daemon dừng tiến trình và dọn socket."""
+    assert daemon.stop() is True
+    running_daemon.wait(timeout=10)
+    assert not daemon.get_socket_path().exists()
+    assert daemon.forward(["--diagnostics"]) is None
+
+
+@pytest.mark.parametrize("argv, env", [(["--loadtest"], None), (["--chat", "hi"], "replay")])
+def test_client_main_runs_loadtest_and_cassette_in_process(argv, env, monkeypatch):
+    """--loadtest và TERMI_CASSETTE không được chuyển tiếp sang daemon (bản vá cassette là toàn tiến trình)."""
+    import termi_cli.__main__ as termi_main
+
+    if env:
+        monkeypatch.setenv("TERMI_CASSETTE", env)
+    else:
+        monkeypatch.delenv("TERMI_CASSETTE", raising=False)
+    monkeypatch.setattr(sys, "argv", ["termi", *argv])
+    monkeypatch.setattr(daemon, "forward", lambda argv: pytest.fail("không được forward"), raising=True)
+    ran = []
+    monkeypatch.setattr(termi_main, "main", lambda: ran.append(True), raising=True)
+
+    daemon.client_main()
+
+    assert ran == [True]
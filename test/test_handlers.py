@@ -194,4 +194,25 @@ def test_generate_git_commit_message_short_empty_response_does_not_execute(mocke
 
     # Vẫn gọi git status/diff nhưng không tạo lệnh commit
     assert check_output_mock.call_count == 2
-    exec_suggested_mock.assert_not_called()
\ No newline at end of file
+    exec_suggested_mock.assert_not_called()
+
+def test_show_cache_stats_labels_every_row_in_the_configured_language(mocker):
+    """show_cache_stats: mọi nhãn (kể cả hits/misses) lấy từ i18n theo ngôn ngữ cấu hình."""
+    from rich.console import Console
+    from termi_cli import i18n
+
+    mocker.patch("termi_cli.handlers.utility_handler.load_config", return_value={"language": "vi"})
+    mocker.patch("termi_cli.handlers.utility_handler.response_cache.get_cache_config", return_value={"enabled": True})
+    mocker.patch(
+        "termi_cli.handlers.utility_handler.response_cache.get_stats",
+        return_value={"entries": 1, "bytes": 2048, "hits": 3, "misses": 1, "hit_rate": 0.75, "evictions": 0},
+    )
+    mocker.patch("termi_cli.handlers.utility_handler.semantic_cache.read_stats", return_value={})
+    console = Console(record=True, width=120)
+
+    utility_handler.show_cache_stats(console)
+
+    output = console.export_text()
+    assert i18n.tr("vi", "cache_stats_hits") in output
+    assert i18n.tr("vi", "cache_stats_misses") in output
+    assert "Hits" not in output
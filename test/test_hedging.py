@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from termi_cli import hedging
+
+
+class _Stream:
+    """Iterator giả lập stream text, có thể chờ một event trước token đầu tiên."""
+
+    def __init__(self, chunks, gate=None, error=None):
+        self._chunks = list(chunks)
+        self._gate = gate
+        self._error = error
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._gate is not None:
+            self._gate.wait(5)
+            self._gate = None
+        if self._error is not None:
+            raise self._error
+        if not self._chunks:
+            raise StopIteration
+        return self._chunks.pop(0)
+
+    def close(self):
+        self.closed.set()
+
+
+def test_fast_primary_is_not_hedged(tmp_path):
+    """Model chính có token trước hạn thì không gửi request dự phòng."""
+    started = []
+
+    def start(model):
+        started.append(model)
+        return _Stream(["a", "b"])
+
+    winner, stream = hedging.first_response("groq-chat", "gemini", start, 1.0, stats_path=tmp_path / "s.json")
+
+    assert (winner, "".join(stream)) == ("groq-chat", "ab")
+    assert started == ["groq-chat"]
+    assert hedging.read_stats(tmp_path / "s.json") == {"requests": 1}
+
+
+def test_slow_primary_is_hedged_and_loser_closed(tmp_path):
+    """Model chính chậm: model dự phòng thắng, stream của model chính bị đóng khi trả về."""
+    gate = threading.Event()
+    primary = _Stream(["late"], gate=gate)
+    streams = {"groq-chat": primary, "gemini": _Stream(["fast"])}
+
+    winner, stream = hedging.first_response("groq-chat", "gemini", streams.__getitem__, 0.01, stats_path=tmp_path / "s.json")
+
+    assert (winner, "".join(stream)) == ("gemini", "fast")
+    gate.set()
+    assert primary.closed.wait(5)
+    assert hedging.read_stats(tmp_path / "s.json") == {"requests": 1, "hedged": 1, "secondary_wins": 1}
+
+
+def test_primary_error_falls_back_immediately_and_both_failing_raises_primary_error(tmp_path):
+    """Lỗi trước token đầu tiên thì gọi dự phòng ngay; cả hai lỗi thì ném lỗi của model chính."""
+    winner, stream = hedging.first_response(
+        "groq-chat",
+        "gemini",
+        lambda m: _Stream([], error=RuntimeError("no credit")) if m == "groq-chat" else _Stream(["ok"]),
+        60.0,
+        stats_path=tmp_path / "s.json",
+    )
+    assert (winner, list(stream)) == ("gemini", ["ok"])
+
+    def always_fail(model):
+        raise RuntimeError(f"{model} down")
+
+    with pytest.raises(RuntimeError, match="groq-chat down"):
+        hedging.first_response("groq-chat", "gemini", always_fail, 60.0, stats_path=tmp_path / "s.json")
@@ -0,0 +1,213 @@
+import json
+import time
+import threading
+import http.client
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from termi_cli import http_pool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    client_ports: list = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        type(self).client_ports.append(self.client_address[1])
+
+        status = payload.get("status", 200)
+        body = json.dumps({"echo": payload, "auth": self.headers.get("Authorization")}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if payload.get("close"):
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    _Handler.client_ports = []
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}/chat/completions"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_pool_reuses_keep_alive_connection(server):
+    """Các request liên tiếp tới cùng host phải dùng lại một kết nối TCP."""
+    pool = http_pool.HTTPPool(pool_size=2)
+
+    for i in range(3):
+        with pool.request("POST", server, body=json.dumps({"i": i}).encode(), headers={"Authorization": "Bearer k"}) as resp:
+            data = json.loads(resp.read())
+        assert data["echo"] == {"i": i}
+        assert data["auth"] == "Bearer k"
+
+    assert len(set(_Handler.client_ports)) == 1
+    pool.close()
+
+
+def test_pool_does_not_reuse_connection_closed_by_server(server):
+    """Server trả 'Connection: close' thì request sau mở kết nối mới."""
+    pool = http_pool.HTTPPool()
+
+    with pool.request("POST", server, body=json.dumps({"close": True}).encode()) as resp:
+        resp.read()
+    with pool.request("POST", server, body=b"{}") as resp:
+        resp.read()
+
+    assert len(set(_Handler.client_ports)) == 2
+    pool.close()
+
+
+class _StaleConnection:
+    """Kết nối keep-alive mà server đã đóng: lỗi lúc gửi hoặc lúc chờ response."""
+
+    def __init__(self, fail_on_send):
+        self.fail_on_send = fail_on_send
+        self.sent = 0
+        self.closed = False
+
+    def request(self, *args, **kwargs):
+        if self.fail_on_send:
+            raise BrokenPipeError("broken pipe")
+        self.sent += 1
+
+    def getresponse(self):
+        raise http.client.RemoteDisconnected("closed without response")
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_resends_only_requests_that_were_not_sent(server, monkeypatch):
+    """Kết nối cũ lỗi khi đang gửi -> gửi lại qua kết nối mới; lỗi sau khi đã gửi -> không gửi lại."""
+    # Server đóng kết nối ngay sau lần kiểm tra trước khi tái sử dụng
+    monkeypatch.setattr(http_pool, "_is_alive", lambda conn: True)
+    pool = http_pool.HTTPPool()
+    key = ("http", "127.0.0.1", int(server.split(":")[2].split("/")[0]))
+
+    broken = _StaleConnection(fail_on_send=True)
+    pool._idle[key] = [(broken, pool._clock())]
+    with pool.request("POST", server, body=b'{"i": 1}') as resp:
+        assert json.loads(resp.read())["echo"] == {"i": 1}
+    assert broken.closed and len(_Handler.client_ports) == 1
+
+    pool.close()
+    dropped = _StaleConnection(fail_on_send=False)
+    pool._idle[key] = [(dropped, pool._clock())]
+    with pytest.raises(http_pool.StaleConnectionError):
+        pool.request("POST", server, body=b'{"i": 2}')
+    # POST có thể đã được xử lý: không tự gửi lại, để retry policy của caller quyết định
+    assert dropped.sent == 1 and len(_Handler.client_ports) == 1
+    pool.close()
+
+
+def test_pool_skips_idle_connection_closed_by_server(server, monkeypatch):
+    """Server đóng kết nối rảnh (keep-alive timeout) thì request sau mở kết nối mới, không lỗi."""
+    monkeypatch.setattr(_Handler, "timeout", 0.1, raising=False)
+    pool = http_pool.HTTPPool()
+
+    key = ("http", "127.0.0.1", int(server.split(":")[2].split("/")[0]))
+
+    with pool.request("POST", server, body=b'{"i": 1}') as resp:
+        resp.read()
+    time.sleep(0.5)
+    conn, reused = pool._acquire(key)
+    assert reused is False
+    pool._release(key, conn)
+    with pool.request("POST", server, body=b'{"i": 2}') as resp:
+        assert json.loads(resp.read())["echo"] == {"i": 2}
+
+    assert len(set(_Handler.client_ports)) == 2
+    pool.close()
+
+
+def test_pool_drops_connections_idle_longer_than_idle_timeout(server, fake_clock):
+    """Kết nối rảnh quá ``idle_timeout`` không được tái sử dụng."""
+    pool = http_pool.HTTPPool(idle_timeout=30, clock=fake_clock)
+
+    with pool.request("POST", server, body=b"{}") as resp:
+        resp.read()
+    fake_clock.now += 10
+    with pool.request("POST", server, body=b"{}") as resp:
+        resp.read()
+    assert len(set(_Handler.client_ports)) == 1
+
+    fake_clock.now += 31
+    with pool.request("POST", server, body=b"{}") as resp:
+        resp.read()
+    assert len(set(_Handler.client_ports)) == 2
+    pool.close()
+
+
+def test_pool_raises_http_error_with_readable_body(server):
+    """Status >= 400 được ném ra dưới dạng urllib HTTPError, body vẫn đọc được qua e.read()."""
+    pool = http_pool.HTTPPool()
+
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        pool.request("POST", server, body=json.dumps({"status": 429}).encode())
+
+    assert excinfo.value.code == 429
+    assert json.loads(excinfo.value.read())["echo"] == {"status": 429}
+
+    # Kết nối vẫn được trả về pool sau lỗi HTTP
+    with pool.request("POST", server, body=b"{}") as resp:
+        resp.read()
+    assert len(set(_Handler.client_ports)) == 1
+    pool.close()
+
+
+def test_pool_raises_url_error_when_connection_refused():
+    """Không kết nối được thì ném URLError giống urllib.request.urlopen."""
+    pool = http_pool.HTTPPool(connect_timeout=1)
+
+    with pytest.raises(urllib.error.URLError):
+        pool.request("POST", "http://127.0.0.1:9/never", body=b"{}")
+
+
+def test_get_pool_uses_http_config(mocker):
+    """Kích thước pool và timeout lấy từ mục 'http' trong config."""
+    mocker.patch.object(
+        http_pool,
+        "load_config",
+        return_value={"http": {"pool_size": 7, "connect_timeout": 3, "read_timeout": 90}},
+    )
+    http_pool.reset_pool()
+    try:
+        pool = http_pool.get_pool()
+        assert isinstance(pool, http_pool.HTTPPool)
+        assert (pool.pool_size, pool.connect_timeout, pool.read_timeout) == (7, 3.0, 90.0)
+        assert http_pool.get_pool() is pool
+    finally:
+        http_pool.reset_pool()
+
+
+def test_json_body_is_serialized_once_and_compressed_above_threshold():
+    """JsonBody giữ UTF-8 gọn, chỉ nén gzip khi body đủ lớn; bản không nén dùng lại bytes đã serialize."""
+    import gzip
+
+    small = http_pool.JsonBody({"content": "xin chào"}, compress=True, min_bytes=1024)
+    assert small.data == '{"content":"xin chào"}'.encode("utf-8")
+    assert small.encoding is None and small.headers == {"Content-Type": "application/json"}
+
+    payload = {"messages": [{"role": "user", "content": "dòng log lặp lại\n" * 5000}]}
+    big = http_pool.JsonBody(payload, compress=True, min_bytes=1024)
+    assert big.encoding == "gzip" and big.headers["Content-Encoding"] == "gzip"
+    assert len(big) < len(big.raw) // 10
+    assert json.loads(gzip.decompress(big.data)) == payload
+
+    plain = big.uncompressed()
+    assert plain.data is big.raw and plain.encoding is None and plain.payload is payload
+    assert http_pool.JsonBody(payload, compress=False, min_bytes=1024).encoding is None
@@ -0,0 +1,95 @@
+import math
+
+import pytest
+
+from termi_cli import key_pool
+
+_GEMINI_DAILY_429 = (
+    "429 Quota exceeded for metric: generativelanguage.googleapis.com/generate_content_free_tier_requests, "
+    "limit: 50 [violations {\n  quota_metric: \"generativelanguage.googleapis.com/generate_content_free_tier_requests\"\n"
+    "  quota_id: \"GenerateRequestsPerDayPerProjectPerModel-FreeTier\"\n}\n, retry_delay {\n  seconds: 23\n}\n]"
+)
+_GROQ_TPD_429 = (
+    '{"error":{"message":"Rate limit reached for model `llama-3.3-70b-versatile` in organization `org_01` '
+    'service tier `on_demand` on tokens per day (TPD): Limit 100000, Used 99512, Requested 1033. '
+    'Please try again in 14m28.032s. Need more tokens? Upgrade to Dev Tier today at '
+    'https://console.groq.com/settings/billing","type":"tokens","code":"rate_limit_exceeded"}}'
+)
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("429 Quota exceeded. Please retry in 12.5s.", 12.5),
+        ("Rate limit reached. Please try again in 1m2.5s.", 62.5),
+        ("Please try again in 250ms.", 0.25),
+        ("retry_delay {\n  seconds: 7\n}", 7.0),
+        ("something else", None),
+    ],
+)
+def test_parse_retry_delay(message, expected):
+    """Đọc thời gian chờ từ thông báo lỗi của Gemini / Groq / DeepSeek."""
+    assert key_pool.parse_retry_delay(message) == expected
+
+
+def test_acquire_prefers_idle_then_least_recently_used_key(fake_clock):
+    """Key đang có request chạy bị xếp sau; giữa các key rảnh, key lâu chưa dùng được chọn trước."""
+    pool = key_pool.KeyPool("gemini", ["k1", "k2", "k3"], clock=fake_clock)
+
+    first = pool.acquire()
+    fake_clock.now += 1
+    second = pool.acquire()
+    fake_clock.now += 1
+    third = pool.acquire()
+    # Ba request đồng thời dùng ba key khác nhau
+    assert {first, second, third} == {"k1", "k2", "k3"}
+
+    pool.release("k2")
+    pool.release("k1")
+    fake_clock.now += 1
+    # Cả k1 và k2 đều rảnh -> chọn k1 vì lâu chưa dùng hơn
+    assert pool.acquire() == "k1"
+
+
+def test_rate_limited_keys_are_skipped_until_cooldown_ends(fake_clock):
+    """Key bị cooldown hoặc hết quota ngày bị bỏ qua; wait_time báo thời gian tới key khả dụng kế tiếp."""
+    pool = key_pool.KeyPool("groq", ["k1", "k2"], clock=fake_clock)
+
+    assert pool.report_rate_limit("k1", "Please try again in 5s") == "cooldown"
+    assert pool.report_rate_limit("k2", _GEMINI_DAILY_429) == "exhausted"
+
+    assert pool.acquire() is None
+    assert pool.wait_time() == pytest.approx(5.0)
+
+    fake_clock.now += 5
+    assert pool.acquire() == "k1"
+    assert pool.status()[1]["exhausted"] is True
+
+
+def test_daily_token_limit_with_server_delay_only_cools_the_key_down(fake_clock):
+    """TPD của Groq kèm "try again in 14m28s" / Retry-After: cooldown theo server, không chặn tới nửa đêm."""
+    pool = key_pool.KeyPool("groq", ["k1"], clock=fake_clock)
+
+    assert pool.report_rate_limit("k1", _GROQ_TPD_429) == "cooldown"
+    assert pool.wait_time() == pytest.approx(868.032)
+    assert pool.report_rate_limit("k1", _GROQ_TPD_429, retry_after=900) == "cooldown"
+    assert pool.wait_time() == pytest.approx(900)
+    assert pool.status()[0]["exhausted"] is False
+
+
+def test_wait_time_is_infinite_when_all_keys_exhausted(fake_clock):
+    """Mọi key đều hết quota ngày thì không nên chờ."""
+    pool = key_pool.KeyPool("deepseek", ["k1"], clock=fake_clock)
+    pool.mark_exhausted("k1")
+
+    assert math.isinf(pool.wait_time())
+
+
+def test_set_keys_preserves_existing_state(fake_clock):
+    """Khởi tạo lại danh sách key không xoá cooldown của key cũ."""
+    pool = key_pool.KeyPool("gemini", ["k1"], clock=fake_clock)
+    pool.mark_cooldown("k1", 10)
+
+    pool.set_keys(["k1", "k2"])
+
+    assert pool.acquire() == "k2"
+    assert pool.index_of("k2") == 1
@@ -0,0 +1,94 @@
+import io
+import argparse
+from types import SimpleNamespace
+
+import pytest
+from rich.console import Console
+
+from termi_cli import __main__ as termi_main
+from termi_cli import circuit_breaker
+
+
+class _TtyInput(io.StringIO):
+    def isatty(self):
+        return True
+
+
+@pytest.fixture
+def single_turn(mocker, monkeypatch):
+    """Chạy ``_run_single_turn`` với prompt "hi"; trả về mock semantic cache và ``tokens.calibrate``."""
+    monkeypatch.setattr("sys.stdin", _TtyInput(""))
+    mocker.patch.object(termi_main.memory, "search_memory", return_value=None)
+    mocker.patch.object(termi_main.memory, "add_memory", return_value=False)
+    mocker.patch.object(termi_main.core_handler, "build_system_instruction", return_value="sys")
+    mocker.patch.object(termi_main, "_plan_prompt_budget", return_value=SimpleNamespace(contents={}))
+    mocker.patch.object(termi_main.hedging, "policy_for", return_value=None)
+    mocker.patch.object(termi_main.utils, "execute_suggested_commands")
+    semantic = mocker.MagicMock()
+    semantic.lookup.return_value = None
+    mocker.patch.object(termi_main.semantic_cache, "get_cache", return_value=semantic)
+    mocker.patch.object(termi_main.api, "tool_declarations_text", return_value="TOOLS")
+    calibrate = mocker.patch.object(termi_main.tokens, "calibrate")
+
+    def run(model):
+        args = argparse.Namespace(prompt="hi", image=None, read_dir=False, model=model, format="raw", output=None)
+        termi_main._run_single_turn(Console(file=io.StringIO()), {}, "vi", None, args, "", [])
+        return SimpleNamespace(semantic=semantic, calibrate=calibrate)
+
+    return run
+
+
+def test_semantic_cache_stores_answer_under_fallback_model(single_turn, mocker):
+    """Model chính bị circuit breaker chặn: câu trả lời của model dự phòng lưu theo model dự phòng."""
+    def fake_stream_text(model, prompt, system_instruction=None):
+        if model == "deepseek-chat":
+            raise circuit_breaker.CircuitOpenError("DeepSeek", 30)
+        return iter(["ok"])
+
+    mocker.patch.object(termi_main.api, "stream_text", side_effect=fake_stream_text)
+    router = mocker.MagicMock()
+    router.next_model.return_value = "groq-chat"
+    mocker.patch.object(termi_main.model_router, "get_router", return_value=router)
+
+    run = single_turn("deepseek-chat")
+
+    run.semantic.store.assert_called_once_with("hi", "groq-chat", "sys", "ok")
+
+
+@pytest.mark.parametrize("requested, answered, stored", [
+    ("gemini-2.5-pro", "models/gemini-2.5-pro", "gemini-2.5-pro"),
+    ("models/gemini-2.5-pro", "models/gemini-2.5-flash", "models/gemini-2.5-flash"),
+])
+def test_semantic_cache_stores_gemini_answer_under_session_model(single_turn, mocker, requested, answered, stored):
+    """Router chuyển chat session sang model khác thì lưu theo model đó; cùng model thì giữ tên được yêu cầu."""
+    session = SimpleNamespace(model=SimpleNamespace(model_name="models/gemini-2.5-pro"))
+    mocker.patch.object(termi_main.api, "start_chat_session", return_value=session)
+
+    def fake_turn(chat_session, prompt_parts, console, model_name=None, args=None):
+        chat_session.model = SimpleNamespace(model_name=answered)
+        return "ok", {}, 0, []
+
+    mocker.patch.object(termi_main.core_handler, "handle_conversation_turn", side_effect=fake_turn)
+
+    run = single_turn(requested)
+
+    run.semantic.store.assert_called_once_with("hi", stored, "sys", "ok")
+
+
+def test_gemini_calibration_uses_only_the_payload_sent(single_turn, mocker):
+    """Hiệu chỉnh token theo instruction, lịch sử, prompt đã gửi và khai báo tool; không đếm prompt hai lần."""
+    mocker.patch.object(termi_main.api, "start_chat_session", return_value=SimpleNamespace(model=None))
+    mocker.patch.object(
+        termi_main.core_handler, "handle_conversation_turn", return_value=("ok", {"prompt_tokens": 900}, 0, [])
+    )
+    history = [{"role": "user", "parts": ["trước đó"]}]
+    mocker.patch.object(
+        termi_main, "_plan_prompt_budget",
+        return_value=SimpleNamespace(contents={"system_instruction": "SYS", "prompt": "hi", "images": [], "history": history}),
+    )
+
+    run = single_turn("models/gemini-2.5-pro")
+
+    # Phần ảnh được lập ngân sách trên bản sao, không bị prompt_text thêm vào sau đó
+    assert termi_main._plan_prompt_budget.call_args.args[-1] == []
+    run.calibrate.assert_called_once_with("models/gemini-2.5-pro", ["SYS", history, ["hi"], "TOOLS"], 900)
@@ -0,0 +1,57 @@
+import pytest
+
+from termi_cli import metrics
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_flush_appends_jsonl_and_load_filters_by_window(tmp_path):
+    """Observation được ghi nối tiếp ra file; load chỉ trả về các mẫu trong cửa sổ thời gian."""
+    clock = _Clock()
+    path = tmp_path / "metrics.jsonl"
+    registry = metrics.MetricsRegistry(path, flush_every=2, clock=clock)
+
+    registry.observe(metrics.PROVIDER_LATENCY, 900, model="groq-chat", key="abc")
+    assert not path.exists()
+    registry.observe(metrics.PROVIDER_LATENCY, 1100, model="groq-chat", key="abc")
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+
+    clock.now += 7200
+    with registry.timer(metrics.TOOL_DURATION, tool="read_file"):
+        pass
+    records = registry.load(metrics.parse_window("1h"))
+    assert [r["metric"] for r in records] == [metrics.TOOL_DURATION]
+    assert len(registry.load()) == 3
+
+    # Registry không có path (pytest) chỉ giữ histogram trong bộ nhớ
+    memory_only = metrics.MetricsRegistry(None)
+    memory_only.observe(metrics.TOKENS_PER_CALL, 42, model="m")
+    memory_only.flush()
+    assert memory_only.load() == []
+    assert memory_only.snapshot()[0]["p50"] == 42
+
+
+def test_summarize_groups_by_model_key_and_tool():
+    """Báo cáo tính p50/p95/p99 riêng cho từng model, key và tool."""
+    records = [
+        {"ts": 0, "metric": metrics.PROVIDER_LATENCY, "value": float(v), "labels": {"model": "a", "key": "k1"}}
+        for v in range(1, 101)
+    ] + [
+        {"ts": 0, "metric": metrics.TOOL_DURATION, "value": 5.0, "labels": {"tool": "grep"}},
+    ]
+    rows = {(r["metric"], r["label"], r["value"]): r for r in metrics.summarize(records)}
+
+    by_model = rows[(metrics.PROVIDER_LATENCY, "model", "a")]
+    assert (by_model["count"], by_model["p50"], by_model["p95"], by_model["p99"]) == (100, 50.0, 95.0, 99.0)
+    assert rows[(metrics.PROVIDER_LATENCY, "key", "k1")]["count"] == 100
+    assert rows[(metrics.TOOL_DURATION, "tool", "grep")]["p99"] == 5.0
+
+    assert metrics.parse_window("30m") == 1800
+    with pytest.raises(ValueError):
+        metrics.parse_window("yesterday")
@@ -0,0 +1,77 @@
+import os
+import urllib.error
+
+import pytest
+
+from termi_cli import api, circuit_breaker, key_pool, mock_server
+from termi_cli.handlers import loadtest_handler
+
+_FAST = {"latency": {"distribution": "fixed", "value_ms": 0}, "tokens_per_second": 0, "completion_tokens": 6, "seed": 7}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_provider_state(monkeypatch):
+    monkeypatch.setattr(key_pool, "_pools", {}, raising=True)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {}, raising=True)
+    monkeypatch.setattr(api, "_groq_api_keys", [], raising=True)
+    monkeypatch.setattr(api, "_deepseek_api_keys", [], raising=True)
+    for name in ("GROQ_API_KEY", "GROQ_API_KEY_2ND", "DEEPSEEK_API_KEY", "DEEPSEEK_API_KEY_2ND"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_provider_layer_handles_mock_errors_like_real_api(monkeypatch):
+    """429 theo RPM của key -> đổi key; 402 -> GroqInsufficientBalance; stream bị cắt -> URLError."""
+    # Cooldown theo RPM là ~60s: báo hết key ngay thay vì chờ
+    monkeypatch.setattr(api, "_MAX_COOLDOWN_WAIT_SECONDS", 1.0)
+    with mock_server.MockServer({**_FAST, "rpm_per_key": 1}, flavor="groq") as server:
+        monkeypatch.setenv("TERMI_GROQ_BASE_URL", server.base_url)
+        monkeypatch.setenv("GROQ_API_KEY", "k1")
+        monkeypatch.setenv("GROQ_API_KEY_2ND", "k2")
+        api.initialize_groq_api_keys()
+        messages = [{"role": "user", "content": "hi"}]
+
+        first = api._resilient_groq_api_call("llama-3.1-8b-instant", messages)
+        assert first["usage"]["completion_tokens"] == 6
+        # Lần hai: key còn lại vẫn còn lượt, lần ba: cả hai key đều vượt RPM -> 429 thật
+        assert "".join(api._resilient_groq_api_call("llama-3.1-8b-instant", messages, stream=True))
+        with pytest.raises(key_pool.KeysExhausted, match="exhausted") as excinfo:
+            api._resilient_groq_api_call("llama-3.1-8b-instant", messages)
+        assert excinfo.value.provider == "groq"
+        assert api.fallback_reason(excinfo.value) == "exhausted"
+        # Lỗi khác chỉ tình cờ chứa chữ "exhausted" không kích hoạt fallback
+        assert api.fallback_reason(RuntimeError("generator exhausted")) is None
+        stats = server.stats()
+        assert stats["ok"] == 2 and stats["rate_limited"] >= 2
+        assert {counts["ok"] for counts in stats["keys"].values()} == {1}
+        assert [row["cooldown_s"] > 0 for row in key_pool.get_pool("groq").status()] == [True, True]
+
+    with mock_server.MockServer({**_FAST, "insufficient_balance_rate": 1.0}, flavor="groq") as server:
+        monkeypatch.setenv("TERMI_GROQ_BASE_URL", server.base_url)
+        key_pool.get_pool("groq").set_keys(["k3"])
+        with pytest.raises(api.GroqInsufficientBalance, match="insufficient credit"):
+            api._resilient_groq_api_call("llama-3.1-8b-instant", messages)
+
+    with mock_server.MockServer({**_FAST, "stream_drop_rate": 1.0}, flavor="deepseek") as server:
+        monkeypatch.setenv("TERMI_DEEPSEEK_BASE_URL", server.base_url)
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "d1")
+        api.initialize_deepseek_api_keys()
+        with pytest.raises(urllib.error.URLError, match="DONE"):
+            list(api._resilient_deepseek_api_call("deepseek-chat", messages, stream=True))
+
+
+def test_load_test_reports_throughput_retries_and_key_rotation():
+    """Load test chạy N session song song qua mock server và khôi phục môi trường sau khi xong."""
+    config = {**_FAST, "rate_limit_rate": 0.3, "retry_after_seconds": 0.01}
+    report = loadtest_handler.run_load_test("groq", sessions=4, turns=3, keys=3, stream=True, server_config=config)
+
+    assert report["requests"] == 12
+    assert report["succeeded"] + sum(report["errors"].values()) == 12
+    assert report["http_requests"] == report["requests"] + report["retries"]
+    assert report["rate_limited"] > 0 and report["retries"] > 0
+    assert report["ttft_ms"]["p50"] <= report["latency_ms"]["p50"] <= report["latency_ms"]["p99"]
+    assert sum(row["requests"] for row in report["keys"]) == report["http_requests"]
+    assert all(row["requests"] > 0 for row in report["keys"])
+
+    assert "TERMI_GROQ_BASE_URL" not in os.environ
+    assert "GROQ_API_KEY" not in os.environ
+    assert api.provider_base_url("groq") == "https://api.groq.com/openai/v1"
@@ -0,0 +1,93 @@
+import threading
+
+from termi_cli import model_catalog
+
+
+def _gemini_models():
+    return [{
+        "name": "models/gemini-flash-latest",
+        "description": "Flash",
+        "input_token_limit": 1048576,
+        "output_token_limit": 8192,
+        "generation_methods": ["generateContent"],
+    }]
+
+
+def test_catalog_fetches_once_and_reuses_disk_cache(tmp_path, fake_clock):
+    """Lần đầu lấy đồng bộ và ghi ra đĩa; tiến trình sau (instance mới) chỉ đọc file."""
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return _gemini_models()
+
+    path = tmp_path / "model_catalog.json"
+    first = model_catalog.ModelCatalog(path, {"gemini": fetch}, ttl_seconds=3600, clock=fake_clock)
+    assert [m["name"] for m in first.models("gemini")] == ["models/gemini-flash-latest"]
+
+    second = model_catalog.ModelCatalog(path, {"gemini": fetch}, ttl_seconds=3600, clock=fake_clock)
+    assert second.find("gemini-flash-latest")["input_token_limit"] == 1048576
+    assert second.models("gemini")
+    assert len(calls) == 1
+
+
+def test_stale_catalog_is_served_while_refreshing_in_background(tmp_path, fake_clock):
+    """Quá TTL: trả dữ liệu cũ ngay, làm mới ở thread nền."""
+    refreshed = threading.Event()
+    responses = [_gemini_models(), [{"name": "models/gemini-new", "generation_methods": ["generateContent"]}]]
+
+    def fetch():
+        models = responses.pop(0)
+        if not responses:
+            refreshed.set()
+        return models
+
+    catalog = model_catalog.ModelCatalog(tmp_path / "c.json", {"gemini": fetch}, ttl_seconds=60, clock=fake_clock)
+    catalog.models("gemini")
+
+    fake_clock.now += 120
+    assert catalog.models("gemini")[0]["name"] == "models/gemini-flash-latest"
+    assert refreshed.wait(5)
+    for thread in threading.enumerate():
+        if thread.name == "model-catalog-gemini":
+            thread.join(5)
+    assert catalog.find("models/gemini-new") is not None
+
+
+def test_failed_fetch_is_not_retried_until_backoff_expires(tmp_path, fake_clock):
+    """Lấy danh sách lỗi thì được ghi ra đĩa: trong thời gian chờ không gọi lại, hết chờ mới thử lại."""
+    responses = [RuntimeError("network down"), _gemini_models()]
+
+    def fetch():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    path = tmp_path / "c.json"
+    first = model_catalog.ModelCatalog(path, {"gemini": fetch}, ttl_seconds=3600, clock=fake_clock,
+                                       failure_backoff_seconds=300)
+    assert first.models("gemini") == []
+
+    second = model_catalog.ModelCatalog(path, {"gemini": fetch}, ttl_seconds=3600, clock=fake_clock,
+                                        failure_backoff_seconds=300)
+    assert second.failed_recently("gemini")
+    assert second.models("gemini") == []
+    assert len(responses) == 1
+
+    fake_clock.now += 301
+    assert [m["name"] for m in second.models("gemini")] == ["models/gemini-flash-latest"]
+    assert not second.failed_recently("gemini")
+
+
+def test_refresh_skips_failing_provider(tmp_path):
+    """Provider lỗi khi lấy danh sách không làm hỏng provider khác."""
+    def broken():
+        raise RuntimeError("network down")
+
+    catalog = model_catalog.ModelCatalog(
+        tmp_path / "c.json", {"gemini": _gemini_models, "groq": broken}, ttl_seconds=60
+    )
+
+    assert catalog.refresh() == {"gemini": 1}
+    assert catalog.models("groq") == []
@@ -0,0 +1,100 @@
+import pytest
+
+from termi_cli import model_router
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _make_router(clock=None, **overrides):
+    config = {**model_router.DEFAULT_ROUTER_CONFIG, **overrides}
+    return model_router.ModelRouter(
+        config=config,
+        fallback_order=["models/flash", "models/pro", "groq-chat"],
+        clock=clock or _Clock(),
+    )
+
+
+def test_exhausted_model_is_skipped_until_degrade_period_ends():
+    """Model hết quota bị xếp cuối trong degrade_seconds, sau đó được dùng lại."""
+    clock = _Clock()
+    router = _make_router(clock, degrade_seconds=60)
+
+    assert router.choose("models/flash") == "models/flash"
+    router.record_failure("models/flash", model_router.EXHAUSTED)
+
+    assert router.candidates("models/flash") == ["models/pro", "groq-chat", "models/flash"]
+    assert router.next_model("models/pro", tried=["models/flash"]) == "groq-chat"
+
+    clock.now += 61
+    assert router.choose("models/flash") == "models/flash"
+
+
+def test_slow_model_moves_behind_healthy_ones_and_accept_filters():
+    """Bật reroute_slow: model có trung vị TTFT vượt slow_ms bị xếp sau; accept lọc model không hợp lệ."""
+    router = _make_router(slow_ms=1000, reroute_slow=True)
+    for latency in (2.0, 3.0, 2.5):
+        router.record_success("models/flash", latency)
+    router.record_success("models/pro", 0.4)
+
+    assert router.is_slow("models/flash")
+    assert router.candidates("models/flash", accept=lambda m: m.startswith("models/")) == [
+        "models/pro",
+        "models/flash",
+    ]
+
+
+def test_slow_requested_model_is_kept_unless_reroute_slow():
+    """Mặc định model được yêu cầu không bị thay chỉ vì chậm; model dự phòng chậm vẫn xếp sau."""
+    router = _make_router(slow_ms=1000)
+    for latency in (2.0, 3.0, 2.5):
+        router.record_success("models/flash", latency)
+
+    assert router.choose("models/flash") == "models/flash"
+    assert router.candidates("models/pro") == ["models/pro", "groq-chat", "models/flash"]
+
+
+def test_repeated_errors_degrade_model():
+    """Tỉ lệ lỗi vượt ngưỡng (sau min_samples lần gọi) làm model bị degraded."""
+    router = _make_router(error_rate=0.5, min_samples=3)
+    router.record_success("models/pro", 0.2)
+    router.record_failure("models/pro")
+    assert not router.is_degraded("models/pro")
+
+    router.record_failure("models/pro")
+    assert router.is_degraded("models/pro")
+
+
+def test_call_falls_back_on_classified_errors_and_reraises_others():
+    """call() chuyển sang model kế tiếp khi lỗi được phân loại, ném ngay lỗi khác."""
+    router = _make_router()
+    calls = []
+
+    def fn(model):
+        calls.append(model)
+        if model == "models/flash":
+            raise RuntimeError("All Gemini API keys exhausted")
+        return f"answer from {model}"
+
+    def classify(exc):
+        return model_router.EXHAUSTED if "exhausted" in str(exc) else None
+
+    assert router.call("models/flash", fn, classify) == ("models/pro", "answer from models/pro")
+    assert calls == ["models/flash", "models/pro"]
+    assert router.is_degraded("models/flash")
+
+    with pytest.raises(ValueError):
+        router.call("models/pro", lambda model: (_ for _ in ()).throw(ValueError("bad")), classify)
+
+
+def test_disabled_router_only_tries_requested_model():
+    """Tắt router thì chỉ gọi đúng model được yêu cầu."""
+    router = _make_router(enabled=False)
+    router.record_failure("models/flash", model_router.EXHAUSTED)
+
+    assert router.candidates("models/flash") == ["models/flash"]
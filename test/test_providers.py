@@ -0,0 +1,117 @@
+import pytest
+
+from termi_cli import api, circuit_breaker, key_pool, mock_server, providers, rate_limit
+
+_FAST = {"latency": {"distribution": "fixed", "value_ms": 0}, "tokens_per_second": 0, "completion_tokens": 4, "seed": 3}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_provider_state(monkeypatch):
+    monkeypatch.setattr(key_pool, "_pools", {}, raising=True)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {}, raising=True)
+    monkeypatch.setattr(api.response_cache, "get_cache", lambda: None)
+
+
+def _use_config(monkeypatch, config: dict) -> None:
+    monkeypatch.setattr(providers, "load_config", lambda: config, raising=True)
+    monkeypatch.setattr(rate_limit, "_limiter", rate_limit.RateLimiter(config_loader=lambda: config), raising=True)
+
+
+def test_configured_local_provider_reuses_openai_compatible_path_without_key(monkeypatch):
+    """Provider khai báo trong config: định tuyến theo tiền tố, map alias, gọi không kèm key và không bị throttle."""
+    with mock_server.MockServer(_FAST, flavor="deepseek") as server:
+        _use_config(monkeypatch, {"providers": {
+            "local": {"base_url": server.base_url, "label": "llama.cpp", "models": {"chat": "qwen2.5-7b-instruct"}},
+        }})
+
+        assert api._provider_of("local-chat") == "local"
+        assert api._provider_of("groq-chat") == "groq"
+        assert api._provider_of("models/gemini-2.5-flash") == "gemini"
+        assert rate_limit.get_limiter().limits_for("local", "qwen2.5-7b-instruct") == {}
+
+        completion = api.generate_completion("local-chat", "hi")
+        assert completion["text"] and completion["usage"]["completion_tokens"] == 4
+        assert "".join(api.stream_text("local-llama-3-8b", "hi"))
+
+        stats = server.stats()
+        assert stats["ok"] == 2
+        # Không có Authorization header -> server thấy key "-"
+        assert set(stats["keys"]) == {"-"}
+        assert key_pool.get_pool("local").keys == [""]
+
+        catalog_models = api._catalog_fetchers()["local"]()
+        assert [m["name"] for m in catalog_models] == ["local-deepseek-chat", "local-deepseek-reasoner"]
+
+
+def test_builtin_providers_merge_config_overrides(monkeypatch):
+    """Ghi đè groq/deepseek trong config: alias được gộp, rate limit của provider đứng sau rate_limits[model]."""
+    _use_config(monkeypatch, {
+        "rate_limits": {"llama3-8b-8192": {"rpm": 5}},
+        "providers": {
+            "groq": {"models": {"fast": "llama-3.1-8b-instant"}, "rate_limits": {"rpm": 100}},
+            "vllm": {"prefix": "vl:", "base_url": "http://127.0.0.1:8000/v1/", "api_key_env": "VLLM_API_KEY"},
+            "broken": {"label": "no base url"},
+        },
+    })
+
+    groq = providers.get("groq")
+    assert groq.model_id("groq-fast") == "llama-3.1-8b-instant"
+    assert api._normalize_groq_model("groq-chat") == "llama-3.3-70b-versatile"
+    assert providers.get("deepseek").model_id("deepseek-chat") == "deepseek-chat"
+
+    limiter = rate_limit.get_limiter()
+    assert limiter.limits_for("groq", "llama3-8b-8192") == {"rpm": 5}
+    assert limiter.limits_for("groq", "llama-3.3-70b-versatile") == {"rpm": 100}
+    assert limiter.limits_for("deepseek", "deepseek-chat") == {"rpm": 30}
+
+    assert "broken" not in providers.registry()
+    vllm = providers.resolve("vl:mistral-7b")
+    assert vllm.name == "vllm" and vllm.base_url == "http://127.0.0.1:8000/v1"
+    assert vllm.model_id("vl:mistral-7b") == "mistral-7b"
+
+    monkeypatch.delenv("VLLM_API_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="VLLM_API_KEY"):
+        api.generate_completion("vl:mistral-7b", "hi")
+
+
+def test_large_prompt_is_serialized_once_compressed_and_counted(monkeypatch):
+    """Prompt lớn: serialize một lần cho mọi lần thử, tự bỏ nén khi server từ chối, ghi số byte vào metrics."""
+    from termi_cli import http_pool, metrics
+
+    registry = metrics.MetricsRegistry(None)
+    monkeypatch.setattr(metrics, "_registry", registry, raising=True)
+    monkeypatch.setattr(api, "_compression_rejected", set(), raising=True)
+    bodies = []
+
+    class _CountingBody(http_pool.JsonBody):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            bodies.append(self)
+
+    monkeypatch.setattr(http_pool, "JsonBody", _CountingBody, raising=True)
+
+    prompt = "2024-05-01 12:00:00 INFO worker heartbeat ok\n" * 4000
+    messages = [{"role": "user", "content": prompt}]
+    for accept_gzip in (False, True):
+        with mock_server.MockServer({**_FAST, "accept_gzip_requests": accept_gzip}, flavor="groq") as server:
+            _use_config(monkeypatch, {"providers": {"local": {"base_url": server.base_url, "compress_requests": True}}})
+            bodies.clear()
+            if accept_gzip:
+                monkeypatch.setattr(api, "_compression_rejected", set(), raising=True)
+            api._resilient_provider_call("local", "llama-3.1-8b-instant", messages)
+            stats = server.stats()
+
+        assert len(bodies) == 1
+        if accept_gzip:
+            assert stats["gzip_requests"] == stats["requests"] >= 1
+            assert stats["request_bytes"] < len(prompt) // 10 * stats["requests"]
+        else:
+            # Lần đầu gửi nén bị 415, gửi lại bản không nén của cùng body (không serialize lại)
+            assert stats["unsupported_encoding"] == 1 and stats["gzip_requests"] == 0
+            assert api._compression_rejected == {"local"}
+
+    # 3 lần gửi (nén bị từ chối, không nén, nén), 2 response thành công
+    sent = [row for row in registry.snapshot() if row["metric"] == metrics.REQUEST_BYTES]
+    received = [row for row in registry.snapshot() if row["metric"] == metrics.RESPONSE_BYTES]
+    assert [row["count"] for row in sent] == [3] and [row["count"] for row in received] == [2]
+    assert sent[0]["p50"] < len(prompt) // 10 < len(prompt) < sent[0]["p99"]
@@ -0,0 +1,44 @@
+from termi_cli import key_pool, quota_store
+
+
+def test_store_upserts_keep_longest_block_and_count_requests(tmp_path):
+    """Cooldown/exhausted chỉ được kéo dài; bộ đếm reset khi sang cửa sổ quota mới."""
+    store = quota_store.QuotaStore(tmp_path / "quota.db")
+    far_future = 4_000_000_000.0
+
+    store.set_cooldown("gemini", "fp1", far_future)
+    store.set_cooldown("gemini", "fp1", 10.0)
+    store.set_exhausted("gemini", "fp1", far_future + 1)
+    store.record_request("gemini", "fp1", far_future)
+    store.record_request("gemini", "fp1", far_future)
+
+    state = store.load("gemini")["fp1"]
+    assert state == {"cooldown_until": far_future, "exhausted_until": far_future + 1, "requests": 2}
+
+    store.record_request("gemini", "fp1", far_future + 86400)
+    assert store.load("gemini")["fp1"]["requests"] == 1
+    assert store.load("groq") == {}
+
+
+def test_key_pools_in_different_processes_share_cooldowns(tmp_path, fake_clock):
+    """Hai pool (mô phỏng hai tiến trình) dùng chung file DB: key bị chặn ở bên này thì bên kia bỏ qua."""
+    path = tmp_path / "quota.db"
+    fake_clock.now = 1_700_000_000.0
+    pool_a = key_pool.KeyPool("groq", ["k1", "k2"], clock=fake_clock, store=quota_store.QuotaStore(path))
+    pool_b = key_pool.KeyPool("groq", ["k1", "k2"], clock=fake_clock, store=quota_store.QuotaStore(path))
+
+    pool_a.report_rate_limit("k1", "Please try again in 30s")
+    pool_a.mark_exhausted("k2")
+
+    assert pool_b.acquire() is None
+    assert pool_b.wait_time() == 30.0
+
+    fake_clock.now += 31
+    assert pool_b.acquire() == "k1"
+    assert pool_a.status()[0]["requests_today"] == 1
+
+
+def test_get_store_is_disabled_by_env(monkeypatch):
+    """TERMI_NO_QUOTA_STORE tắt hoàn toàn việc dùng DB chung."""
+    monkeypatch.setenv("TERMI_NO_QUOTA_STORE", "1")
+    assert quota_store.get_store() is None
@@ -0,0 +1,48 @@
+import pytest
+
+from termi_cli import rate_limit
+
+
+def test_token_bucket_allows_burst_then_spaces_requests(fake_clock):
+    """Bucket cho phép burst bằng dung lượng, sau đó giãn cách theo tốc độ nạp."""
+    bucket = rate_limit.TokenBucket(rate=1.0, capacity=2, clock=fake_clock)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1.0)
+    # Request kế tiếp được xếp lịch sau request đã giữ chỗ
+    assert bucket.reserve() == pytest.approx(2.0)
+
+    fake_clock.now += 10
+    assert bucket.reserve() == 0
+
+
+def test_rate_limiter_uses_model_rpm_limits_per_key(fake_clock):
+    """RPM lấy từ MODEL_RPM_LIMITS và bucket tách riêng theo từng API key."""
+    limiter = rate_limit.RateLimiter(config_loader=lambda: {}, clock=fake_clock)
+
+    # gemini-pro-latest: 2 RPM -> burst 1, request thứ hai phải chờ 30s
+    assert limiter.reserve("gemini", "key-a", "models/gemini-pro-latest") == 0
+    assert limiter.reserve("gemini", "key-a", "models/gemini-pro-latest") == pytest.approx(30.0)
+    # Key khác có bucket riêng
+    assert limiter.reserve("gemini", "key-b", "models/gemini-pro-latest") == 0
+
+
+def test_rate_limiter_prefers_user_config_and_tracks_tpm(fake_clock):
+    """config['rate_limits'] ghi đè mặc định; TPM được giữ chỗ và điều chỉnh theo usage thật."""
+    config = {"rate_limits": {"deepseek": {"rpm": 600, "tpm": 600, "burst": 10}}}
+    limiter = rate_limit.RateLimiter(config_loader=lambda: config, clock=fake_clock)
+
+    assert limiter.limits_for("deepseek", "deepseek-chat") == {"rpm": 600, "tpm": 600, "burst": 10}
+    assert limiter.reserve("deepseek", "k", "deepseek-chat", tokens=100) == 0
+
+    # Thực tế dùng 600 token -> bucket TPM cạn, request sau phải chờ token nạp lại (10 token/giây)
+    limiter.record_usage("deepseek", "k", "deepseek-chat", 600, reserved_tokens=100)
+    assert limiter.reserve("deepseek", "k", "deepseek-chat", tokens=50) == pytest.approx(5.0)
+
+
+def test_key_fingerprint_does_not_leak_key():
+    """Fingerprint ngắn, ổn định và không chứa giá trị key."""
+    fp = rate_limit.key_fingerprint("secret-key-123")
+    assert fp == rate_limit.key_fingerprint("secret-key-123")
+    assert "secret" not in fp and len(fp) == 12
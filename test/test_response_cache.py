@@ -0,0 +1,77 @@
+from termi_cli import api, response_cache
+
+
+def test_make_key_depends_on_every_input():
+    """Khoá thay đổi khi bất kỳ thành phần nào của input thay đổi."""
+    base = response_cache.make_key("gemini", "m", "sys", "prompt")
+    assert base == response_cache.make_key("gemini", "m", "sys", "prompt")
+    assert base != response_cache.make_key("groq", "m", "sys", "prompt")
+    assert base != response_cache.make_key("gemini", "m", None, "prompt")
+    assert base != response_cache.make_key("gemini", "m", "sys", "prompt", {"temperature": 0.2})
+
+
+def test_cache_evicts_least_recently_used_and_expired_entries(tmp_path, make_cache, fake_clock):
+    """Vượt max_entries thì xoá entry ít dùng gần đây nhất; entry quá TTL bị coi là miss."""
+    cache = make_cache(response_cache.ResponseCache, tmp_path / "responses.db", max_entries=2, max_bytes=1024)
+
+    cache.put("a", "m", "A")
+    fake_clock.now += 1
+    cache.put("b", "m", "B")
+    fake_clock.now += 1
+    assert cache.get("a") == "A"  # "a" vừa được dùng -> "b" là LRU
+    cache.put("c", "m", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("c") == "C"
+
+    fake_clock.now += 200
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 2, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_generate_text_uses_cache_and_no_cache_bypass(tmp_path, monkeypatch, make_cache):
+    """Lần gọi thứ hai với input giống hệt không gọi model; --no-cache luôn gọi model."""
+    cache = make_cache(response_cache.ResponseCache, tmp_path / "responses.db", ttl_seconds=3600, max_entries=10, max_bytes=1024)
+    monkeypatch.setattr(response_cache, "_cache", cache, raising=True)
+    monkeypatch.setattr(response_cache, "get_cache_config", lambda: {"enabled": True}, raising=True)
+
+    calls = []
+
+    def fake_uncached(model_name, prompt, system_instruction=None):
+        calls.append(prompt)
+        return f"answer {len(calls)}", None
+
+    monkeypatch.setattr(api, "_generate_completion_uncached", fake_uncached, raising=True)
+
+    assert api.generate_text("groq-chat", "hello", "sys") == "answer 1"
+    assert api.generate_text("groq-chat", "hello", "sys") == "answer 1"
+    assert calls == ["hello"]
+
+    response_cache.set_bypass(True)
+    try:
+        assert api.generate_text("groq-chat", "hello", "sys") == "answer 2"
+    finally:
+        response_cache.set_bypass(False)
+
+
+def test_fallback_answer_is_not_cached_under_requested_model(tmp_path, monkeypatch, make_cache):
+    """Model chính hết quota, model dự phòng trả lời: lần sau vẫn thử lại model chính thay vì đọc cache."""
+    cache = make_cache(response_cache.ResponseCache, tmp_path / "responses.db", ttl_seconds=3600, max_entries=10, max_bytes=1024)
+    monkeypatch.setattr(response_cache, "_cache", cache, raising=True)
+    monkeypatch.setattr(response_cache, "get_cache_config", lambda: {"enabled": True}, raising=True)
+
+    class _FallbackRouter:
+        def call(self, model_name, call, classify):
+            return "groq-chat", call("groq-chat")
+
+    monkeypatch.setattr(api.model_router, "get_router", lambda: _FallbackRouter(), raising=True)
+    monkeypatch.setattr(api, "_generate_completion_uncached", lambda model, prompt, system_instruction=None: (f"from {model}", None))
+
+    first = api.generate_completion("deepseek-chat", "hello")
+    assert first["model"] == "groq-chat" and not first["cached"]
+    second = api.generate_completion("deepseek-chat", "hello")
+    assert not second["cached"]
+    assert cache.stats()["entries"] == 0
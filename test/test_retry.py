@@ -0,0 +1,94 @@
+import io
+import json
+import email.utils
+import urllib.error
+
+import pytest
+
+from termi_cli import api, circuit_breaker, key_pool, retry
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_policy_uses_full_jitter_server_delays_and_deadline():
+    """Backoff nằm trong [0, cap], ưu tiên thời gian server yêu cầu và dừng khi hết lượt / quá deadline."""
+    clock = _Clock()
+    policy = retry.RetryPolicy(max_retries=3, base_delay=1.0, max_delay=5.0, deadline_seconds=10.0, rng=lambda: 0.5, clock=clock)
+    assert [policy.backoff(n) for n in (1, 2, 3, 4, 5)] == [0.5, 1.0, 2.0, 2.5, 2.5]
+    assert retry.RetryPolicy(rng=lambda: 0.0).backoff(3) == 0.0
+
+    assert retry.parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert retry.parse_duration("120ms") == pytest.approx(0.12)
+    assert retry.parse_duration("soon") is None
+    assert retry.retry_after({"Retry-After": "7"}) == 7.0
+    http_date = email.utils.formatdate(1_000_030, usegmt=True)
+    assert retry.retry_after({"retry-after": http_date}, now=1_000_000) == pytest.approx(30.0)
+    groq_headers = {
+        "x-ratelimit-remaining-requests": "14",
+        "x-ratelimit-reset-requests": "2m59.56s",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "7.66s",
+    }
+    assert retry.retry_after(groq_headers) == pytest.approx(7.66)
+    assert retry.retry_after({"x-ratelimit-reset-requests": "3s", "x-ratelimit-reset-tokens": "1s"}) == 1.0
+    assert retry.retry_after({}) is None
+
+    state = policy.start()
+    with retry.track() as stats:
+        assert state.next_delay("HTTP 503") == 0.5
+        assert state.next_delay("HTTP 503", server_delay=11.0) is None  # quá deadline
+        clock.now = 9.5
+        assert state.next_delay("URLError", server_delay=0.2) == 0.2
+        assert state.next_delay("URLError") is None  # còn 0.5s, backoff lần 3 là 2s
+        clock.now = 0.0
+        assert state.next_delay("URLError", server_delay=0.0) == 0.0
+        assert state.next_delay("URLError", server_delay=0.0) is None  # hết max_retries
+    assert stats.retries == 3
+    assert stats.reasons == {"HTTP 503": 1, "URLError": 2}
+
+
+def test_single_key_provider_retries_transient_errors_and_reports_count(monkeypatch):
+    """Một key duy nhất: 503, lỗi kết nối và 429 đều được thử lại; số lần retry trả về cho caller."""
+    monkeypatch.setattr(api, "_groq_api_keys", ["k1"], raising=True)
+    monkeypatch.setattr(key_pool, "_pools", {"groq": key_pool.KeyPool("groq", ["k1"])}, raising=True)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {"groq": circuit_breaker.CircuitBreaker("groq", failure_threshold=5)}, raising=True)
+    monkeypatch.setattr(retry, "get_policy", lambda: retry.RetryPolicy(max_retries=4, base_delay=0.0), raising=True)
+
+    replies = [
+        urllib.error.HTTPError("u", 503, "Service Unavailable", {}, io.BytesIO(b"upstream overloaded")),
+        urllib.error.URLError(TimeoutError("timed out")),
+        urllib.error.HTTPError("u", 429, "Too Many Requests", {"Retry-After": "0"}, io.BytesIO(b'{"error":"rate limit"}')),
+    ]
+
+    class _Response(io.BytesIO):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            self.close()
+
+    def fake_post_json(url, payload, headers=None):
+        if replies:
+            raise replies.pop(0)
+        return _Response(json.dumps({"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 3}}).encode())
+
+    monkeypatch.setattr(api.http_pool, "post_json", fake_post_json, raising=True)
+    monkeypatch.setattr(api.response_cache, "get_cache", lambda: None)
+
+    completion = api.generate_completion("groq-chat", "hi")
+    assert completion["text"] == "ok"
+    assert completion["retries"] == 3
+
+    # Hết lượt retry: lỗi 5xx được ném ra cho caller
+    replies.extend(
+        urllib.error.HTTPError("u", 502, "Bad Gateway", {}, io.BytesIO(b"bad gateway")) for _ in range(5)
+    )
+    with retry.track() as stats, pytest.raises(urllib.error.HTTPError):
+        api._resilient_groq_api_call("llama-3.1-8b-instant", [{"role": "user", "content": "hi"}])
+    assert stats.retries == 4 and stats.reasons == {"HTTP 502": 4}
@@ -0,0 +1,65 @@
+import uuid
+
+import chromadb
+from chromadb.config import Settings
+
+from termi_cli import semantic_cache
+
+
+class _BagOfWordsEmbedding(chromadb.EmbeddingFunction):
+    """Embedding giả lập (không cần tải model): đếm từ trong một bộ từ vựng nhỏ."""
+
+    VOCAB = ["git", "rebase", "onto", "main", "how", "python", "list", "sort"]
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[float(text.lower().split().count(word)) + 0.01 for word in self.VOCAB] for text in input]
+
+    @staticmethod
+    def name():
+        return "test-bag-of-words"
+
+
+def _collection():
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    return client.get_or_create_collection(
+        name=f"semantic-{uuid.uuid4().hex}",
+        metadata={"hnsw:space": "cosine"},
+        embedding_function=_BagOfWordsEmbedding(),
+    )
+
+
+def test_paraphrase_hits_only_for_same_model_and_instruction(tmp_path, make_cache):
+    """Câu hỏi diễn đạt lại được trả từ cache; khác model / system instruction thì miss."""
+    cache = make_cache(semantic_cache.SemanticCache, _collection(), stats_path=tmp_path / "stats.json", threshold=0.85, max_entries=10)
+    cache.store("how do I rebase onto main", "models/gemini-flash", "sys", "git rebase main")
+
+    answer, similarity = cache.lookup("git rebase onto main how", "models/gemini-flash", "sys")
+    assert answer == "git rebase main"
+    assert similarity >= 0.85
+
+    assert cache.lookup("git rebase onto main how", "groq-chat", "sys") is None
+    assert cache.lookup("git rebase onto main how", "models/gemini-flash", "other") is None
+    assert cache.lookup("sort a python list", "models/gemini-flash", "sys") is None
+
+    assert semantic_cache.read_stats(tmp_path / "stats.json") == {"hits": 1, "misses": 3}
+
+
+def test_expired_answers_are_dropped_and_size_is_capped(tmp_path, make_cache, fake_clock):
+    """Câu trả lời quá TTL bị bỏ qua; vượt max_entries thì entry cũ nhất bị xoá."""
+    cache = make_cache(semantic_cache.SemanticCache, _collection(), stats_path=tmp_path / "stats.json", threshold=0.85, max_entries=2)
+
+    cache.store("git rebase", "m", None, "old")
+    fake_clock.now += 1
+    cache.store("python list", "m", None, "b")
+    fake_clock.now += 1
+    cache.store("sort", "m", None, "c")
+
+    assert cache.collection.count() == 2
+    assert cache.lookup("git rebase", "m", None) is None
+
+    fake_clock.now += 500
+    assert cache.lookup("sort", "m", None) is None
+    assert cache.collection.count() == 1
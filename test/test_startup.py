@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import subprocess
+
+# Các package nặng không được phép import khi chạy lệnh không cần model
+HEAVY_MODULES = [
+    "google.generativeai",
+    "google.api_core",
+    "PIL",
+    "chromadb",
+    "sqlalchemy",
+    "googleapiclient",
+    "requests",
+]
+
+
+def _run_and_collect_modules(tmp_path, cli_args):
+    """Chạy termi trong tiến trình con và trả về danh sách module nặng đã bị import."""
+    script = (
+        "import json, sys\n"
+        f"sys.argv = ['termi'] + {cli_args!r}\n"
+        "from termi_cli.__main__ import main\n"
+        "main()\n"
+        f"heavy = {HEAVY_MODULES!r}\n"
+        "loaded = [m for m in heavy if m in sys.modules]\n"
+        "print('LOADED_MODULES=' + json.dumps(loaded))\n"
+    )
+    env = dict(os.environ)
+    env["TERMI_CLI_HOME"] = str(tmp_path / "home")
+    env.pop("PYTEST_CURRENT_TEST", None)
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr
+    marker = [line for line in proc.stdout.splitlines() if line.startswith("LOADED_MODULES=")]
+    assert marker, proc.stdout
+    return json.loads(marker[-1].split("=", 1)[1])
+
+
+def test_diagnostics_does_not_import_heavy_sdks(tmp_path):
+    """`termi --diagnostics` không được import SDK provider, chromadb, sqlalchemy, googleapiclient, requests."""
+    loaded = _run_and_collect_modules(tmp_path, ["--diagnostics"])
+    assert loaded == []
+
+
+def test_list_profiles_does_not_import_heavy_sdks(tmp_path):
+    """`termi --list-profiles` cũng phải khởi động mà không kéo theo SDK nặng."""
+    loaded = _run_and_collect_modules(tmp_path, ["--list-profiles"])
+    assert loaded == []
@@ -0,0 +1,75 @@
+import json
+
+from termi_cli import tokens
+
+
+def test_estimate_is_family_specific_and_calibrated(tmp_path):
+    """Ước lượng theo họ model; hiệu chỉnh từ usage thật được lưu và đọc lại."""
+    path = tmp_path / "calibration.json"
+    estimator = tokens.TokenEstimator(path)
+    text = "x" * 4000
+
+    assert estimator.estimate("models/gemini-flash-latest", text) == 1000
+    assert estimator.estimate("deepseek-chat", text) > estimator.estimate("models/gemini-flash-latest", text)
+
+    estimator.calibrate("models/gemini-flash-latest", text, 1500)
+    assert estimator.estimate("models/gemini-flash-latest", text) == 1500
+    # Prompt quá ngắn không được dùng để hiệu chỉnh
+    estimator.calibrate("models/gemini-flash-latest", "hi", 50)
+
+    assert json.loads(path.read_text(encoding="utf-8"))["gemini"]["samples"] == 1
+    reloaded = tokens.TokenEstimator(path)
+    assert reloaded.estimate("models/gemini-pro-latest", text) == 1500
+    assert reloaded.estimate("groq-chat", text) == round(4000 / tokens.BYTES_PER_TOKEN["groq"])
+
+
+def test_plan_budget_trims_lowest_priority_first():
+    """Vượt ngân sách thì bỏ/cắt phần ưu tiên thấp trước, giữ nguyên phần bắt buộc."""
+    estimator = tokens.TokenEstimator()
+    sections = [
+        tokens.Section("system_instruction", "s" * 400, priority=100, required=True),
+        tokens.Section("prompt", "p" * 400, priority=90, required=True),
+        tokens.Section("history", ["h" * 400, "i" * 400, "j" * 400], priority=40, trim="items"),
+        tokens.Section("memory", "m" * 800, priority=30, trim="drop"),
+        tokens.Section("directory_context", "d" * 40000, priority=10),
+    ]
+
+    plan = tokens.plan_budget("models/gemini-flash-latest", sections, limit=600, reserve_ratio=0.0, estimator=estimator)
+
+    assert plan.fits
+    assert plan.total_tokens <= 600
+    assert plan.contents["system_instruction"] == "s" * 400
+    assert plan.contents["prompt"] == "p" * 400
+    # Ngữ cảnh thư mục bị bỏ trước, rồi tới trí nhớ; lịch sử còn chỗ nên giữ nguyên
+    assert [name for name, _, _ in plan.trimmed] == ["directory_context", "memory"]
+    assert "directory_context" not in plan.contents
+    assert plan.contents["history"] == ["h" * 400, "i" * 400, "j" * 400]
+
+
+def test_plan_budget_truncates_text_and_drops_oldest_history():
+    """Phần "tail" được cắt giữ phần đầu kèm dấu hiệu; lịch sử bỏ tin nhắn cũ nhất."""
+    estimator = tokens.TokenEstimator()
+    sections = [
+        tokens.Section("prompt", "p" * 400, priority=90, required=True),
+        tokens.Section("history", ["old" * 400, "new" * 100], priority=40, trim="items"),
+        tokens.Section("directory_context", "d" * 8000, priority=10),
+    ]
+
+    plan = tokens.plan_budget("models/gemini-flash-latest", sections, limit=1000, reserve_ratio=0.0, estimator=estimator)
+
+    assert plan.contents["directory_context"].startswith("d" * 100)
+    assert plan.contents["directory_context"].endswith(tokens.TRUNCATION_MARKER)
+    assert plan.total_tokens <= 1000
+    assert plan.contents["history"] == ["old" * 400, "new" * 100]
+
+    smaller = tokens.plan_budget("models/gemini-flash-latest", sections, limit=300, reserve_ratio=0.0, estimator=estimator)
+    assert smaller.contents["history"] == ["new" * 100]
+    assert "directory_context" not in smaller.contents
+
+    tight = tokens.plan_budget("models/gemini-flash-latest", sections, limit=50, reserve_ratio=0.0, estimator=estimator)
+    assert not tight.fits
+    assert "directory_context" not in tight.contents
+    assert "history" not in tight.contents
+
+    unknown = tokens.plan_budget("groq-chat", sections, limit=0, estimator=estimator)
+    assert unknown.trimmed == []
@@ -0,0 +1,49 @@
+import json
+import threading
+
+import pytest
+
+from termi_cli import tracing
+
+
+def test_spans_are_written_as_chrome_trace_events(tmp_path):
+    """Span lồng nhau, span lỗi và sự kiện tức thời được ghi đúng định dạng trace-event."""
+    path = tmp_path / "trace.json"
+    tracing.start(path)
+    try:
+        with tracing.span("chat_turn", tracing.TURN, model="m"):
+            with tracing.span("tool read_file", tracing.TOOL):
+                pass
+            tracing.instant("key_rate_limited", tracing.PROVIDER, key=1)
+        with pytest.raises(ValueError):
+            with tracing.span("gemini m", tracing.PROVIDER):
+                raise ValueError("boom")
+
+        def _search():
+            with tracing.span("memory_search", tracing.MEMORY):
+                pass
+
+        worker = threading.Thread(target=_search, name="worker")
+        worker.start()
+        worker.join()
+    finally:
+        tracing.stop()
+
+    events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    turn, tool = spans["chat_turn"], spans["tool read_file"]
+    # Span con nằm trọn trong span cha trên cùng thread
+    assert turn["tid"] == tool["tid"]
+    assert turn["ts"] <= tool["ts"] and tool["ts"] + tool["dur"] <= turn["ts"] + turn["dur"]
+    assert turn["args"] == {"model": "m"}
+    assert spans["gemini m"]["args"]["error"] == "ValueError"
+    assert [e["args"] for e in events if e["ph"] == "i"] == [{"key": 1}]
+    assert "worker" in {e["args"]["name"] for e in events if e["ph"] == "M"}
+
+
+def test_span_is_noop_when_tracing_disabled():
+    """Không bật --trace thì span không ghi gì và không tạo tracer."""
+    assert not tracing.enabled()
+    with tracing.span("anything", tracing.TOOL):
+        tracing.instant("nothing", tracing.TURN)
+    assert not tracing.enabled()